@@ -1,3 +1,13 @@
 from django.contrib import admin
 
-# Register your models here.
+from apps.core.models import SpooledTask
+
+
+@admin.register(SpooledTask)
+class SpooledTaskAdmin(admin.ModelAdmin):
+    """Admin do spool de tasks do Celery."""
+
+    list_display = ['task_name', 'attempts', 'next_attempt_at', 'created_at']
+    list_filter = ['task_name']
+    search_fields = ['task_name', 'last_error']
+    readonly_fields = ['created_at']
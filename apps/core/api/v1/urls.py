@@ -0,0 +1,8 @@
+from django.urls import path
+from .views import IntegrationStatusAPIView
+
+app_name = "core_api_v1"
+
+urlpatterns = [
+    path("integrations/status/", IntegrationStatusAPIView.as_view(), name="integrations-status"),
+]
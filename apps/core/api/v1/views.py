@@ -0,0 +1,29 @@
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework.permissions import IsAdminUser
+
+from apps.core import status as core_status
+from apps.notifications import status as notifications_status
+from apps.orders import status as orders_status
+
+# Cada app responde pelas próprias métricas (status() de cada app)
+STATUS_PROVIDERS = (core_status, orders_status, notifications_status)
+
+
+class IntegrationStatusAPIView(APIView):
+    """
+    Monitoramento das integrações externas (somente staff).
+
+    Junta o status() de cada app; as chaves estão documentadas lá.
+
+    Contadores são do processo que atende a requisição; o estado "aberto"
+    do circuito é compartilhado via cache entre web e workers.
+    """
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        data = {}
+        for provider in STATUS_PROVIDERS:
+            data.update(provider.status())
+        return Response(data)
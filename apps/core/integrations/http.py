@@ -0,0 +1,217 @@
+"""
+Transporte HTTP compartilhado pelas integrações (Pagar.me, Correios, Evolution).
+
+- Session por processo (keep-alive + pool de conexões por host); recriada
+  após fork (gunicorn/celery prefork), nunca compartilhada entre processos
+- Timeouts de conexão e leitura em toda chamada: upstream travado não
+  prende o worker
+- Retentativas limitadas com backoff exponencial + jitter:
+  - falha de conexão (a requisição não saiu): sempre
+  - timeout de leitura e 502/503/504: só em chamadas idempotentes
+- Métricas por host (chamadas, erros, latência) em memória do processo
+
+Configuração (variáveis de ambiente):
+    HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT, HTTP_MAX_RETRIES,
+    HTTP_RETRY_BACKOFF, HTTP_POOL_MAXSIZE
+"""
+import logging
+import os
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from decouple import config
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger("integrations")
+
+CONNECT_TIMEOUT = config("HTTP_CONNECT_TIMEOUT", default=3.05, cast=float)
+READ_TIMEOUT = config("HTTP_READ_TIMEOUT", default=15.0, cast=float)
+MAX_RETRIES = config("HTTP_MAX_RETRIES", default=2, cast=int)
+RETRY_BACKOFF = config("HTTP_RETRY_BACKOFF", default=0.5, cast=float)
+RETRY_BACKOFF_MAX = 5.0
+POOL_MAXSIZE = config("HTTP_POOL_MAXSIZE", default=10, cast=int)
+
+RETRY_STATUS_CODES = {502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+
+# ============================
+# Session por processo
+# ============================
+_session: requests.Session | None = None
+_session_pid: int | None = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """
+    Retorna a Session do processo atual (criada sob demanda).
+
+    Após um fork o pid muda e uma nova Session é criada: sockets do
+    processo pai não são reaproveitados pelo filho.
+    """
+    global _session, _session_pid
+
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _session_lock:
+            if _session is None or _session_pid != pid:
+                session = requests.Session()
+                # Retentativas ficam no nosso loop (com jitter e regra de idempotência)
+                adapter = HTTPAdapter(
+                    pool_connections=10,
+                    pool_maxsize=POOL_MAXSIZE,
+                    max_retries=0,
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session, _session_pid = session, pid
+
+    return _session
+
+
+# ============================
+# Métricas por host
+# ============================
+_metrics: dict[str, dict] = {}
+_metrics_lock = threading.Lock()
+
+
+def _record(host: str, elapsed: float, error: bool, retried: bool):
+    with _metrics_lock:
+        stats = _metrics.setdefault(host, {
+            "calls": 0,
+            "errors": 0,
+            "retries": 0,
+            "total_time": 0.0,
+            "max_time": 0.0,
+        })
+        stats["calls"] += 1
+        stats["errors"] += int(error)
+        stats["retries"] += int(retried)
+        stats["total_time"] += elapsed
+        stats["max_time"] = max(stats["max_time"], elapsed)
+
+
+def get_http_metrics() -> dict[str, dict]:
+    """
+    Snapshot das métricas por host deste processo.
+
+    {host: {calls, errors, retries, total_time, max_time, avg_time}}
+    """
+    with _metrics_lock:
+        return {
+            host: {
+                **stats,
+                "avg_time": stats["total_time"] / stats["calls"] if stats["calls"] else 0.0,
+            }
+            for host, stats in _metrics.items()
+        }
+
+
+def reset_http_metrics():
+    """Zera as métricas (testes e benchmarks)."""
+    with _metrics_lock:
+        _metrics.clear()
+
+
+# ============================
+# Requisições
+# ============================
+def _backoff(attempt: int) -> float:
+    """Backoff exponencial com jitter completo."""
+    return random.uniform(0, min(RETRY_BACKOFF_MAX, RETRY_BACKOFF * 2 ** attempt))
+
+
+def request(
+    method: str,
+    url: str,
+    *,
+    timeout: float | tuple[float, float] | None = None,
+    retries: int | None = None,
+    idempotent: bool | None = None,
+    **kwargs,
+) -> requests.Response:
+    """
+    Faz uma requisição pelo transporte compartilhado.
+
+    Args:
+        method: Método HTTP
+        url: URL completa
+        timeout: (conexão, leitura) em segundos; padrão do ambiente
+        retries: Número máximo de retentativas; padrão HTTP_MAX_RETRIES
+        idempotent: Se a chamada pode ser repetida com segurança.
+            Padrão: pelo método (POST não é idempotente).
+
+    Returns:
+        requests.Response (o chamador decide sobre raise_for_status)
+
+    Raises:
+        requests.exceptions.RequestException: esgotadas as retentativas
+    """
+    method = method.upper()
+    timeout = timeout or (CONNECT_TIMEOUT, READ_TIMEOUT)
+    retries = MAX_RETRIES if retries is None else retries
+    if idempotent is None:
+        idempotent = method in IDEMPOTENT_METHODS
+
+    host = urlsplit(url).netloc
+    session = get_session()
+    attempt = 0
+
+    while True:
+        started = time.perf_counter()
+        try:
+            response = session.request(method, url, timeout=timeout, **kwargs)
+        except requests.exceptions.RequestException as e:
+            elapsed = time.perf_counter() - started
+            # ConnectTimeout é subclasse de ConnectionError: nada foi enviado
+            can_retry = attempt < retries and (
+                isinstance(e, requests.exceptions.ConnectTimeout)
+                or (idempotent and isinstance(e, (
+                    requests.exceptions.ConnectionError,
+                    requests.exceptions.ReadTimeout,
+                )))
+            )
+            _record(host, elapsed, error=True, retried=can_retry)
+            if not can_retry:
+                logger.error(f"[HTTP] {method} {host} falhou após {attempt + 1} tentativa(s): {e}")
+                raise
+        else:
+            elapsed = time.perf_counter() - started
+            server_error = response.status_code >= 500
+            can_retry = (
+                idempotent
+                and attempt < retries
+                and response.status_code in RETRY_STATUS_CODES
+            )
+            _record(host, elapsed, error=server_error, retried=can_retry)
+            if not can_retry:
+                return response
+            response.close()
+
+        delay = _backoff(attempt)
+        attempt += 1
+        logger.warning(
+            f"[HTTP] {method} {host} - retentativa {attempt}/{retries} em {delay:.2f}s"
+        )
+        time.sleep(delay)
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    return request("POST", url, **kwargs)
+
+
+def put(url: str, **kwargs) -> requests.Response:
+    return request("PUT", url, **kwargs)
+
+
+def delete(url: str, **kwargs) -> requests.Response:
+    return request("DELETE", url, **kwargs)
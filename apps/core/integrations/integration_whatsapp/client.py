@@ -1,7 +1,13 @@
 from apps.core.integrations.integration_whatsapp.whatsapp import get_evolution_client
 
-CLIENT = get_evolution_client()
-
 
 def get_client():
-    return CLIENT
+    """Cliente da Evolution API do processo atual (criado no primeiro uso)."""
+    return get_evolution_client()
+
+
+def __getattr__(name):
+    # Compatibilidade: CLIENT era criado na importação do módulo
+    if name == "CLIENT":
+        return get_evolution_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
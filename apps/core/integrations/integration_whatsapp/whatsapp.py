@@ -1,4 +1,6 @@
 import logging
+import os
+import threading
 import time
 from typing import Optional
 
@@ -8,21 +10,82 @@ from evolutionapi.exceptions import (
     EvolutionAPIError,
     EvolutionAuthenticationError,
 )
+from requests_toolbelt import MultipartEncoder
+
+from apps.core.integrations import http
+from apps.core.integrations.standin import CREDENTIAL_DEFAULT, service_url
 
 # Logger
 logger = logging.getLogger("integrations")
 
-# Variáveis de ambiente (com fallback para compatibilidade)
-URL_SERVE = config("EVOLUTION_API_URL", default=config("URL_SERVE", default=""))
-API_KEY = config("EVOLUTION_API_KEY", default=config("API_KEY", default=""))
+# Variáveis de ambiente (com fallback para compatibilidade);
+# INTEGRATIONS_STANDIN_URL troca pelo servidor local
+URL_SERVE = service_url(
+    "evolution", config("EVOLUTION_API_URL", default=config("URL_SERVE", default=""))
+)
+API_KEY = config(
+    "EVOLUTION_API_KEY",
+    default=config("API_KEY", default=CREDENTIAL_DEFAULT.get("default", "")),
+)
 MAX_RETRIES = config("MAX_RETRIES", default=3, cast=int)
 RETRY_DELAY = config("RETRY_DELAY", default=2, cast=int)
+# Após falhar ao conectar, espera (s) antes de tentar de novo
+EVOLUTION_RETRY_COOLDOWN = config("EVOLUTION_RETRY_COOLDOWN", default=30, cast=int)
+# Validade (s) da última verificação de saúde (por processo)
+EVOLUTION_HEALTH_TTL = config("EVOLUTION_HEALTH_TTL", default=60, cast=int)
+
+
+class PooledEvolutionClient(EvolutionClient):
+    """
+    EvolutionClient que usa o transporte HTTP compartilhado.
+
+    O cliente original chama requests.get/post direto (sem timeout e uma
+    conexão nova por mensagem). Aqui as mesmas chamadas passam pela
+    Session do processo, com timeout e métricas por host.
+    """
+
+    def get(self, endpoint: str, instance_token: str = None):
+        url = self._get_full_url(endpoint)
+        response = http.get(url, headers=self._get_headers(instance_token))
+        return self._handle_response(response)
+
+    def post(self, endpoint: str, data: dict = None, instance_token: str = None, files: dict = None):
+        url = self._get_full_url(endpoint)
+        headers = self._get_headers(instance_token)
+
+        if files:
+            # Mesmo multipart do cliente original
+            fields = {
+                key: str(value) if not isinstance(value, (int, float)) else (None, str(value), "text/plain")
+                for key, value in (data or {}).items()
+            }
+            fields["file"] = tuple(files["file"][:3])
+            multipart = MultipartEncoder(fields=fields)
+            headers["Content-Type"] = multipart.content_type
+            response = http.post(url, headers=headers, data=multipart)
+        else:
+            response = http.post(url, headers=headers, json=data)
+
+        return response.json()
+
+    def put(self, endpoint, data=None):
+        url = self._get_full_url(endpoint)
+        response = http.put(url, headers=self._get_headers(), json=data)
+        return self._handle_response(response)
+
+    def delete(self, endpoint: str, instance_token: str = None):
+        url = self._get_full_url(endpoint)
+        response = http.delete(url, headers=self._get_headers(instance_token))
+        return self._handle_response(response)
 
 
 class EvolutionClientManager:
     """
     Gerencia a conexão com a Evolution API.
     Conecta sob demanda e tenta reconectar se cair.
+
+    Depois de uma falha, não tenta de novo por EVOLUTION_RETRY_COOLDOWN
+    segundos: quem chama recebe None na hora, sem esperar as retentativas.
     """
 
     def __init__(
@@ -31,6 +94,7 @@ class EvolutionClientManager:
         api_token: str,
         max_retries: int,
         retry_delay: int,
+        retry_cooldown: int = EVOLUTION_RETRY_COOLDOWN,
     ):
         if not base_url or not api_token:
             raise EnvironmentError(
@@ -41,7 +105,10 @@ class EvolutionClientManager:
         self.api_token = api_token
         self.max_retries = max_retries
         self.retry_delay = retry_delay
-        self._client: Optional[EvolutionClient] = None
+        self.retry_cooldown = retry_cooldown
+        self._client: Optional[PooledEvolutionClient] = None
+        self._failed_at: Optional[float] = None
+        self._health: Optional[dict] = None
 
     def _connect(self) -> None:
         """Cria a conexão com retentativas."""
@@ -49,10 +116,11 @@ class EvolutionClientManager:
 
         for attempt in range(1, self.max_retries + 1):
             try:
-                self._client = EvolutionClient(
+                self._client = PooledEvolutionClient(
                     base_url=self.base_url,
                     api_token=self.api_token,
                 )
+                self._failed_at = None
                 logger.info("EvolutionClient conectado com sucesso.")
                 return
 
@@ -64,28 +132,85 @@ class EvolutionClientManager:
                     time.sleep(self.retry_delay)
                 else:
                     self._client = None
+                    self._failed_at = time.monotonic()
                     raise
 
             except Exception as e:
                 self._client = None
+                self._failed_at = time.monotonic()
                 logger.error(f"Erro inesperado ao conectar: {e}")
                 raise
 
     def get_client(self) -> Optional[EvolutionClient]:
         """
         Retorna o cliente ativo.
-        Se não existir, tenta criar.
+        Se não existir, tenta criar (fora da espera após falha).
         """
         if self._client is None:
+            if self._failed_at and time.monotonic() - self._failed_at < self.retry_cooldown:
+                return None
             self._connect()
 
         return self._client
 
+    def health(self, max_age: int = EVOLUTION_HEALTH_TTL) -> dict:
+        """
+        {"available", "instances", "error", "checked_at"}
+
+        Consulta as instâncias na Evolution API no máximo uma vez a cada
+        max_age segundos; no meio tempo devolve o último resultado.
+        """
+        now = time.time()
+        if self._health and now - self._health["checked_at"] < max_age:
+            return self._health
+
+        try:
+            client = self.get_client()
+            if client is None:
+                health = {"available": False, "instances": None, "error": "sem cliente"}
+            else:
+                instances = client.instances.fetch_instances()
+                health = {"available": True, "instances": len(instances or []), "error": None}
+        except Exception as e:
+            health = {"available": False, "instances": None, "error": str(e)}
+
+        self._health = {**health, "checked_at": now}
+        return self._health
+
 
 # ============================
-# Lazy Singleton (CORRETO)
+# Registro por processo
 # ============================
+# Nada conecta na importação: manage.py e workers sobem sem I/O de rede.
+# O cliente é criado no primeiro uso, no processo que vai usá-lo; após
+# um fork (gunicorn/celery prefork) o pid muda e o filho cria o seu.
 _client_manager: Optional[EvolutionClientManager] = None
+_client_pid: Optional[int] = None
+_client_lock = threading.Lock()
+
+
+def get_client_manager() -> EvolutionClientManager:
+    """
+    Gerenciador do processo atual (criado no primeiro uso).
+
+    Raises:
+        EnvironmentError: URL_SERVE / API_KEY não configuradas
+    """
+    global _client_manager, _client_pid
+
+    pid = os.getpid()
+    if _client_manager is None or _client_pid != pid:
+        with _client_lock:
+            if _client_manager is None or _client_pid != pid:
+                _client_manager = EvolutionClientManager(
+                    base_url=URL_SERVE,
+                    api_token=API_KEY,
+                    max_retries=MAX_RETRIES,
+                    retry_delay=RETRY_DELAY,
+                )
+                _client_pid = pid
+
+    return _client_manager
 
 
 def get_evolution_client() -> Optional[EvolutionClient]:
@@ -93,19 +218,26 @@ def get_evolution_client() -> Optional[EvolutionClient]:
     Ponto único para obter o cliente da Evolution API.
     Só conecta quando alguém chama.
     """
-    global _client_manager
-
     try:
-        if _client_manager is None:
-            _client_manager = EvolutionClientManager(
-                base_url=URL_SERVE,
-                api_token=API_KEY,
-                max_retries=MAX_RETRIES,
-                retry_delay=RETRY_DELAY,
-            )
-
-        return _client_manager.get_client()
+        return get_client_manager().get_client()
 
     except Exception as e:
         logger.error(f"Falha ao obter cliente Evolution API: {e}")
         return None
+
+
+def get_evolution_health() -> dict:
+    """Saúde da Evolution API vista por este processo (com cache)."""
+    try:
+        return get_client_manager().health()
+    except EnvironmentError as e:
+        return {"available": False, "instances": None, "error": str(e), "checked_at": time.time()}
+
+
+def reset_evolution_client() -> None:
+    """Descarta o cliente do processo (ex.: worker_process_init do Celery)."""
+    global _client_manager, _client_pid
+
+    with _client_lock:
+        _client_manager = None
+        _client_pid = None
@@ -2,12 +2,56 @@ import requests
 from decouple import config
 from enum import Enum
 
+from apps.core.integrations import http
+from apps.core.integrations.resilience import (
+    Bulkhead,
+    CircuitBreaker,
+    IntegrationUnavailable,
+)
+from apps.core.integrations.standin import CREDENTIAL_DEFAULT, service_url
+
+
+# Base da API v5 (INTEGRATIONS_STANDIN_URL troca pelo servidor local)
+PAGARME_API_URL = service_url(
+    "pagarme",
+    config("PAGARME_API_URL", default="https://api.pagar.me/core/v5"),
+    "/core/v5",
+)
+
+# Validade (minutos) dos links criados; a varredura de expiração
+# (expire_payment_links_task) usa a mesma variável
+PAYMENT_LINK_EXPIRES_IN = config("PAYMENT_LINK_EXPIRES_MINUTES", default=1200, cast=int)
+
+
+# Circuit breaker + bulkhead da criação de links/pedidos: com o Pagar.me
+# lento ou fora, as chamadas falham rápido em vez de prender workers
+PAGARME_BREAKER = CircuitBreaker(
+    "pagarme",
+    failure_rate=config("PAGARME_BREAKER_FAILURE_RATE", default=0.5, cast=float),
+    min_calls=config("PAGARME_BREAKER_MIN_CALLS", default=5, cast=int),
+    slow_call_seconds=config("PAGARME_BREAKER_SLOW_SECONDS", default=5.0, cast=float),
+    open_seconds=config("PAGARME_BREAKER_OPEN_SECONDS", default=30.0, cast=float),
+)
+PAGARME_BULKHEAD = Bulkhead(
+    "pagarme",
+    max_concurrent=config("PAGARME_MAX_CONCURRENT", default=4, cast=int),
+    acquire_timeout=1.0,
+)
+
+
+def _is_upstream_failure(error: Exception) -> bool:
+    """Erros 4xx são do nosso payload, não do Pagar.me: não abrem o circuito."""
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        return error.response.status_code >= 500
+    return True
+
 
 class PaymentLinkType(Enum):
     """Tipos de endpoints disponíveis no Pagar.me"""
 
-    ORDER = "https://api.pagar.me/core/v5/orders"
-    PAYMENT_LINK = "https://api.pagar.me/core/v5/paymentlinks"
+    ORDER = f"{PAGARME_API_URL}/orders"
+    PAYMENT_LINK = f"{PAGARME_API_URL}/paymentlinks"
+    CHARGES = f"{PAGARME_API_URL}/charges"
 
 
 class BasePagarMeApi:
@@ -24,7 +68,7 @@ class BasePagarMeApi:
 
     def __init__(self, total_amount, max_installments, customer_name, api_url):
         self.api_url = api_url
-        self.api_key = config("API_KEY_PAGAR_ME")
+        self.api_key = config("API_KEY_PAGAR_ME", **CREDENTIAL_DEFAULT)
         self.total_amount = total_amount
         self.max_installments = max_installments
         self.customer_name = customer_name
@@ -41,6 +85,13 @@ class BasePagarMeApi:
         """
         Faz a requisição POST para a API.
 
+        Usa o transporte compartilhado (conexão reaproveitada + timeout).
+        Criar pedido/link não é idempotente: só repete se a conexão nem
+        chegou a ser aberta.
+
+        Passa pelo bulkhead e pelo circuit breaker do Pagar.me: com o
+        circuito aberto retorna na hora, com "unavailable": True.
+
         Args:
             payload (dict): Dados a serem enviados.
 
@@ -48,11 +99,14 @@ class BasePagarMeApi:
             dict: Resposta da API em formato JSON ou erro.
         """
         try:
-            response = requests.post(
-                self.api_url, json=payload, headers=self._get_headers()
-            )
-            response.raise_for_status()
-            return response.json()
+            with PAGARME_BULKHEAD, PAGARME_BREAKER.guard(is_failure=_is_upstream_failure):
+                response = http.post(
+                    self.api_url, json=payload, headers=self._get_headers()
+                )
+                response.raise_for_status()
+                return response.json()
+        except IntegrationUnavailable as e:
+            return {"error": str(e), "unavailable": True}
         except requests.exceptions.RequestException as e:
             return {"error": str(e)}
 
@@ -179,13 +233,60 @@ class PagarMePaymentLink(BasePagarMeApi):
             },
             "name": self.customer_name,
             "type": "order",
-            "expires_in": 1200,
+            "expires_in": PAYMENT_LINK_EXPIRES_IN,
             "max_paid_sessions": 1,
         }
 
         return self._make_request(payload)
 
 
+class PagarMeCharges(BasePagarMeApi):
+    """
+    Consulta cobranças na API do Pagar.me (GET /charges).
+
+    Usada pela conciliação. Leitura é idempotente: o transporte repete
+    em falhas de conexão e 502/503/504. Passa pelo circuit breaker do
+    Pagar.me (com o circuito aberto levanta CircuitOpenError), mas não
+    pelo bulkhead: a concorrência da conciliação é limitada por ela mesma.
+
+    Erros HTTP são levantados (requests.exceptions.RequestException);
+    quem chama decide se aborta ou registra a falha.
+    """
+
+    def __init__(self):
+        self.api_url = PaymentLinkType.CHARGES.value
+        self.api_key = config("API_KEY_PAGAR_ME", **CREDENTIAL_DEFAULT)
+
+    def _get(self, params: dict) -> dict:
+        with PAGARME_BREAKER.guard(is_failure=_is_upstream_failure):
+            response = http.get(self.api_url, params=params, headers=self._get_headers())
+            response.raise_for_status()
+            return response.json()
+
+    def list_charges(self, *, created_since, created_until, page=1, size=100):
+        """
+        Uma página de cobranças criadas no período.
+
+        Returns:
+            dict: {"data": [cobranças], "paging": {"total": int, ...}}
+        """
+        return self._get({
+            "created_since": created_since.isoformat(),
+            "created_until": created_until.isoformat(),
+            "page": page,
+            "size": size,
+        })
+
+    def list_charges_by_code(self, code):
+        """
+        Cobranças de um código (id do link de pagamento).
+
+        Returns:
+            list: Cobranças encontradas (pode ser vazia)
+        """
+        return self._get({"code": code, "page": 1, "size": 30}).get("data") or []
+
+
 """# Exemplos de uso
 if __name__ == "__main__":
     total_amount = 20000  # R$ 200,00 em centavos
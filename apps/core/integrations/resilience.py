@@ -0,0 +1,414 @@
+"""
+Circuit breaker e bulkhead para integrações externas.
+
+CircuitBreaker:
+- closed: chamadas passam; erros e chamadas lentas contam numa janela
+  das últimas `window_size` chamadas
+- open: taxa de falha ≥ `failure_rate` (com pelo menos `min_calls` na
+  janela) → falha rápida (CircuitOpenError) por `open_seconds`
+- half_open: passado o tempo, uma chamada de teste por vez; sucesso
+  fecha o circuito, falha reabre
+
+O estado "aberto" também vai para o cache compartilhado: quando um worker
+abre o circuito, os outros processos (gunicorn, celery) falham rápido
+sem precisar descobrir o problema sozinhos. O processo que soube pelo
+cache adota o prazo e, passado ele, também faz uma chamada de teste.
+
+Bulkhead: limita chamadas simultâneas por processo. Quem não consegue
+vaga em `acquire_timeout` segundos recebe BulkheadFullError, em vez de
+ficar preso esperando um upstream lento.
+
+TokenBucket: limita a vazão (chamadas/s) de todos os processos juntos.
+Com o cache no Redis, o balde é um hash atualizado por script Lua
+(atômico); sem Redis, ou com o Redis fora do ar, cai para um balde local
+do processo. AdaptiveRate ajusta a vazão pelas respostas do upstream:
+dobra a espera em erro/limite e volta aos poucos com sucessos (AIMD).
+
+Uso:
+    with bulkhead, breaker.guard():
+        response = http.post(...)
+
+    bucket.rate = pacer.rate
+    if bucket.acquire(timeout=5):
+        ...
+"""
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from django.core.cache import cache
+
+logger = logging.getLogger("integrations")
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class IntegrationUnavailable(Exception):
+    """Integração indisponível (circuito aberto ou sem vaga no bulkhead)."""
+
+
+class CircuitOpenError(IntegrationUnavailable):
+    pass
+
+
+class BulkheadFullError(IntegrationUnavailable):
+    pass
+
+
+# ============================
+# Circuit breaker
+# ============================
+_breakers: dict[str, "CircuitBreaker"] = {}
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        *,
+        failure_rate: float = 0.5,
+        min_calls: int = 5,
+        window_size: int = 20,
+        slow_call_seconds: float | None = None,
+        open_seconds: float = 30.0,
+    ):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+
+        self._lock = threading.Lock()
+        self._window: deque[bool] = deque(maxlen=window_size)  # True = falha
+        self._opened_at: float | None = None
+        self._trial_in_flight = False
+        self._counters = {
+            "calls": 0,
+            "failures": 0,
+            "slow_calls": 0,
+            "rejected": 0,
+            "opened": 0,
+        }
+
+        _breakers[name] = self
+
+    # ---------- estado ----------
+
+    @property
+    def _cache_key(self) -> str:
+        return f"circuit:{self.name}:open_until"
+
+    def _shared_open_until(self) -> float | None:
+        try:
+            return cache.get(self._cache_key)
+        except Exception:
+            # Cache fora do ar não pode derrubar a integração
+            return None
+
+    @property
+    def state(self) -> str:
+        now = time.time()
+        with self._lock:
+            if self._opened_at is None:
+                open_until = self._shared_open_until()
+                if not open_until or open_until <= now:
+                    return STATE_CLOSED
+                # Aberto por outro processo: adota o prazo, para que ao fim
+                # dele este processo também passe por meio aberto (uma
+                # chamada de teste) em vez de voltar direto a fechado
+                self._opened_at = open_until - self.open_seconds
+                self._window.clear()
+
+            if now - self._opened_at < self.open_seconds:
+                return STATE_OPEN
+            return STATE_HALF_OPEN
+
+    def allows_calls(self) -> bool:
+        """True se uma chamada agora não seria rejeitada de imediato."""
+        state = self.state
+        return state == STATE_CLOSED or (
+            state == STATE_HALF_OPEN and not self._trial_in_flight
+        )
+
+    def _before_call(self):
+        state = self.state
+        with self._lock:
+            if state == STATE_OPEN or (state == STATE_HALF_OPEN and self._trial_in_flight):
+                self._counters["rejected"] += 1
+                raise CircuitOpenError(f"Circuito {self.name} aberto")
+            if state == STATE_HALF_OPEN:
+                self._trial_in_flight = True
+            self._counters["calls"] += 1
+
+    def _after_call(self, failed: bool, slow: bool):
+        with self._lock:
+            half_open = self._trial_in_flight
+            self._trial_in_flight = False
+            self._counters["failures"] += int(failed)
+            self._counters["slow_calls"] += int(slow)
+
+            if half_open:
+                if failed or slow:
+                    self._open()
+                else:
+                    self._close()
+                return
+
+            self._window.append(failed or slow)
+            failures = sum(self._window)
+            if (
+                len(self._window) >= self.min_calls
+                and failures / len(self._window) >= self.failure_rate
+            ):
+                self._open()
+
+    def _open(self):
+        self._opened_at = time.time()
+        self._window.clear()
+        self._counters["opened"] += 1
+        logger.warning(f"[Circuit] {self.name} aberto por {self.open_seconds}s")
+        try:
+            cache.set(self._cache_key, self._opened_at + self.open_seconds, self.open_seconds)
+        except Exception:
+            pass
+
+    def _close(self):
+        self._opened_at = None
+        self._window.clear()
+        logger.info(f"[Circuit] {self.name} fechado")
+        try:
+            cache.delete(self._cache_key)
+        except Exception:
+            pass
+
+    def reset(self):
+        """Volta ao estado inicial (testes e operação manual)."""
+        with self._lock:
+            self._opened_at = None
+            self._trial_in_flight = False
+            self._window.clear()
+            for key in self._counters:
+                self._counters[key] = 0
+        try:
+            cache.delete(self._cache_key)
+        except Exception:
+            pass
+
+    # ---------- uso ----------
+
+    @contextmanager
+    def guard(self, is_failure=None):
+        """
+        Envolve uma chamada externa.
+
+        Args:
+            is_failure: predicado (exceção → bool) para decidir se a exceção
+                conta como falha do upstream. Padrão: toda exceção conta.
+        """
+        self._before_call()
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            failed = is_failure(e) if is_failure else True
+            self._after_call(failed=failed, slow=False)
+            raise
+        else:
+            elapsed = time.perf_counter() - started
+            slow = bool(self.slow_call_seconds) and elapsed > self.slow_call_seconds
+            self._after_call(failed=False, slow=slow)
+
+    def snapshot(self) -> dict:
+        state = self.state
+        with self._lock:
+            return {
+                "state": state,
+                "window_calls": len(self._window),
+                "window_failures": sum(self._window),
+                **self._counters,
+            }
+
+
+def get_breaker_states() -> dict[str, dict]:
+    """Estado e contadores de todos os circuit breakers do processo."""
+    return {name: breaker.snapshot() for name, breaker in _breakers.items()}
+
+
+# ============================
+# Bulkhead
+# ============================
+class Bulkhead:
+    def __init__(self, name: str, *, max_concurrent: int, acquire_timeout: float = 0.0):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.acquire_timeout = acquire_timeout
+        self._semaphore = threading.BoundedSemaphore(max_concurrent)
+        self.rejected = 0
+
+    def __enter__(self):
+        if self.acquire_timeout:
+            acquired = self._semaphore.acquire(timeout=self.acquire_timeout)
+        else:
+            acquired = self._semaphore.acquire(blocking=False)
+
+        if not acquired:
+            self.rejected += 1
+            raise BulkheadFullError(
+                f"Bulkhead {self.name} cheio ({self.max_concurrent} chamadas em andamento)"
+            )
+        return self
+
+    def __exit__(self, *exc_info):
+        self._semaphore.release()
+        return False
+
+
+# ============================
+# Token bucket (distribuído)
+# ============================
+# KEYS[1] = balde; ARGV = agora, vazão (tokens/s), capacidade
+# Retorna 0 se pegou o token, ou a espera (ms) até o próximo
+_TOKEN_BUCKET_LUA = """
+local now = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local capacity = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = math.ceil((1 - tokens) / rate * 1000)
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000) + 1000)
+return wait
+"""
+
+
+def _redis_client():
+    """Cliente Redis do cache padrão, ou None (locmem, outro backend)."""
+    from django.core.cache import caches
+    from django.core.cache.backends.redis import RedisCache
+
+    backend = caches["default"]
+    if not isinstance(backend, RedisCache):
+        return None
+    return backend._cache.get_client(write=True)
+
+
+class TokenBucket:
+    def __init__(self, name: str, *, rate: float, capacity: int = 1):
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity
+
+        self._lock = threading.Lock()
+        self._tokens = float(capacity)
+        self._updated_at = time.monotonic()
+        self._script = None
+
+    @property
+    def _cache_key(self) -> str:
+        return f"token_bucket:{self.name}"
+
+    def _try_shared(self) -> float | None:
+        """Pega um token no Redis → espera (s); None se não há Redis."""
+        try:
+            client = _redis_client()
+            if client is None:
+                return None
+            if self._script is None:
+                self._script = client.register_script(_TOKEN_BUCKET_LUA)
+            wait_ms = self._script(
+                keys=[self._cache_key], args=[time.time(), self.rate, self.capacity]
+            )
+            return int(wait_ms) / 1000
+        except Exception:
+            # Redis fora do ar: segue com o balde local
+            logger.warning(f"TokenBucket {self.name}: Redis indisponível, usando balde local")
+            return None
+
+    def _try_local(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated_at) * self.rate
+            )
+            self._updated_at = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def try_acquire(self) -> float:
+        """Tenta pegar um token: 0 se pegou, senão a espera (s) sugerida."""
+        wait = self._try_shared()
+        return self._try_local() if wait is None else wait
+
+    def acquire(self, timeout: float = 0.0) -> bool:
+        """Espera até `timeout` segundos por um token."""
+        deadline = time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire()
+            if wait == 0:
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(wait, remaining))
+
+
+class AdaptiveRate:
+    """
+    Vazão ajustada pelas respostas do upstream (compartilhada via cache).
+
+    - on_throttle(): erro/limite → vazão cai pela metade (até min_rate)
+    - on_success(): cada sucesso soma `step` (até max_rate)
+    """
+
+    def __init__(self, name: str, *, rate: float, min_rate: float, max_rate: float, step: float | None = None):
+        self.name = name
+        self.initial_rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.step = step if step is not None else rate / 10
+        self._local_rate = rate
+
+    @property
+    def _cache_key(self) -> str:
+        return f"adaptive_rate:{self.name}"
+
+    @property
+    def rate(self) -> float:
+        try:
+            shared = cache.get(self._cache_key)
+        except Exception:
+            shared = None
+        return shared if shared is not None else self._local_rate
+
+    def _set(self, rate: float) -> float:
+        rate = max(self.min_rate, min(self.max_rate, rate))
+        self._local_rate = rate
+        try:
+            cache.set(self._cache_key, rate, None)
+        except Exception:
+            pass
+        return rate
+
+    def on_success(self) -> float:
+        return self._set(self.rate + self.step)
+
+    def on_throttle(self) -> float:
+        rate = self._set(self.rate / 2)
+        logger.warning(f"AdaptiveRate {self.name}: vazão reduzida para {rate:.2f}/s")
+        return rate
+
+    def reset(self):
+        self._set(self.initial_rate)
@@ -1,6 +1,24 @@
-import requests
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+from typing import Iterable, Iterator
+
 from decouple import config
 
+from apps.core.integrations import http
+from apps.core.integrations.standin import CREDENTIAL_DEFAULT, service_url
+
+# INTEGRATIONS_STANDIN_URL troca pelo servidor local
+CORREIOS_API_URL = service_url(
+    "correios", config("CORREIOS_API_URL", default="https://api.correios.com.br")
+)
+# Tempo máximo (s) de cada consulta; calcular() responde em no máximo isso
+CORREIOS_TIMEOUT = config("CORREIOS_TIMEOUT", default=5.0, cast=float)
+# Cotação em lote: requisições por lote e lotes simultâneos
+CORREIOS_LOTE_SIZE = config("CORREIOS_LOTE_SIZE", default=50, cast=int)
+CORREIOS_MAX_CONCURRENCY = config("CORREIOS_MAX_CONCURRENCY", default=4, cast=int)
+
+logger = logging.getLogger("integrations")
+
 
 class CorreiosAPI:
     """
@@ -10,10 +28,10 @@ class CorreiosAPI:
     PRODUTOS_DEFAULT = ["03220", "03298"]  # SEDEX / PAC
 
     def __init__(self):
-        self.token = config("MAIL_ACCESS_KEY")
+        self.token = config("MAIL_ACCESS_KEY", **CREDENTIAL_DEFAULT)
 
-        self.url_preco = "https://api.correios.com.br/preco/v1/nacional"
-        self.url_prazo = "https://api.correios.com.br/prazo/v1/nacional"
+        self.url_preco = f"{CORREIOS_API_URL}/preco/v1/nacional"
+        self.url_prazo = f"{CORREIOS_API_URL}/prazo/v1/nacional"
 
         self.headers = {
             "Authorization": f"Bearer {self.token}",
@@ -25,13 +43,28 @@ class CorreiosAPI:
     # CONSULTAS SIMPLES
     # -------------------------
 
-    def consultar_preco(self, payload: dict):
-        resp = requests.post(self.url_preco, json=payload, headers=self.headers)
-        return resp.json()
+    # Consultas são só leitura: podem ser repetidas com segurança.
+    # Falha (rede, HTTP, JSON) → None: quem chama trata como "sem resposta"
+
+    def _consultar(self, url: str, payload: dict, timeout: float | None):
+        try:
+            resp = http.post(
+                url,
+                json=payload,
+                headers=self.headers,
+                idempotent=True,
+                timeout=(http.CONNECT_TIMEOUT, timeout or CORREIOS_TIMEOUT),
+            )
+            return resp.json()
+        except Exception as e:
+            logger.error(f"[Correios] Falha na consulta {url}: {e}")
+            return None
 
-    def consultar_prazo(self, payload: dict):
-        resp = requests.post(self.url_prazo, json=payload, headers=self.headers)
-        return resp.json()
+    def consultar_preco(self, payload: dict, timeout: float | None = None):
+        return self._consultar(self.url_preco, payload, timeout)
+
+    def consultar_prazo(self, payload: dict, timeout: float | None = None):
+        return self._consultar(self.url_prazo, payload, timeout)
 
     # -------------------------
     # MÉTODO PRINCIPAL (DINÂMICO)
@@ -45,62 +78,185 @@ class CorreiosAPI:
                  largura: int,
                  altura: int,
                  produtos: list = None,
-                 formato: int = 1):
+                 formato: int = 1,
+                 timeout: float = None):
         """
         produtos → lista de códigos ["03220", "03298"]
+
+        Preço e prazo são consultados em paralelo; SEDEX/PAC vão juntos
+        numa consulta e cada código extra na sua. Espera no máximo
+        `timeout` segundos (padrão CORREIOS_TIMEOUT): consulta que não
+        respondeu a tempo (ou falhou) fica None no retorno.
+
+        Retorno: {produto: {"preco": dict | None, "prazo": dict | None}}
         """
         produtos = produtos or self.PRODUTOS_DEFAULT
+        timeout = timeout or CORREIOS_TIMEOUT
         id_lote = "lote-001"
 
-        # ----- Monta params PREÇO -----
-        parametros_preco = []
-        for i, produto in enumerate(produtos, start=1):
-            parametros_preco.append({
-                "coProduto": produto,
-                "nuRequisicao": i,
-                "cepOrigem": cep_origem,
-                "cepDestino": cep_destino,
-                "psObjeto": peso,
-                "comprimento": comprimento,
-                "largura": largura,
-                "altura": altura,
-                "nuFormato": formato,
-            })
-
-        payload_preco = {
-            "idLote": id_lote,
-            "parametrosProduto": parametros_preco
-        }
+        grupos = [[p for p in produtos if p in self.PRODUTOS_DEFAULT]]
+        grupos += [[p] for p in produtos if p not in self.PRODUTOS_DEFAULT]
+        grupos = [grupo for grupo in grupos if grupo]
 
-        # ----- Monta params PRAZO -----
-        parametros_prazo = []
-        for i, produto in enumerate(produtos, start=1):
-            parametros_prazo.append({
-                "coProduto": produto,
-                "nuRequisicao": i,
-                "cepOrigem": cep_origem,
-                "cepDestino": cep_destino,
-            })
-
-        payload_prazo = {
-            "idLote": id_lote,
-            "parametrosPrazo": parametros_prazo
+        # ----- Monta as consultas (preço e prazo por grupo) -----
+        consultas = []
+        for grupo in grupos:
+            parametros_preco = [
+                {
+                    "coProduto": produto,
+                    "nuRequisicao": i,
+                    "cepOrigem": cep_origem,
+                    "cepDestino": cep_destino,
+                    "psObjeto": peso,
+                    "comprimento": comprimento,
+                    "largura": largura,
+                    "altura": altura,
+                    "nuFormato": formato,
+                }
+                for i, produto in enumerate(grupo, start=1)
+            ]
+            parametros_prazo = [
+                {
+                    "coProduto": produto,
+                    "nuRequisicao": i,
+                    "cepOrigem": cep_origem,
+                    "cepDestino": cep_destino,
+                }
+                for i, produto in enumerate(grupo, start=1)
+            ]
+            consultas.append(("preco", grupo, self.consultar_preco,
+                              {"idLote": id_lote, "parametrosProduto": parametros_preco}))
+            consultas.append(("prazo", grupo, self.consultar_prazo,
+                              {"idLote": id_lote, "parametrosPrazo": parametros_prazo}))
+
+        # ----- Chama APIs em paralelo -----
+        pool = ThreadPoolExecutor(max_workers=len(consultas))
+        futures = {
+            pool.submit(consultar, payload, timeout): (tipo, grupo)
+            for tipo, grupo, consultar, payload in consultas
         }
+        done, pending = wait(futures, timeout=timeout)
+        # Não espera as atrasadas: terminam sozinhas no timeout de leitura
+        pool.shutdown(wait=False, cancel_futures=True)
 
-        # ----- Chama APIs -----
-        preco = self.consultar_preco(payload_preco)
-        prazo = self.consultar_prazo(payload_prazo)
+        if pending:
+            logger.warning(
+                f"[Correios] {len(pending)}/{len(futures)} consultas sem resposta em {timeout}s"
+            )
 
         # ----- Junta retorno organizado -----
-        retorno = {}
-        for i, produto in enumerate(produtos, start=1):
-            retorno[produto] = {
-                "preco": preco[i - 1] if isinstance(preco, list) else preco,
-                "prazo": prazo[i - 1] if isinstance(prazo, list) else prazo,
-            }
+        retorno = {produto: {"preco": None, "prazo": None} for produto in produtos}
+        for future in done:
+            tipo, grupo = futures[future]
+            resultado = future.result()
+            if resultado is None:
+                continue
+            for i, produto in enumerate(grupo):
+                if isinstance(resultado, list):
+                    retorno[produto][tipo] = resultado[i] if i < len(resultado) else None
+                else:
+                    retorno[produto][tipo] = resultado
 
         return retorno
 
+    # -------------------------
+    # COTAÇÃO EM LOTE
+    # -------------------------
+
+    # Campos de uma requisição de preço; o prazo usa só origem/destino/produto
+    CAMPOS_PRECO = (
+        "coProduto", "cepOrigem", "cepDestino", "psObjeto",
+        "comprimento", "largura", "altura", "nuFormato",
+    )
+    CAMPOS_PRAZO = ("coProduto", "cepOrigem", "cepDestino")
+
+    def calcular_lotes(
+        self,
+        itens: Iterable[dict],
+        *,
+        lote_size: int = None,
+        max_workers: int = None,
+        timeout: float = None,
+    ) -> Iterator[tuple[tuple, dict | None, dict | None]]:
+        """
+        Cota muitas combinações destino/pacote/produto de uma vez.
+
+        itens → dicts com CAMPOS_PRECO. Requisições idênticas são
+        consultadas uma vez só; as únicas são agrupadas em lotes de até
+        lote_size (padrão CORREIOS_LOTE_SIZE), e cada lote faz uma
+        consulta de preço e uma de prazo. Até max_workers lotes em
+        paralelo.
+
+        Gera (chave, preço, prazo) à medida que os lotes terminam, com
+        chave = tuple dos CAMPOS_PRECO do item (ver chave_lote). Consulta
+        que falhou fica None.
+        """
+        lote_size = lote_size or CORREIOS_LOTE_SIZE
+        max_workers = max_workers or CORREIOS_MAX_CONCURRENCY
+
+        unicos = list(dict.fromkeys(self.chave_lote(item) for item in itens))
+        lotes = [unicos[i:i + lote_size] for i in range(0, len(unicos), lote_size)]
+        if not lotes:
+            return
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(lotes))) as pool:
+            futures = [
+                pool.submit(self._consultar_lote, numero, lote, timeout)
+                for numero, lote in enumerate(lotes, start=1)
+            ]
+            for future in as_completed(futures):
+                yield from future.result()
+
+    def chave_lote(self, item: dict) -> tuple:
+        return tuple(item.get(campo) for campo in self.CAMPOS_PRECO)
+
+    def _consultar_lote(self, numero: int, lote: list[tuple], timeout: float | None):
+        id_lote = f"lote-{numero:04d}"
+        itens = [dict(zip(self.CAMPOS_PRECO, chave)) for chave in lote]
+
+        # Prazo não depende do pacote: uma requisição por origem/destino/produto
+        chaves_prazo = list(dict.fromkeys(
+            tuple(item[campo] for campo in self.CAMPOS_PRAZO) for item in itens
+        ))
+
+        preco = self.consultar_preco({
+            "idLote": id_lote,
+            "parametrosProduto": [
+                {**item, "nuRequisicao": i} for i, item in enumerate(itens, start=1)
+            ],
+        }, timeout)
+        prazo = self.consultar_prazo({
+            "idLote": id_lote,
+            "parametrosPrazo": [
+                {**dict(zip(self.CAMPOS_PRAZO, chave)), "nuRequisicao": i}
+                for i, chave in enumerate(chaves_prazo, start=1)
+            ],
+        }, timeout)
+
+        precos = self._por_requisicao(preco, len(itens))
+        prazos = self._por_requisicao(prazo, len(chaves_prazo))
+        indice_prazo = {chave: i for i, chave in enumerate(chaves_prazo, start=1)}
+
+        return [
+            (
+                chave,
+                precos.get(i),
+                prazos.get(indice_prazo[tuple(item[campo] for campo in self.CAMPOS_PRAZO)]),
+            )
+            for i, (chave, item) in enumerate(zip(lote, itens), start=1)
+        ]
+
+    @staticmethod
+    def _por_requisicao(resultado, total: int) -> dict[int, dict]:
+        """Resposta do lote → {nuRequisicao: item} (posição se não vier o número)."""
+        if not isinstance(resultado, list):
+            return {}
+        return {
+            int(item.get("nuRequisicao") or posicao): item
+            for posicao, item in enumerate(resultado[:total], start=1)
+            if isinstance(item, dict)
+        }
+
 
 # -------------------------
 # TESTE RÁPIDO
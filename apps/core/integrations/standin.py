@@ -0,0 +1,336 @@
+"""
+Servidor local (stand-in) do Pagar.me, Correios e Evolution API.
+
+Para testes de carga e de caos sem tocar nos serviços reais. Um único
+servidor HTTP atende os três, por prefixo:
+
+    /pagarme/core/v5/paymentlinks   POST  cria link (e agenda o webhook)
+    /pagarme/core/v5/orders         POST  cria pedido/checkout
+    /pagarme/core/v5/charges        GET   lista cobranças (conciliação)
+    /correios/preco/v1/nacional     POST  preço por produto
+    /correios/prazo/v1/nacional     POST  prazo por produto
+    /evolution/message/sendText/<instância>  POST  envio de texto
+
+Comportamento por serviço (pagarme, correios, evolution):
+- latência: "fixed:0.05", "uniform:0.01:0.2", "normal:0.1:0.03",
+  "lognormal:0.08:0.5" (mediana, sigma) ou "exp:0.1" (média), em segundos
+- error_rate: fração de respostas 503
+- timeout_rate: fração de requisições que ficam presas timeout_seconds
+  (simula upstream travado; o cliente estoura o timeout de leitura)
+
+Webhooks: com webhook_url, cada link criado gera um "charge.<status>"
+de volta para o WebhookAPIView depois de webhook_delay segundos, com
+reenvio opcional do mesmo evento (como o Pagar.me faz).
+
+Para apontar as integrações para cá, defina INTEGRATIONS_STANDIN_URL
+(ex.: http://127.0.0.1:8765): tem precedência sobre as URLs reais.
+
+    python manage.py run_standin_servers --port 8765 \\
+        --latency pagarme=lognormal:0.3:0.4 --error-rate correios=0.05 \\
+        --webhook-url http://127.0.0.1:8000/payments/webhook/
+"""
+import json
+import logging
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+from decouple import config
+
+logger = logging.getLogger("integrations")
+
+STANDIN_URL = config("INTEGRATIONS_STANDIN_URL", default="").rstrip("/")
+
+SERVICES = ("pagarme", "correios", "evolution")
+
+
+# Com o stand-in ativo, credenciais ausentes não são erro (o servidor local
+# não valida): config("CHAVE", **CREDENTIAL_DEFAULT)
+CREDENTIAL_DEFAULT = {"default": "standin"} if STANDIN_URL else {}
+
+
+def service_url(service: str, default: str, path: str = "") -> str:
+    """URL base do serviço: o stand-in, se INTEGRATIONS_STANDIN_URL estiver definido."""
+    return f"{STANDIN_URL}/{service}{path}" if STANDIN_URL else default.rstrip("/")
+
+
+# ============================
+# Comportamento (latência e falhas)
+# ============================
+def parse_latency(spec: str):
+    """
+    Converte a especificação de latência numa função (rng → segundos).
+
+    Raises:
+        ValueError: especificação inválida
+    """
+    kind, _, args = (spec or "fixed:0").partition(":")
+    try:
+        params = [float(arg) for arg in args.split(":")] if args else []
+    except ValueError:
+        raise ValueError(f"Latência inválida: {spec}")
+
+    distributions = {
+        "fixed": (1, lambda rng, value: value),
+        "uniform": (2, lambda rng, low, high: rng.uniform(low, high)),
+        "normal": (2, lambda rng, mean, std: rng.gauss(mean, std)),
+        "lognormal": (2, lambda rng, median, sigma: median * rng.lognormvariate(0, sigma)),
+        "exp": (1, lambda rng, mean: rng.expovariate(1 / mean) if mean else 0.0),
+    }
+    if kind not in distributions or len(params) != distributions[kind][0]:
+        raise ValueError(f"Latência inválida: {spec}")
+
+    sample = distributions[kind][1]
+    return lambda rng: max(0.0, sample(rng, *params))
+
+
+class ServiceBehavior:
+    def __init__(
+        self,
+        *,
+        latency: str = "fixed:0",
+        error_rate: float = 0.0,
+        timeout_rate: float = 0.0,
+        timeout_seconds: float = 30.0,
+    ):
+        self.latency = latency
+        self.sample_latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.timeout_seconds = timeout_seconds
+
+
+# ============================
+# Servidor
+# ============================
+class StandinServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: tuple[str, int],
+        *,
+        behaviors: dict[str, ServiceBehavior] | None = None,
+        webhook_url: str = "",
+        webhook_delay: float = 1.0,
+        webhook_statuses: dict[str, float] | None = None,
+        webhook_redelivery_rate: float = 0.0,
+        seed: int | None = None,
+    ):
+        super().__init__(address, StandinHandler)
+        self.behaviors = {service: ServiceBehavior() for service in SERVICES}
+        self.behaviors.update(behaviors or {})
+        self.webhook_url = webhook_url
+        self.webhook_delay = webhook_delay
+        self.webhook_statuses = webhook_statuses or {"paid": 0.8, "failed": 0.2}
+        self.webhook_redelivery_rate = webhook_redelivery_rate
+
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.charges: list[dict] = []
+        self.counters = {service: {"requests": 0, "errors": 0, "timeouts": 0} for service in SERVICES}
+        self.webhooks_sent = 0
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def decide(self, service: str) -> tuple[float, str | None]:
+        """Sorteia (latência, falha) de uma requisição: falha = "error" | "timeout" | None."""
+        behavior = self.behaviors[service]
+        with self.lock:
+            counters = self.counters[service]
+            counters["requests"] += 1
+            roll = self.rng.random()
+            latency = behavior.sample_latency(self.rng)
+
+            if roll < behavior.timeout_rate:
+                counters["timeouts"] += 1
+                return behavior.timeout_seconds, "timeout"
+            if roll < behavior.timeout_rate + behavior.error_rate:
+                counters["errors"] += 1
+                return latency, "error"
+            return latency, None
+
+    # ---------- Pagar.me ----------
+
+    def create_charge(self, code: str, amount: int):
+        """Registra a cobrança do link e agenda o webhook."""
+        statuses, weights = zip(*self.webhook_statuses.items())
+        with self.lock:
+            status = self.rng.choices(statuses, weights=weights)[0]
+            charge = {
+                "id": f"ch_{uuid.uuid4().hex[:16]}",
+                "code": code,
+                "amount": amount,
+                "status": status,
+                "paid_amount": amount if status in {"paid", "overpaid", "underpaid"} else 0,
+                "paid_at": (
+                    time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+                    if status in {"paid", "overpaid", "underpaid"} else None
+                ),
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            }
+            self.charges.append(charge)
+            redeliver = self.rng.random() < self.webhook_redelivery_rate
+
+        if self.webhook_url:
+            event = {"id": f"hook_{uuid.uuid4().hex[:16]}", "type": f"charge.{status}", "data": charge}
+            timer = threading.Timer(self.webhook_delay, self.send_webhook, args=(event, redeliver))
+            timer.daemon = True
+            timer.start()
+
+    def send_webhook(self, event: dict, redeliver: bool = False):
+        for _ in range(2 if redeliver else 1):
+            try:
+                requests.post(self.webhook_url, json=event, timeout=(3.05, 10))
+                with self.lock:
+                    self.webhooks_sent += 1
+            except requests.exceptions.RequestException as e:
+                logger.warning(f"[Stand-in] Falha ao enviar webhook {event['id']}: {e}")
+
+    def list_charges(self, query: dict) -> dict:
+        page = int(query.get("page", ["1"])[0])
+        size = int(query.get("size", ["10"])[0])
+        code = query.get("code", [None])[0]
+        with self.lock:
+            charges = [c for c in self.charges if code is None or c["code"] == code]
+        return {
+            "data": charges[(page - 1) * size:page * size],
+            "paging": {"total": len(charges)},
+        }
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    server: StandinServer
+    protocol_version = "HTTP/1.1"
+
+    ROUTES = [
+        ("POST", re.compile(r"^/pagarme/core/v5/paymentlinks/?$"), "pagarme", "_pagarme_payment_link"),
+        ("POST", re.compile(r"^/pagarme/core/v5/orders/?$"), "pagarme", "_pagarme_order"),
+        ("GET", re.compile(r"^/pagarme/core/v5/charges/?$"), "pagarme", "_pagarme_charges"),
+        ("POST", re.compile(r"^/correios/preco/v1/nacional/?$"), "correios", "_correios_preco"),
+        ("POST", re.compile(r"^/correios/prazo/v1/nacional/?$"), "correios", "_correios_prazo"),
+        ("POST", re.compile(r"^/evolution/message/sendText/[^/]+/?$"), "evolution", "_evolution_send_text"),
+    ]
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def log_message(self, format, *args):
+        logger.debug(f"[Stand-in] {format % args}")
+
+    def _dispatch(self, method: str):
+        url = urlsplit(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+
+        for route_method, pattern, service, handler in self.ROUTES:
+            if route_method == method and pattern.match(url.path):
+                break
+        else:
+            return self._send(404, {"message": "Rota não encontrada no stand-in"})
+
+        latency, failure = self.server.decide(service)
+        time.sleep(latency)
+        if failure == "timeout":
+            # Já dormiu timeout_seconds; o cliente normalmente desistiu antes
+            return self._send(504, {"message": "Timeout simulado"})
+        if failure == "error":
+            return self._send(503, {"message": "Erro simulado"})
+
+        try:
+            payload = json.loads(body) if body else {}
+        except json.JSONDecodeError:
+            return self._send(400, {"message": "JSON inválido"})
+
+        status, data = getattr(self, handler)(payload, parse_qs(url.query), url.path)
+        self._send(status, data)
+
+    def _send(self, status: int, data):
+        body = json.dumps(data).encode("utf-8")
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # Cliente desistiu (timeout de leitura)
+            pass
+
+    # ---------- rotas ----------
+
+    def _pagarme_payment_link(self, payload, query, path):
+        code = f"pl_{uuid.uuid4().hex[:16]}"
+        amount = (
+            payload.get("payment_settings", {})
+            .get("credit_card_settings", {})
+            .get("installments_setup", {})
+            .get("amount", 0)
+        )
+        self.server.create_charge(code, amount)
+        return 200, {
+            "id": code,
+            "url": f"{self.server.base_url}/checkout/{code}",
+            "status": "active",
+            "name": payload.get("name"),
+        }
+
+    def _pagarme_order(self, payload, query, path):
+        code = f"or_{uuid.uuid4().hex[:16]}"
+        return 200, {
+            "id": code,
+            "status": "pending",
+            "checkouts": [{"payment_url": f"{self.server.base_url}/checkout/{code}"}],
+        }
+
+    def _pagarme_charges(self, payload, query, path):
+        return 200, self.server.list_charges(query)
+
+    def _correios_preco(self, payload, query, path):
+        results = []
+        for item in payload.get("parametrosProduto", []):
+            weight_kg = float(item.get("psObjeto") or 0) / 1000
+            base = 25.0 if item.get("coProduto") == "03220" else 18.0
+            price = base + 2.5 * weight_kg + int(str(item.get("cepDestino", "0"))[:1] or 0)
+            results.append({
+                "coProduto": item.get("coProduto"),
+                "nuRequisicao": item.get("nuRequisicao"),
+                "pcFinal": f"{price:.2f}".replace(".", ","),
+            })
+        return 200, results
+
+    def _correios_prazo(self, payload, query, path):
+        return 200, [
+            {
+                "coProduto": item.get("coProduto"),
+                "nuRequisicao": item.get("nuRequisicao"),
+                "prazoEntrega": 2 if item.get("coProduto") == "03220" else 6,
+            }
+            for item in payload.get("parametrosPrazo", [])
+        ]
+
+    def _evolution_send_text(self, payload, query, path):
+        return 201, {
+            "key": {"id": uuid.uuid4().hex[:20].upper(), "remoteJid": f"{payload.get('number')}@s.whatsapp.net"},
+            "status": "PENDING",
+            "message": {"conversation": payload.get("text")},
+        }
+
+
+def start_standin_server(host: str = "127.0.0.1", port: int = 0, **options) -> StandinServer:
+    """Sobe o servidor numa thread (testes e benchmarks no mesmo processo)."""
+    server = StandinServer((host, port), **options)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
@@ -5,6 +5,7 @@ from django.utils import timezone
 from apps.core.integrations.pagarme import PagarMeOrder, PagarMePaymentLink
 from apps.core.integrations.sgpweb import CorreiosAPI
 import json
+import time
 
 
 class PagarMeOrderTestCase(TestCase):
@@ -16,7 +17,7 @@ class PagarMeOrderTestCase(TestCase):
         self.total_amount = 10000  # 100 reais em centavos
         self.max_installments = 12
 
-    @patch('apps.core.integrations.pagarme.requests.post')
+    @patch('apps.core.integrations.pagarme.http.post')
     def test_pagarme_create_order_success(self, mock_post):
         """Testa a criação bem-sucedida de um pedido no Pagar.me."""
         # Mock da resposta da API
@@ -40,7 +41,7 @@ class PagarMeOrderTestCase(TestCase):
         self.assertEqual(result['id'], 'order_123')
         self.assertEqual(result['customer']['name'], self.customer_name)
 
-    @patch('apps.core.integrations.pagarme.requests.post')
+    @patch('apps.core.integrations.pagarme.http.post')
     def test_pagarme_create_order_api_error(self, mock_post):
         """Testa o comportamento quando há erro na API do Pagar.me."""
         # Mock de erro
@@ -96,7 +97,7 @@ class PagarMePaymentLinkTestCase(TestCase):
         self.max_installments = 12
         self.free_installments = 12
 
-    @patch('apps.core.integrations.pagarme.requests.post')
+    @patch('apps.core.integrations.pagarme.http.post')
     def test_pagarme_create_payment_link_success(self, mock_post):
         """Testa a criação bem-sucedida de um link de pagamento."""
         # Mock da resposta da API
@@ -143,7 +144,7 @@ class CorreiosAPITestCase(TestCase):
         """Configuração inicial para os testes."""
         self.api = CorreiosAPI()
 
-    @patch('apps.core.integrations.sgpweb.requests.post')
+    @patch('apps.core.integrations.sgpweb.http.post')
     def test_consultar_preco_success(self, mock_post):
         """Testa a consulta de preço nos Correios."""
         mock_response = MagicMock()
@@ -177,7 +178,7 @@ class CorreiosAPITestCase(TestCase):
         self.assertIsNotNone(result)
         self.assertIn('coProduto', result[0])
 
-    @patch('apps.core.integrations.sgpweb.requests.post')
+    @patch('apps.core.integrations.sgpweb.http.post')
     def test_consultar_prazo_success(self, mock_post):
         """Testa a consulta de prazo nos Correios."""
         mock_response = MagicMock()
@@ -211,7 +212,7 @@ class CorreiosAPITestCase(TestCase):
         """Testa os produtos padrão da API dos Correios."""
         self.assertEqual(self.api.PRODUTOS_DEFAULT, ['03220', '03298'])
 
-    @patch('apps.core.integrations.sgpweb.requests.post')
+    @patch('apps.core.integrations.sgpweb.http.post')
     def test_calcular_frete_success(self, mock_post):
         """Testa o cálculo de frete completo."""
         # Mock para preço
@@ -293,7 +294,7 @@ class IntegrationEndToEndTestCase(TestCase):
             seller=self.seller
         )
 
-    @patch('apps.core.integrations.pagarme.requests.post')
+    @patch('apps.core.integrations.pagarme.http.post')
     def test_full_payment_flow_success(self, mock_post):
         """Testa o fluxo completo de pagamento do pedido."""
         # Mock da criação do link de pagamento
@@ -320,7 +321,7 @@ class IntegrationEndToEndTestCase(TestCase):
         self.assertEqual(result['status'], 'active')
         self.assertIn('url', result)
 
-    @patch('apps.core.integrations.pagarme.requests.post')
+    @patch('apps.core.integrations.pagarme.http.post')
     def test_payment_link_with_installments(self, mock_post):
         """Testa criação de link de pagamento com parcelas."""
         mock_response = MagicMock()
@@ -376,7 +377,7 @@ class IntegrationEndToEndTestCase(TestCase):
             link.refresh_from_db()
             self.assertEqual(link.status, 'paid')
 
-    @patch('apps.core.integrations.sgpweb.requests.post')
+    @patch('apps.core.integrations.sgpweb.http.post')
     def test_shipping_calculation_workflow(self, mock_post):
         """Testa o fluxo de cálculo de frete."""
         mock_response = MagicMock()
@@ -492,7 +493,7 @@ class PaymentErrorHandlingTestCase(TestCase):
             seller=self.seller
         )
 
-    @patch('apps.core.integrations.pagarme.requests.post')
+    @patch('apps.core.integrations.pagarme.http.post')
     def test_pagarme_timeout_error(self, mock_post):
         """Testa tratamento de timeout da API."""
         from requests.exceptions import Timeout
@@ -510,7 +511,7 @@ class PaymentErrorHandlingTestCase(TestCase):
         # Deve retornar um dicionário com erro
         self.assertIn('error', result)
 
-    @patch('apps.core.integrations.pagarme.requests.post')
+    @patch('apps.core.integrations.pagarme.http.post')
     def test_pagarme_invalid_response(self, mock_post):
         """Testa tratamento de resposta inválida da API."""
         mock_response = MagicMock()
@@ -530,7 +531,7 @@ class PaymentErrorHandlingTestCase(TestCase):
         # Deve ter processado sem erro
         self.assertIsNotNone(result)
 
-    @patch('apps.core.integrations.sgpweb.requests.post')
+    @patch('apps.core.integrations.sgpweb.http.post')
     def test_correios_api_error(self, mock_post):
         """Testa tratamento de erro na API dos Correios."""
         mock_post.side_effect = Exception('API Error')
@@ -547,7 +548,7 @@ class PaymentErrorHandlingTestCase(TestCase):
         # Deve retornar None ou valor seguro
         self.assertIsNone(result)
 
-    @patch('apps.core.integrations.sgpweb.requests.post')
+    @patch('apps.core.integrations.sgpweb.http.post')
     def test_correios_network_error(self, mock_post):
         """Testa tratamento de erro de rede nos Correios."""
         from requests.exceptions import ConnectionError
@@ -559,3 +560,543 @@ class PaymentErrorHandlingTestCase(TestCase):
         
         # Deve ser tratado graciosamente
         self.assertIsNone(result)
+
+
+class HttpTransportTestCase(TestCase):
+    """Testes do transporte HTTP compartilhado."""
+
+    def setUp(self):
+        from apps.core.integrations import http
+        self.http = http
+        http.reset_http_metrics()
+        self.real_get_session = http.get_session
+        self.session = MagicMock()
+        session_patch = patch.object(http, 'get_session', return_value=self.session)
+        sleep_patch = patch.object(http.time, 'sleep')
+        session_patch.start()
+        self.mock_sleep = sleep_patch.start()
+        self.addCleanup(session_patch.stop)
+        self.addCleanup(sleep_patch.stop)
+
+    def _response(self, status_code):
+        response = MagicMock()
+        response.status_code = status_code
+        return response
+
+    def test_session_reused_in_same_process(self):
+        """Testa que a Session é a mesma no processo e recriada após fork."""
+        session = self.real_get_session()
+        self.assertIs(self.real_get_session(), session)
+
+        with patch.object(self.http.os, 'getpid', return_value=-1):
+            self.assertIsNot(self.real_get_session(), session)
+
+    def test_request_always_has_timeout(self):
+        """Testa que toda requisição sai com timeout de conexão e leitura."""
+        self.session.request.return_value = self._response(200)
+
+        self.http.post('https://api.test/x', json={})
+
+        timeout = self.session.request.call_args.kwargs['timeout']
+        self.assertEqual(timeout, (self.http.CONNECT_TIMEOUT, self.http.READ_TIMEOUT))
+
+    def test_idempotent_call_retries_on_503(self):
+        """Testa retentativa de chamada idempotente em 503."""
+        self.session.request.side_effect = [self._response(503), self._response(200)]
+
+        response = self.http.get('https://api.test/x', retries=2)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.session.request.call_count, 2)
+        self.mock_sleep.assert_called_once()
+
+    def test_post_not_retried_on_503(self):
+        """Testa que POST não idempotente não é repetido em erro do servidor."""
+        self.session.request.return_value = self._response(503)
+
+        response = self.http.post('https://api.test/x', retries=2)
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(self.session.request.call_count, 1)
+
+    def test_post_retried_on_connect_timeout(self):
+        """Testa que POST é repetido se a conexão nem foi aberta."""
+        from requests.exceptions import ConnectTimeout
+        self.session.request.side_effect = [ConnectTimeout('sem conexão'), self._response(201)]
+
+        response = self.http.post('https://api.test/x', retries=2)
+
+        self.assertEqual(response.status_code, 201)
+
+    def test_post_not_retried_on_read_timeout(self):
+        """Testa que POST com timeout de leitura não é repetido."""
+        from requests.exceptions import ReadTimeout
+        self.session.request.side_effect = ReadTimeout('upstream travado')
+
+        with self.assertRaises(ReadTimeout):
+            self.http.post('https://api.test/x', retries=2)
+
+        self.assertEqual(self.session.request.call_count, 1)
+
+    def test_retries_are_bounded(self):
+        """Testa que as retentativas têm limite."""
+        from requests.exceptions import ConnectionError
+        self.session.request.side_effect = ConnectionError('rede')
+
+        with self.assertRaises(ConnectionError):
+            self.http.get('https://api.test/x', retries=2)
+
+        self.assertEqual(self.session.request.call_count, 3)
+
+    def test_metrics_per_host(self):
+        """Testa as métricas de chamadas e erros por host."""
+        self.session.request.side_effect = [self._response(200), self._response(500)]
+
+        self.http.get('https://api.a.test/x')
+        self.http.post('https://api.b.test/y')
+
+        metrics = self.http.get_http_metrics()
+        self.assertEqual(metrics['api.a.test']['calls'], 1)
+        self.assertEqual(metrics['api.a.test']['errors'], 0)
+        self.assertEqual(metrics['api.b.test']['errors'], 1)
+
+
+class CircuitBreakerTestCase(TestCase):
+    """Testes do circuit breaker e do bulkhead."""
+
+    def setUp(self):
+        from django.core.cache import cache
+        from apps.core.integrations import resilience
+        cache.clear()
+        self.resilience = resilience
+        self.breaker = resilience.CircuitBreaker(
+            'teste', failure_rate=0.5, min_calls=4, window_size=10,
+            slow_call_seconds=None, open_seconds=30,
+        )
+
+    def _call(self, fail=False):
+        with self.breaker.guard():
+            if fail:
+                raise RuntimeError('upstream')
+
+    def _fail(self, times):
+        for _ in range(times):
+            with self.assertRaises(RuntimeError):
+                self._call(fail=True)
+
+    def test_opens_on_error_rate(self):
+        """Testa que o circuito abre ao atingir a taxa de falha."""
+        self._call()
+        self._call()
+        self._fail(2)
+
+        self.assertEqual(self.breaker.state, self.resilience.STATE_OPEN)
+        with self.assertRaises(self.resilience.CircuitOpenError):
+            self._call()
+        self.assertEqual(self.breaker.snapshot()['rejected'], 1)
+
+    def test_stays_closed_below_min_calls(self):
+        """Testa que poucas chamadas não abrem o circuito."""
+        self._fail(3)
+        self.assertEqual(self.breaker.state, self.resilience.STATE_CLOSED)
+
+    def test_slow_calls_count_as_failures(self):
+        """Testa que chamadas lentas abrem o circuito."""
+        self.breaker.slow_call_seconds = 0.01
+        with patch.object(self.resilience.time, 'perf_counter', side_effect=[0, 1] * 4):
+            for _ in range(4):
+                self._call()
+
+        self.assertEqual(self.breaker.state, self.resilience.STATE_OPEN)
+
+    def test_half_open_trial_closes_circuit(self):
+        """Testa que a chamada de teste bem-sucedida fecha o circuito."""
+        self._fail(4)
+        self.breaker._opened_at -= 31
+
+        self.assertEqual(self.breaker.state, self.resilience.STATE_HALF_OPEN)
+        self._call()
+        self.assertEqual(self.breaker.state, self.resilience.STATE_CLOSED)
+
+    def test_half_open_trial_failure_reopens(self):
+        """Testa que a chamada de teste com falha reabre o circuito."""
+        self._fail(4)
+        self.breaker._opened_at -= 31
+
+        self._fail(1)
+        self.assertEqual(self.breaker.state, self.resilience.STATE_OPEN)
+
+    def test_open_state_shared_between_processes(self):
+        """Testa que outro processo (outra instância) vê o circuito aberto via cache."""
+        self._fail(4)
+
+        other = self.resilience.CircuitBreaker('teste', open_seconds=30)
+        self.assertEqual(other.state, self.resilience.STATE_OPEN)
+
+    def test_shared_open_expiry_goes_half_open(self):
+        """Testa que o processo que soube pelo cache passa por meio aberto ao fim do prazo."""
+        from django.core.cache import cache
+
+        self._fail(4)
+        other = self.resilience.CircuitBreaker('teste', open_seconds=30)
+        self.assertEqual(other.state, self.resilience.STATE_OPEN)
+
+        # Prazo vencido: a chave do cache expira junto
+        other._opened_at -= 31
+        cache.delete(other._cache_key)
+
+        self.assertEqual(other.state, self.resilience.STATE_HALF_OPEN)
+        with other.guard():
+            self.assertFalse(other.allows_calls())
+            with self.assertRaises(self.resilience.CircuitOpenError):
+                with other.guard():
+                    pass
+        self.assertEqual(other.state, self.resilience.STATE_CLOSED)
+
+    def test_bulkhead_rejects_when_full(self):
+        """Testa que o bulkhead rejeita chamadas além do limite."""
+        bulkhead = self.resilience.Bulkhead('teste', max_concurrent=1)
+
+        with bulkhead:
+            with self.assertRaises(self.resilience.BulkheadFullError):
+                with bulkhead:
+                    pass
+
+        with bulkhead:
+            pass
+        self.assertEqual(bulkhead.rejected, 1)
+
+    @patch('apps.core.integrations.pagarme.config', return_value='chave')
+    @patch('apps.core.integrations.pagarme.http.post')
+    def test_pagarme_fails_fast_when_open(self, mock_post, mock_config):
+        """Testa que o Pagar.me não é chamado com o circuito aberto."""
+        from apps.core.integrations.pagarme import PAGARME_BREAKER
+
+        PAGARME_BREAKER.reset()
+        self.addCleanup(PAGARME_BREAKER.reset)
+        PAGARME_BREAKER._open()
+
+        result = PagarMePaymentLink(
+            total_amount=1000, max_installments=1, customer_name='Cliente', free_installments=1
+        ).create_link()
+
+        self.assertTrue(result['unavailable'])
+        mock_post.assert_not_called()
+
+    @patch('apps.core.integrations.pagarme.config', return_value='chave')
+    @patch('apps.core.integrations.pagarme.http.get')
+    def test_pagarme_charges_listing(self, mock_get, mock_config):
+        """Testa a paginação de cobranças usada pela conciliação."""
+        from apps.core.integrations.pagarme import PAGARME_BREAKER, PagarMeCharges
+
+        PAGARME_BREAKER.reset()
+        self.addCleanup(PAGARME_BREAKER.reset)
+        mock_get.return_value.json.return_value = {'data': [{'code': 'lnk_1'}], 'paging': {'total': 1}}
+        since = timezone.now()
+
+        result = PagarMeCharges().list_charges(
+            created_since=since, created_until=since, page=2, size=50
+        )
+
+        self.assertEqual(result['paging']['total'], 1)
+        url = mock_get.call_args.args[0]
+        params = mock_get.call_args.kwargs['params']
+        self.assertTrue(url.endswith('/charges'))
+        self.assertEqual((params['page'], params['size']), (2, 50))
+        self.assertEqual(params['created_since'], since.isoformat())
+
+
+class StandinServerTestCase(TestCase):
+    """Testes do servidor local das integrações."""
+
+    def setUp(self):
+        from apps.core.integrations import standin
+        from apps.core.integrations.pagarme import PAGARME_BREAKER
+
+        self.standin = standin
+        PAGARME_BREAKER.reset()
+        self.addCleanup(PAGARME_BREAKER.reset)
+
+    def _start(self, **options):
+        server = self.standin.start_standin_server(seed=1, **options)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def test_service_url_switch(self):
+        """Testa que INTEGRATIONS_STANDIN_URL troca a URL base dos serviços."""
+        self.assertEqual(
+            self.standin.service_url('correios', 'https://api.correios.com.br/'),
+            'https://api.correios.com.br',
+        )
+        with patch.object(self.standin, 'STANDIN_URL', 'http://127.0.0.1:8765'):
+            self.assertEqual(
+                self.standin.service_url('pagarme', 'https://api.pagar.me/core/v5', '/core/v5'),
+                'http://127.0.0.1:8765/pagarme/core/v5',
+            )
+
+    def test_parse_latency(self):
+        """Testa as distribuições de latência."""
+        import random
+
+        rng = random.Random(1)
+        self.assertEqual(self.standin.parse_latency('fixed:0.2')(rng), 0.2)
+        self.assertTrue(0.1 <= self.standin.parse_latency('uniform:0.1:0.3')(rng) <= 0.3)
+        self.assertGreaterEqual(self.standin.parse_latency('lognormal:0.1:0.5')(rng), 0)
+        with self.assertRaises(ValueError):
+            self.standin.parse_latency('gamma:1')
+
+    @patch('apps.core.integrations.pagarme.config', return_value='chave')
+    def test_pagarme_and_correios_clients_against_standin(self, mock_config):
+        """Testa os clientes reais contra o stand-in."""
+        server = self._start()
+
+        link = PagarMePaymentLink(
+            total_amount=1500, max_installments=1, customer_name='Cliente', free_installments=1
+        )
+        link.api_url = f'{server.base_url}/pagarme/core/v5/paymentlinks'
+        result = link.create_link()
+        self.assertTrue(result['id'].startswith('pl_'))
+        self.assertIn('/checkout/', result['url'])
+        self.assertEqual(server.charges[0]['code'], result['id'])
+
+        with patch('apps.core.integrations.sgpweb.config', return_value='token'):
+            correios = CorreiosAPI()
+        correios.url_preco = f'{server.base_url}/correios/preco/v1/nacional'
+        correios.url_prazo = f'{server.base_url}/correios/prazo/v1/nacional'
+        frete = correios.calcular('30170903', '34600190', 1000, 20, 15, 10)
+        self.assertEqual(frete['03220']['prazo']['prazoEntrega'], 2)
+        self.assertIn(',', frete['03298']['preco']['pcFinal'])
+
+    @patch('apps.core.integrations.pagarme.config', return_value='chave')
+    def test_error_injection(self, mock_config):
+        """Testa que a taxa de erro gera 503 e o cliente trata a falha."""
+        server = self._start(behaviors={'pagarme': self.standin.ServiceBehavior(error_rate=1.0)})
+
+        link = PagarMePaymentLink(
+            total_amount=1500, max_installments=1, customer_name='Cliente', free_installments=1
+        )
+        link.api_url = f'{server.base_url}/pagarme/core/v5/paymentlinks'
+
+        self.assertIn('error', link.create_link())
+        self.assertEqual(server.counters['pagarme']['errors'], 1)
+
+    def test_emits_webhook_for_created_link(self):
+        """Testa o webhook de volta para o WebhookAPIView."""
+        import threading
+
+        sent = []
+        delivered = threading.Event()
+
+        def fake_post(url, **kwargs):
+            sent.append(kwargs['json'])
+            if len(sent) == 2:
+                delivered.set()
+
+        server = self._start(
+            webhook_url='http://django.test/payments/webhook/',
+            webhook_delay=0,
+            webhook_statuses={'paid': 1.0},
+            webhook_redelivery_rate=1.0,
+        )
+
+        with patch.object(self.standin.requests, 'post', side_effect=fake_post) as mock_post:
+            server.create_charge('pl_teste', 2500)
+            self.assertTrue(delivered.wait(2))
+
+        event = sent[0]
+        self.assertEqual(sent[1]['id'], event['id'])  # reenvio do mesmo evento
+        self.assertEqual(mock_post.call_args.args[0], 'http://django.test/payments/webhook/')
+        self.assertEqual(event['type'], 'charge.paid')
+        self.assertEqual(event['data']['code'], 'pl_teste')
+        self.assertEqual(event['data']['paid_amount'], 2500)
+
+
+class CorreiosFanOutTestCase(TestCase):
+    """Testes das consultas paralelas de preço e prazo."""
+
+    def setUp(self):
+        with patch('apps.core.integrations.sgpweb.config', return_value='token'):
+            self.api = CorreiosAPI()
+
+    def _fake_post(self, delays):
+        def fake_post(url, **kwargs):
+            payload = kwargs['json']
+            kind = 'preco' if 'parametrosProduto' in payload else 'prazo'
+            items = payload.get('parametrosProduto') or payload.get('parametrosPrazo')
+            time.sleep(delays.get(kind, 0))
+            response = MagicMock()
+            response.json.return_value = [
+                {'coProduto': item['coProduto'], 'pcFinal': '10,00', 'prazoEntrega': 3}
+                for item in items
+            ]
+            return response
+
+        return fake_post
+
+    @patch('apps.core.integrations.sgpweb.http.post')
+    def test_calls_run_concurrently(self, mock_post):
+        """Testa que preço e prazo (e códigos extras) saem em paralelo."""
+        mock_post.side_effect = self._fake_post({'preco': 0.2, 'prazo': 0.2})
+
+        started = time.perf_counter()
+        result = self.api.calcular(
+            '30170903', '01310100', 1000, 20, 15, 10,
+            produtos=['03220', '03298', '04014'], timeout=2,
+        )
+        elapsed = time.perf_counter() - started
+
+        self.assertLess(elapsed, 0.35)
+        self.assertEqual(mock_post.call_count, 4)
+        self.assertEqual(result['04014']['preco']['coProduto'], '04014')
+        self.assertEqual(result['03298']['prazo']['prazoEntrega'], 3)
+        self.assertEqual(mock_post.call_args.kwargs['timeout'][1], 2)
+
+    @patch('apps.core.integrations.sgpweb.http.post')
+    def test_slow_call_returns_partial_results(self, mock_post):
+        """Testa que a consulta lenta vira None e o resto volta no timeout."""
+        mock_post.side_effect = self._fake_post({'prazo': 1.0})
+
+        started = time.perf_counter()
+        result = self.api.calcular('30170903', '01310100', 1000, 20, 15, 10, timeout=0.2)
+        elapsed = time.perf_counter() - started
+
+        self.assertLess(elapsed, 0.6)
+        self.assertEqual(result['03220']['preco']['pcFinal'], '10,00')
+        self.assertIsNone(result['03220']['prazo'])
+
+    @patch('apps.core.integrations.sgpweb.http.post')
+    def test_lotes_dedupe_and_chunk(self, mock_post):
+        """Testa que requisições repetidas saem uma vez e os lotes respeitam o tamanho."""
+        def fake_post(url, **kwargs):
+            payload = kwargs['json']
+            items = payload.get('parametrosProduto') or payload.get('parametrosPrazo')
+            # Correios não garantem a ordem: o mapeamento é pelo nuRequisicao
+            return MagicMock(json=MagicMock(return_value=[
+                {
+                    'nuRequisicao': item['nuRequisicao'],
+                    'pcFinal': f"{int(item['cepDestino'][:2])},00",
+                    'prazoEntrega': int(item['cepDestino'][:1]),
+                }
+                for item in reversed(items)
+            ]))
+
+        mock_post.side_effect = fake_post
+        itens = [
+            {
+                'coProduto': produto, 'cepOrigem': '30170903', 'cepDestino': cep,
+                'psObjeto': 500, 'comprimento': 20, 'largura': 15, 'altura': 5, 'nuFormato': 1,
+            }
+            for cep in ('01310100', '20040002', '30140071', '01310100', '40010000')
+            for produto in ('03220', '03298')
+        ]
+
+        resultados = list(self.api.calcular_lotes(itens, lote_size=3, max_workers=2))
+
+        # 8 únicas → 3 lotes, cada um com uma consulta de preço e uma de prazo
+        self.assertEqual(len(resultados), 8)
+        self.assertEqual(mock_post.call_count, 6)
+        lotes = sorted(
+            call.kwargs['json']['idLote'] for call in mock_post.call_args_list
+            if 'parametrosProduto' in call.kwargs['json']
+        )
+        self.assertEqual(lotes, ['lote-0001', 'lote-0002', 'lote-0003'])
+        for chave, preco, prazo in resultados:
+            cep = chave[2]
+            self.assertEqual(preco['pcFinal'], f'{int(cep[:2])},00')
+            self.assertEqual(prazo['prazoEntrega'], int(cep[:1]))
+
+
+class EvolutionClientRegistryTestCase(TestCase):
+    """Testes do cliente da Evolution API criado sob demanda, por processo."""
+
+    def setUp(self):
+        from apps.core.integrations.integration_whatsapp import whatsapp
+
+        self.whatsapp = whatsapp
+        whatsapp.reset_evolution_client()
+        self.addCleanup(whatsapp.reset_evolution_client)
+        patcher = patch.multiple(whatsapp, URL_SERVE='http://evolution.test', API_KEY='key')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_import_does_not_connect(self):
+        """Testa que importar os módulos não cria o cliente."""
+        import importlib
+
+        from apps.core.integrations.integration_whatsapp import client
+        from apps.notifications.domain import rules
+
+        with patch.object(self.whatsapp, 'PooledEvolutionClient') as mock_client:
+            importlib.reload(client)
+            importlib.reload(rules)
+
+        mock_client.assert_not_called()
+        self.assertIsNone(self.whatsapp._client_manager)
+
+    def test_new_client_after_fork(self):
+        """Testa que outro pid (processo filho) cria o próprio cliente."""
+        first = self.whatsapp.get_evolution_client()
+        self.assertIs(self.whatsapp.get_evolution_client(), first)
+
+        with patch.object(self.whatsapp.os, 'getpid', return_value=-1):
+            child = self.whatsapp.get_evolution_client()
+
+        self.assertIsNotNone(child)
+        self.assertIsNot(child, first)
+
+    def test_failed_connect_waits_cooldown(self):
+        """Testa que, após falhar, o cliente não tenta de novo até passar a espera."""
+        manager = self.whatsapp.get_client_manager()
+        manager.max_retries = 1
+
+        with patch.object(self.whatsapp, 'PooledEvolutionClient', side_effect=RuntimeError('down')) as mock_client:
+            self.assertIsNone(self.whatsapp.get_evolution_client())
+            self.assertIsNone(self.whatsapp.get_evolution_client())
+
+        self.assertEqual(mock_client.call_count, 1)
+
+    def test_health_is_cached(self):
+        """Testa que a verificação de saúde consulta a API uma vez por janela."""
+        client = self.whatsapp.get_evolution_client()
+
+        with patch.object(client.instances, 'fetch_instances', return_value=[{}, {}]) as mock_fetch:
+            first = self.whatsapp.get_evolution_health()
+            second = self.whatsapp.get_evolution_health()
+
+        self.assertEqual(first, second)
+        self.assertEqual((first['available'], first['instances']), (True, 2))
+        mock_fetch.assert_called_once()
+
+
+class TokenBucketTestCase(TestCase):
+    """Testes do token bucket (balde local, sem Redis) e da vazão adaptativa."""
+
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+
+    def test_bucket_allows_burst_then_paces(self):
+        """Testa a rajada inicial e a espera pelo próximo token."""
+        from apps.core.integrations.resilience import TokenBucket
+
+        bucket = TokenBucket('test', rate=10, capacity=2)
+
+        self.assertEqual(bucket.try_acquire(), 0)
+        self.assertEqual(bucket.try_acquire(), 0)
+        self.assertFalse(bucket.acquire(timeout=0))
+        self.assertTrue(bucket.acquire(timeout=0.5))
+
+    def test_adaptive_rate_aimd(self):
+        """Testa que limite corta a vazão pela metade e sucessos a recuperam aos poucos."""
+        from apps.core.integrations.resilience import AdaptiveRate
+
+        pacer = AdaptiveRate('test', rate=2.0, min_rate=0.5, max_rate=2.0, step=0.25)
+
+        self.assertEqual(pacer.on_throttle(), 1.0)
+        self.assertEqual(pacer.on_throttle(), 0.5)
+        self.assertEqual(pacer.on_throttle(), 0.5)
+        self.assertEqual(pacer.on_success(), 0.75)
+        # Vazão compartilhada: outra instância (outro processo) enxerga o valor
+        self.assertEqual(AdaptiveRate('test', rate=2.0, min_rate=0.5, max_rate=2.0).rate, 0.75)
@@ -0,0 +1,34 @@
+"""
+Republica no Celery as tasks gravadas no spool (broker estava fora do ar).
+
+O beat já faz isso a cada 30 s; o comando serve para esvaziar na hora ou
+rodar como processo à parte quando o beat também depende do broker:
+
+    python manage.py flush_task_spool
+    python manage.py flush_task_spool --loop --interval 10
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.core.task_spool import flush_spool
+
+
+class Command(BaseCommand):
+    help = "Republica no broker as tasks gravadas no spool"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None, help="Tasks por lote (padrão: TASK_SPOOL_BATCH_SIZE)")
+        parser.add_argument("--loop", action="store_true", help="Repete até ser interrompido")
+        parser.add_argument("--interval", type=float, default=10.0, help="Intervalo (s) entre execuções com --loop")
+
+    def handle(self, *args, **options):
+        while True:
+            summary = flush_spool(batch_size=options["batch_size"])
+            self.stdout.write(
+                f"Spool: {summary['published']} republicadas, "
+                f"{summary['failed']} com erro, {summary['pending']} pendentes"
+            )
+            if not options["loop"]:
+                return
+            time.sleep(options["interval"])
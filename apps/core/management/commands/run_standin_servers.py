@@ -0,0 +1,108 @@
+"""
+Sobe o servidor local (stand-in) do Pagar.me, Correios e Evolution API.
+
+Depois, rode o Django/Celery com INTEGRATIONS_STANDIN_URL apontando para ele.
+
+Opções por serviço aceitam "serviço=valor" ou só "valor" (vale para todos):
+
+    python manage.py run_standin_servers --port 8765
+    python manage.py run_standin_servers --latency lognormal:0.2:0.5 \\
+        --latency correios=uniform:0.3:1.2 --error-rate pagarme=0.05 \\
+        --timeout-rate evolution=0.01 \\
+        --webhook-url http://127.0.0.1:8000/payments/webhook/ --paid-rate 0.9
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.integrations.standin import (
+    SERVICES,
+    ServiceBehavior,
+    StandinServer,
+    parse_latency,
+)
+
+
+def _latency(spec: str) -> str:
+    parse_latency(spec)  # valida
+    return spec
+
+
+def _per_service(values: list[str], cast) -> dict:
+    """["0.1", "pagarme=0.3"] → {"correios": 0.1, "evolution": 0.1, "pagarme": 0.3}"""
+    result = {}
+    for value in values or []:
+        service, sep, raw = value.rpartition("=") if "=" in value else ("", "", value)
+        targets = [service] if sep else SERVICES
+        if sep and service not in SERVICES:
+            raise CommandError(f"Serviço desconhecido: {service} (use {', '.join(SERVICES)})")
+        try:
+            parsed = cast(raw)
+        except ValueError as e:
+            raise CommandError(str(e))
+        for target in targets:
+            result[target] = parsed
+    return result
+
+
+class Command(BaseCommand):
+    help = "Servidor local do Pagar.me, Correios e Evolution API (testes de carga e caos)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument("--latency", action="append", help="Distribuição de latência (s)")
+        parser.add_argument("--error-rate", action="append", help="Fração de respostas 503")
+        parser.add_argument("--timeout-rate", action="append", help="Fração de requisições presas")
+        parser.add_argument("--timeout-seconds", type=float, default=30.0)
+        parser.add_argument("--webhook-url", default="", help="URL do WebhookAPIView")
+        parser.add_argument("--webhook-delay", type=float, default=1.0)
+        parser.add_argument(
+            "--paid-rate",
+            type=float,
+            default=0.8,
+            help="Fração de cobranças pagas (o resto falha)",
+        )
+        parser.add_argument("--redelivery-rate", type=float, default=0.0)
+        parser.add_argument("--seed", type=int, default=None)
+
+    def handle(self, *args, **options):
+        latencies = _per_service(options["latency"], _latency)
+        error_rates = _per_service(options["error_rate"], float)
+        timeout_rates = _per_service(options["timeout_rate"], float)
+
+        behaviors = {
+            service: ServiceBehavior(
+                latency=latencies.get(service, "fixed:0"),
+                error_rate=error_rates.get(service, 0.0),
+                timeout_rate=timeout_rates.get(service, 0.0),
+                timeout_seconds=options["timeout_seconds"],
+            )
+            for service in SERVICES
+        }
+
+        server = StandinServer(
+            (options["host"], options["port"]),
+            behaviors=behaviors,
+            webhook_url=options["webhook_url"],
+            webhook_delay=options["webhook_delay"],
+            webhook_statuses={"paid": options["paid_rate"], "failed": 1 - options["paid_rate"]},
+            webhook_redelivery_rate=options["redelivery_rate"],
+            seed=options["seed"],
+        )
+
+        self.stdout.write(f"Stand-in em {server.base_url}")
+        for service, behavior in behaviors.items():
+            self.stdout.write(
+                f"  {service}: latência {behavior.latency}, "
+                f"erros {behavior.error_rate:.0%}, timeouts {behavior.timeout_rate:.0%}"
+            )
+        self.stdout.write(f"Use INTEGRATIONS_STANDIN_URL={server.base_url}")
+
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            for service, counters in server.counters.items():
+                self.stdout.write(f"{service}: {counters}")
+            self.stdout.write(f"webhooks enviados: {server.webhooks_sent}")
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:04
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpooledTask',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_name', models.CharField(max_length=255, verbose_name='Task')),
+                ('args', models.JSONField(default=list, verbose_name='Argumentos')),
+                ('kwargs', models.JSONField(default=dict, verbose_name='Argumentos nomeados')),
+                ('options', models.JSONField(default=dict, verbose_name='Opções de publicação')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Tentativas')),
+                ('last_error', models.TextField(blank=True, default='', verbose_name='Último erro')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Próxima tentativa')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Task no spool',
+                'verbose_name_plural': 'Spool de tasks',
+                'db_table': 'task_spool',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['next_attempt_at'], name='task_spool_next_at_0cc916_idx')],
+            },
+        ),
+    ]
@@ -1,4 +1,6 @@
 from django.db import models
+from django.utils import timezone
+
 
 class BaseModel(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
@@ -10,3 +12,32 @@ class BaseModel(models.Model):
     class Meta:
         abstract = True
 
+
+
+class SpooledTask(models.Model):
+    """
+    Task do Celery que não pôde ser publicada (broker fora do ar ou lento).
+
+    Gravada por apps/core/task_spool.py e republicada pelo flusher.
+    """
+
+    task_name = models.CharField(max_length=255, verbose_name='Task')
+    args = models.JSONField(default=list, verbose_name='Argumentos')
+    kwargs = models.JSONField(default=dict, verbose_name='Argumentos nomeados')
+    options = models.JSONField(default=dict, verbose_name='Opções de publicação')
+    attempts = models.PositiveIntegerField(default=0, verbose_name='Tentativas')
+    last_error = models.TextField(blank=True, default='', verbose_name='Último erro')
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name='Próxima tentativa')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Task no spool'
+        verbose_name_plural = 'Spool de tasks'
+        ordering = ['id']
+        db_table = 'task_spool'
+        indexes = [
+            models.Index(fields=['next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.task_name} ({self.attempts} tentativas)"
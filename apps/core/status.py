@@ -0,0 +1,26 @@
+"""
+Estado das integrações do core, para o endpoint de monitoramento.
+
+Cada app expõe um status() com as próprias métricas; a view
+(apps/core/api/v1/views.py) só junta os dicionários.
+"""
+
+from apps.core.integrations.http import get_http_metrics
+from apps.core.integrations.integration_whatsapp.whatsapp import get_evolution_health
+from apps.core.integrations.resilience import get_breaker_states
+from apps.core.task_spool import get_spool_metrics
+
+
+def status() -> dict:
+    """
+    - breakers: estado e contadores dos circuit breakers
+    - http: chamadas, erros e latência por host
+    - evolution: última verificação de saúde da Evolution API
+    - task_spool: tasks aguardando o broker voltar e idade da mais antiga
+    """
+    return {
+        "breakers": get_breaker_states(),
+        "http": get_http_metrics(),
+        "evolution": get_evolution_health(),
+        "task_spool": get_spool_metrics(),
+    }
@@ -0,0 +1,191 @@
+"""
+Spool local (banco) para a publicação de tasks no Celery.
+
+delay()/apply_async() deste módulo não levantam por causa do broker: se
+a publicação falha (Redis fora do ar, memória cheia, timeout), a
+mensagem é gravada em SpooledTask e o flusher (flush_task_spool_task, no
+beat) a republica em lotes quando o broker volta. Um webhook já gravado
+não devolve erro ao Pagar.me só porque o Redis caiu.
+
+Broker lento (publicações que demoram ou esgotam o timeout) abre um
+circuit breaker: por alguns segundos as mensagens vão direto para o
+spool, sem esperar o timeout de conexão a cada uma (ver
+TASK_PUBLISH_TIMEOUT). Recusa imediata (Redis parado) não abre o
+circuito: não custa nada à requisição.
+
+Ordem: mensagens novas podem sair antes das que ainda estão no spool.
+"""
+import logging
+import time
+from datetime import datetime, timedelta
+
+from celery import current_app
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Min
+from django.utils import timezone
+
+from apps.core.integrations.resilience import CircuitBreaker
+from apps.core.models import SpooledTask
+
+logger = logging.getLogger("integrations")
+
+# Publicação (ok ou com erro) acima disto conta contra o circuito do broker
+SLOW_PUBLISH_SECONDS = 1.0
+
+broker_breaker = CircuitBreaker(
+    "celery-broker",
+    failure_rate=0.5,
+    min_calls=2,
+    window_size=10,
+    slow_call_seconds=SLOW_PUBLISH_SECONDS,
+    open_seconds=15.0,
+)
+
+# Este processo gravou no spool desde o último flush agendado
+_spooled = False
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+# ============================
+# Publicação
+# ============================
+def delay(task, *args, **kwargs):
+    """task.delay(...) que grava no spool se o broker falhar (None nesse caso)."""
+    return _publish(task, args, kwargs, {})
+
+
+def apply_async(task, args=(), kwargs=None, **options):
+    """task.apply_async(...) que grava no spool se o broker falhar (None nesse caso)."""
+    return _publish(task, args, kwargs or {}, options)
+
+
+def _publish(task, args, kwargs, options):
+    global _spooled
+    started = time.monotonic()
+
+    def slow_failure(error):
+        return time.monotonic() - started >= SLOW_PUBLISH_SECONDS
+
+    try:
+        with broker_breaker.guard(is_failure=slow_failure):
+            if options:
+                result = task.apply_async(args=args, kwargs=kwargs, **options)
+            else:
+                result = task.delay(*args, **kwargs)
+    except Exception as e:
+        _spool(task.name, args, kwargs, options, str(e) or e.__class__.__name__)
+        return None
+
+    if _spooled:
+        # Broker de volta: esvazia o spool sem esperar o beat
+        _spooled = False
+        _wake_flusher()
+    return result
+
+
+def _spool(task_name: str, args, kwargs: dict, options: dict, error: str):
+    global _spooled
+    options = dict(options)
+    countdown = options.pop("countdown", None)
+    if countdown:
+        options["eta"] = timezone.now() + timedelta(seconds=countdown)
+    if isinstance(options.get("eta"), datetime):
+        options["eta"] = options["eta"].isoformat()
+
+    SpooledTask.objects.create(
+        task_name=task_name,
+        args=list(args),
+        kwargs=kwargs,
+        options=options,
+        last_error=error[:1000],
+    )
+    _spooled = True
+    logger.warning(f"[Celery] Broker indisponível, {task_name} gravada no spool: {error}")
+
+
+def _wake_flusher():
+    from apps.core.tasks import flush_task_spool_task
+
+    try:
+        flush_task_spool_task.delay()
+    except Exception:
+        # O beat esvazia o spool periodicamente
+        logger.warning("Falha ao acordar o flusher do spool", exc_info=True)
+
+
+# ============================
+# Flusher
+# ============================
+def _republish(item: SpooledTask):
+    options = dict(item.options)
+    if options.get("eta"):
+        options["eta"] = datetime.fromisoformat(options["eta"])
+    current_app.send_task(item.task_name, args=item.args, kwargs=item.kwargs, **options)
+
+
+def flush_spool(*, batch_size: int | None = None, max_batches: int | None = None) -> dict:
+    """
+    Republica o spool em lotes, na ordem de gravação.
+
+    Para no primeiro erro do broker (a mensagem volta com backoff e o
+    resto do lote espera a próxima execução).
+
+    Returns:
+        {"published", "failed", "pending"}
+    """
+    batch_size = batch_size or _setting("TASK_SPOOL_BATCH_SIZE", 100)
+    max_batches = max_batches or _setting("TASK_SPOOL_MAX_BATCHES", 20)
+    summary = {"published": 0, "failed": 0}
+
+    for _ in range(max_batches):
+        with transaction.atomic():
+            batch = list(
+                SpooledTask.objects
+                .select_for_update(skip_locked=True)
+                .filter(next_attempt_at__lte=timezone.now())
+                .order_by("id")[:batch_size]
+            )
+            if not batch:
+                break
+
+            published, failure = [], None
+            for item in batch:
+                try:
+                    _republish(item)
+                except Exception as e:
+                    failure = (item, str(e) or e.__class__.__name__)
+                    break
+                published.append(item.id)
+
+            SpooledTask.objects.filter(id__in=published).delete()
+            summary["published"] += len(published)
+
+            if failure:
+                item, error = failure
+                SpooledTask.objects.filter(id=item.id).update(
+                    attempts=F("attempts") + 1,
+                    last_error=error[:1000],
+                    next_attempt_at=timezone.now() + timedelta(seconds=min(5 * 2 ** item.attempts, 60)),
+                )
+                summary["failed"] += 1
+                logger.warning(f"[Celery] Spool: broker ainda indisponível ({error})")
+                break
+
+    summary["pending"] = SpooledTask.objects.count()
+    return summary
+
+
+def get_spool_metrics() -> dict:
+    """Mensagens no spool e idade (s) da mais antiga."""
+    result = SpooledTask.objects.aggregate(oldest=Min("created_at"))
+    pending = SpooledTask.objects.count()
+    return {
+        "pending": pending,
+        "oldest_seconds": (
+            round((timezone.now() - result["oldest"]).total_seconds()) if result["oldest"] else None
+        ),
+    }
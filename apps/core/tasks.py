@@ -0,0 +1,22 @@
+# apps/core/tasks.py
+"""
+Tasks Celery de infraestrutura.
+
+- flush_task_spool_task: republica as tasks gravadas no spool enquanto o
+  broker estava fora do ar (beat, e acordada quando o broker volta)
+"""
+import logging
+
+from celery import shared_task
+
+from apps.core.task_spool import flush_spool
+
+logger = logging.getLogger("integrations")
+
+
+@shared_task(ignore_result=True)
+def flush_task_spool_task():
+    """Republica o spool em lotes."""
+    summary = flush_spool()
+    if summary["published"] or summary["failed"]:
+        logger.info(f"[Task] Spool de tasks: {summary}")
@@ -1,7 +1,12 @@
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.urls import reverse
 from django.utils import timezone
 from datetime import timedelta
-from apps.core.models import BaseModel
+from unittest.mock import MagicMock, patch
+from rest_framework.test import APIClient
+from apps.core import task_spool
+from apps.core.models import BaseModel, SpooledTask
 from apps.orders.models import Order
 from apps.sellers.models import Seller
 from decimal import Decimal
@@ -154,3 +159,113 @@ class BaseModelTestCase(TestCase):
         
         # created_at deve permanecer o mesmo
         self.assertEqual(order.created_at, original_created_at)
+
+
+class TaskSpoolTestCase(TestCase):
+    """Testes do spool de publicação de tasks do Celery."""
+
+    def setUp(self):
+        task_spool.broker_breaker.reset()
+        task_spool._spooled = False
+        self.task = MagicMock()
+        self.task.name = 'apps.payments.tasks.generate_payment_link_task'
+
+    def tearDown(self):
+        task_spool.broker_breaker.reset()
+        task_spool._spooled = False
+
+    def test_publish_failure_goes_to_spool(self):
+        """Testa que erro do broker grava a task em vez de levantar."""
+        self.task.delay.side_effect = ConnectionError('Redis fora do ar')
+
+        result = task_spool.delay(self.task, 42)
+
+        self.assertIsNone(result)
+        spooled = SpooledTask.objects.get()
+        self.assertEqual(spooled.task_name, self.task.name)
+        self.assertEqual(spooled.args, [42])
+        self.assertIn('Redis fora do ar', spooled.last_error)
+
+    def test_countdown_becomes_eta(self):
+        """Testa que o countdown vira hora absoluta no spool."""
+        self.task.apply_async.side_effect = ConnectionError('Redis fora do ar')
+
+        task_spool.apply_async(self.task, kwargs={'keys': ['a']}, countdown=60)
+
+        options = SpooledTask.objects.get().options
+        self.assertNotIn('countdown', options)
+        self.assertGreater(
+            timezone.datetime.fromisoformat(options['eta']),
+            timezone.now() + timedelta(seconds=50),
+        )
+
+    @patch('apps.core.task_spool.SLOW_PUBLISH_SECONDS', 0)
+    def test_slow_broker_opens_circuit(self):
+        """Testa que com o broker lento a task vai direto para o spool."""
+        self.task.delay.side_effect = ConnectionError('Timeout')
+        for order_id in range(3):
+            task_spool.delay(self.task, order_id)
+
+        self.assertEqual(self.task.delay.call_count, 2)  # min_calls
+        self.assertEqual(SpooledTask.objects.count(), 3)
+
+    def test_refused_connection_keeps_circuit_closed(self):
+        """Testa que recusa imediata do broker não abre o circuito."""
+        self.task.delay.side_effect = ConnectionError('Connection refused')
+        for order_id in range(3):
+            task_spool.delay(self.task, order_id)
+
+        self.assertEqual(self.task.delay.call_count, 3)
+        self.assertEqual(SpooledTask.objects.count(), 3)
+
+    @patch('apps.core.task_spool.current_app')
+    def test_flush_republishes_in_order(self, mock_app):
+        """Testa que o flusher republica e remove do spool."""
+        for order_id in range(3):
+            SpooledTask.objects.create(task_name=self.task.name, args=[order_id])
+
+        summary = task_spool.flush_spool(batch_size=2)
+
+        self.assertEqual(summary, {'published': 3, 'failed': 0, 'pending': 0})
+        self.assertEqual(
+            [call.kwargs['args'] for call in mock_app.send_task.call_args_list],
+            [[0], [1], [2]],
+        )
+
+    @patch('apps.core.task_spool.current_app')
+    def test_flush_stops_while_broker_down(self, mock_app):
+        """Testa que o flusher para no primeiro erro e reagenda a task."""
+        for order_id in range(3):
+            SpooledTask.objects.create(task_name=self.task.name, args=[order_id])
+        mock_app.send_task.side_effect = [None, ConnectionError('Redis fora do ar')]
+
+        summary = task_spool.flush_spool()
+
+        self.assertEqual(summary, {'published': 1, 'failed': 1, 'pending': 2})
+        retried = SpooledTask.objects.get(args=[1])
+        self.assertEqual(retried.attempts, 1)
+        self.assertGreater(retried.next_attempt_at, timezone.now())
+
+
+class IntegrationStatusAPITestCase(TestCase):
+    """Testes do endpoint de monitoramento das integrações."""
+
+    def test_requires_staff(self):
+        """Testa que o endpoint não é público."""
+        response = APIClient().get(reverse('core_api_v1:integrations-status'))
+        self.assertIn(response.status_code, (401, 403))
+
+    def test_merges_status_of_each_app(self):
+        """Testa que o endpoint junta o status() do core, pedidos e notificações."""
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('ops', is_staff=True))
+
+        response = client.get(reverse('core_api_v1:integrations-status'))
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertIn('pagarme', data['breakers'])
+        self.assertIn('http', data)
+        self.assertIn('task_spool', data)
+        self.assertIn('hit_rate', data['freight_cache'])
+        self.assertIn('payment_notifications', data)
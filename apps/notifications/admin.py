@@ -1,5 +1,5 @@
 from django.contrib import admin
-from apps.notifications.models import Notification
+from apps.notifications.models import Notification, WhatsAppOutbox
 
 
 @admin.register(Notification)
@@ -23,3 +23,13 @@ class NotificationAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
     )
+
+
+@admin.register(WhatsAppOutbox)
+class WhatsAppOutboxAdmin(admin.ModelAdmin):
+    """Admin da caixa de saída do WhatsApp."""
+
+    list_display = ['kind', 'phone', 'priority', 'status', 'attempts', 'created_at', 'sent_at']
+    list_filter = ['status', 'priority', 'kind', 'instance_id']
+    search_fields = ['phone', 'text']
+    readonly_fields = ['created_at', 'updated_at', 'sent_at']
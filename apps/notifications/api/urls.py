@@ -0,0 +1,5 @@
+from django.urls import path, include
+
+urlpatterns = [
+    path("v1/", include("apps.notifications.api.v1.urls")),
+]
@@ -0,0 +1,16 @@
+from rest_framework import serializers
+from apps.notifications.models import Notification
+
+
+class NotificationSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Notification
+        fields = [
+            "id",
+            "title",
+            "message",
+            "notification_type",
+            "is_read",
+            "read_at",
+            "created_at",
+        ]
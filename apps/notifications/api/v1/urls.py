@@ -0,0 +1,16 @@
+from django.urls import path
+from .views import (
+    NotificationFeedAPIView,
+    NotificationMarkAllReadAPIView,
+    NotificationMarkReadAPIView,
+    UnreadCountAPIView,
+)
+
+app_name = "notifications_api_v1"
+
+urlpatterns = [
+    path("", NotificationFeedAPIView.as_view(), name="feed"),
+    path("unread-count/", UnreadCountAPIView.as_view(), name="unread-count"),
+    path("read-all/", NotificationMarkAllReadAPIView.as_view(), name="read-all"),
+    path("<int:pk>/read/", NotificationMarkReadAPIView.as_view(), name="read"),
+]
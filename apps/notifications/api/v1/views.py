@@ -0,0 +1,68 @@
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+
+from apps.notifications.models import Notification
+from apps.notifications.services import NotificationService
+from .serializers import NotificationSerializer
+
+MAX_PAGE_SIZE = 100
+
+
+class NotificationFeedAPIView(APIView):
+    """
+    GET -> notificações do usuário, da mais recente para a mais antiga
+
+    Paginação por cursor: ?cursor=<next_cursor da página anterior>
+    Outros parâmetros: ?limit= (até 100) e ?unread=1 (só não lidas)
+    """
+
+    def get(self, request):
+        try:
+            limit = min(int(request.query_params.get("limit", 20)), MAX_PAGE_SIZE)
+            if limit < 1:
+                raise ValueError("limit deve ser positivo")
+            notifications, next_cursor = NotificationService.get_notifications_page(
+                request.user,
+                cursor=request.query_params.get("cursor"),
+                limit=limit,
+                unread_only=request.query_params.get("unread") in ("1", "true"),
+            )
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            "results": NotificationSerializer(notifications, many=True).data,
+            "next_cursor": next_cursor,
+        })
+
+
+class UnreadCountAPIView(APIView):
+    """
+    GET -> número de notificações não lidas (badge do menu)
+    """
+
+    def get(self, request):
+        return Response({"unread": NotificationService.get_unread_count(request.user)})
+
+
+class NotificationMarkReadAPIView(APIView):
+    """
+    POST -> marca a notificação como lida
+    """
+
+    def post(self, request, pk):
+        try:
+            notification = NotificationService.mark_as_read(pk, user=request.user)
+        except Notification.DoesNotExist:
+            return Response({"error": "Notificação não encontrada"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(NotificationSerializer(notification).data)
+
+
+class NotificationMarkAllReadAPIView(APIView):
+    """
+    POST -> marca todas as notificações do usuário como lidas
+    """
+
+    def post(self, request):
+        return Response({"marked": NotificationService.mark_all_as_read(request.user)})
@@ -1,21 +1,17 @@
-from apps.core.integrations.integration_whatsapp.whatsapp import get_evolution_client
+from apps.core.integrations.integration_whatsapp.whatsapp import (
+    get_evolution_client,
+    get_evolution_health,
+)
 
-# Singleton global do client
-CLIENT = get_evolution_client()
 
-
-def is_evolution_api_available() -> dict:
+def is_evolution_api_available():
     """
-    Verifica se o cliente da Evolution API está disponível.
+    Cliente da Evolution API se ela respondeu na última verificação
+    (resultado em cache por EVOLUTION_HEALTH_TTL), senão None.
     """
-    # Busca instâncias apenas uma vez
-    if CLIENT:
-        INSTANCES = CLIENT.instances.fetch_instances()
-        context = {
-            "client": CLIENT,
-            "instances": INSTANCES,
-        }
-        return context.get("client")
+    if get_evolution_health()["available"]:
+        return get_evolution_client()
+    return None
 
 
 def is_valid_phone(phone: str) -> bool:
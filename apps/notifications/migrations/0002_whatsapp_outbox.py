@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:56
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WhatsAppOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('deleted_at', models.DateTimeField(blank=True, null=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('is_deleted', models.BooleanField(default=False)),
+                ('instance_id', models.CharField(max_length=255, verbose_name='Instância')),
+                ('phone', models.CharField(max_length=20, verbose_name='Telefone')),
+                ('text', models.TextField(verbose_name='Mensagem')),
+                ('kind', models.CharField(max_length=50, verbose_name='Tipo')),
+                ('priority', models.PositiveSmallIntegerField(choices=[(0, 'Pagamento'), (5, 'Link de pagamento'), (9, 'Em massa')], default=9, verbose_name='Prioridade')),
+                ('status', models.CharField(choices=[('pending', 'Pendente'), ('sending', 'Enviando'), ('sent', 'Enviada'), ('failed', 'Falhou')], default='pending', max_length=20, verbose_name='Status')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Tentativas')),
+                ('last_error', models.TextField(blank=True, default='', verbose_name='Último erro')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Próxima tentativa')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='Enviada em')),
+            ],
+            options={
+                'verbose_name': 'Mensagem de WhatsApp',
+                'verbose_name_plural': 'Caixa de saída do WhatsApp',
+                'db_table': 'whatsapp_outbox',
+                'ordering': ['priority', 'created_at'],
+                'indexes': [models.Index(fields=['status', 'priority', 'next_attempt_at'], name='whatsapp_ou_status_283556_idx')],
+            },
+        ),
+    ]
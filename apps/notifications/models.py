@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 from apps.core.models import BaseModel
 
 
@@ -73,8 +74,74 @@ class Notification(BaseModel):
         return f"{self.title} - {self.user.username}"
     
     def mark_as_read(self):
-        """Marca a notificação como lida."""
-        from django.utils import timezone
-        self.is_read = True
-        self.read_at = timezone.now()
-        self.save()
+        """
+        Marca a notificação como lida (grava só os campos alterados).
+
+        Returns:
+            bool: False se ela já estava lida
+        """
+        if self.is_read:
+            return False
+        now = timezone.now()
+        # Condicional: duas marcações simultâneas contam uma vez só
+        updated = Notification.objects.filter(pk=self.pk, is_read=False).update(
+            is_read=True, read_at=now, updated_at=now
+        )
+        self.is_read, self.read_at, self.updated_at = True, now, now
+        return bool(updated)
+
+
+class OutboxStatus(models.TextChoices):
+    PENDING = 'pending', 'Pendente'
+    SENDING = 'sending', 'Enviando'
+    SENT = 'sent', 'Enviada'
+    FAILED = 'failed', 'Falhou'
+
+
+class OutboxPriority(models.IntegerChoices):
+    """Menor número sai primeiro."""
+    PAYMENT = 0, 'Pagamento'
+    PAYMENT_LINK = 5, 'Link de pagamento'
+    BULK = 9, 'Em massa'
+
+
+class WhatsAppOutbox(BaseModel):
+    """
+    Caixa de saída das mensagens de WhatsApp.
+
+    A mensagem é gravada na mesma transação do evento que a gerou; o
+    despachante (apps/notifications/services/outbox.py) envia respeitando
+    a vazão de cada instância da Evolution API e a prioridade.
+    """
+
+    instance_id = models.CharField(max_length=255, verbose_name='Instância')
+    phone = models.CharField(max_length=20, verbose_name='Telefone')
+    text = models.TextField(verbose_name='Mensagem')
+    kind = models.CharField(max_length=50, verbose_name='Tipo')
+    priority = models.PositiveSmallIntegerField(
+        choices=OutboxPriority.choices,
+        default=OutboxPriority.BULK,
+        verbose_name='Prioridade',
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=OutboxStatus.choices,
+        default=OutboxStatus.PENDING,
+        verbose_name='Status',
+    )
+    attempts = models.PositiveIntegerField(default=0, verbose_name='Tentativas')
+    last_error = models.TextField(blank=True, default='', verbose_name='Último erro')
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name='Próxima tentativa')
+    sent_at = models.DateTimeField(null=True, blank=True, verbose_name='Enviada em')
+
+    class Meta:
+        verbose_name = 'Mensagem de WhatsApp'
+        verbose_name_plural = 'Caixa de saída do WhatsApp'
+        ordering = ['priority', 'created_at']
+        db_table = 'whatsapp_outbox'
+        indexes = [
+            models.Index(fields=['status', 'priority', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} → {self.phone} ({self.status})"
@@ -0,0 +1,3 @@
+from apps.notifications.services.notification_service import NotificationService
+
+__all__ = ["NotificationService"]
@@ -2,6 +2,8 @@
 
 import logging
 
+from evolutionapi.models.message import TextMessage
+
 from apps.notifications.domain.messages import (
     build_payment_link_success_message,
     build_payment_link_failed_message,
@@ -37,6 +39,21 @@ class WhatsAppMessageService:
         if not is_valid_phone(phone):
             raise ValueError("Telefone inválido")
 
+    def send_text(self, *, phone: str, text: str, delay: int | None = None):
+        """
+        Envia um texto já montado (caixa de saída).
+
+        Retorna a resposta da Evolution API: erros HTTP vêm no corpo, sem
+        exceção; quem chama decide o que é falha.
+        """
+        self._validate_phone(phone)
+
+        return self.client.messages.send_text(
+            instance_id=self.instance_id,
+            message=TextMessage(number=phone, text=text, delay=delay),
+            instance_token=self.instance_token,
+        )
+
 
     def send_payment_link_successful(self, *, phone: str, value: float, link: str):
         self._validate_phone(phone)
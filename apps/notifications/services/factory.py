@@ -1,15 +1,367 @@
 # apps/notifications/services/whatsapp_factory.py
+"""
+Factory do serviço de WhatsApp e pool de instâncias da Evolution API.
+
+Instâncias (números de WhatsApp) em EVOLUTION_INSTANCES:
+
+    EVOLUTION_INSTANCES=loja1:token1:2,loja2:token2:1   # id:token:peso
+
+Sem EVOLUTION_INSTANCES, o pool tem só EVOLUTION_INSTANCE_ID/TOKEN.
+
+Roteamento: rendezvous hashing ponderado pelo telefone do destinatário.
+O mesmo cliente sempre recebe do mesmo número, a carga se divide pelos
+pesos e, quando uma instância cai, só os clientes dela mudam de número
+(voltam quando ela volta).
+
+Saúde de cada instância:
+- passiva: circuit breaker por instância (falha de rede, 429, 5xx)
+- ativa: check_instances_health() consulta o connectionState de cada
+  uma (task periódica); o resultado fica no cache, visível para todos
+  os processos
+
+Failover: envio que falha numa instância tenta a próxima da ordem do
+telefone. Métricas por instância: get_instance_pool().snapshot().
+"""
+import hashlib
+import logging
+import math
+import threading
+import time
+from dataclasses import dataclass, field
 
 from decouple import config
+from django.core.cache import cache
+from evolutionapi.models.message import TextMessage
+
 from apps.core.integrations.integration_whatsapp.client import get_client
+from apps.core.integrations.resilience import CircuitBreaker
+from apps.core.integrations.standin import CREDENTIAL_DEFAULT
 from apps.notifications.services.commands import WhatsAppMessageService
 
+logger = logging.getLogger("integrations")
+
+# Validade (s) do resultado da verificação ativa de saúde
+INSTANCE_HEALTH_TTL = 5 * 60
+
+
+class EvolutionSendError(Exception):
+    """Instância não entregou (rede, limite ou erro do servidor)."""
+
+
+def response_error(response) -> tuple[str, bool] | None:
+    """
+    Erro na resposta da Evolution API → (descrição, é limite/instabilidade).
+
+    O cliente devolve o corpo JSON mesmo em erro HTTP.
+    """
+    if not isinstance(response, dict):
+        return None
+    status = response.get("status")
+    try:
+        status = int(status) if status is not None else None
+    except (TypeError, ValueError):
+        status = None
+
+    if not response.get("error") and not (status and status >= 400):
+        return None
+
+    detail = response.get("response") or response.get("error") or response
+    throttled = status is None or status == 429 or status >= 500
+    return f"{status}: {detail}", throttled
+
+
+# ============================
+# Pool de instâncias
+# ============================
+@dataclass
+class EvolutionInstance:
+    id: str
+    token: str
+    weight: int = 1
+    breaker: CircuitBreaker = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.breaker = CircuitBreaker(
+            f"evolution:{self.id}",
+            failure_rate=0.5,
+            min_calls=3,
+            window_size=10,
+            open_seconds=60.0,
+        )
+
+    @property
+    def _health_key(self) -> str:
+        return f"evolution:instance:{self.id}:health"
+
+    @property
+    def health(self) -> dict | None:
+        try:
+            return cache.get(self._health_key)
+        except Exception:
+            return None
+
+    def set_health(self, available: bool, state: str | None, error: str | None = None):
+        health = {"available": available, "state": state, "error": error, "checked_at": time.time()}
+        try:
+            cache.set(self._health_key, health, INSTANCE_HEALTH_TTL)
+        except Exception:
+            pass
+
+    @property
+    def available(self) -> bool:
+        """Circuito fechado e sem verificação ativa dizendo que caiu."""
+        health = self.health
+        return self.breaker.allows_calls() and (health is None or health["available"])
+
+
+def parse_instances(raw: str) -> list[EvolutionInstance]:
+    """"id:token:peso,id:token" → instâncias (peso padrão 1)."""
+    instances = []
+    for entry in filter(None, (part.strip() for part in raw.split(","))):
+        parts = entry.split(":")
+        weight = 1
+        if len(parts) >= 3 and parts[-1].isdigit():
+            weight = int(parts.pop())
+        if len(parts) < 2:
+            raise ValueError(f"Instância inválida em EVOLUTION_INSTANCES: {entry}")
+        instances.append(EvolutionInstance(id=parts[0], token=":".join(parts[1:]), weight=weight))
+    return instances
+
+
+def _score(instance: EvolutionInstance, key: str) -> float:
+    """Rendezvous ponderado: maior score = instância preferida para a chave."""
+    digest = hashlib.sha1(f"{instance.id}:{key}".encode()).digest()
+    unit = (int.from_bytes(digest[:8], "big") + 1) / (2 ** 64 + 1)  # (0, 1)
+    return -instance.weight / math.log(unit)
+
+
+class InstancePool:
+    def __init__(self, instances: list[EvolutionInstance]):
+        if not instances:
+            raise RuntimeError("Nenhuma instância da Evolution API configurada")
+        self.instances = instances
+        self._by_id = {instance.id: instance for instance in instances}
+        self._lock = threading.Lock()
+        self._metrics = {
+            instance.id: {"sent": 0, "errors": 0, "failovers": 0, "latency_total": 0.0}
+            for instance in instances
+        }
+
+    def get(self, instance_id: str) -> EvolutionInstance | None:
+        return self._by_id.get(instance_id)
+
+    def candidates(self, phone: str) -> list[EvolutionInstance]:
+        """Instâncias disponíveis na ordem de preferência do telefone."""
+        ordered = sorted(self.instances, key=lambda instance: _score(instance, phone), reverse=True)
+        return [instance for instance in ordered if instance.available]
+
+    def route(self, phone: str, current: str | None = None) -> EvolutionInstance | None:
+        """
+        Instância do telefone (mantém `current` se ainda disponível).
+
+        None se nenhuma instância está disponível.
+        """
+        instance = self.get(current) if current else None
+        if instance and instance.available:
+            return instance
+        candidates = self.candidates(phone)
+        return candidates[0] if candidates else None
+
+    # ---------- envio ----------
+
+    def call(self, instance: EvolutionInstance, send):
+        """
+        Executa `send()` pela instância, com circuit breaker e métricas.
+
+        Raises:
+            EvolutionSendError: rede, limite (429) ou erro 5xx — conta
+                como falha da instância. Recusas (4xx) voltam na resposta.
+            CircuitOpenError: circuito da instância aberto
+        """
+        started = time.perf_counter()
+        try:
+            with instance.breaker.guard():
+                try:
+                    response = send()
+                except Exception as e:
+                    raise EvolutionSendError(str(e) or e.__class__.__name__) from e
+                failure = response_error(response)
+                if failure and failure[1]:
+                    raise EvolutionSendError(failure[0])
+        except Exception:
+            self._record(instance, started, failed=True)
+            raise
+
+        self._record(instance, started, failed=False)
+        return response
+
+    def _record(self, instance: EvolutionInstance, started: float, failed: bool):
+        with self._lock:
+            metrics = self._metrics[instance.id]
+            metrics["latency_total"] += time.perf_counter() - started
+            metrics["errors" if failed else "sent"] += 1
+
+    def record_failover(self, instance: EvolutionInstance):
+        with self._lock:
+            self._metrics[instance.id]["failovers"] += 1
+
+    # ---------- saúde ----------
+
+    def check_health(self, client) -> dict[str, bool]:
+        """Consulta o connectionState de cada instância (task periódica)."""
+        result = {}
+        for instance in self.instances:
+            try:
+                response = client.instance_operations.get_connection_state(instance.id, instance.token)
+                state = ((response or {}).get("instance") or {}).get("state")
+                instance.set_health(state == "open", state)
+            except Exception as e:
+                instance.set_health(False, None, str(e))
+            result[instance.id] = instance.health["available"] if instance.health else False
+        return result
+
+    def snapshot(self) -> dict[str, dict]:
+        """Por instância: peso, disponibilidade, circuito, saúde e métricas."""
+        with self._lock:
+            metrics = {key: dict(value) for key, value in self._metrics.items()}
+
+        result = {}
+        for instance in self.instances:
+            data = metrics[instance.id]
+            calls = data["sent"] + data["errors"]
+            result[instance.id] = {
+                "weight": instance.weight,
+                "available": instance.available,
+                "circuit": instance.breaker.state,
+                "health": instance.health,
+                "sent": data["sent"],
+                "errors": data["errors"],
+                "failovers": data["failovers"],
+                "error_rate": data["errors"] / calls if calls else 0.0,
+                "avg_ms": round(1000 * data["latency_total"] / calls, 1) if calls else None,
+            }
+        return result
+
+
+_pool: InstancePool | None = None
+_pool_lock = threading.Lock()
+
+
+def _configured_instances() -> list[EvolutionInstance]:
+    raw = config("EVOLUTION_INSTANCES", default="")
+    if raw:
+        return parse_instances(raw)
+
+    instance_id, instance_token = get_instance_config()
+    if not instance_id or not instance_token:
+        raise RuntimeError("Configuração EVOLUTION_INSTANCE_ID ou EVOLUTION_INSTANCE_TOKEN não definida")
+    return [EvolutionInstance(id=instance_id, token=instance_token)]
+
+
+def get_instance_pool() -> InstancePool:
+    """
+    Pool do processo (criado no primeiro uso).
+
+    Raises:
+        RuntimeError: nenhuma instância configurada
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = InstancePool(_configured_instances())
+    return _pool
+
+
+def check_instances_health() -> dict[str, bool]:
+    """Verificação ativa de todas as instâncias ({id: disponível})."""
+    client = get_client()
+    if not client:
+        raise RuntimeError("Evolution API indisponível")
+    return get_instance_pool().check_health(client)
+
+
+def get_instance_metrics() -> dict[str, dict]:
+    """Snapshot do pool, ou {} se não há instância configurada."""
+    try:
+        return get_instance_pool().snapshot()
+    except RuntimeError:
+        return {}
+
+
+def reset_instance_pool():
+    global _pool
+    with _pool_lock:
+        _pool = None
+
+
+def get_instance_config() -> tuple[str, str]:
+    """(instance_id, instance_token) da instância configurada."""
+    standin = CREDENTIAL_DEFAULT.get("default", "")
+    return (
+        config("EVOLUTION_INSTANCE_ID", default=standin),
+        config("EVOLUTION_INSTANCE_TOKEN", default=standin),
+    )
+
+
+# ============================
+# Serviço
+# ============================
+class PooledWhatsAppMessageService(WhatsAppMessageService):
+    """
+    WhatsAppMessageService que envia pelo pool de instâncias.
+
+    Cada mensagem sai pela instância do telefone; se ela falhar, tenta
+    as próximas da ordem (failover).
+    """
+
+    def __init__(self, *, client, pool: InstancePool):
+        first = pool.instances[0]
+        super().__init__(client=client, instance_id=first.id, instance_token=first.token)
+        self.pool = pool
+
+    def _send_via(self, instance: EvolutionInstance, message: TextMessage):
+        return self.pool.call(
+            instance,
+            lambda: self.client.messages.send_text(
+                instance_id=instance.id,
+                message=message,
+                instance_token=instance.token,
+            ),
+        )
+
+    def _send(self, message):
+        last_error = None
+        for attempt, instance in enumerate(self.pool.candidates(message.number)):
+            if attempt:
+                self.pool.record_failover(instance)
+            try:
+                return self._send_via(instance, message)
+            except Exception as e:
+                last_error = e
+                logger.warning(f"Instância {instance.id} falhou para {message.number}: {e}")
+
+        logger.error("Erro ao enviar mensagem WhatsApp: nenhuma instância entregou")
+        raise last_error or RuntimeError("Nenhuma instância da Evolution API disponível")
+
+    def send_text(self, *, phone: str, text: str, delay: int | None = None, instance_id: str | None = None):
+        """
+        Envia pela instância `instance_id` (caixa de saída, sem failover:
+        quem chama reagenda) ou pela instância do telefone.
+        """
+        self._validate_phone(phone)
+
+        instance = self.pool.get(instance_id) if instance_id else self.pool.route(phone)
+        if instance is None:
+            raise EvolutionSendError("Nenhuma instância da Evolution API disponível")
+        return self._send_via(instance, TextMessage(number=phone, text=text, delay=delay))
+
 
 def get_whatsapp_service() -> WhatsAppMessageService:
     """
     Factory oficial para criar o WhatsAppMessageService.
     Centraliza configurações e dependências.
-    
+
     Raises:
         RuntimeError: Se a Evolution API não estiver disponível
         ValueError: Se as configurações de instância estiverem faltando
@@ -18,15 +370,5 @@ def get_whatsapp_service() -> WhatsAppMessageService:
 
     if not client:
         raise RuntimeError("Evolution API indisponível")
-    
-    instance_id = config("EVOLUTION_INSTANCE_ID", default="")
-    instance_token = config("EVOLUTION_INSTANCE_TOKEN", default="")
-    
-    if not instance_id or not instance_token:
-        raise RuntimeError("Configuração EVOLUTION_INSTANCE_ID ou EVOLUTION_INSTANCE_TOKEN não definida")
 
-    return WhatsAppMessageService(
-        client=client,
-        instance_id=instance_id,
-        instance_token=instance_token,
-    )
\ No newline at end of file
+    return PooledWhatsAppMessageService(client=client, pool=get_instance_pool())
@@ -0,0 +1,241 @@
+"""
+Serviços para gerenciamento de notificações.
+
+Este módulo fornece funções para criar, marcar como lida e buscar notificações.
+
+Contador de não lidas (badge do menu, renderizado em toda página): fica
+no cache por usuário e é ajustado com incr/decr atômicos na criação (no
+commit), ao marcar como lida e ao marcar todas. Sem contador no cache,
+um COUNT recalcula o valor; a validade limita qualquer desvio de
+corrida entre o recálculo e um ajuste.
+
+Feed: paginação por cursor (created_at, id) em vez de offset, usando os
+índices (user, is_read) e -created_at.
+"""
+import base64
+import binascii
+import logging
+from datetime import datetime
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from apps.notifications.models import Notification, NotificationType
+
+logger = logging.getLogger("notifications")
+
+# Validade (s) do contador de não lidas no cache
+UNREAD_COUNT_TTL = 60 * 60
+
+
+def _unread_key(user_id) -> str:
+    return f"notifications:unread:{user_id}"
+
+
+def _adjust_unread_count(user_id, delta: int):
+    """Soma delta ao contador do cache (sem contador, o próximo COUNT recalcula)."""
+    key = _unread_key(user_id)
+    try:
+        if cache.incr(key, delta) < 0:
+            cache.delete(key)
+    except ValueError:
+        pass
+    except Exception:
+        # O contador é só otimização: cache fora do ar não derruba a
+        # notificação. Sem o ajuste, o contador antigo não pode ficar
+        logger.warning(f"Cache indisponível ao ajustar não lidas do usuário {user_id}")
+        try:
+            cache.delete(key)
+        except Exception:
+            pass
+
+
+def encode_cursor(notification) -> str:
+    raw = f"{notification.created_at.isoformat()}|{notification.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """
+    Raises:
+        ValueError: cursor inválido
+    """
+    try:
+        created_at, _, notification_id = base64.urlsafe_b64decode(cursor.encode()).decode().partition("|")
+        return datetime.fromisoformat(created_at), int(notification_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("Cursor inválido")
+
+
+class NotificationService:
+    """Serviço para gerenciar notificações do sistema."""
+
+    @staticmethod
+    def create_notification(user, title, message, notification_type=NotificationType.INFO):
+        """
+        Cria uma nova notificação para um usuário.
+
+        Args:
+            user: Usuário que receberá a notificação
+            title: Título da notificação
+            message: Mensagem da notificação
+            notification_type: Tipo da notificação (INFO, SUCCESS, WARNING, ERROR)
+
+        Returns:
+            Notification: Notificação criada
+
+        Example:
+            >>> from django.contrib.auth.models import User
+            >>> user = User.objects.first()
+            >>> NotificationService.create_notification(
+            ...     user=user,
+            ...     title="Pagamento Recebido",
+            ...     message="Seu pagamento de R$ 100,00 foi confirmado",
+            ...     notification_type=NotificationType.SUCCESS
+            ... )
+        """
+        notification = Notification.objects.create(
+            user=user,
+            title=title,
+            message=message,
+            notification_type=notification_type
+        )
+        # Rollback não conta
+        transaction.on_commit(lambda: _adjust_unread_count(user.pk, 1))
+        return notification
+
+    @staticmethod
+    def mark_as_read(notification_id, user=None):
+        """
+        Marca uma notificação como lida.
+
+        Args:
+            notification_id: ID da notificação
+            user: Se informado, a notificação precisa ser dele
+
+        Returns:
+            Notification: Notificação atualizada
+
+        Raises:
+            Notification.DoesNotExist: Se a notificação não existir
+        """
+        notifications = Notification.objects.all()
+        if user is not None:
+            notifications = notifications.filter(user=user)
+        notification = notifications.get(id=notification_id)
+        if notification.mark_as_read():
+            _adjust_unread_count(notification.user_id, -1)
+        return notification
+
+    @staticmethod
+    def mark_all_as_read(user):
+        """
+        Marca todas as notificações de um usuário como lidas.
+
+        Args:
+            user: Usuário
+
+        Returns:
+            int: Número de notificações marcadas como lidas
+        """
+        now = timezone.now()
+        count = Notification.objects.filter(
+            user=user,
+            is_read=False
+        ).update(
+            is_read=True,
+            read_at=now,
+            updated_at=now
+        )
+        if count:
+            _adjust_unread_count(user.pk, -count)
+        return count
+
+    @staticmethod
+    def get_unread_notifications(user):
+        """
+        Retorna todas as notificações não lidas de um usuário.
+
+        Args:
+            user: Usuário
+
+        Returns:
+            QuerySet: Notificações não lidas
+        """
+        return Notification.objects.filter(user=user, is_read=False)
+
+    @staticmethod
+    def get_unread_count(user):
+        """
+        Retorna o número de notificações não lidas de um usuário.
+
+        Lido do cache; o COUNT só roda quando o contador não existe.
+
+        Args:
+            user: Usuário
+
+        Returns:
+            int: Número de notificações não lidas
+        """
+        key = _unread_key(user.pk)
+        try:
+            count = cache.get(key)
+        except Exception:
+            # Cache fora do ar: COUNT direto, sem guardar
+            return Notification.objects.filter(user=user, is_read=False).count()
+        if count is None:
+            count = Notification.objects.filter(user=user, is_read=False).count()
+            # add: não sobrescreve um contador criado/ajustado nesse meio tempo
+            try:
+                cache.add(key, count, UNREAD_COUNT_TTL)
+            except Exception:
+                pass
+        return count
+
+    @staticmethod
+    def get_recent_notifications(user, limit=10):
+        """
+        Retorna as notificações mais recentes de um usuário.
+
+        Args:
+            user: Usuário
+            limit: Número máximo de notificações a retornar
+
+        Returns:
+            QuerySet: Notificações recentes
+        """
+        return Notification.objects.filter(user=user)[:limit]
+
+    @staticmethod
+    def get_notifications_page(user, cursor=None, limit=20, unread_only=False):
+        """
+        Página do feed de notificações, da mais recente para a mais antiga.
+
+        Paginação por cursor: a próxima página começa depois da última
+        notificação desta (created_at, id), sem OFFSET.
+
+        Args:
+            user: Usuário
+            cursor: Cursor devolvido pela página anterior (None = início)
+            limit: Notificações por página
+            unread_only: Só as não lidas
+
+        Returns:
+            tuple: (lista de notificações, cursor da próxima página ou None)
+
+        Raises:
+            ValueError: Se o cursor for inválido
+        """
+        notifications = Notification.objects.filter(user=user)
+        if unread_only:
+            notifications = notifications.filter(is_read=False)
+        if cursor:
+            created_at, notification_id = decode_cursor(cursor)
+            notifications = notifications.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=notification_id)
+            )
+
+        page = list(notifications.order_by('-created_at', '-id')[:limit + 1])
+        next_cursor = encode_cursor(page[limit - 1]) if len(page) > limit else None
+        return page[:limit], next_cursor
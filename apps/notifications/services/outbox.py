@@ -0,0 +1,316 @@
+"""
+Caixa de saída do WhatsApp (WHATSAPP_OUTBOX_ENABLED).
+
+Em vez de uma task Celery chamar a Evolution API na hora, a mensagem é
+gravada em WhatsAppOutbox na mesma transação do evento (pagamento, link)
+e um despachante envia:
+
+- por prioridade: confirmações de pagamento antes de links, e links
+  antes de mensagens em massa; lotes pequenos, então uma confirmação
+  nova passa na frente do resto da fila em poucos envios
+- pela instância do destinatário (pool de instâncias, ver factory.py),
+  escolhida no enfileiramento; se ela estiver fora, a mensagem muda para
+  a próxima instância do telefone no envio
+- no ritmo da instância: um token bucket por instância da Evolution API,
+  compartilhado entre os processos via Redis (balde local sem Redis)
+- com ritmo adaptativo: limite (429), erro 5xx ou falha de rede cortam a
+  vazão pela metade; sucessos a recuperam aos poucos
+- com novas tentativas: backoff exponencial até
+  WHATSAPP_OUTBOX_MAX_ATTEMPTS; recusa definitiva (4xx, telefone
+  inválido) vai direto para "failed"
+
+Um despachante por vez (trava no cache); o commit de cada mensagem
+acorda o despachante e o beat drena o que sobrar. Instância sem token
+não segura as outras: suas mensagens voltam para a fila e ficam fora dos
+próximos lotes até o balde dela liberar.
+"""
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from apps.core.integrations.resilience import AdaptiveRate, TokenBucket
+from apps.notifications.domain.messages import (
+    build_payment_approved_message,
+    build_payment_link_success_message,
+    build_payment_refused_message,
+)
+from apps.notifications.models import OutboxPriority, OutboxStatus, WhatsAppOutbox
+from apps.notifications.services.factory import (
+    get_instance_config,
+    get_instance_pool,
+    get_whatsapp_service,
+    response_error,
+)
+
+logger = logging.getLogger("notifications")
+
+DISPATCH_LOCK_KEY = "whatsapp_outbox:dispatching"
+
+REFUSED_STATUSES = {"failed", "canceled", "refunded", "chargeback"}
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+def outbox_enabled() -> bool:
+    return _setting("WHATSAPP_OUTBOX_ENABLED", False)
+
+
+# ============================
+# Ritmo por instância
+# ============================
+_buckets: dict[str, TokenBucket] = {}
+_pacers: dict[str, AdaptiveRate] = {}
+
+
+def get_instance_pacing(instance_id: str) -> tuple[TokenBucket, AdaptiveRate]:
+    """Token bucket e vazão adaptativa da instância (um par por processo)."""
+    if instance_id not in _buckets:
+        rate = _setting("WHATSAPP_RATE_PER_SECOND", 1.0)
+        _pacers[instance_id] = AdaptiveRate(
+            f"whatsapp:{instance_id}",
+            rate=rate,
+            min_rate=_setting("WHATSAPP_RATE_MIN", 0.1),
+            max_rate=_setting("WHATSAPP_RATE_MAX", 3.0),
+        )
+        _buckets[instance_id] = TokenBucket(
+            f"whatsapp:{instance_id}",
+            rate=rate,
+            capacity=_setting("WHATSAPP_BURST", 3),
+        )
+    return _buckets[instance_id], _pacers[instance_id]
+
+
+# ============================
+# Enfileiramento
+# ============================
+def enqueue_messages(messages: list[dict]) -> list[WhatsAppOutbox]:
+    """
+    Grava as mensagens na caixa de saída (na transação atual).
+
+    messages: {"phone", "text", "kind", "priority"} (instância padrão se
+    "instance_id" não vier). O despachante é acordado no commit.
+    """
+    if not messages:
+        return []
+
+    rows = WhatsAppOutbox.objects.bulk_create([
+        WhatsAppOutbox(
+            instance_id=message.get("instance_id") or _instance_for(message["phone"]),
+            phone=message["phone"],
+            text=message["text"],
+            kind=message["kind"],
+            priority=message.get("priority", OutboxPriority.BULK),
+        )
+        for message in messages
+    ])
+    transaction.on_commit(_wake_dispatcher)
+    return rows
+
+
+def _instance_for(phone: str) -> str:
+    """Instância do telefone no pool (a configurada se o pool não existe)."""
+    try:
+        instance = get_instance_pool().route(phone)
+    except RuntimeError:
+        instance = None
+    return instance.id if instance else get_instance_config()[0]
+
+
+def enqueue_payment_notifications(notifications: list[dict]) -> list[WhatsAppOutbox]:
+    """Notificações de pagamento ({"status", "phone", "amount"}) → caixa de saída."""
+    messages = []
+    for notification in notifications:
+        status, phone = notification["status"], notification["phone"]
+        amount = notification.get("amount")
+
+        if status == "paid" and amount is not None:
+            message, kind = build_payment_approved_message(phone=phone, value=amount), "payment_approved"
+        elif status in REFUSED_STATUSES:
+            message, kind = build_payment_refused_message(phone=phone), "payment_refused"
+        else:
+            continue
+
+        messages.append({
+            "phone": phone, "text": message.text, "kind": kind,
+            "priority": OutboxPriority.PAYMENT,
+        })
+    return enqueue_messages(messages)
+
+
+def enqueue_payment_link(*, phone: str, link: str, value: float) -> list[WhatsAppOutbox]:
+    message = build_payment_link_success_message(phone=phone, link=link, value=value)
+    return enqueue_messages([{
+        "phone": phone, "text": message.text, "kind": "payment_link",
+        "priority": OutboxPriority.PAYMENT_LINK,
+    }])
+
+
+def _wake_dispatcher():
+    from apps.notifications.tasks import dispatch_whatsapp_outbox_task
+
+    try:
+        dispatch_whatsapp_outbox_task.delay()
+    except Exception:
+        # O beat drena a caixa de saída periodicamente
+        logger.warning("Falha ao acordar o despachante do WhatsApp", exc_info=True)
+
+
+# ============================
+# Despacho
+# ============================
+def _claim_batch(limit: int, exclude_instances=()) -> list[WhatsAppOutbox]:
+    """Próximas mensagens por prioridade (skip_locked: sem disputa entre processos)."""
+    with transaction.atomic():
+        batch = list(
+            WhatsAppOutbox.objects
+            .select_for_update(skip_locked=True)
+            .filter(status=OutboxStatus.PENDING, next_attempt_at__lte=timezone.now())
+            .exclude(instance_id__in=list(exclude_instances))
+            .order_by("priority", "created_at", "id")[:limit]
+        )
+        WhatsAppOutbox.objects.filter(id__in=[message.id for message in batch]).update(
+            status=OutboxStatus.SENDING, updated_at=timezone.now()
+        )
+    return batch
+
+
+def _release(messages: list[WhatsAppOutbox]):
+    """Devolve para a fila mensagens pegas e não enviadas."""
+    WhatsAppOutbox.objects.filter(id__in=[message.id for message in messages]).update(
+        status=OutboxStatus.PENDING, updated_at=timezone.now()
+    )
+
+
+def _send(service, message: WhatsAppOutbox) -> tuple[str, bool] | None:
+    """Envia; None se saiu, senão (erro, é limite/instabilidade)."""
+    try:
+        response = service.send_text(
+            phone=message.phone,
+            text=message.text,
+            delay=_setting("WHATSAPP_MESSAGE_DELAY_MS", 0) or None,
+            instance_id=message.instance_id,
+        )
+    except ValueError as e:
+        return str(e), False
+    except Exception as e:
+        return str(e) or e.__class__.__name__, True
+    return response_error(response)
+
+
+def _record_failure(message: WhatsAppOutbox, error: str, retry: bool):
+    attempts = message.attempts + 1
+    give_up = not retry or attempts >= _setting("WHATSAPP_OUTBOX_MAX_ATTEMPTS", 5)
+    WhatsAppOutbox.objects.filter(id=message.id).update(
+        status=OutboxStatus.FAILED if give_up else OutboxStatus.PENDING,
+        attempts=attempts,
+        last_error=error[:1000],
+        next_attempt_at=timezone.now() + timedelta(seconds=min(5 * 2 ** attempts, 300)),
+        updated_at=timezone.now(),
+    )
+    return give_up
+
+
+def dispatch_outbox(*, max_seconds: float | None = None, batch_size: int | None = None) -> dict | None:
+    """
+    Envia mensagens pendentes até esvaziar a fila ou acabar o tempo.
+
+    Returns:
+        {"sent", "retried", "failed", "throttled"} ou None se outro
+        despachante já está rodando.
+    """
+    max_seconds = max_seconds if max_seconds is not None else _setting("WHATSAPP_OUTBOX_MAX_SECONDS", 50)
+    batch_size = batch_size or _setting("WHATSAPP_OUTBOX_BATCH_SIZE", 10)
+
+    if not cache.add(DISPATCH_LOCK_KEY, 1, int(max_seconds) + 60):
+        return None
+
+    summary = {"sent": 0, "retried": 0, "failed": 0, "throttled": 0}
+    try:
+        # Mensagens presas em "sending" (despachante morto no meio)
+        WhatsAppOutbox.objects.filter(
+            status=OutboxStatus.SENDING,
+            updated_at__lt=timezone.now() - timedelta(seconds=max_seconds + 60),
+        ).update(status=OutboxStatus.PENDING)
+
+        service = get_whatsapp_service()
+        pool = get_instance_pool()
+        deadline = time.monotonic() + max_seconds
+        # Instância sem token → quando o balde dela libera (monotonic)
+        throttled_until: dict[str, float] = {}
+
+        while time.monotonic() < deadline:
+            now = time.monotonic()
+            waiting = {instance_id for instance_id, until in throttled_until.items() if until > now}
+            batch = _claim_batch(batch_size, exclude_instances=waiting)
+            if not batch:
+                if not waiting:
+                    break
+                # Só sobraram mensagens de instâncias sem token
+                resume_at = min(min(throttled_until[instance_id] for instance_id in waiting), deadline)
+                time.sleep(max(0.0, resume_at - time.monotonic()))
+                continue
+
+            skipped = []
+            for index, message in enumerate(batch):
+                instance = pool.route(message.phone, current=message.instance_id)
+                if instance is None:
+                    logger.warning("[WhatsApp] Nenhuma instância disponível")
+                    _release(skipped + batch[index:])
+                    return summary
+                if instance.id != message.instance_id:
+                    message.instance_id = instance.id
+                    WhatsAppOutbox.objects.filter(id=message.id).update(instance_id=instance.id)
+
+                if message.instance_id in waiting:
+                    skipped.append(message)
+                    continue
+
+                bucket, pacer = get_instance_pacing(message.instance_id)
+                bucket.rate = pacer.rate
+                wait = bucket.try_acquire()
+                if wait:
+                    # Sem token: não espera, segue com as outras instâncias
+                    throttled_until[message.instance_id] = time.monotonic() + wait
+                    waiting.add(message.instance_id)
+                    skipped.append(message)
+                    continue
+
+                failure = _send(service, message)
+                if failure is None:
+                    WhatsAppOutbox.objects.filter(id=message.id).update(
+                        status=OutboxStatus.SENT,
+                        attempts=message.attempts + 1,
+                        last_error="",
+                        sent_at=timezone.now(),
+                        updated_at=timezone.now(),
+                    )
+                    pacer.on_success()
+                    summary["sent"] += 1
+                    continue
+
+                error, throttled = failure
+                logger.warning(f"[WhatsApp] Falha ao enviar mensagem {message.id}: {error}")
+                if throttled:
+                    pacer.on_throttle()
+                    summary["throttled"] += 1
+                gave_up = _record_failure(message, error, retry=throttled)
+                summary["failed" if gave_up else "retried"] += 1
+
+            _release(skipped)
+    finally:
+        cache.delete(DISPATCH_LOCK_KEY)
+
+    return summary
+
+
+def has_ready_messages() -> bool:
+    return WhatsAppOutbox.objects.filter(
+        status=OutboxStatus.PENDING, next_attempt_at__lte=timezone.now()
+    ).exists()
@@ -3,26 +3,62 @@ Serviço de notificações de pagamento via WhatsApp.
 
 Responsável por enviar mensagens ao cliente quando o status do pagamento muda.
 Usa Celery para processamento assíncrono (não bloqueia o webhook).
+
+O enfileiramento é feito via transaction.on_commit: a notificação só vai
+para o broker depois que a mudança de status foi gravada (rollback não
+gera mensagem). Notificações de um mesmo lote viram uma única task.
+Broker fora do ar: a task vai para o spool local (apps/core/task_spool.py)
+e o webhook não falha.
+
+Janela de coalescência (PAYMENT_NOTIFICATION_COALESCE_SECONDS > 0,
+desligada por padrão; exige cache compartilhado, CACHE_URL): o último status de cada pagamento/telefone fica
+guardado no cache e só é enviado no fim da janela. Uma sequência de
+transições em poucos segundos (estorno, chargeback) vira uma única
+mensagem com o status final; as substituídas são descartadas antes de
+chegar à Evolution API.
+
+Sem read-modify-write no cache: cada transição pega a próxima versão com
+incr (atômico) e grava o status numa chave só dela; o fim da janela
+reserva a versão que vai enviar com add. Uma transição que chega durante
+o envio nunca sobrescreve nem é sobrescrita.
 """
 import logging
+from functools import partial
 
-from apps.notifications.tasks import send_payment_notification_task
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+from apps.core import task_spool
+from apps.notifications.services.outbox import (
+    enqueue_payment_link,
+    enqueue_payment_notifications,
+    outbox_enabled,
+)
+from apps.notifications.tasks import (
+    send_coalesced_payment_notifications_task,
+    send_payment_link_task,
+    send_payment_notification_task,
+    send_payment_notifications_batch_task,
+)
 
 logger = logging.getLogger("notifications")
 
 
-def payment_status(*, payment):
+def _build_payment_notification(payment) -> dict | None:
     """
-    Enfileira notificação de mudança de status do pagamento.
-    
-    Despacha para fila Celery - não bloqueia o webhook.
+    Monta os argumentos da task de notificação de um pagamento.
+
+    Retorna None se o status não notifica ou o vendedor não tem telefone.
     """
     order = payment.payment_link.order
     phone = order.seller.phone
     
     if not phone:
         logger.warning(f"Seller sem telefone cadastrado, pedido {order.id}")
-        return
+        return None
     
     status = payment.status
     phone_formatted = f"55{phone}"
@@ -30,15 +66,231 @@ def payment_status(*, payment):
     # Status que não precisam de notificação
     if status in {"pending", "processing"}:
         logger.debug(f"Status {status} - não notificar")
-        return
+        return None
     
     logger.info(f"Enfileirando notificação: status={status}, pedido={order.id}")
     
-    # Despachar para fila Celery (assíncrono)
     amount = float(payment.amount) if status == "paid" else None
+
+    return {
+        "status": status,
+        "phone": phone_formatted,
+        "amount": amount,
+    }
+
+
+def _dispatch_payment_notifications(notifications: list[dict]):
+    """
+    Publica as notificações no broker (roda no commit da transação).
+
+    Uma notificação → task unitária; várias → uma task de lote,
+    processada pelo worker com uma única sessão do WhatsApp.
+    """
+    if len(notifications) == 1:
+        task_spool.delay(send_payment_notification_task, **notifications[0])
+    elif notifications:
+        task_spool.delay(send_payment_notifications_batch_task, notifications=notifications)
+
+
+def payment_status(*, payment):
+    """
+    Enfileira notificação de mudança de status do pagamento.
     
-    send_payment_notification_task.delay(
-        status=status,
-        phone=phone_formatted,
-        amount=amount,
-    )
+    Despacha para fila Celery no commit - não bloqueia o webhook.
+    """
+    payment_statuses(payments=[payment])
+
+
+def payment_statuses(*, payments):
+    """
+    Enfileira as notificações de vários pagamentos numa só publicação.
+
+    Usado pelo processamento em lote de webhooks.
+    """
+    pending = [
+        (payment.id, notification)
+        for payment, notification in zip(payments, map(_build_payment_notification, payments))
+        if notification
+    ]
+    notifications = [notification for _, notification in pending]
+
+    if pending and coalesce_window() and _cache_is_shared():
+        transaction.on_commit(partial(_hold_payment_notifications, pending))
+    elif notifications:
+        _send_payment_notifications(notifications)
+
+
+def _send_payment_notifications(notifications: list[dict]):
+    """Envio sem janela: caixa de saída ou task publicada no commit."""
+    if outbox_enabled():
+        enqueue_payment_notifications(notifications)
+    else:
+        transaction.on_commit(
+            partial(_dispatch_payment_notifications, notifications)
+        )
+
+
+# ============================
+# Janela de coalescência
+# ============================
+COALESCE_PREFIX = "payment_notification"
+
+
+def coalesce_window() -> int:
+    return getattr(settings, "PAYMENT_NOTIFICATION_COALESCE_SECONDS", 0)
+
+
+def _cache_is_shared() -> bool:
+    """
+    Cache visto por web e worker. Em memória local (sem CACHE_URL), o
+    worker do fim da janela leria um cache vazio: a janela fica desligada.
+    """
+    return not isinstance(caches["default"], (LocMemCache, DummyCache))
+
+
+def _coalesce_key(payment_id, phone: str) -> str:
+    return f"{COALESCE_PREFIX}:{payment_id}:{phone}"
+
+
+def _count(name: str, amount: int = 1):
+    """Contador compartilhado (web guarda, worker envia)."""
+    key = f"{COALESCE_PREFIX}:metrics:{name}"
+    try:
+        cache.add(key, 0, None)
+        cache.incr(key, amount)
+    except ValueError:
+        cache.set(key, amount, None)
+    except Exception:
+        logger.debug("Falha ao atualizar contador de notificações", exc_info=True)
+
+
+def _coalesce_ttl() -> int:
+    return coalesce_window() + 3600
+
+
+def _next_version(key: str) -> int:
+    """Próxima versão da chave (incr atômico)."""
+    version_key = f"{key}:version"
+    cache.add(version_key, 0, _coalesce_ttl())
+    try:
+        version = cache.incr(version_key)
+    except ValueError:
+        # Expirou entre o add e o incr
+        cache.add(version_key, 0, _coalesce_ttl())
+        version = cache.incr(version_key)
+    cache.touch(version_key, _coalesce_ttl())
+    return version
+
+
+def _hold_payment_notifications(pending: list[tuple]):
+    """
+    Guarda o último status de cada pagamento e agenda o envio (no commit).
+
+    Cada transição ganha uma versão: a task do fim da janela envia só a
+    versão mais nova, e apenas uma task fica agendada por chave.
+    """
+    window = coalesce_window()
+    scheduled, direct = [], []
+    for payment_id, notification in pending:
+        key = _coalesce_key(payment_id, notification["phone"])
+        try:
+            version = _next_version(key)
+            cache.set(f"{key}:payload:{version}", notification, _coalesce_ttl())
+            if cache.add(f"{key}:scheduled", 1, window + 60):
+                scheduled.append(key)
+        except Exception:
+            # O pagamento já foi gravado: sem cache, envia sem janela
+            logger.warning(f"Cache indisponível, notificação {key} enviada sem janela", exc_info=True)
+            direct.append(notification)
+
+    if direct:
+        _send_payment_notifications(direct)
+    if scheduled:
+        task_spool.apply_async(
+            send_coalesced_payment_notifications_task,
+            kwargs={"keys": scheduled},
+            countdown=window,
+        )
+
+
+def release_coalesced_notifications(keys: list[str]) -> list[dict]:
+    """
+    Fim da janela: a notificação mais nova de cada chave ainda não enviada.
+
+    Status igual ao último enviado (ex.: "paid" repetido) é descartado.
+    """
+    ttl = _coalesce_ttl()
+    ready = []
+    for key in keys:
+        # Libera o agendamento antes de ler: status que chegar agora
+        # agenda outra task e sai na próxima janela
+        cache.delete(f"{key}:scheduled")
+        version = cache.get(f"{key}:version")
+        sent = cache.get(f"{key}:sent") or {"version": 0, "status": None}
+        if not version or version <= sent["version"]:
+            continue
+
+        notification = cache.get(f"{key}:payload:{version}")
+        # Sem status: a transição ainda está sendo gravada e agenda a
+        # própria task. A reserva garante um único envio por versão
+        if not notification or not cache.add(f"{key}:sent:{version}", 1, ttl):
+            continue
+
+        repeated = notification["status"] == sent["status"]
+        cache.set(f"{key}:sent", {"version": version, "status": notification["status"]}, ttl)
+        # O contador vive pelo menos tanto quanto as reservas
+        cache.touch(f"{key}:version", ttl)
+
+        # Versões entre a última enviada e esta foram substituídas
+        coalesced = version - sent["version"] - 1 + int(repeated)
+        if coalesced:
+            _count("coalesced", coalesced)
+        if not repeated:
+            ready.append(notification)
+
+    if ready:
+        _count("sent", len(ready))
+    return ready
+
+
+def get_coalescing_metrics() -> dict:
+    """Janela configurada e notificações coalescidas/enviadas (todos os processos)."""
+    names = ("coalesced", "sent")
+    try:
+        values = cache.get_many([f"{COALESCE_PREFIX}:metrics:{name}" for name in names])
+    except Exception:
+        values = {}
+    return {
+        "window_seconds": coalesce_window(),
+        **{name: values.get(f"{COALESCE_PREFIX}:metrics:{name}", 0) for name in names},
+    }
+
+
+def payment_link_created(*, payment_link):
+    """
+    Enfileira o envio do link de pagamento para o vendedor.
+
+    Publicado no commit, junto com a gravação do link.
+    """
+    order = payment_link.order
+    phone = order.seller.phone
+
+    if not phone:
+        logger.warning(f"Seller sem telefone cadastrado, pedido {order.id}")
+        return
+
+    logger.info(f"Enfileirando envio do link: pedido={order.id}")
+
+    if outbox_enabled():
+        enqueue_payment_link(
+            phone=f"55{phone}", link=payment_link.url_link, value=float(order.total)
+        )
+        return
+
+    transaction.on_commit(partial(
+        task_spool.delay,
+        send_payment_link_task,
+        phone=f"55{phone}",
+        link=payment_link.url_link,
+        value=float(order.total),
+    ))
@@ -0,0 +1,19 @@
+"""
+Estado das notificações, para o endpoint de monitoramento (apps/core/api/v1).
+"""
+
+from apps.notifications.services.factory import get_instance_metrics
+from apps.notifications.services.payment_notifications import get_coalescing_metrics
+
+
+def status() -> dict:
+    """
+    - evolution_instances: por instância do pool, circuito, saúde, envios,
+      erros, failovers e latência média
+    - payment_notifications: janela de coalescência, notificações
+      descartadas (substituídas) e enviadas
+    """
+    return {
+        "evolution_instances": get_instance_metrics(),
+        "payment_notifications": get_coalescing_metrics(),
+    }
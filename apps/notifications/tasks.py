@@ -6,11 +6,25 @@ Configurado com:
 - Retry automático (3 tentativas)
 - Backoff exponencial (5s, 10s, 20s)
 - Logging detalhado
+
+Com WHATSAPP_OUTBOX_ENABLED as mensagens vão para a caixa de saída e
+dispatch_whatsapp_outbox_task as envia no ritmo de cada instância.
+
+Com PAYMENT_NOTIFICATION_COALESCE_SECONDS, as notificações de pagamento
+saem no fim da janela por send_coalesced_payment_notifications_task.
 """
 import logging
 from celery import shared_task
+from django.db import transaction
 
-from apps.notifications.services.factory import get_whatsapp_service
+from apps.core import task_spool
+from apps.notifications.services.factory import check_instances_health, get_whatsapp_service
+from apps.notifications.services.outbox import (
+    dispatch_outbox,
+    enqueue_payment_notifications,
+    has_ready_messages,
+    outbox_enabled,
+)
 
 logger = logging.getLogger("notifications")
 
@@ -41,22 +55,67 @@ def send_payment_notification_task(self, status: str, phone: str, amount: float
         raise  # Vai fazer retry
     
     try:
-        if status == "paid" and amount is not None:
-            service.send_payment_success_approved(phone=phone, value=amount)
-            logger.info(f"[Task] Mensagem de sucesso enviada para {phone}")
-            
-        elif status in {"failed", "canceled", "refunded", "chargeback"}:
-            service.send_payment_refused(phone=phone)
-            logger.info(f"[Task] Mensagem de recusa enviada para {phone}")
-            
-        else:
-            logger.debug(f"[Task] Status {status} não requer notificação")
-            
+        _send_payment_notification(service, status=status, phone=phone, amount=amount)
     except Exception as e:
         logger.error(f"[Task] Erro ao enviar mensagem: {e}")
         raise  # Vai fazer retry
 
 
+@shared_task(
+    bind=True,
+    autoretry_for=(RuntimeError,),
+    retry_backoff=5,
+    retry_backoff_max=60,
+    retry_kwargs={"max_retries": 3},
+    ignore_result=True,
+)
+def send_payment_notifications_batch_task(self, notifications: list[dict]):
+    """
+    Task assíncrona para enviar várias notificações de pagamento.
+
+    Usa uma única sessão do WhatsApp para o lote inteiro. Se o WhatsApp
+    estiver indisponível, o lote todo faz retry (nada foi enviado); falhas
+    de envio individuais são reenfileiradas como tasks unitárias, para
+    não reenviar mensagens que já saíram.
+
+    Args:
+        notifications: Lista de {"status", "phone", "amount"}
+    """
+    logger.info(f"[Task] Processando lote de {len(notifications)} notificações")
+
+    try:
+        service = get_whatsapp_service()
+    except RuntimeError as e:
+        logger.error(f"[Task] WhatsApp indisponível: {e}")
+        raise  # Vai fazer retry
+
+    for notification in notifications:
+        try:
+            _send_payment_notification(service, **notification)
+        except Exception as e:
+            logger.error(
+                f"[Task] Erro ao enviar mensagem para {notification.get('phone')}: {e}"
+            )
+            # Sem broker, o reenvio individual fica no spool
+            task_spool.delay(send_payment_notification_task, **notification)
+
+
+def _send_payment_notification(service, *, status: str, phone: str, amount: float = None):
+    """
+    Envia a mensagem do status pelo serviço de WhatsApp já criado.
+    """
+    if status == "paid" and amount is not None:
+        service.send_payment_success_approved(phone=phone, value=amount)
+        logger.info(f"[Task] Mensagem de sucesso enviada para {phone}")
+        
+    elif status in {"failed", "canceled", "refunded", "chargeback"}:
+        service.send_payment_refused(phone=phone)
+        logger.info(f"[Task] Mensagem de recusa enviada para {phone}")
+        
+    else:
+        logger.debug(f"[Task] Status {status} não requer notificação")
+
+
 @shared_task(
     bind=True,
     autoretry_for=(Exception,),
@@ -77,3 +136,65 @@ def send_payment_link_task(self, phone: str, link: str, value: float):
     except Exception as e:
         logger.error(f"[Task] Erro ao enviar link: {e}")
         raise
+
+
+@shared_task(ignore_result=True)
+def send_coalesced_payment_notifications_task(keys: list[str]):
+    """
+    Fim da janela de coalescência: envia o último status de cada pagamento.
+
+    O envio segue o caminho normal (caixa de saída ou tasks de envio, com
+    as novas tentativas delas).
+    """
+    from apps.notifications.services.payment_notifications import (
+        _dispatch_payment_notifications,
+        release_coalesced_notifications,
+    )
+
+    notifications = release_coalesced_notifications(keys)
+    if not notifications:
+        return
+
+    if outbox_enabled():
+        with transaction.atomic():
+            enqueue_payment_notifications(notifications)
+    else:
+        _dispatch_payment_notifications(notifications)
+
+
+@shared_task(ignore_result=True)
+def dispatch_whatsapp_outbox_task():
+    """
+    Envia a caixa de saída do WhatsApp (um despachante por vez).
+
+    Acordada no commit de cada mensagem e pelo beat. Se sobrou mensagem
+    pronta (tempo esgotado ou chegou durante o fim do envio), se
+    reenfileira.
+    """
+    try:
+        summary = dispatch_outbox()
+    except RuntimeError as e:
+        logger.error(f"[Task] WhatsApp indisponível: {e}")
+        return
+
+    if summary is None:
+        return  # outro despachante rodando
+
+    if any(summary.values()):
+        logger.info(f"[Task] Caixa de saída do WhatsApp: {summary}")
+    if has_ready_messages():
+        dispatch_whatsapp_outbox_task.delay()
+
+
+@shared_task(ignore_result=True)
+def check_evolution_instances_task():
+    """Verifica o connectionState de cada instância do pool (roteamento evita as caídas)."""
+    try:
+        result = check_instances_health()
+    except RuntimeError as e:
+        logger.error(f"[Task] Verificação das instâncias: {e}")
+        return
+
+    down = [instance_id for instance_id, available in result.items() if not available]
+    if down:
+        logger.warning(f"[Task] Instâncias da Evolution API fora do ar: {', '.join(down)}")
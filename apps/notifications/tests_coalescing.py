@@ -0,0 +1,188 @@
+"""
+Testes da janela de coalescência das notificações de pagamento.
+"""
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from apps.core import task_spool
+from apps.core.models import SpooledTask
+from apps.notifications.services.payment_notifications import (
+    get_coalescing_metrics,
+    payment_status,
+)
+from apps.notifications.tasks import (
+    send_coalesced_payment_notifications_task,
+    send_payment_notifications_batch_task,
+)
+from apps.orders.models import Order
+from apps.payments.models import Payment, PaymentLink
+from apps.sellers.models import Seller
+
+
+@override_settings(PAYMENT_NOTIFICATION_COALESCE_SECONDS=10)
+@patch("apps.notifications.services.payment_notifications.send_payment_notifications_batch_task")
+@patch("apps.notifications.services.payment_notifications.send_payment_notification_task")
+@patch("apps.notifications.services.payment_notifications.send_coalesced_payment_notifications_task")
+class PaymentNotificationCoalescingTests(TestCase):
+    """Transições do mesmo pagamento na janela viram uma só mensagem."""
+
+    def setUp(self):
+        cache.clear()
+        # Nos testes o cache é o locmem, visto pelo "worker" (mesmo processo)
+        shared = patch(
+            "apps.notifications.services.payment_notifications._cache_is_shared", return_value=True
+        )
+        self.cache_is_shared = shared.start()
+        self.addCleanup(shared.stop)
+        seller = Seller.objects.create(name="Seller", phone="11999999999")
+        order = Order.objects.create(
+            name="Pedido", value=Decimal("10.00"), value_freight=Decimal("0.00"),
+            total=Decimal("10.00"), status="paid", installments=1, seller=seller,
+        )
+        link = PaymentLink.objects.create(
+            order=order, url_link="https://pay.test/x", id_link="lnk_x", amount=order.total,
+        )
+        self.payment = Payment.objects.create(
+            payment_link=link, amount=order.total, status="paid", payment_date=timezone.now(),
+        )
+
+    def _transition(self, status):
+        self.payment.status = status
+        with self.captureOnCommitCallbacks(execute=True):
+            payment_status(payment=self.payment)
+
+    def _end_window(self, mock_coalesced):
+        keys = mock_coalesced.apply_async.call_args.kwargs["kwargs"]["keys"]
+        send_coalesced_payment_notifications_task(keys=keys)
+
+    def test_only_latest_status_sent(self, mock_coalesced, mock_task, mock_batch):
+        """Testa que paid → refunded → chargeback na janela envia só o chargeback."""
+        for status in ("paid", "refunded", "chargeback"):
+            self._transition(status)
+
+        mock_coalesced.apply_async.assert_called_once()
+        self.assertEqual(mock_coalesced.apply_async.call_args.kwargs["countdown"], 10)
+        mock_task.delay.assert_not_called()
+
+        self._end_window(mock_coalesced)
+
+        mock_task.delay.assert_called_once_with(
+            status="chargeback", phone="5511999999999", amount=None
+        )
+        metrics = get_coalescing_metrics()
+        self.assertEqual(metrics["coalesced"], 2)
+        self.assertEqual(metrics["sent"], 1)
+        self.assertEqual(metrics["window_seconds"], 10)
+
+    def test_repeated_status_dropped(self, mock_coalesced, mock_task, mock_batch):
+        """Testa que o mesmo status depois de enviado não gera outra mensagem."""
+        self._transition("refunded")
+        self._end_window(mock_coalesced)
+        self._transition("refunded")
+        self._end_window(mock_coalesced)
+
+        self.assertEqual(mock_task.delay.call_count, 1)
+        self.assertEqual(mock_coalesced.apply_async.call_count, 2)
+        self.assertEqual(get_coalescing_metrics()["coalesced"], 1)
+
+    def test_transition_during_release_not_lost(self, mock_coalesced, mock_task, mock_batch):
+        """Testa que um status gravado entre a leitura e o envio sai na janela seguinte."""
+        self._transition("refunded")
+
+        read_version = cache.get
+        interleaved = []
+
+        def get_then_transition(key, *args, **kwargs):
+            value = read_version(key, *args, **kwargs)
+            if key.endswith(":version") and not interleaved:
+                interleaved.append(key)
+                self._transition("paid")
+            return value
+
+        with patch.object(cache, "get", side_effect=get_then_transition):
+            self._end_window(mock_coalesced)
+
+        self.assertEqual(mock_coalesced.apply_async.call_count, 2)
+        self._end_window(mock_coalesced)
+
+        self.assertEqual(
+            [call.kwargs["status"] for call in mock_task.delay.call_args_list], ["refunded", "paid"]
+        )
+        self.assertEqual(mock_task.delay.call_args.kwargs["amount"], 10.0)
+
+    def test_rollback_holds_nothing(self, mock_coalesced, mock_task, mock_batch):
+        """Testa que transição revertida não entra na janela."""
+        self.payment.status = "refunded"
+        with self.captureOnCommitCallbacks(execute=False):
+            payment_status(payment=self.payment)
+
+        mock_coalesced.apply_async.assert_not_called()
+        self.assertEqual(get_coalescing_metrics()["coalesced"], 0)
+
+    def test_schedule_failure_goes_to_spool(self, mock_coalesced, mock_task, mock_batch):
+        """Testa que sem broker o fim da janela fica no spool, com a mesma hora."""
+        mock_coalesced.name = "apps.notifications.tasks.send_coalesced_payment_notifications_task"
+        mock_coalesced.apply_async.side_effect = ConnectionError("broker")
+        task_spool.broker_breaker.reset()
+
+        self._transition("failed")
+
+        spooled = SpooledTask.objects.get()
+        self.assertEqual(spooled.task_name, mock_coalesced.name)
+        self.assertEqual(len(spooled.kwargs["keys"]), 1)
+        self.assertIn("eta", spooled.options)
+        mock_task.delay.assert_not_called()
+
+    def test_local_cache_sends_without_window(self, mock_coalesced, mock_task, mock_batch):
+        """Testa que sem cache compartilhado (locmem) cada transição sai na hora."""
+        self.cache_is_shared.return_value = False
+
+        self._transition("paid")
+
+        mock_coalesced.apply_async.assert_not_called()
+        mock_task.delay.assert_called_once_with(status="paid", phone="5511999999999", amount=10.0)
+
+    def test_cache_error_sends_without_window(self, mock_coalesced, mock_task, mock_batch):
+        """Testa que erro do cache no commit não perde a notificação."""
+        broken_cache = MagicMock()
+        broken_cache.add.side_effect = ConnectionError("redis")
+
+        with patch("apps.notifications.services.payment_notifications.cache", broken_cache):
+            self._transition("refunded")
+
+        mock_coalesced.apply_async.assert_not_called()
+        mock_task.delay.assert_called_once_with(status="refunded", phone="5511999999999", amount=None)
+
+    @override_settings(PAYMENT_NOTIFICATION_COALESCE_SECONDS=0)
+    def test_disabled_window_sends_each_transition(self, mock_coalesced, mock_task, mock_batch):
+        """Testa que sem janela cada transição vira uma task."""
+        self._transition("paid")
+        self._transition("refunded")
+
+        self.assertEqual(mock_task.delay.call_count, 2)
+        mock_coalesced.apply_async.assert_not_called()
+
+
+class PaymentNotificationBatchTests(TestCase):
+    """Reenvio individual das falhas do lote."""
+
+    @patch("apps.notifications.tasks.send_payment_notification_task")
+    @patch("apps.notifications.tasks.get_whatsapp_service")
+    def test_failed_message_goes_to_spool_without_broker(self, mock_service, mock_task):
+        """Testa que a falha no lote sem broker fica no spool em vez de levantar."""
+        mock_service.return_value.send_payment_refused.side_effect = RuntimeError("whatsapp")
+        mock_task.name = "apps.notifications.tasks.send_payment_notification_task"
+        mock_task.delay.side_effect = ConnectionError("broker")
+        task_spool.broker_breaker.reset()
+
+        send_payment_notifications_batch_task(
+            notifications=[{"status": "failed", "phone": "5511999999999", "amount": None}]
+        )
+
+        spooled = SpooledTask.objects.get()
+        self.assertEqual(spooled.task_name, mock_task.name)
+        self.assertEqual(spooled.kwargs["phone"], "5511999999999")
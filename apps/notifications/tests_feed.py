@@ -0,0 +1,162 @@
+"""
+Testes do contador de não lidas e do feed de notificações.
+"""
+from unittest.mock import MagicMock, patch
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.notifications.models import Notification
+from apps.notifications.services import NotificationService
+
+
+class UnreadCountTests(TestCase):
+    """Contador de não lidas no cache."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("leitor")
+
+    def _create(self, title="Aviso"):
+        with self.captureOnCommitCallbacks(execute=True):
+            return NotificationService.create_notification(self.user, title, "Mensagem")
+
+    def test_count_served_from_cache(self):
+        """Testa que só a primeira leitura faz COUNT."""
+        self._create()
+        self.assertEqual(NotificationService.get_unread_count(self.user), 1)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(NotificationService.get_unread_count(self.user), 1)
+
+    def test_counter_follows_create_and_reads(self):
+        """Testa criação, marcação (uma vez só) e marcar todas."""
+        first = self._create()
+        self.assertEqual(NotificationService.get_unread_count(self.user), 1)
+
+        self._create()
+        self._create()
+        with self.assertNumQueries(0):
+            self.assertEqual(NotificationService.get_unread_count(self.user), 3)
+
+        NotificationService.mark_as_read(first.id)
+        NotificationService.mark_as_read(first.id)
+        self.assertEqual(NotificationService.get_unread_count(self.user), 2)
+
+        self.assertEqual(NotificationService.mark_all_as_read(self.user), 2)
+        self.assertEqual(NotificationService.get_unread_count(self.user), 0)
+        self.assertEqual(Notification.objects.filter(user=self.user, is_read=False).count(), 0)
+
+    def test_rollback_not_counted(self):
+        """Testa que notificação revertida não entra no contador."""
+        NotificationService.get_unread_count(self.user)
+        with self.captureOnCommitCallbacks(execute=False):
+            NotificationService.create_notification(self.user, "Aviso", "Mensagem")
+
+        self.assertEqual(NotificationService.get_unread_count(self.user), 0)
+
+    def test_cache_outage_does_not_break_notifications(self):
+        """Testa que criar, ler e contar seguem funcionando com o cache fora do ar."""
+        broken_cache = MagicMock()
+        for method in ("get", "add", "incr", "delete"):
+            getattr(broken_cache, method).side_effect = ConnectionError("redis")
+
+        with patch("apps.notifications.services.notification_service.cache", broken_cache):
+            notification = self._create()
+            self._create()
+            NotificationService.mark_as_read(notification.id)
+            self.assertEqual(NotificationService.get_unread_count(self.user), 1)
+
+        notification.refresh_from_db()
+        self.assertTrue(notification.is_read)
+
+    def test_mark_as_read_updates_only_changed_fields(self):
+        """Testa que marcar como lida não regrava título e mensagem."""
+        notification = self._create()
+
+        with CaptureQueriesContext(connection) as queries:
+            notification.mark_as_read()
+
+        updates = [query["sql"] for query in queries if query["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 1)
+        self.assertNotIn('"title"', updates[0])
+        self.assertNotIn('"message"', updates[0])
+        notification.refresh_from_db()
+        self.assertTrue(notification.is_read)
+        self.assertIsNotNone(notification.read_at)
+
+
+class NotificationFeedTests(TestCase):
+    """Feed paginado por cursor e endpoints."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("leitor")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.notifications = [
+            Notification.objects.create(user=self.user, title=f"Aviso {i}", message="Mensagem")
+            for i in range(5)
+        ]
+        # Mesmo instante para três delas: o id desempata
+        Notification.objects.filter(id__in=[n.id for n in self.notifications[1:4]]).update(
+            created_at=timezone.now()
+        )
+
+    def test_pages_cover_feed_once_in_order(self):
+        """Testa que as páginas percorrem o feed sem repetir nem pular."""
+        seen, cursor = [], None
+        while True:
+            page, cursor = NotificationService.get_notifications_page(self.user, cursor=cursor, limit=2)
+            seen.extend(notification.id for notification in page)
+            if not cursor:
+                break
+
+        expected = list(
+            Notification.objects.filter(user=self.user)
+            .order_by("-created_at", "-id")
+            .values_list("id", flat=True)
+        )
+        self.assertEqual(seen, expected)
+
+    def test_feed_endpoint(self):
+        """Testa o feed na API e o cursor inválido."""
+        url = reverse("notifications_api_v1:feed")
+
+        response = self.client.get(url, {"limit": 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["results"]), 3)
+
+        response = self.client.get(url, {"limit": 3, "cursor": response.data["next_cursor"]})
+        self.assertEqual(len(response.data["results"]), 2)
+        self.assertIsNone(response.data["next_cursor"])
+
+        response = self.client.get(url, {"cursor": "inválido"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_read_endpoints_scoped_to_user(self):
+        """Testa marcar como lida, marcar todas e notificação de outro usuário."""
+        other = Notification.objects.create(
+            user=User.objects.create_user("outro"), title="Aviso", message="Mensagem"
+        )
+
+        response = self.client.post(reverse("notifications_api_v1:read", args=[other.id]))
+        self.assertEqual(response.status_code, 404)
+
+        response = self.client.post(
+            reverse("notifications_api_v1:read", args=[self.notifications[0].id])
+        )
+        self.assertTrue(response.data["is_read"])
+        response = self.client.get(reverse("notifications_api_v1:unread-count"))
+        self.assertEqual(response.data["unread"], 4)
+
+        response = self.client.post(reverse("notifications_api_v1:read-all"))
+        self.assertEqual(response.data["marked"], 4)
+        response = self.client.get(reverse("notifications_api_v1:unread-count"))
+        self.assertEqual(response.data["unread"], 0)
@@ -0,0 +1,95 @@
+"""
+Testes do pool de instâncias da Evolution API.
+"""
+from collections import Counter
+from unittest.mock import MagicMock
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from apps.notifications.services.factory import (
+    EvolutionInstance,
+    InstancePool,
+    PooledWhatsAppMessageService,
+    parse_instances,
+)
+
+
+def phones(count):
+    return [f"55119{i:08d}" for i in range(count)]
+
+
+class InstancePoolTests(TestCase):
+    """Testes de roteamento, failover, saúde e métricas."""
+
+    def setUp(self):
+        cache.clear()
+        self.pool = InstancePool(parse_instances("loja1:tok1:3,loja2:tok2:1"))
+
+    def test_parse_instances(self):
+        """Testa o formato id:token:peso (peso opcional)."""
+        instances = parse_instances("a:tok:2, b:tok:b")
+
+        self.assertEqual([(i.id, i.token, i.weight) for i in instances], [("a", "tok", 2), ("b", "tok:b", 1)])
+        with self.assertRaises(ValueError):
+            parse_instances("sem-token")
+
+    def test_sticky_weighted_routing(self):
+        """Testa que o telefone sempre cai na mesma instância e a carga segue os pesos."""
+        routes = {phone: self.pool.route(phone).id for phone in phones(2000)}
+
+        self.assertEqual(routes, {phone: self.pool.route(phone).id for phone in phones(2000)})
+        share = Counter(routes.values())["loja1"] / len(routes)
+        self.assertAlmostEqual(share, 0.75, delta=0.05)
+
+    def test_down_instance_moves_only_its_recipients(self):
+        """Testa que, com uma instância fora, só os clientes dela mudam de número."""
+        before = {phone: self.pool.route(phone).id for phone in phones(200)}
+        self.pool.get("loja2").set_health(False, "close")
+
+        after = {phone: self.pool.route(phone).id for phone in phones(200)}
+
+        self.assertEqual(set(after.values()), {"loja1"})
+        self.assertTrue(all(after[p] == "loja1" for p, instance in before.items() if instance == "loja1"))
+
+    def test_failover_and_metrics(self):
+        """Testa que o envio tenta a próxima instância quando a preferida falha."""
+        phone = next(p for p in phones(100) if self.pool.route(p).id == "loja2")
+        client = MagicMock()
+        client.messages.send_text.side_effect = [
+            {"status": 500, "error": "Internal Server Error"},
+            {"key": {"id": "ok"}},
+        ]
+        service = PooledWhatsAppMessageService(client=client, pool=self.pool)
+
+        service.send_payment_refused(phone=phone)
+
+        used = [call.kwargs["instance_id"] for call in client.messages.send_text.call_args_list]
+        self.assertEqual(used, ["loja2", "loja1"])
+        metrics = self.pool.snapshot()
+        self.assertEqual((metrics["loja2"]["errors"], metrics["loja2"]["sent"]), (1, 0))
+        self.assertEqual((metrics["loja1"]["sent"], metrics["loja1"]["failovers"]), (1, 1))
+
+    def test_all_instances_failing_raises(self):
+        """Testa que sem nenhuma instância entregando o envio falha (task faz retry)."""
+        client = MagicMock()
+        client.messages.send_text.side_effect = ConnectionError("down")
+        service = PooledWhatsAppMessageService(client=client, pool=self.pool)
+
+        with self.assertRaises(Exception):
+            service.send_payment_refused(phone="5511999999999")
+        self.assertEqual(client.messages.send_text.call_count, 2)
+
+    def test_active_health_check(self):
+        """Testa que a verificação ativa tira do roteamento a instância desconectada."""
+        client = MagicMock()
+        client.instance_operations.get_connection_state.side_effect = [
+            {"instance": {"instanceName": "loja1", "state": "open"}},
+            {"instance": {"instanceName": "loja2", "state": "close"}},
+        ]
+
+        self.assertEqual(self.pool.check_health(client), {"loja1": True, "loja2": False})
+        self.assertEqual([i.id for i in self.pool.candidates("5511999999999")], ["loja1"])
+        # Outro processo (outro pool) enxerga o resultado pelo cache
+        other = InstancePool([EvolutionInstance(id="loja2", token="tok2")])
+        self.assertFalse(other.get("loja2").available)
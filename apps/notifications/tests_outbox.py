@@ -0,0 +1,170 @@
+"""
+Testes da caixa de saída do WhatsApp.
+"""
+import time
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from apps.notifications.models import OutboxPriority, OutboxStatus, WhatsAppOutbox
+from apps.notifications.services import outbox
+from apps.notifications.services.factory import EvolutionInstance, InstancePool
+from apps.notifications.services.payment_notifications import payment_link_created, payment_statuses
+from apps.orders.models import Order
+from apps.payments.models import Payment, PaymentLink
+from apps.sellers.models import Seller
+
+
+class FakeWhatsApp:
+    """Serviço de WhatsApp falso: guarda a ordem dos envios."""
+
+    def __init__(self, responses=None):
+        self.sent = []
+        self.responses = list(responses or [])
+
+    def send_text(self, *, phone, text, delay=None, instance_id=None):
+        self.sent.append(phone)
+        return self.responses.pop(0) if self.responses else {"key": {"id": "msg"}}
+
+
+def message(phone, priority=OutboxPriority.BULK, instance_id="inst", **fields):
+    return WhatsAppOutbox.objects.create(
+        instance_id=instance_id, phone=phone, text="Olá", kind="test", priority=priority, **fields
+    )
+
+
+@override_settings(
+    WHATSAPP_OUTBOX_ENABLED=True,
+    WHATSAPP_RATE_PER_SECOND=1000.0,
+    WHATSAPP_RATE_MAX=1000.0,
+    WHATSAPP_BURST=100,
+)
+class WhatsAppOutboxTests(TestCase):
+    """Testes do enfileiramento e do despachante."""
+
+    def setUp(self):
+        cache.clear()
+        outbox._buckets.clear()
+        outbox._pacers.clear()
+
+    def _dispatch(self, service, instances=("inst",), **kwargs):
+        pool = InstancePool([EvolutionInstance(id=instance_id, token="tok") for instance_id in instances])
+        kwargs.setdefault("max_seconds", 5)
+        with patch("apps.notifications.services.outbox.get_whatsapp_service", return_value=service), \
+                patch("apps.notifications.services.outbox.get_instance_pool", return_value=pool):
+            return outbox.dispatch_outbox(**kwargs)
+
+    @patch("apps.notifications.services.payment_notifications.send_payment_notification_task")
+    @patch("apps.notifications.services.payment_notifications.send_payment_link_task")
+    @patch("apps.notifications.tasks.dispatch_whatsapp_outbox_task.delay")
+    def test_events_written_to_outbox_in_transaction(self, mock_wake, mock_link_task, mock_task):
+        """Testa que pagamento e link viram linhas na caixa de saída, não tasks."""
+        seller = Seller.objects.create(name="Seller", phone="11999999999")
+        order = Order.objects.create(
+            name="Pedido", value=Decimal("10.00"), value_freight=Decimal("0.00"),
+            total=Decimal("10.00"), status="paid", installments=1, seller=seller,
+        )
+        link = PaymentLink.objects.create(
+            order=order, url_link="https://pay.test/x", id_link="lnk_x", amount=order.total,
+        )
+        payment = Payment.objects.create(
+            payment_link=link, amount=order.total, status="paid", payment_date=timezone.now(),
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            payment_link_created(payment_link=link)
+            payment_statuses(payments=[payment])
+
+        rows = list(WhatsAppOutbox.objects.order_by("priority"))
+        self.assertEqual(
+            [(row.kind, row.priority, row.phone) for row in rows],
+            [
+                ("payment_approved", OutboxPriority.PAYMENT, "5511999999999"),
+                ("payment_link", OutboxPriority.PAYMENT_LINK, "5511999999999"),
+            ],
+        )
+        self.assertIn("10.00", rows[0].text)
+        mock_task.delay.assert_not_called()
+        mock_link_task.delay.assert_not_called()
+        self.assertEqual(mock_wake.call_count, 2)
+
+    def test_dispatch_sends_by_priority(self):
+        """Testa que confirmações de pagamento saem antes das mensagens em massa."""
+        for i in range(3):
+            message(f"551100000000{i}")
+        message("5511999999999", priority=OutboxPriority.PAYMENT)
+        message("5511888888888", next_attempt_at=timezone.now() + timedelta(minutes=5))
+        service = FakeWhatsApp()
+
+        summary = self._dispatch(service, batch_size=2)
+
+        self.assertEqual(summary["sent"], 4)
+        self.assertEqual(service.sent[0], "5511999999999")
+        self.assertEqual(WhatsAppOutbox.objects.filter(status=OutboxStatus.SENT).count(), 4)
+        self.assertFalse(outbox.has_ready_messages())
+
+    def test_throttle_slows_down_and_retries(self):
+        """Testa que 429 reduz a vazão e reagenda; 400 falha sem nova tentativa."""
+        throttled = message("5511000000001", priority=OutboxPriority.PAYMENT)
+        rejected = message("5511000000002")
+        service = FakeWhatsApp([
+            {"status": 429, "error": "Too Many Requests"},
+            {"status": 400, "error": "Bad Request", "response": {"message": ["número não existe"]}},
+        ])
+
+        summary = self._dispatch(service)
+
+        self.assertEqual((summary["retried"], summary["failed"], summary["throttled"]), (1, 1, 1))
+        throttled.refresh_from_db()
+        self.assertEqual((throttled.status, throttled.attempts), (OutboxStatus.PENDING, 1))
+        self.assertGreater(throttled.next_attempt_at, timezone.now())
+        rejected.refresh_from_db()
+        self.assertEqual(rejected.status, OutboxStatus.FAILED)
+        _, pacer = outbox.get_instance_pacing("inst")
+        self.assertEqual(pacer.rate, 500.0)
+
+    def test_single_dispatcher_at_a_time(self):
+        """Testa que um segundo despachante não roda em paralelo."""
+        message("5511000000001")
+        cache.add(outbox.DISPATCH_LOCK_KEY, 1, 60)
+
+        self.assertIsNone(self._dispatch(FakeWhatsApp()))
+        self.assertEqual(WhatsAppOutbox.objects.get().status, OutboxStatus.PENDING)
+
+    @override_settings(WHATSAPP_RATE_PER_SECOND=20.0, WHATSAPP_RATE_MAX=20.0, WHATSAPP_BURST=1)
+    def test_dispatch_paced_by_token_bucket(self):
+        """Testa que o envio respeita a vazão da instância."""
+        for i in range(4):
+            message(f"551100000000{i}")
+
+        started = time.perf_counter()
+        summary = self._dispatch(FakeWhatsApp())
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual(summary["sent"], 4)
+        self.assertGreaterEqual(elapsed, 0.14)
+
+    def test_throttled_instance_does_not_block_others(self):
+        """Testa que a instância sem token não segura as mensagens das outras."""
+        slow = [
+            message(f"551100000000{i}", priority=OutboxPriority.PAYMENT, instance_id="slow")
+            for i in range(3)
+        ]
+        for i in range(2):
+            message(f"551199999999{i}")
+        slow_bucket, _ = outbox.get_instance_pacing("slow")
+
+        started = time.perf_counter()
+        with patch.object(slow_bucket, "try_acquire", return_value=60.0):
+            summary = self._dispatch(FakeWhatsApp(), instances=("inst", "slow"), max_seconds=0.5)
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual(summary["sent"], 2)
+        self.assertLess(elapsed, 2)
+        for row in slow:
+            row.refresh_from_db()
+            self.assertEqual((row.status, row.attempts), (OutboxStatus.PENDING, 0))
@@ -3,6 +3,9 @@ from apps.orders.models import Order
 
 
 class OrderSerializer(serializers.ModelSerializer):
+    # Link gerado em background: clientes acompanham por link_status
+    payment_link_url = serializers.SerializerMethodField()
+
     class Meta:
         model = Order
         fields = [
@@ -11,7 +14,16 @@ class OrderSerializer(serializers.ModelSerializer):
             "value",
             "value_freight",
             "status",
+            "link_status",
+            "payment_link_url",
             "installments",
             "seller",
             "created_at",
         ]
+
+    def get_payment_link_url(self, obj):
+        # Usa o prefetch de payment_links quando a view fizer
+        payment_links = list(obj.payment_links.all())
+        if not payment_links:
+            return None
+        return max(payment_links, key=lambda link: link.created_at).url_link
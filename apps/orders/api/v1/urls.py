@@ -1,9 +1,10 @@
 from django.urls import path
-from .views import OrderListCreateAPIView, OrderDetailAPIView
+from .views import OrderListCreateAPIView, OrderDetailAPIView, OrderImportAPIView
 
 app_name = "orders_api_v1"
 
 urlpatterns = [
     path("", OrderListCreateAPIView.as_view(), name="order-list-create"),
     path("<int:pk>/", OrderDetailAPIView.as_view(), name="order-detail"),
+    path("import/", OrderImportAPIView.as_view(), name="order-import"),
 ]
@@ -3,6 +3,7 @@ from rest_framework.response import Response
 from rest_framework import status
 
 from apps.orders.services.commands import create_order, get_order
+from apps.orders.services.order_import import import_orders, parse_order_rows
 from apps.orders.services.queries import list_orders_filtered
 from .serializers import OrderSerializer
 
@@ -14,7 +15,7 @@ class OrderListCreateAPIView(APIView):
     """
 
     def get(self, request):
-        orders = list_orders_filtered(request.query_params)
+        orders = list_orders_filtered(request.query_params).prefetch_related("payment_links")
         serializer = OrderSerializer(orders, many=True)
         return Response(serializer.data)
 
@@ -39,3 +40,59 @@ class OrderDetailAPIView(APIView):
         order = get_order(pk)
         serializer = OrderSerializer(order)
         return Response(serializer.data)
+
+
+class OrderImportAPIView(APIView):
+    """
+    POST -> importa pedidos em lote (CSV ou JSONL)
+
+    Aceita:
+    - multipart com o campo "file" (formato pela extensão ou "formato")
+    - corpo cru com Content-Type text/csv ou application/x-ndjson
+
+    Os pedidos são inseridos na hora; os links são gerados em background
+    (acompanhe por link_status no detalhe do pedido).
+    """
+
+    CONTENT_TYPE_FORMATS = {
+        "text/csv": "csv",
+        "application/x-ndjson": "jsonl",
+        "application/jsonl": "jsonl",
+    }
+
+    def post(self, request):
+        try:
+            content, fmt = self._read_upload(request)
+            rows = parse_order_rows(content, fmt)
+        except (ValueError, UnicodeDecodeError) as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        result = import_orders(rows)
+
+        return Response(
+            {
+                "created": result["created"],
+                "invalid": result["invalid"],
+                "elapsed_ms": round(result["elapsed"] * 1000, 1),
+                "rows_per_second": (
+                    round(len(rows) / result["elapsed"], 1) if result["elapsed"] else None
+                ),
+                "rows": result["rows"],
+            },
+            status=status.HTTP_201_CREATED,
+        )
+
+    def _read_upload(self, request) -> tuple[str, str]:
+        content_type = (request.content_type or "").split(";")[0].strip()
+
+        if content_type == "multipart/form-data":
+            upload = request.FILES.get("file")
+            if not upload:
+                raise ValueError("Envie o arquivo no campo 'file'")
+            fmt = request.data.get("formato") or upload.name.rsplit(".", 1)[-1].lower()
+            return upload.read().decode("utf-8-sig"), fmt
+
+        fmt = self.CONTENT_TYPE_FORMATS.get(content_type)
+        if not fmt:
+            raise ValueError(f"Content-Type não suportado: {content_type or 'vazio'}")
+        return request.body.decode("utf-8-sig"), fmt
@@ -0,0 +1,54 @@
+"""
+Monta a tabela local de preços de frete (estimativas da página de frete).
+
+Uso:
+    python manage.py build_freight_table
+    python manage.py build_freight_table --path /tmp/frete.bin --workers 8
+    python manage.py build_freight_table --sample 50   # mede o erro depois
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.orders.services.freight_table import (
+    build_freight_table,
+    sample_freight_estimate_error,
+)
+
+
+class Command(BaseCommand):
+    help = "Cota as faixas de CEP/peso nos Correios e grava a tabela de preços"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", default=None, help="Arquivo (padrão: FREIGHT_TABLE_PATH)")
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Lotes simultâneos (padrão: CORREIOS_MAX_CONCURRENCY)",
+        )
+        parser.add_argument(
+            "--sample",
+            type=int,
+            default=0,
+            help="Cotações reais para medir o erro da estimativa (0 = não mede)",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        result = build_freight_table(path=options["path"], max_workers=options["workers"])
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f"Tabela {result['path']}: {result['records']} faixas, "
+            f"{result['quotes']} cotações, {result['missing']} sem resposta "
+            f"em {elapsed:.2f} s"
+        )
+
+        if options["sample"] and not options["path"]:
+            summary = sample_freight_estimate_error(options["sample"])
+            if summary:
+                self.stdout.write(
+                    f"Erro da estimativa: média {summary['mean_abs_pct']}%, "
+                    f"máximo {summary['max_abs_pct']}% ({summary['samples']} amostras)"
+                )
@@ -0,0 +1,95 @@
+"""
+Importa pedidos em lote de um arquivo CSV ou JSONL e gera os links.
+
+Campos por linha: cliente_nome, valor_produto, valor_frete, vendedor, parcelas
+
+Uso:
+    python manage.py import_orders pedidos.csv
+    python manage.py import_orders pedidos.jsonl --workers 8
+    python manage.py import_orders pedidos.csv --async   # links via Celery
+"""
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.orders.services.order_import import (
+    IMPORT_FORMATS,
+    import_orders,
+    parse_order_rows,
+)
+from apps.payments.services.commands import generate_payment_links_for_orders
+
+
+class Command(BaseCommand):
+    help = "Importa pedidos de um arquivo CSV/JSONL e gera os links de pagamento"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Arquivo CSV ou JSONL")
+        parser.add_argument(
+            "--format",
+            choices=IMPORT_FORMATS,
+            default=None,
+            help="Formato do arquivo (padrão: pela extensão)",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Chamadas simultâneas ao Pagar.me (padrão: bulkhead do Pagar.me)",
+        )
+        parser.add_argument(
+            "--async",
+            action="store_true",
+            dest="use_celery",
+            help="Enfileira a geração dos links no Celery em vez de gerar aqui",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = options["format"] or os.path.splitext(path)[1].lstrip(".").lower()
+
+        try:
+            with open(path, encoding="utf-8-sig") as source:
+                rows = parse_order_rows(source.read(), fmt)
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        result = import_orders(rows, dispatch_links=options["use_celery"])
+
+        links = {}
+        links_elapsed = 0.0
+        if result["order_ids"] and not options["use_celery"]:
+            started = time.perf_counter()
+            links = generate_payment_links_for_orders(
+                result["order_ids"], max_workers=options["workers"]
+            )
+            links_elapsed = time.perf_counter() - started
+
+        for row in result["rows"]:
+            if row["status"] == "invalid":
+                self.stdout.write(f"linha {row['line']}: inválida - {row['error']}")
+                continue
+
+            payment_link = links.get(row["order_id"])
+            if options["use_celery"]:
+                detail = "link enfileirado"
+            elif payment_link:
+                detail = payment_link.url_link
+            else:
+                detail = "falha ao gerar link"
+            self.stdout.write(f"linha {row['line']}: pedido {row['order_id']} - {detail}")
+
+        created = result["created"]
+        self.stdout.write("")
+        self.stdout.write(
+            f"Pedidos: {created} criados, {result['invalid']} inválidos "
+            f"em {result['elapsed']:.2f} s"
+            + (f" ({created / result['elapsed']:.1f} pedidos/s)" if result["elapsed"] else "")
+        )
+        if links_elapsed:
+            generated = sum(1 for link in links.values() if link)
+            self.stdout.write(
+                f"Links: {generated}/{len(links)} gerados em {links_elapsed:.2f} s "
+                f"({len(links) / links_elapsed:.1f} links/s)"
+            )
@@ -0,0 +1,89 @@
+"""
+Cota o frete de muitos destinos de uma vez (lotes dos Correios).
+
+Campos por linha: cep, weight (kg), length, width, height (cm).
+Sem peso/dimensões no arquivo, valem as opções --weight/--length/...
+
+Uso:
+    python manage.py quote_freight_batch destinos.csv
+    python manage.py quote_freight_batch destinos.jsonl --workers 8 --output cotacoes.jsonl
+    python manage.py quote_freight_batch ceps.csv --weight 0.3 --length 20 --width 15 --height 5
+"""
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.integrations.sgpweb import CorreiosAPI
+from apps.orders.services.freight_batch import quote_freight_batch
+from apps.orders.services.order_import import IMPORT_FORMATS, parse_order_rows
+
+PACKAGE_FIELDS = ("weight", "length", "width", "height")
+
+
+class Command(BaseCommand):
+    help = "Cota o frete de vários destinos em lotes nos Correios (saída JSONL)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Arquivo CSV ou JSONL com os destinos")
+        parser.add_argument(
+            "--format",
+            choices=IMPORT_FORMATS,
+            default=None,
+            help="Formato do arquivo (padrão: pela extensão)",
+        )
+        parser.add_argument(
+            "--produtos",
+            default=",".join(CorreiosAPI.PRODUTOS_DEFAULT),
+            help="Códigos dos produtos separados por vírgula",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Lotes simultâneos (padrão: CORREIOS_MAX_CONCURRENCY)",
+        )
+        parser.add_argument("--output", default=None, help="Arquivo JSONL (padrão: saída)")
+        for field in PACKAGE_FIELDS:
+            parser.add_argument(f"--{field}", default=None, help=f"{field} padrão")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = options["format"] or os.path.splitext(path)[1].lstrip(".").lower()
+
+        try:
+            with open(path, encoding="utf-8-sig") as source:
+                destinations = parse_order_rows(source.read(), fmt)
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        defaults = {field: options[field] for field in PACKAGE_FIELDS if options[field]}
+        destinations = [
+            {**defaults, **{k: v for k, v in row.items() if v not in (None, "")}}
+            for row in destinations
+        ]
+        produtos = [code.strip() for code in options["produtos"].split(",") if code.strip()]
+
+        output = open(options["output"], "w", encoding="utf-8") if options["output"] else self.stdout
+        stats = {}
+        quoted = errors = 0
+        started = time.perf_counter()
+        try:
+            for row in quote_freight_batch(
+                destinations, produtos=produtos, max_workers=options["workers"], stats=stats
+            ):
+                output.write(json.dumps(row, ensure_ascii=False) + "\n")
+                if row["error"]:
+                    errors += 1
+                else:
+                    quoted += 1
+        finally:
+            if options["output"]:
+                output.close()
+        elapsed = time.perf_counter() - started
+
+        self.stderr.write(
+            f"Cotações: {quoted} ok, {errors} com erro em {elapsed:.2f} s "
+            f"({stats.get('requests', 0)} requisições, {stats.get('unique', 0)} únicas)"
+        )
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:33
+
+from django.db import migrations, models
+
+
+def set_existing_link_status(apps, schema_editor):
+    """Pedidos anteriores à geração assíncrona: pronto se tem link, senão falhou."""
+    Order = apps.get_model('orders', 'Order')
+    PaymentLink = apps.get_model('payments', 'PaymentLink')
+
+    with_link = PaymentLink.objects.values('order_id')
+    Order.objects.filter(pk__in=with_link).update(link_status='ready')
+    Order.objects.exclude(pk__in=with_link).update(link_status='failed')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_alter_order_installments_alter_order_status_and_more'),
+        ('payments', '0008_paymentlink_id_link_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='link_status',
+            field=models.CharField(choices=[('generating', 'Gerando link'), ('ready', 'Link pronto'), ('failed', 'Falha ao gerar link')], default='generating', help_text='Status da geração do link de pagamento', max_length=20, verbose_name='Status do link'),
+        ),
+        migrations.RunPython(set_existing_link_status, migrations.RunPython.noop),
+    ]
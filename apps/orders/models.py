@@ -14,6 +14,13 @@ STATUS_CHOICES = (
     ('canceled', 'Cancelado'),
 )
 
+# Geração do link de pagamento (assíncrona, via Celery)
+LINK_STATUS_CHOICES = (
+    ('generating', 'Gerando link'),
+    ('ready', 'Link pronto'),
+    ('failed', 'Falha ao gerar link'),
+)
+
 
 class Order(BaseModel):
     name = models.CharField(
@@ -54,6 +61,14 @@ class Order(BaseModel):
         db_index=True  # Índice para melhor performance em queries
     )
     
+    link_status = models.CharField(
+        max_length=20,
+        choices=LINK_STATUS_CHOICES,
+        default='generating',
+        verbose_name='Status do link',
+        help_text='Status da geração do link de pagamento'
+    )
+
     installments = models.IntegerField(
         default=1,
         verbose_name='Parcelas',
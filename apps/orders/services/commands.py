@@ -1,10 +1,16 @@
+import logging
+
+from django.db import transaction
 from django.shortcuts import get_object_or_404
 
+from apps.core import task_spool
 from apps.orders.models import Order
 from apps.orders.domain.rules import build_order
 from apps.orders.utils import formatar_valor
 from apps.sellers.services.queries import get_seller
 
+logger = logging.getLogger("orders")
+
 
 def create_order(data: dict) -> Order:
     """
@@ -12,6 +18,9 @@ def create_order(data: dict) -> Order:
     
     A lógica de formatação de valores e cálculo do total foi movida
     do model.save() para este service (seguindo padrão DDD).
+
+    O link de pagamento é gerado de forma assíncrona: o pedido nasce com
+    link_status="generating" e a task é disparada no commit.
     """
     # Formatar valores
     value = formatar_valor(data.get("valor_produto", "0"))
@@ -32,7 +41,24 @@ def create_order(data: dict) -> Order:
     # Adicionar total calculado
     order_data['total'] = total
 
-    return Order.objects.create(**order_data)
+    order = Order.objects.create(**order_data)
+    transaction.on_commit(lambda: _dispatch_payment_link_generation(order.pk))
+    return order
+
+
+def _dispatch_payment_link_generation(order_id: int):
+    """
+    Enfileira a geração do link (Pagar.me + WhatsApp) no Celery.
+
+    Broker fora do ar não derruba a criação do pedido: a task vai para o
+    spool e é publicada quando o broker volta.
+    """
+    from apps.payments.tasks import generate_payment_link_task
+
+    try:
+        task_spool.delay(generate_payment_link_task, order_id)
+    except Exception:
+        logger.exception(f"Falha ao enfileirar geração do link do pedido {order_id}")
 
 
 def update_order(order_id: int, data: dict) -> Order:
@@ -0,0 +1,107 @@
+"""
+Cotação de frete em lote (ex.: CEPs dos clientes de uma campanha).
+
+Cada destino usa os mesmos campos do formulário de frete:
+    cep, weight (kg), length, width, height (cm)
+
+Fluxo:
+- Normaliza com build_freight_params (com FREIGHT_QUOTE_AT_BAND_LIMIT,
+  as mesmas faixas do cache de cotações, o que também aumenta os
+  duplicados)
+- Uma requisição por destino × produto; CorreiosAPI.calcular_lotes tira
+  os duplicados, agrupa em lotes e consulta os lotes em paralelo
+- Resultados saem à medida que os lotes terminam (streaming)
+
+Milhares de cotações viram algumas dezenas de chamadas.
+"""
+from typing import Iterable, Iterator
+
+from apps.core.integrations.sgpweb import CorreiosAPI
+from apps.orders.services.freight_calculator import ORIGIN_CEP, build_freight_params
+
+SERVICE_NAMES = {"03220": "sedex", "03298": "pac"}
+
+
+def _to_float(valor: str) -> float:
+    """Raises: ValueError/TypeError se o valor não é número."""
+    if valor is None:
+        raise TypeError("valor ausente")
+    return float(str(valor).replace(",", "."))
+
+
+def quote_freight_batch(
+    destinations: Iterable[dict],
+    *,
+    produtos: list[str] | None = None,
+    max_workers: int | None = None,
+    stats: dict | None = None,
+) -> Iterator[dict]:
+    """
+    Cota todos os destinos e gera uma linha por destino × produto.
+
+    Linhas:
+        {"line", "cep", "produto", "servico", "preco", "prazo", "error"}
+
+    Destinos inválidos saem primeiro, com "error"; os demais saem na
+    ordem em que os lotes terminam. Se stats for passado, recebe
+    "requests" (destino × produto) e "unique" (consultas de fato).
+    """
+    api = CorreiosAPI()
+    produtos = produtos or CorreiosAPI.PRODUTOS_DEFAULT
+
+    # chave da requisição → [(linha, cep, produto)]
+    waiting: dict[tuple, list[tuple[int, str, str]]] = {}
+    items = []
+    for line, data in enumerate(destinations, start=1):
+        try:
+            params = build_freight_params(data)
+        except (TypeError, ValueError):
+            yield {
+                "line": line, "cep": data.get("cep"), "produto": None, "servico": None,
+                "preco": None, "prazo": None, "error": "Destino inválido",
+            }
+            continue
+
+        for produto in produtos:
+            item = {
+                "coProduto": produto,
+                "cepOrigem": ORIGIN_CEP,
+                "cepDestino": params["cep_destino"],
+                "psObjeto": params["peso"],
+                "comprimento": params["comprimento"],
+                "largura": params["largura"],
+                "altura": params["altura"],
+                "nuFormato": 1,
+            }
+            items.append(item)
+            waiting.setdefault(api.chave_lote(item), []).append(
+                (line, params["cep_destino"], produto)
+            )
+
+    if stats is not None:
+        stats["requests"] = len(items)
+        stats["unique"] = len(waiting)
+
+    for key, preco, prazo in api.calcular_lotes(items, max_workers=max_workers):
+        error, price = None, None
+        if not preco:
+            error = "Sem resposta dos Correios"
+        elif preco.get("txErro"):
+            error = preco["txErro"]
+        else:
+            # Item malformado vira erro da linha, sem derrubar o resto do lote
+            try:
+                price = _to_float(preco.get("pcFinal"))
+            except (TypeError, ValueError):
+                error = "Resposta dos Correios sem preço"
+
+        for line, cep, produto in waiting.get(key, []):
+            yield {
+                "line": line,
+                "cep": cep,
+                "produto": produto,
+                "servico": SERVICE_NAMES.get(produto, produto),
+                "preco": price,
+                "prazo": int(prazo["prazoEntrega"]) if prazo and prazo.get("prazoEntrega") else None,
+                "error": error,
+            }
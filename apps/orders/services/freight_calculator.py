@@ -1,38 +1,244 @@
+"""
+Cálculo de frete (Correios) com cache de cotações.
+
+Vendedores cotam as mesmas regiões e tamanhos de pacote o dia inteiro,
+então a cotação é guardada no cache por:
+
+- origem
+- prefixo do CEP de destino (FREIGHT_CACHE_CEP_PREFIX dígitos)
+- peso e dimensões cotados
+- códigos dos produtos (SEDEX / PAC)
+
+A chave usa exatamente o peso e as dimensões enviados aos Correios: um
+pacote mais pesado nunca recebe a cotação guardada de um mais leve. Com
+FREIGHT_QUOTE_AT_BAND_LIMIT (desligado por padrão), peso e dimensões
+são arredondados PARA CIMA até o limite da faixa
+(FREIGHT_WEIGHT_BAND_GRAMS / FREIGHT_DIMENSION_BAND_CM) antes de cotar:
+pacotes da mesma faixa compartilham a chave, sem subestimar o frete,
+mas todo pacote paga pelo limite.
+
+Validade:
+- até FREIGHT_CACHE_TTL: resposta direto do cache
+- até FREIGHT_CACHE_TTL + FREIGHT_CACHE_STALE_TTL: responde o valor
+  antigo e atualiza em segundo plano (Celery), uma atualização por chave
+- depois disso: nova cotação nos Correios
+
+Métricas (hit / stale / miss) por processo: get_freight_cache_metrics().
+
+Modo estimativa (estimate=True): responde pela tabela local de preços
+(freight_table), sem chamar os Correios; fora da tabela, segue o fluxo
+normal acima.
+"""
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
 from apps.core.integrations.sgpweb import CorreiosAPI
 
+logger = logging.getLogger("orders")
+
+ORIGIN_CEP = "30170903"
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+# ============================
+# Parâmetros e chave do cache
+# ============================
+def _band(value: float, size: float) -> int:
+    """Arredonda para cima até o limite da faixa (mínimo: uma faixa)."""
+    return int(max(1, math.ceil(value / size)) * size)
 
-def calcular_frete_from_request(data: dict) -> dict:
-    payload = {
-        "cep_destino": data.get("cep", "").replace("-", ""),
-        "peso": float(data.get("weight")) * 1000,
+
+def build_freight_params(data: dict) -> dict:
+    """
+    Normaliza os dados do formulário (peso em gramas, dimensões em cm).
+
+    Com FREIGHT_QUOTE_AT_BAND_LIMIT, aplica as faixas de peso/dimensões.
+
+    Raises:
+        TypeError/ValueError: campos ausentes ou inválidos
+    """
+    params = {
+        "cep_destino": data.get("cep", "").replace("-", "").strip(),
+        "peso": round(float(data.get("weight")) * 1000),
         "comprimento": int(data.get("length")),
         "largura": int(data.get("width")),
         "altura": int(data.get("height")),
     }
+    if _setting("FREIGHT_QUOTE_AT_BAND_LIMIT", False):
+        params = _banded(params)
+    return params
+
+
+def _banded(params: dict) -> dict:
+    """Peso e dimensões no limite superior das faixas."""
+    weight_band = _setting("FREIGHT_WEIGHT_BAND_GRAMS", 500)
+    dimension_band = _setting("FREIGHT_DIMENSION_BAND_CM", 5)
+    return {
+        **params,
+        "peso": _band(params["peso"], weight_band),
+        "comprimento": _band(params["comprimento"], dimension_band),
+        "largura": _band(params["largura"], dimension_band),
+        "altura": _band(params["altura"], dimension_band),
+    }
+
+
+def freight_cache_key(params: dict, produtos: list[str] | None = None) -> str:
+    prefix = params["cep_destino"][:_setting("FREIGHT_CACHE_CEP_PREFIX", 5)]
+    produtos = ",".join(sorted(produtos or CorreiosAPI.PRODUTOS_DEFAULT))
+    return (
+        f"freight:{ORIGIN_CEP}:{prefix}:{params['peso']}:"
+        f"{params['comprimento']}x{params['largura']}x{params['altura']}:{produtos}"
+    )
+
+
+# ============================
+# Métricas por processo
+# ============================
+_metrics = {"hits": 0, "stale": 0, "misses": 0, "refreshes": 0, "estimates": 0}
+_metrics_lock = threading.Lock()
+
+
+def _record(event: str):
+    with _metrics_lock:
+        _metrics[event] += 1
 
+
+def get_freight_cache_metrics() -> dict:
+    """{hits, stale, misses, refreshes, estimates, hit_rate} deste processo."""
+    with _metrics_lock:
+        lookups = _metrics["hits"] + _metrics["stale"] + _metrics["misses"]
+        served = _metrics["hits"] + _metrics["stale"]
+        return {**_metrics, "hit_rate": served / lookups if lookups else 0.0}
+
+
+def reset_freight_cache_metrics():
+    with _metrics_lock:
+        for key in _metrics:
+            _metrics[key] = 0
+
+
+# ============================
+# Cotação
+# ============================
+def quote_freight(params: dict) -> tuple[dict, bool]:
+    """
+    Cota nos Correios (preço e prazo em paralelo) e extrai SEDEX / PAC.
+
+    Returns:
+        (frete, completo). Incompleto = alguma consulta não respondeu a
+        tempo: o serviço sem preço fica de fora e o sem prazo vem com
+        "prazo": None. Cotação incompleta não vai para o cache.
+    """
     api = CorreiosAPI()
-    resultado = api.calcular(cep_origem="30170903", **payload)
+    resultado = api.calcular(cep_origem=ORIGIN_CEP, **params)
 
-    def ok(servico):
-        return servico and "txErro" not in servico.get("preco", {})
+    def ok(preco):
+        return bool(preco) and not preco.get("txErro")
 
     def to_float(valor):
         return float(valor.replace(",", "."))
 
-    freight = {}
+    complete = all(
+        servico and servico.get("preco") is not None and servico.get("prazo") is not None
+        for servico in resultado.values()
+    )
 
-    if ok(resultado.get("03220")):
-        s = resultado["03220"]
-        freight["sedex"] = {
-            "preco": to_float(s["preco"]["pcFinal"]),
-            "prazo": int(s["prazo"]["prazoEntrega"]),
+    freight = {}
+    for code, name in (("03220", "sedex"), ("03298", "pac")):
+        servico = resultado.get(code) or {}
+        if not ok(servico.get("preco")):
+            continue
+        prazo = servico.get("prazo")
+        freight[name] = {
+            "preco": to_float(servico["preco"]["pcFinal"]),
+            "prazo": int(prazo["prazoEntrega"]) if prazo and prazo.get("prazoEntrega") else None,
         }
 
-    if ok(resultado.get("03298")):
-        p = resultado["03298"]
-        freight["pac"] = {
-            "preco": to_float(p["preco"]["pcFinal"]),
-            "prazo": int(p["prazo"]["prazoEntrega"]),
-        }
+    return freight, complete
+
+
+def _store(key: str, freight: dict, complete: bool):
+    """Guarda a cotação (vazia ou incompleta não é guardada)."""
+    if not freight or not complete:
+        return
+    timeout = _setting("FREIGHT_CACHE_TTL", 6 * 60 * 60) + _setting(
+        "FREIGHT_CACHE_STALE_TTL", 24 * 60 * 60
+    )
+    cache.set(key, {"freight": freight, "fetched_at": time.time()}, timeout)
+
+
+def refresh_freight_quote(params: dict) -> dict:
+    """Cota de novo e atualiza o cache (usada pela task de atualização)."""
+    key = freight_cache_key(params)
+    try:
+        freight, complete = quote_freight(params)
+        _store(key, freight, complete)
+        _record("refreshes")
+        return freight
+    finally:
+        cache.delete(f"{key}:refreshing")
+
+
+def _schedule_refresh(key: str, params: dict):
+    """Uma atualização em segundo plano por chave (cache.add como trava)."""
+    if not cache.add(f"{key}:refreshing", 1, 60):
+        return
+
+    try:
+        from apps.orders.tasks import refresh_freight_quote_task
+        refresh_freight_quote_task.delay(params)
+    except Exception as e:
+        cache.delete(f"{key}:refreshing")
+        logger.warning(f"[Frete] Falha ao agendar atualização da cotação: {e}")
+
+
+def calcular_frete_from_request(
+    data: dict, *, use_cache: bool = True, estimate: bool = False
+) -> dict:
+    """
+    Cotação de frete do formulário.
+
+    estimate=True: usa a tabela local de preços quando ela cobre o
+    destino/peso (estimativa, sem chamar os Correios).
+
+    Returns:
+        {"sedex": {"preco", "prazo"}, "pac": {"preco", "prazo"}}
+        (serviços com erro ou sem resposta a tempo ficam de fora;
+        prazo None quando só o preço respondeu)
+    """
+    params = build_freight_params(data)
+    if estimate:
+        from apps.orders.services.freight_table import estimate_freight
+
+        freight = estimate_freight(params)
+        if freight:
+            _record("estimates")
+            return freight
+
+    if not use_cache:
+        return quote_freight(params)[0]
+
+    key = freight_cache_key(params)
+    cached = cache.get(key)
+
+    if cached:
+        age = time.time() - cached["fetched_at"]
+        if age <= _setting("FREIGHT_CACHE_TTL", 6 * 60 * 60):
+            _record("hits")
+        else:
+            _record("stale")
+            _schedule_refresh(key, params)
+        return cached["freight"]
 
+    _record("misses")
+    freight, complete = quote_freight(params)
+    _store(key, freight, complete)
     return freight
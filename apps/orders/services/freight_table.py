@@ -0,0 +1,396 @@
+"""
+Tabela local de preços de frete (estimativa sem chamar os Correios).
+
+Arquivo binário, lido por mmap:
+
+    cabeçalho: magic "BPFT", versão, registros, gerada em (epoch)
+    registros (ordenados por cep_inicio, peso):
+        cep_inicio, cep_fim, peso (g),
+        sedex (centavos), sedex (dias), pac (centavos), pac (dias)
+
+Consulta O(log n) com duas buscas binárias direto no mmap: a faixa de
+CEP que contém o destino e, dentro dela, a menor faixa de peso que cobre
+o pacote. Nada é carregado para a memória do processo; todos os workers
+compartilham as páginas do arquivo.
+
+Peso considerado: o maior entre o real e o cubado (C × L × A / 6000),
+como os Correios cobram.
+
+Construção: build_freight_table() cota um CEP de referência de cada
+faixa em cada faixa de peso, usando a cotação em lote (calcular_lotes).
+O arquivo novo é gravado ao lado e trocado com os.replace, então quem
+está lendo nunca vê um arquivo pela metade.
+
+Erro da estimativa: sample_freight_estimate_error() compara estimativas
+com cotações reais em pontos sorteados e guarda o resumo no cache.
+"""
+import bisect
+import logging
+import math
+import mmap
+import os
+import random
+import struct
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from apps.core.integrations.sgpweb import CorreiosAPI
+from apps.orders.services.freight_calculator import ORIGIN_CEP
+
+logger = logging.getLogger("orders")
+
+MAGIC = b"BPFT"
+VERSION = 1
+HEADER = struct.Struct("<4sHIQ")
+RECORD = struct.Struct("<IIIIHIH")
+
+# Serviço sem preço na faixa
+NO_PRICE = 0xFFFFFFFF
+
+SERVICES = (("03220", "sedex"), ("03298", "pac"))
+
+# Pacote usado na construção: dimensões mínimas, para o preço depender só
+# do peso (o peso cubado entra na consulta)
+REFERENCE_DIMENSIONS = {"comprimento": 16, "largura": 11, "altura": 2}
+
+CUBIC_DIVISOR = 6000
+
+ESTIMATE_ERROR_KEY = "freight:estimate:error"
+
+# Faixas de CEP por UF: (início, fim, CEP de referência — capital)
+CEP_RANGES = [
+    (1000000, 19999999, "01310100"),   # SP
+    (20000000, 28999999, "20040002"),  # RJ
+    (29000000, 29999999, "29010000"),  # ES
+    (30000000, 39999999, "30140071"),  # MG
+    (40000000, 48999999, "40010000"),  # BA
+    (49000000, 49999999, "49010000"),  # SE
+    (50000000, 56999999, "50010000"),  # PE
+    (57000000, 57999999, "57020000"),  # AL
+    (58000000, 58999999, "58010000"),  # PB
+    (59000000, 59999999, "59010000"),  # RN
+    (60000000, 63999999, "60010000"),  # CE
+    (64000000, 64999999, "64000000"),  # PI
+    (65000000, 65999999, "65010000"),  # MA
+    (66000000, 68899999, "66010000"),  # PA
+    (68900000, 68999999, "68900000"),  # AP
+    (69000000, 69299999, "69010000"),  # AM
+    (69300000, 69399999, "69301000"),  # RR
+    (69400000, 69899999, "69010000"),  # AM
+    (69900000, 69999999, "69900000"),  # AC
+    (70000000, 72799999, "70040000"),  # DF
+    (72800000, 72999999, "74000000"),  # GO
+    (73000000, 73699999, "70040000"),  # DF
+    (73700000, 76799999, "74000000"),  # GO
+    (76800000, 76999999, "76800000"),  # RO
+    (77000000, 77999999, "77000000"),  # TO
+    (78000000, 78899999, "78000000"),  # MT
+    (79000000, 79999999, "79000000"),  # MS
+    (80000000, 87999999, "80010000"),  # PR
+    (88000000, 89999999, "88010000"),  # SC
+    (90000000, 99999999, "90010000"),  # RS
+]
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+def _table_path() -> str:
+    return str(_setting("FREIGHT_TABLE_PATH", "freight_table.bin"))
+
+
+# ============================
+# Leitura
+# ============================
+class FreightTable:
+    """Tabela aberta por mmap (somente leitura)."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as source:
+            self._mmap = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, count, built_at = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            self._mmap.close()
+            raise ValueError(f"Tabela de frete inválida: {path}")
+        if len(self._mmap) < HEADER.size + count * RECORD.size:
+            self._mmap.close()
+            raise ValueError(f"Tabela de frete truncada: {path}")
+
+        self.count = count
+        self.built_at = built_at
+
+    def close(self):
+        self._mmap.close()
+
+    @property
+    def closed(self) -> bool:
+        return self._mmap.closed
+
+    def _record(self, index: int) -> tuple:
+        return RECORD.unpack_from(self._mmap, HEADER.size + index * RECORD.size)
+
+    def lookup(self, cep: int, weight_grams: int) -> tuple | None:
+        """Registro da faixa de CEP/peso do pacote, ou None fora da tabela."""
+        keys = _Keys(self)
+
+        # Última faixa com cep_inicio <= cep
+        index = bisect.bisect_right(keys, (cep, NO_PRICE)) - 1
+        if index < 0:
+            return None
+        cep_start, cep_end = self._record(index)[:2]
+        if cep > cep_end:
+            return None
+
+        # Menor peso >= pacote dentro da faixa
+        index = bisect.bisect_left(keys, (cep_start, weight_grams))
+        if index >= self.count:
+            return None
+        record = self._record(index)
+        if record[0] != cep_start:
+            return None
+        return record
+
+
+class _Keys:
+    """Visão (cep_inicio, peso) dos registros, para o bisect."""
+
+    def __init__(self, table: FreightTable):
+        self.table = table
+
+    def __len__(self):
+        return self.table.count
+
+    def __getitem__(self, index):
+        record = self.table._record(index)
+        return record[0], record[2]
+
+
+_table: FreightTable | None = None
+_table_stamp = None
+# Tabela anterior: ainda pode ter leitores, é fechada na troca seguinte
+_retired_table: FreightTable | None = None
+_table_lock = threading.Lock()
+
+
+def get_freight_table() -> FreightTable | None:
+    """
+    Tabela do processo, reaberta quando o arquivo é trocado.
+
+    None se o arquivo não existe ou é inválido.
+    """
+    global _table, _table_stamp, _retired_table
+    path = _table_path()
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    stamp = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    with _table_lock:
+        if _table is None or _table_stamp != stamp:
+            try:
+                table = FreightTable(path)
+            except (OSError, ValueError) as e:
+                logger.error(f"[Frete] Falha ao abrir a tabela de frete: {e}")
+                return None
+            # O mmap antigo fica com quem ainda está lendo (uma consulta é
+            # rápida e a troca é rara); o de duas trocas atrás é fechado
+            if _retired_table is not None:
+                _retired_table.close()
+            _retired_table = _table
+            _table, _table_stamp = table, stamp
+        return _table
+
+
+# ============================
+# Estimativa
+# ============================
+def package_weight(params: dict) -> int:
+    """Peso cobrado (g): o maior entre o real e o cubado."""
+    cubic = params["comprimento"] * params["largura"] * params["altura"] / CUBIC_DIVISOR
+    return max(int(params["peso"]), math.ceil(cubic * 1000))
+
+
+def estimate_freight(params: dict) -> dict | None:
+    """
+    Estimativa pela tabela local (params de build_freight_params).
+
+    Returns:
+        {"sedex": {"preco", "prazo"}, "pac": {...}} ou None quando não há
+        tabela ou o destino/peso está fora dela.
+    """
+    table = get_freight_table()
+    cep = params["cep_destino"]
+    if table is None or not cep.isdigit():
+        return None
+
+    record = table.lookup(int(cep), package_weight(params))
+    if record is None:
+        return None
+
+    freight = {}
+    for (_, name), (cents, days) in zip(SERVICES, (record[3:5], record[5:7])):
+        if cents != NO_PRICE:
+            freight[name] = {"preco": cents / 100, "prazo": days or None}
+    return freight or None
+
+
+# ============================
+# Construção
+# ============================
+def _weights() -> list[int]:
+    return sorted(_setting(
+        "FREIGHT_TABLE_WEIGHTS_GRAMS", [300, 500, 1000, 2000, 3000, 5000, 10000, 20000, 30000]
+    ))
+
+
+def _price_item(produto: str, cep: str, weight: int) -> dict:
+    return {
+        "coProduto": produto,
+        "cepOrigem": ORIGIN_CEP,
+        "cepDestino": cep,
+        "psObjeto": weight,
+        **REFERENCE_DIMENSIONS,
+        "nuFormato": 1,
+    }
+
+
+def build_freight_table(
+    *,
+    path: str | None = None,
+    ranges: list[tuple] | None = None,
+    weights: list[int] | None = None,
+    max_workers: int | None = None,
+) -> dict:
+    """
+    Cota todas as faixas nos Correios e grava uma tabela nova.
+
+    Faixas sem nenhum preço ficam de fora (a estimativa cai na cotação
+    real). Se nada for cotado, a tabela atual é mantida.
+
+    Returns:
+        {"records", "quotes", "missing", "path"}
+    """
+    path = path or _table_path()
+    ranges = sorted(ranges or CEP_RANGES)
+    weights = sorted(weights or _weights())
+
+    api = CorreiosAPI()
+    items = [
+        _price_item(produto, sample, weight)
+        for _, _, sample in ranges
+        for weight in weights
+        for produto, _ in SERVICES
+    ]
+    quotes = {}
+    for key, preco, prazo in api.calcular_lotes(items, max_workers=max_workers):
+        if preco and not preco.get("txErro") and preco.get("pcFinal"):
+            cents = round(float(str(preco["pcFinal"]).replace(",", ".")) * 100)
+            days = int(prazo["prazoEntrega"]) if prazo and prazo.get("prazoEntrega") else 0
+            quotes[key] = (cents, days)
+
+    records = []
+    missing = 0
+    for cep_start, cep_end, sample in ranges:
+        for weight in weights:
+            prices = []
+            for produto, _ in SERVICES:
+                quote = quotes.get(api.chave_lote(_price_item(produto, sample, weight)))
+                if quote is None:
+                    missing += 1
+                prices.extend(quote or (NO_PRICE, 0))
+            if any(price != NO_PRICE for price in prices[::2]):
+                records.append((cep_start, cep_end, weight, *prices))
+
+    if records:
+        _write_table(path, records)
+    else:
+        logger.error("[Frete] Nenhuma cotação para montar a tabela; mantendo a atual")
+
+    return {"records": len(records), "quotes": len(quotes), "missing": missing, "path": path}
+
+
+def _write_table(path: str, records: list[tuple]):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as target:
+        target.write(HEADER.pack(MAGIC, VERSION, len(records), int(time.time())))
+        for record in sorted(records):
+            target.write(RECORD.pack(*record))
+        target.flush()
+        os.fsync(target.fileno())
+    os.replace(tmp_path, path)
+
+
+# ============================
+# Erro da estimativa
+# ============================
+def sample_freight_estimate_error(samples: int = 20, *, rng: random.Random | None = None) -> dict | None:
+    """
+    Compara estimativas com cotações reais em pontos sorteados.
+
+    Sorteia faixa de CEP, CEP dentro da faixa e peso; cota os pontos em
+    lote nos Correios e mede o erro relativo do preço por serviço.
+
+    Returns:
+        {"samples", "mean_abs_pct", "max_abs_pct", "measured_at"} (também
+        guardado no cache em ESTIMATE_ERROR_KEY), ou None sem tabela.
+    """
+    if get_freight_table() is None:
+        return None
+
+    rng = rng or random.Random()
+    max_weight = _weights()[-1]
+    points = []
+    for _ in range(samples):
+        cep_start, cep_end, _ = rng.choice(CEP_RANGES)
+        params = {
+            "cep_destino": f"{rng.randint(cep_start, cep_end):08d}",
+            "peso": rng.randint(100, max_weight),
+            **REFERENCE_DIMENSIONS,
+        }
+        estimate = estimate_freight(params)
+        if estimate:
+            points.append((params, estimate))
+
+    api = CorreiosAPI()
+    items = {
+        api.chave_lote(_price_item(produto, params["cep_destino"], params["peso"])): (estimate, name)
+        for params, estimate in points
+        for produto, name in SERVICES
+    }
+    errors = []
+    for key, preco, _ in api.calcular_lotes(list(map(_item_from_key, items))):
+        estimate, name = items[key]
+        if name not in estimate or not preco or preco.get("txErro") or not preco.get("pcFinal"):
+            continue
+        real = float(str(preco["pcFinal"]).replace(",", "."))
+        if real:
+            errors.append(abs(estimate[name]["preco"] - real) / real)
+
+    summary = {
+        "samples": len(errors),
+        "mean_abs_pct": round(100 * sum(errors) / len(errors), 2) if errors else None,
+        "max_abs_pct": round(100 * max(errors), 2) if errors else None,
+        "measured_at": int(time.time()),
+    }
+    cache.set(ESTIMATE_ERROR_KEY, summary, None)
+    logger.info(f"[Frete] Erro da estimativa: {summary}")
+    return summary
+
+
+def _item_from_key(key: tuple) -> dict:
+    return dict(zip(CorreiosAPI.CAMPOS_PRECO, key))
+
+
+def get_freight_estimate_error() -> dict | None:
+    """Último resumo de erro da estimativa (de qualquer processo)."""
+    return cache.get(ESTIMATE_ERROR_KEY)
@@ -0,0 +1,161 @@
+"""
+Importação de pedidos em lote (CSV ou JSONL).
+
+Cada linha usa os mesmos campos do formulário de pedido:
+    cliente_nome, valor_produto, valor_frete, vendedor, parcelas
+
+Fluxo:
+- Valida as linhas com build_order (vendedores buscados numa consulta)
+- Insere os pedidos válidos com bulk_create
+- Links de pagamento: gerados por generate_payment_links_for_orders
+  (chamadas concorrentes ao Pagar.me + bulk_create dos PaymentLinks),
+  na hora ou via Celery
+"""
+import csv
+import io
+import json
+import time
+
+from django.db import transaction
+
+from apps.core import task_spool
+from apps.orders.domain.rules import build_order
+from apps.orders.models import Order
+from apps.orders.utils import formatar_valor
+from apps.sellers.models import Seller
+
+IMPORT_FORMATS = ("csv", "jsonl")
+
+# Pedidos por task de geração de links
+LINK_BATCH_SIZE = 50
+
+
+def parse_order_rows(content: str, fmt: str) -> list[dict]:
+    """
+    Converte o conteúdo do arquivo em uma lista de dicts (uma por linha).
+
+    Raises:
+        ValueError: formato desconhecido, JSON inválido ou linha que não é objeto
+    """
+    if fmt == "csv":
+        return [dict(row) for row in csv.DictReader(io.StringIO(content))]
+
+    if fmt == "jsonl":
+        rows = []
+        for number, line in enumerate(content.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Linha {number}: JSON inválido ({e})")
+            if not isinstance(row, dict):
+                raise ValueError(f"Linha {number}: esperado um objeto JSON")
+            rows.append(row)
+        return rows
+
+    raise ValueError(f"Formato inválido: {fmt} (use {', '.join(IMPORT_FORMATS)})")
+
+
+def _build_row(data: dict, sellers: dict) -> dict:
+    """Valida uma linha e retorna os campos do pedido (ValueError se inválida)."""
+    seller = sellers.get(str(data.get("vendedor", "")).strip())
+    if not seller:
+        raise ValueError("Vendedor não encontrado")
+
+    try:
+        if isinstance(data.get("parcelas"), bool):
+            raise ValueError
+        installments = int(data.get("parcelas") or 1)
+    except (TypeError, ValueError):
+        raise ValueError("Parcelas inválidas")
+
+    # JSONL aceita qualquer tipo: nome precisa ser texto, valores viram texto
+    name = data.get("cliente_nome") or ""
+    if not isinstance(name, str):
+        raise ValueError("Nome do cliente inválido")
+    for field in ("valor_produto", "valor_frete"):
+        if isinstance(data.get(field), (bool, dict, list)):
+            raise ValueError(f"Valor inválido em {field}")
+
+    value = formatar_valor(data.get("valor_produto", "0"))
+    freight = formatar_valor(data.get("valor_frete", "0"))
+
+    order_data = build_order(
+        name=name,
+        value=value,
+        freight=freight,
+        installments=installments,
+        seller=seller,
+    )
+    order_data["total"] = value + freight
+    return order_data
+
+
+def import_orders(rows: list[dict], *, dispatch_links: bool = True) -> dict:
+    """
+    Valida e insere os pedidos em lote.
+
+    Args:
+        rows: Linhas já convertidas (parse_order_rows)
+        dispatch_links: Enfileira a geração dos links no Celery (no commit).
+            Com False, o chamador gera os links (ex.: management command).
+
+    Returns:
+        {
+            "rows": [{"line", "status": "created"|"invalid", "order_id", "error"}],
+            "created": int,
+            "invalid": int,
+            "order_ids": [int],
+            "elapsed": float (s),
+        }
+    """
+    started = time.perf_counter()
+
+    seller_ids = {str(row.get("vendedor", "")).strip() for row in rows}
+    sellers = {
+        str(seller.pk): seller
+        for seller in Seller.objects.filter(
+            pk__in=[pk for pk in seller_ids if pk.isdigit()]
+        )
+    }
+
+    results = []
+    orders = []
+    for line, data in enumerate(rows, start=1):
+        try:
+            order_data = _build_row(data, sellers)
+        except ValueError as e:
+            results.append({"line": line, "status": "invalid", "order_id": None, "error": str(e)})
+            continue
+
+        orders.append(Order(**order_data, link_status="generating"))
+        results.append({"line": line, "status": "created", "order_id": None, "error": None})
+
+    with transaction.atomic():
+        orders = Order.objects.bulk_create(orders, batch_size=500)
+        order_ids = [order.pk for order in orders]
+
+        if dispatch_links and order_ids:
+            transaction.on_commit(lambda: _dispatch_link_batches(order_ids))
+
+    created = iter(order_ids)
+    for result in results:
+        if result["status"] == "created":
+            result["order_id"] = next(created)
+
+    return {
+        "rows": results,
+        "created": len(order_ids),
+        "invalid": len(results) - len(order_ids),
+        "order_ids": order_ids,
+        "elapsed": time.perf_counter() - started,
+    }
+
+
+def _dispatch_link_batches(order_ids: list[int]):
+    """Enfileira a geração dos links em lotes de LINK_BATCH_SIZE pedidos."""
+    from apps.payments.tasks import generate_payment_links_batch_task
+
+    for start in range(0, len(order_ids), LINK_BATCH_SIZE):
+        task_spool.delay(generate_payment_links_batch_task, order_ids[start:start + LINK_BATCH_SIZE])
@@ -0,0 +1,17 @@
+"""
+Estado do frete, para o endpoint de monitoramento (apps/core/api/v1).
+"""
+
+from apps.orders.services.freight_calculator import get_freight_cache_metrics
+from apps.orders.services.freight_table import get_freight_estimate_error
+
+
+def status() -> dict:
+    """
+    - freight_cache: acertos / valores antigos / faltas do cache de frete
+    - freight_estimate: erro da última amostragem da tabela de preços
+    """
+    return {
+        "freight_cache": get_freight_cache_metrics(),
+        "freight_estimate": get_freight_estimate_error(),
+    }
@@ -0,0 +1,46 @@
+# apps/orders/tasks.py
+"""
+Tasks Celery do domínio de Pedidos.
+
+- refresh_freight_quote_task: atualiza em segundo plano uma cotação de
+  frete vencida (stale-while-revalidate do cache de frete)
+- rebuild_freight_table_task: remonta a tabela local de preços (diária)
+- sample_freight_estimate_error_task: mede o erro da estimativa contra
+  cotações reais (de hora em hora)
+"""
+import logging
+
+from celery import shared_task
+from django.conf import settings
+
+from apps.orders.services.freight_calculator import refresh_freight_quote
+from apps.orders.services.freight_table import (
+    build_freight_table,
+    sample_freight_estimate_error,
+)
+
+logger = logging.getLogger("orders")
+
+
+@shared_task(ignore_result=True)
+def refresh_freight_quote_task(params: dict):
+    """Cota de novo nos Correios e regrava o cache."""
+    freight = refresh_freight_quote(params)
+    if not freight:
+        logger.warning(f"[Task] Correios sem cotação para {params.get('cep_destino')}")
+
+
+@shared_task(ignore_result=True)
+def rebuild_freight_table_task():
+    """Cota as faixas nos Correios e troca o arquivo da tabela."""
+    result = build_freight_table()
+    logger.info(
+        f"[Task] Tabela de frete: {result['records']} faixas, "
+        f"{result['missing']} cotações sem resposta"
+    )
+
+
+@shared_task(ignore_result=True)
+def sample_freight_estimate_error_task():
+    """Compara a estimativa com cotações reais (resumo no cache)."""
+    sample_freight_estimate_error(settings.FREIGHT_ESTIMATE_SAMPLES)
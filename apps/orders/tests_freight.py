@@ -0,0 +1,322 @@
+"""
+Testes do cache de cotações de frete.
+"""
+import random
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from apps.orders.services import freight_calculator, freight_table
+from apps.orders.services.freight_batch import quote_freight_batch
+from apps.orders.services.freight_table import build_freight_table
+from apps.orders.services.freight_calculator import (
+    build_freight_params,
+    calcular_frete_from_request,
+    freight_cache_key,
+    get_freight_cache_metrics,
+    reset_freight_cache_metrics,
+)
+
+CORREIOS_RESULT = {
+    "03220": {"preco": {"pcFinal": "30,50"}, "prazo": {"prazoEntrega": 2}},
+    "03298": {"preco": {"pcFinal": "22,10"}, "prazo": {"prazoEntrega": 7}},
+}
+
+
+def form(cep="30140-071", weight="0.3", length="16", width="11", height="4"):
+    return {"cep": cep, "weight": weight, "length": length, "width": width, "height": height}
+
+
+@patch("apps.orders.services.freight_calculator.CorreiosAPI.calcular", return_value=CORREIOS_RESULT)
+@patch("apps.orders.services.freight_calculator.CorreiosAPI.__init__", return_value=None)
+class FreightCacheTests(TestCase):
+    """Testes da chave por faixa, TTL e atualização em segundo plano."""
+
+    def setUp(self):
+        cache.clear()
+        reset_freight_cache_metrics()
+
+    def test_key_uses_cep_prefix_and_quoted_package(self, mock_init, mock_calcular):
+        """Testa que a chave agrupa a região e separa pacotes de pesos diferentes."""
+        key = freight_cache_key(build_freight_params(form()))
+
+        self.assertEqual(key, freight_cache_key(build_freight_params(form(cep="30140-999"))))
+        self.assertNotEqual(key, freight_cache_key(build_freight_params(form(cep="30150-071"))))
+        self.assertNotEqual(key, freight_cache_key(build_freight_params(form(weight="0.45"))))
+        # Cota com o peso e as dimensões reais
+        self.assertEqual(build_freight_params(form())["peso"], 300)
+        self.assertEqual(build_freight_params(form())["comprimento"], 16)
+
+    @override_settings(FREIGHT_QUOTE_AT_BAND_LIMIT=True)
+    def test_quote_at_band_limit_opt_in(self, mock_init, mock_calcular):
+        """Testa que, ligado, a cotação usa o limite superior da faixa e a chave é da faixa."""
+        params = build_freight_params(form())
+
+        self.assertEqual((params["peso"], params["comprimento"], params["altura"]), (500, 20, 5))
+        self.assertEqual(freight_cache_key(params), freight_cache_key(build_freight_params(form(weight="0.45"))))
+
+    def test_quote_uses_real_package(self, mock_init, mock_calcular):
+        """Testa que os Correios recebem o pacote informado, não o limite da faixa."""
+        calcular_frete_from_request(form(weight="0.45"))
+
+        kwargs = mock_calcular.call_args.kwargs
+        self.assertEqual((kwargs["peso"], kwargs["comprimento"], kwargs["largura"]), (450, 16, 11))
+
+    def test_heavier_package_never_quoted_lower(self, mock_init, mock_calcular):
+        """Testa que, na mesma faixa de peso, o pacote mais pesado não recebe frete menor."""
+        def by_weight(**params):
+            price = f"{20 + params['peso'] // 10},00"
+            return {code: {"preco": {"pcFinal": price}, "prazo": {"prazoEntrega": 3}} for code in ("03220", "03298")}
+
+        for quote_at_limit in (False, True):
+            cache.clear()
+            with self.settings(FREIGHT_QUOTE_AT_BAND_LIMIT=quote_at_limit):
+                mock_calcular.side_effect = by_weight
+                lighter = calcular_frete_from_request(form(weight="0.3"))
+                heavier = calcular_frete_from_request(form(weight="0.45"))
+
+            self.assertGreaterEqual(heavier["sedex"]["preco"], lighter["sedex"]["preco"])
+            self.assertGreaterEqual(heavier["pac"]["preco"], lighter["pac"]["preco"])
+        # Sem o limite: cada peso com a própria cotação
+        self.assertEqual(mock_calcular.call_count, 3)
+
+    def test_repeat_quote_served_from_cache(self, mock_init, mock_calcular):
+        """Testa que a segunda cotação do mesmo pacote na região não chama os Correios."""
+        first = calcular_frete_from_request(form())
+        second = calcular_frete_from_request(form(cep="30140-100"))
+
+        self.assertEqual(first, {"sedex": {"preco": 30.5, "prazo": 2}, "pac": {"preco": 22.1, "prazo": 7}})
+        self.assertEqual(second, first)
+        mock_calcular.assert_called_once()
+        metrics = get_freight_cache_metrics()
+        self.assertEqual((metrics["hits"], metrics["misses"]), (1, 1))
+
+    def test_stale_quote_refreshed_in_background(self, mock_init, mock_calcular):
+        """Testa o stale-while-revalidate com uma atualização por chave."""
+        params = build_freight_params(form())
+        key = freight_cache_key(params)
+        cache.set(key, {"freight": {"pac": {"preco": 1.0, "prazo": 9}}, "fetched_at": time.time() - 100})
+
+        with self.settings(FREIGHT_CACHE_TTL=10), \
+                patch("apps.orders.tasks.refresh_freight_quote_task.delay") as mock_delay:
+            self.assertEqual(calcular_frete_from_request(form())["pac"]["preco"], 1.0)
+            calcular_frete_from_request(form())
+
+        mock_delay.assert_called_once_with(params)
+        mock_calcular.assert_not_called()
+        self.assertEqual(get_freight_cache_metrics()["stale"], 2)
+
+        freight_calculator.refresh_freight_quote(params)
+        self.assertEqual(cache.get(key)["freight"]["pac"]["preco"], 22.1)
+        self.assertIsNone(cache.get(f"{key}:refreshing"))
+
+    def test_failed_quote_not_cached(self, mock_init, mock_calcular):
+        """Testa que cotação vazia (Correios com erro) não vai para o cache."""
+        mock_calcular.return_value = {
+            "03220": {"preco": {"txErro": "Serviço indisponível"}, "prazo": {"prazoEntrega": 2}},
+            "03298": {"preco": None, "prazo": None},
+        }
+
+        self.assertEqual(calcular_frete_from_request(form()), {})
+        calcular_frete_from_request(form())
+
+        self.assertEqual(mock_calcular.call_count, 2)
+
+    def test_freight_view_uses_cache(self, mock_init, mock_calcular):
+        """Testa a página de frete com cotações repetidas."""
+        url = reverse("orders:order-frete")
+
+        for _ in range(3):
+            response = self.client.post(url, form())
+
+        self.assertContains(response, "7 dias úteis")
+        mock_calcular.assert_called_once()
+
+
+@patch("apps.orders.services.freight_calculator.CorreiosAPI.__init__", return_value=None)
+class PartialFreightQuoteTests(TestCase):
+    """Testes da cotação com consultas sem resposta."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_partial_quote_returned_but_not_cached(self, mock_init):
+        """Testa que preço sem prazo aparece, mas não vai para o cache."""
+        partial = {
+            "03220": {"preco": {"pcFinal": "30,50"}, "prazo": None},
+            "03298": {"preco": {"pcFinal": "22,10"}, "prazo": None},
+        }
+
+        with patch("apps.orders.services.freight_calculator.CorreiosAPI.calcular",
+                   return_value=partial) as mock_calcular:
+            freight = calcular_frete_from_request(form())
+            calcular_frete_from_request(form())
+
+        self.assertEqual(freight["sedex"], {"preco": 30.5, "prazo": None})
+        self.assertEqual(mock_calcular.call_count, 2)
+
+
+def fake_lote(payload, timeout=None):
+    """Resposta de lote dos Correios: preço/prazo pelo CEP de destino."""
+    items = payload.get("parametrosProduto") or payload.get("parametrosPrazo")
+    rows = []
+    for item in items:
+        if item["cepDestino"].startswith("9"):
+            rows.append({"nuRequisicao": item["nuRequisicao"], "txErro": "CEP inválido"})
+        else:
+            rows.append({"nuRequisicao": item["nuRequisicao"], "pcFinal": "19,90", "prazoEntrega": "4"})
+    return rows
+
+
+@patch("apps.orders.services.freight_batch.CorreiosAPI.__init__", return_value=None)
+class FreightBatchTests(TestCase):
+    """Testes da cotação de frete em lote."""
+
+    @patch("apps.orders.services.freight_batch.CorreiosAPI.consultar_prazo", side_effect=fake_lote)
+    @patch("apps.orders.services.freight_batch.CorreiosAPI.consultar_preco", side_effect=fake_lote)
+    def test_batch_dedupes_and_maps_rows(self, mock_preco, mock_prazo, mock_init):
+        """Testa que destinos repetidos são cotados uma vez e voltam para cada linha."""
+        destinations = [
+            form(cep="30140-071"),
+            form(cep="30140071"),  # mesmo pacote e destino
+            form(cep="99999-000"),
+            {"cep": "01310100", "weight": "abc"},
+        ]
+        stats = {}
+
+        rows = list(quote_freight_batch(destinations, produtos=["03220"], stats=stats))
+
+        self.assertEqual(stats, {"requests": 3, "unique": 2})
+        self.assertEqual(mock_preco.call_count, 1)
+        by_line = {row["line"]: row for row in rows}
+        self.assertEqual(by_line[4]["error"], "Destino inválido")
+        self.assertEqual(
+            (by_line[1]["servico"], by_line[1]["preco"], by_line[1]["prazo"]), ("sedex", 19.9, 4)
+        )
+        self.assertEqual(by_line[2]["preco"], 19.9)
+        self.assertEqual(by_line[3]["error"], "CEP inválido")
+        self.assertIsNone(by_line[3]["preco"])
+
+    @patch("apps.orders.services.freight_batch.CorreiosAPI.consultar_prazo", return_value=None)
+    @patch("apps.orders.services.freight_batch.CorreiosAPI.consultar_preco", return_value=None)
+    def test_batch_without_response_reports_error(self, mock_preco, mock_prazo, mock_init):
+        """Testa que lote sem resposta vira erro em cada linha."""
+        rows = list(quote_freight_batch([form(), form(cep="01310-100")]))
+
+        self.assertEqual(len(rows), 4)
+        self.assertTrue(all(row["error"] == "Sem resposta dos Correios" for row in rows))
+
+
+    @patch("apps.orders.services.freight_batch.CorreiosAPI.calcular_lotes")
+    def test_batch_price_without_value_reported_per_row(self, mock_lotes, mock_init):
+        """Testa que preço sem pcFinal vira erro da linha e o resto do lote sai."""
+        mock_lotes.return_value = iter([
+            ("a", {"coProduto": "03220"}, None),
+            ("b", {"pcFinal": "19,90"}, {"prazoEntrega": "4"}),
+        ])
+
+        with patch("apps.orders.services.freight_batch.CorreiosAPI.chave_lote", side_effect=["a", "b"]):
+            rows = list(quote_freight_batch([form(), form(cep="01310-100")], produtos=["03220"]))
+
+        by_line = {row["line"]: row for row in rows}
+        self.assertEqual(by_line[1]["error"], "Resposta dos Correios sem preço")
+        self.assertIsNone(by_line[1]["preco"])
+        self.assertEqual((by_line[2]["preco"], by_line[2]["prazo"], by_line[2]["error"]), (19.9, 4, None))
+
+
+def fake_table_lote(payload, timeout=None):
+    """Correios falso: preço cresce com o peso e a região do CEP."""
+    rows = []
+    for item in payload.get("parametrosProduto") or payload.get("parametrosPrazo"):
+        region = int(item["cepDestino"][0])
+        extra = 5 if item["coProduto"] == "03220" else 0
+        weight = item.get("psObjeto", 0)
+        rows.append({
+            "nuRequisicao": item["nuRequisicao"],
+            "pcFinal": f"{10 + region + extra + weight // 1000},00",
+            "prazoEntrega": str(region + 1),
+        })
+    return rows
+
+
+@patch("apps.orders.services.freight_table.CorreiosAPI.consultar_prazo", side_effect=fake_table_lote)
+@patch("apps.orders.services.freight_table.CorreiosAPI.consultar_preco", side_effect=fake_table_lote)
+@patch("apps.orders.services.freight_table.CorreiosAPI.__init__", return_value=None)
+class FreightTableTests(TestCase):
+    """Testes da tabela local de preços e do modo estimativa."""
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        override = self.settings(
+            FREIGHT_TABLE_PATH=str(Path(directory) / "freight_table.bin"),
+            FREIGHT_TABLE_WEIGHTS_GRAMS=[500, 1000, 5000],
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_lookup_by_cep_range_and_weight_band(self, *mocks):
+        """Testa a busca pela faixa de CEP e pela menor faixa de peso que cobre o pacote."""
+        result = build_freight_table()
+
+        self.assertEqual(result["records"], len(freight_table.CEP_RANGES) * 3)
+        self.assertEqual(result["missing"], 0)
+
+        # MG (30…), 0,3 kg → faixa de 500 g
+        self.assertEqual(
+            freight_table.estimate_freight(build_freight_params(form())),
+            {"sedex": {"preco": 18.0, "prazo": 4}, "pac": {"preco": 13.0, "prazo": 4}},
+        )
+        # SP (01…), 4,2 kg → faixa de 5 kg
+        params = build_freight_params(form(cep="01310-100", weight="4.2"))
+        self.assertEqual(freight_table.estimate_freight(params)["pac"]["preco"], 15.0)
+        # Peso cubado maior que o real: 60×40×30 cm = 12 kg, acima da última faixa
+        params = build_freight_params(form(length="60", width="40", height="30"))
+        self.assertIsNone(freight_table.estimate_freight(params))
+        # CEP fora das faixas
+        self.assertIsNone(freight_table.estimate_freight(build_freight_params(form(cep="00000-100"))))
+
+    def test_estimate_mode_skips_correios_and_falls_back(self, mock_init, mock_preco, mock_prazo):
+        """Testa que o modo estimativa não chama os Correios quando a tabela cobre o pacote."""
+        build_freight_table()
+        mock_preco.reset_mock()
+
+        with patch("apps.orders.services.freight_calculator.CorreiosAPI.__init__", return_value=None), \
+                patch("apps.orders.services.freight_calculator.CorreiosAPI.calcular",
+                      return_value=CORREIOS_RESULT) as mock_calcular:
+            estimated = calcular_frete_from_request(form(), estimate=True)
+            fallback = calcular_frete_from_request(form(weight="12"), estimate=True)
+
+        self.assertEqual(estimated["sedex"]["preco"], 18.0)
+        self.assertEqual(fallback["sedex"]["preco"], 30.5)
+        mock_calcular.assert_called_once()
+        mock_preco.assert_not_called()
+
+    def test_rebuild_swaps_table_and_samples_error(self, *mocks):
+        """Testa que a tabela nova é lida sem reiniciar e que o erro amostrado vai para o cache."""
+        build_freight_table()
+        first = freight_table.get_freight_table()
+        build_freight_table(weights=[1000, 5000])
+
+        second = freight_table.get_freight_table()
+        self.assertIsNot(second, first)
+        self.assertEqual(second.count, len(freight_table.CEP_RANGES) * 2)
+        # A anterior fica aberta para leitores em andamento; fecha na troca seguinte
+        self.assertFalse(first.closed)
+        build_freight_table(weights=[500, 5000])
+        freight_table.get_freight_table()
+        self.assertTrue(first.closed)
+        self.assertFalse(second.closed)
+
+        summary = freight_table.sample_freight_estimate_error(10, rng=random.Random(7))
+
+        self.assertGreater(summary["samples"], 0)
+        self.assertGreaterEqual(summary["max_abs_pct"], summary["mean_abs_pct"])
+        self.assertEqual(freight_table.get_freight_estimate_error(), summary)
@@ -0,0 +1,232 @@
+"""
+Testes da importação de pedidos em lote.
+"""
+import os
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from apps.orders.models import Order
+from apps.orders.services.order_import import import_orders, parse_order_rows
+from apps.payments.models import PaymentLink
+from apps.payments.services.commands import generate_payment_links_for_orders
+from apps.sellers.models import Seller
+
+
+def fake_pagarme(order):
+    """Link falso; pedidos com "Falha" no nome simulam erro do Pagar.me."""
+    if "Falha" in order.name:
+        return None
+    return {"id": f"lnk_import_{order.pk}", "url": f"https://pay.test/import/{order.pk}"}
+
+
+class OrderImportTests(TestCase):
+    """Testes da validação e inserção em lote."""
+
+    def setUp(self):
+        cache.clear()
+        self.seller = Seller.objects.create(name="Seller Import", phone="11999999999")
+
+    def _csv(self, *lines):
+        header = "cliente_nome,valor_produto,valor_frete,vendedor,parcelas"
+        return "\n".join((header,) + lines)
+
+    def test_parse_csv_and_jsonl(self):
+        """Testa a leitura dos dois formatos."""
+        csv_rows = parse_order_rows(self._csv(f"Ana,10.00,2.00,{self.seller.pk},1"), "csv")
+        jsonl_rows = parse_order_rows(
+            '{"cliente_nome": "Ana", "vendedor": 1}\n\n{"cliente_nome": "Bia", "vendedor": 1}\n',
+            "jsonl",
+        )
+
+        self.assertEqual(csv_rows[0]["cliente_nome"], "Ana")
+        self.assertEqual(len(jsonl_rows), 2)
+        with self.assertRaises(ValueError):
+            parse_order_rows("{quebrado", "jsonl")
+        with self.assertRaises(ValueError):
+            parse_order_rows("", "xlsx")
+
+    def test_jsonl_line_must_be_object(self):
+        """Testa que linha JSON válida que não é objeto é rejeitada com o número da linha."""
+        for line in ("[1, 2]", '"x"', "3"):
+            with self.assertRaisesMessage(ValueError, "Linha 2: esperado um objeto JSON"):
+                parse_order_rows('{"cliente_nome": "Ana"}\n' + line, "jsonl")
+
+    def test_wrong_field_types_are_invalid_rows(self):
+        """Testa que tipos errados no JSONL viram linha inválida, não erro."""
+        rows = parse_order_rows(
+            f'{{"cliente_nome": 123, "vendedor": {self.seller.pk}}}\n'
+            f'{{"cliente_nome": "Ana", "valor_produto": [10], "vendedor": {self.seller.pk}}}\n'
+            f'{{"cliente_nome": "Bia", "valor_produto": 10.5, "vendedor": {self.seller.pk}, "parcelas": 2}}\n',
+            "jsonl",
+        )
+
+        result = import_orders(rows, dispatch_links=False)
+
+        self.assertEqual(
+            [(row["status"], row["error"]) for row in result["rows"]],
+            [
+                ("invalid", "Nome do cliente inválido"),
+                ("invalid", "Valor inválido em valor_produto"),
+                ("created", None),
+            ],
+        )
+        self.assertEqual(Order.objects.get().value, Decimal("10.5"))
+
+    def test_import_reports_per_row_results(self):
+        """Testa que linhas válidas viram pedidos e inválidas são reportadas."""
+        rows = parse_order_rows(self._csv(
+            f"Ana,\"10,50\",2.00,{self.seller.pk},2",
+            f",10.00,2.00,{self.seller.pk},1",
+            "Bia,10.00,2.00,9999,1",
+            f"Caio,10.00,2.00,{self.seller.pk},0",
+        ), "csv")
+
+        with self.assertNumQueries(4):
+            # vendedores + SAVEPOINT + INSERT em lote + RELEASE
+            result = import_orders(rows, dispatch_links=False)
+
+        self.assertEqual(result["created"], 1)
+        self.assertEqual(result["invalid"], 3)
+        self.assertEqual([row["status"] for row in result["rows"]],
+                         ["created", "invalid", "invalid", "invalid"])
+
+        order = Order.objects.get(pk=result["rows"][0]["order_id"])
+        self.assertEqual(order.total, Decimal("12.50"))
+        self.assertEqual(order.installments, 2)
+        self.assertEqual(order.link_status, "generating")
+
+    def test_import_dispatches_link_batches_on_commit(self):
+        """Testa que os links são enfileirados em lotes no commit."""
+        rows = [
+            {"cliente_nome": f"Cliente {i}", "valor_produto": "10", "vendedor": self.seller.pk}
+            for i in range(3)
+        ]
+
+        with patch("apps.payments.tasks.generate_payment_links_batch_task.delay") as mock_delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                result = import_orders(rows)
+
+        mock_delay.assert_called_once_with(result["order_ids"])
+
+
+@patch("apps.payments.services.commands._generate_payment_link", side_effect=fake_pagarme)
+@patch("apps.notifications.services.payment_notifications.send_payment_link_task")
+class BulkPaymentLinkGenerationTests(TestCase):
+    """Testes da geração concorrente dos links."""
+
+    def setUp(self):
+        cache.clear()
+        self.seller = Seller.objects.create(name="Seller Links", phone="11999999999")
+
+    def _orders(self, *names):
+        return Order.objects.bulk_create([
+            Order(
+                name=name,
+                value=Decimal("10.00"),
+                value_freight=Decimal("0.00"),
+                total=Decimal("10.00"),
+                status="pending",
+                installments=1,
+                seller=self.seller,
+            )
+            for name in names
+        ])
+
+    def test_generates_links_in_bulk(self, mock_link_task, mock_generate):
+        """Testa bulk_create dos links e status dos pedidos (pronto / falhou)."""
+        ok_a, ok_b, failed = self._orders("Cliente A", "Cliente B", "Cliente Falha")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            results = generate_payment_links_for_orders(
+                [ok_a.pk, ok_b.pk, failed.pk], max_workers=3
+            )
+
+        self.assertEqual(PaymentLink.objects.count(), 2)
+        self.assertIsNone(results[failed.pk])
+        self.assertEqual(results[ok_a.pk].url_link, f"https://pay.test/import/{ok_a.pk}")
+        self.assertEqual(
+            dict(Order.objects.values_list("pk", "link_status")),
+            {ok_a.pk: "ready", ok_b.pk: "ready", failed.pk: "failed"},
+        )
+        self.assertEqual(mock_link_task.delay.call_count, 2)
+
+    def test_skips_orders_with_active_link(self, mock_link_task, mock_generate):
+        """Testa que pedidos que já têm link não chamam o Pagar.me de novo."""
+        order, = self._orders("Cliente Com Link")
+        PaymentLink.objects.create(
+            order=order, url_link="https://pay.test/x", id_link="lnk_x",
+            amount=order.total, status="active",
+        )
+
+        results = generate_payment_links_for_orders([order.pk])
+
+        self.assertEqual(results, {})
+        mock_generate.assert_not_called()
+
+    def test_management_command(self, mock_link_task, mock_generate):
+        """Testa o comando de importação com relatório por linha e throughput."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "pedidos.csv")
+            # Com BOM, como o Excel exporta CSV UTF-8
+            with open(path, "w", encoding="utf-8-sig") as source:
+                source.write(
+                    "cliente_nome,valor_produto,valor_frete,vendedor,parcelas\n"
+                    f"Ana,10.00,0,{self.seller.pk},1\n"
+                    f"Cliente Falha,10.00,0,{self.seller.pk},1\n"
+                    "Bia,10.00,0,9999,1\n"
+                )
+            out = StringIO()
+            call_command("import_orders", path, "--workers", "2", stdout=out)
+
+        output = out.getvalue()
+        self.assertIn("https://pay.test/import/", output)
+        self.assertIn("falha ao gerar link", output)
+        self.assertIn("linha 3: inválida - Vendedor não encontrado", output)
+        self.assertIn("Links: 1/2 gerados", output)
+
+
+class OrderImportAPITests(TestCase):
+    """Testes do endpoint de importação."""
+
+    def setUp(self):
+        self.seller = Seller.objects.create(name="Seller API", phone="11999999999")
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("importador"))
+        self.url = reverse("orders_api_v1:order-import")
+
+    def test_import_csv_body(self):
+        """Testa importação com corpo text/csv."""
+        body = (
+            "cliente_nome,valor_produto,valor_frete,vendedor,parcelas\n"
+            f"Ana,10.00,0,{self.seller.pk},1\n"
+            "Bia,10.00,0,9999,1\n"
+        )
+
+        with patch("apps.payments.tasks.generate_payment_links_batch_task.delay"):
+            response = self.client.post(self.url, data=body, content_type="text/csv")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["created"], 1)
+        self.assertEqual(response.json()["invalid"], 1)
+        self.assertIn("rows_per_second", response.json())
+
+    def test_rejects_non_object_jsonl_line(self):
+        """Testa que linha JSONL que não é objeto devolve 400, não 500."""
+        response = self.client.post(self.url, data="[1, 2]\n", content_type="application/x-ndjson")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+    def test_rejects_unknown_content_type(self):
+        """Testa que formatos desconhecidos retornam 400."""
+        response = self.client.post(self.url, data="x", content_type="text/plain")
+        self.assertEqual(response.status_code, 400)
@@ -1,3 +1,5 @@
+from unittest.mock import patch
+
 from django.test import TestCase, Client
 from django.urls import reverse
 from decimal import Decimal
@@ -225,3 +227,44 @@ class OrdersViewsTests(TestCase):
         
         # Verificar redirecionamento
         self.assertIn(resp.status_code, [200, 302])
+
+    def test_order_create_dispatches_link_generation_on_commit(self):
+        """Testa que a criação do pedido só enfileira a geração do link (sem Pagar.me inline)."""
+        url = reverse('orders:order-create')
+        data = {
+            'cliente_nome': 'Cliente Assíncrono',
+            'valor_produto': '40.00',
+            'valor_frete': '0.00',
+            'vendedor': self.seller.id,
+            'parcelas': '1'
+        }
+
+        with patch('apps.payments.tasks.generate_payment_link_task.delay') as mock_delay, \
+                patch('apps.core.integrations.pagarme.PagarMePaymentLink.create_link') as mock_pagarme:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(url, data)
+
+        order = Order.objects.get(name='Cliente Assíncrono')
+        self.assertEqual(order.link_status, 'generating')
+        mock_delay.assert_called_once_with(order.pk)
+        mock_pagarme.assert_not_called()
+
+    def test_order_success_polls_while_generating(self):
+        """Testa que a página de sucesso acompanha a geração do link."""
+        order = Order.objects.filter(seller=self.seller).first()
+
+        resp = self.client.get(reverse('orders:order-success', args=[order.pk]))
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.context['link_generating'])
+        self.assertContains(resp, 'Gerando Link')
+
+    def test_order_success_shows_failed_link(self):
+        """Testa a página de sucesso quando a geração do link falhou."""
+        order = Order.objects.filter(seller=self.seller).first()
+        Order.objects.filter(pk=order.pk).update(link_status='failed')
+
+        resp = self.client.get(reverse('orders:order-success', args=[order.pk]))
+
+        self.assertFalse(resp.context['link_generating'])
+        self.assertContains(resp, 'Não foi possível gerar o link')
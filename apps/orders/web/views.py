@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.shortcuts import render, redirect
 from django.views import View
@@ -30,12 +31,20 @@ class OrderCreateView(View):
         )
 
     def post(self, request):
+        # O link é gerado em background; a página de sucesso acompanha
         order = create_order(request.POST.dict())
-        payment_link = get_latest_payment_link(order)
         return redirect("orders:order-success", pk=order.pk)
 
 
 class OrderSuccessView(View):
+    """
+    Página do pedido criado.
+
+    Enquanto o link está sendo gerado (link_status="generating"), a página
+    se recarrega a cada LINK_POLL_SECONDS.
+    """
+
+    LINK_POLL_SECONDS = 2
 
     def get(self, request, pk):
         order = get_order(pk)
@@ -60,6 +69,8 @@ class OrderSuccessView(View):
                 "order": order,
                 "payment": payment,
                 "payment_link": payment_link,
+                "link_generating": order.link_status == "generating" and not payment_link,
+                "poll_seconds": self.LINK_POLL_SECONDS,
             }
         )
 
@@ -84,7 +95,9 @@ class OrderFreteView(View):
 
     def post(self, request):
         try:
-            freight = calcular_frete_from_request(request.POST)
+            freight = calcular_frete_from_request(
+                request.POST, estimate=settings.FREIGHT_ESTIMATE_ENABLED
+            )
             return render(request, "orders/order_frete.html", {"freight": freight})
         except Exception:
             return render(
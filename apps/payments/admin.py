@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import PaymentLink, Payment
+from .models import PaymentLink, Payment, WebhookInbox
 
 
 @admin.register(PaymentLink)
@@ -9,4 +9,10 @@ class PaymentLinkAdmin(admin.ModelAdmin):
 
 @admin.register(Payment)
 class PaymentAdmin(admin.ModelAdmin):
-    list_display = ('id', 'payment_link', 'payment_date', 'amount', 'status', 'created_at')
\ No newline at end of file
+    list_display = ('id', 'payment_link', 'payment_date', 'amount', 'status', 'created_at')
+
+@admin.register(WebhookInbox)
+class WebhookInboxAdmin(admin.ModelAdmin):
+    list_display = ('id', 'event_id', 'event_type', 'status', 'attempts', 'created_at', 'processed_at')
+    search_fields = ('event_id',)
+    list_filter = ('status', 'event_type')
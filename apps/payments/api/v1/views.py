@@ -16,12 +16,16 @@ Este arquivo:
 View é porteiro, não juiz.
 """
 
+import logging
+
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import AllowAny
 
-from apps.payments.services.commands import process_payment_webhook
+from apps.payments.services.commands import receive_payment_webhook
+
+logger = logging.getLogger("payments")
 
 
 class WebhookAPIView(APIView):
@@ -31,7 +35,8 @@ class WebhookAPIView(APIView):
     Fluxo:
     - Recebe payload
     - Filtra eventos relevantes
-    - Encaminha para o command
+    - Grava na caixa de entrada e responde 202
+    - O worker Celery processa depois (process_webhook_inbox)
     """
 
     permission_classes = [AllowAny]
@@ -41,7 +46,7 @@ class WebhookAPIView(APIView):
         payload = request.data
         event = payload.get("type")
 
-        print(f"→ Webhook recebido | Evento: {event}")
+        logger.info(f"Webhook recebido | Evento: {event}")
 
         # Ignora eventos que não são de cobrança
         if not event or not event.startswith("charge."):
@@ -50,15 +55,10 @@ class WebhookAPIView(APIView):
                 status=status.HTTP_200_OK
             )
 
-        payment = process_payment_webhook(payload)
-
-        if not payment:
-            return Response(
-                {"error": "Falha ao processar webhook"},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        # Reenvios do mesmo evento recebem a mesma resposta (idempotente)
+        response_data = receive_payment_webhook(payload)
 
         return Response(
-            {"status": "ok"},
-            status=status.HTTP_200_OK
+            response_data,
+            status=status.HTTP_202_ACCEPTED
         )
@@ -34,6 +34,57 @@ def is_valid_payment_status(status: str) -> bool:
     return status in VALID_PAYMENT_STATUSES
 
 
+# Quanto maior, mais "final" é o status dentro do ciclo da cobrança
+PAYMENT_STATUS_PRECEDENCE = {
+    "pending": 0,
+    "processing": 1,
+    "failed": 2,
+    "canceled": 2,
+    "paid": 3,
+    "overpaid": 3,
+    "underpaid": 3,
+    "refunded": 4,
+    "chargeback": 4,
+}
+
+
+def resolve_terminal_payment_status(statuses: list[str]) -> str | None:
+    """
+    Escolhe, entre vários eventos da mesma cobrança, o status que vale.
+
+    Regras:
+    - Status inválidos são ignorados
+    - Vence o status mais avançado no ciclo (ex.: pending → processing → paid)
+    - Empate: vence o evento mais recente (último da lista)
+
+    Retorna None se nenhum status for válido.
+    """
+    terminal = None
+
+    for status in statuses:
+        if not is_valid_payment_status(status):
+            continue
+
+        if terminal is None or (
+            PAYMENT_STATUS_PRECEDENCE[status] >= PAYMENT_STATUS_PRECEDENCE[terminal]
+        ):
+            terminal = status
+
+    return terminal
+
+
+def is_payment_status_regression(current: str | None, new: str) -> bool:
+    """
+    Indica se aplicar `new` faria o pagamento voltar no ciclo.
+
+    Ex.: evento "pending" processado depois de "paid" já gravado.
+    Mesmo nível (failed/canceled, paid/overpaid) não é regressão.
+    """
+    if current not in PAYMENT_STATUS_PRECEDENCE:
+        return False
+    return PAYMENT_STATUS_PRECEDENCE[new] < PAYMENT_STATUS_PRECEDENCE[current]
+
+
 # ================================================================
 # TRANSIÇÃO DE STATUS DO LINK
 # ================================================================
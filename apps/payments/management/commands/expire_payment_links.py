@@ -0,0 +1,34 @@
+"""
+Expira links de pagamento vencidos (mesma regra da task do Celery beat).
+
+Útil para limpar o acúmulo de uma vez (ex.: logo após o deploy da
+varredura), sem esperar as execuções periódicas.
+
+Uso:
+    python manage.py expire_payment_links
+    python manage.py expire_payment_links --chunk-size 2000
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.payments.services.commands import expire_overdue_payment_links
+
+
+class Command(BaseCommand):
+    help = "Expira links de pagamento vencidos em lotes (catch-up)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=getattr(settings, "PAYMENT_LINK_EXPIRY_CHUNK_SIZE", 500),
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        expired, _ = expire_overdue_payment_links(chunk_size=options["chunk_size"])
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(f"{expired} links expirados em {elapsed:.2f} s")
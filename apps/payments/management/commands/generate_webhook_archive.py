@@ -0,0 +1,161 @@
+"""
+Gera um arquivo JSONL sintético de webhooks do Pagar.me para benchmark.
+
+Cada cobrança segue uma sequência realista de status (ex.: pending →
+processing → paid), os eventos de cobranças diferentes são intercalados
+e uma fração é reenviada (mesmo ID de evento), como faz o Pagar.me.
+
+Uso:
+    python manage.py generate_webhook_archive webhooks.jsonl --events 100000 --create-links
+    python manage.py replay_webhooks webhooks.jsonl
+"""
+import json
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from apps.orders.models import Order
+from apps.payments.models import PaymentLink
+from apps.payments.services.queries import charge_code_cache_key
+from apps.sellers.models import Seller
+
+
+# (sequência de status, peso)
+STATUS_SEQUENCES = [
+    (["pending", "processing", "paid"], 55),
+    (["pending", "paid"], 10),
+    (["pending", "processing", "failed"], 10),
+    (["pending", "canceled"], 8),
+    (["processing", "failed", "processing", "paid"], 5),
+    (["pending", "processing", "paid", "refunded"], 5),
+    (["pending", "processing", "paid", "chargeback"], 2),
+    (["pending", "processing", "underpaid"], 3),
+    (["pending", "processing", "overpaid"], 2),
+]
+
+
+class Command(BaseCommand):
+    help = "Gera um arquivo JSONL sintético de webhooks do Pagar.me"
+
+    def add_arguments(self, parser):
+        parser.add_argument("output", help="Caminho do arquivo JSONL gerado")
+        parser.add_argument("--events", type=int, default=100_000)
+        parser.add_argument(
+            "--redelivery-rate",
+            type=float,
+            default=0.1,
+            help="Fração de eventos reenviados (mesmo ID)",
+        )
+        parser.add_argument("--prefix", default="bench", help="Prefixo dos códigos")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument(
+            "--create-links",
+            action="store_true",
+            help="Cria pedidos e links no banco para os códigos gerados",
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        sequences, weights = zip(*STATUS_SEQUENCES)
+
+        events = []
+        active = []  # [código, status restantes, valor em centavos]
+        charge_count = 0
+        started_at = timezone.now() - timedelta(hours=1)
+
+        while len(events) < options["events"]:
+            # Abre novas cobranças até ter um conjunto ativo para intercalar
+            while len(active) < 64:
+                charge_count += 1
+                active.append([
+                    f"{options['prefix']}_{charge_count}",
+                    list(rng.choices(sequences, weights=weights)[0]),
+                    rng.randrange(1_000, 100_000),
+                ])
+
+            current = active[rng.randrange(len(active))]
+            code, statuses, amount = current
+            status = statuses.pop(0)
+            if not statuses:
+                active.remove(current)
+
+            paid = status in {"paid", "overpaid", "underpaid", "refunded", "chargeback"}
+            event = {
+                "id": f"hook_{options['prefix']}_{len(events) + 1}",
+                "type": f"charge.{status}",
+                "data": {
+                    "code": code,
+                    "status": status,
+                    "paid_amount": amount if paid else 0,
+                    "paid_at": (
+                        (started_at + timedelta(seconds=len(events))).isoformat()
+                        if paid else None
+                    ),
+                },
+            }
+            events.append(event)
+
+            if rng.random() < options["redelivery_rate"]:
+                events.append(event)
+
+        events = events[:options["events"]]
+
+        with open(options["output"], "w", encoding="utf-8") as archive:
+            for event in events:
+                archive.write(json.dumps(event) + "\n")
+
+        codes = {event["data"]["code"] for event in events}
+        self.stdout.write(
+            f"{len(events)} eventos, {len(codes)} cobranças → {options['output']}"
+        )
+
+        if options["create_links"]:
+            created = self._create_links(sorted(codes))
+            self.stdout.write(f"{created} links de pagamento criados")
+
+    def _create_links(self, codes: list[str]) -> int:
+        """
+        Cria um pedido + link ativo para cada código que ainda não existe.
+        """
+        existing = set(
+            PaymentLink.objects.filter(id_link__in=codes).values_list("id_link", flat=True)
+        )
+        codes = [code for code in codes if code not in existing]
+        if not codes:
+            return 0
+
+        with transaction.atomic():
+            seller, _ = Seller.objects.get_or_create(
+                name="Vendedor Benchmark", defaults={"phone": "11999999999"}
+            )
+            orders = Order.objects.bulk_create([
+                Order(
+                    name=f"Pedido {code}",
+                    value=Decimal("100.00"),
+                    value_freight=Decimal("0.00"),
+                    total=Decimal("100.00"),
+                    status="pending",
+                    installments=1,
+                    seller=seller,
+                )
+                for code in codes
+            ], batch_size=1000)
+            PaymentLink.objects.bulk_create([
+                PaymentLink(
+                    order=order,
+                    id_link=code,
+                    url_link=f"https://pagar.me/link/{code}",
+                    amount=order.total,
+                    status="active",
+                )
+                for order, code in zip(orders, codes)
+            ], batch_size=1000)
+
+        # bulk_create não passa pelo command: limpa eventuais caches negativos
+        cache.delete_many([charge_code_cache_key(code) for code in codes])
+        return len(codes)
@@ -0,0 +1,103 @@
+"""
+Concilia pagamentos com o Pagar.me (recupera webhooks perdidos).
+
+Divergências vão para o relatório (uma linha JSON por cobrança).
+PAGARME_API_URL aponta para um servidor local nos testes.
+
+Uso:
+    python manage.py reconcile_payments --since 2025-01-01 --until 2025-01-31
+    python manage.py reconcile_payments --stuck
+    python manage.py reconcile_payments --since 2025-01-01 --dry-run --report diffs.jsonl
+"""
+import time
+from datetime import datetime, time as dt_time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.payments.services.reconciliation import (
+    reconcile_charges_range,
+    reconcile_stuck_links,
+)
+
+
+def _parse_date(value: str) -> datetime:
+    try:
+        parsed = datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise CommandError(f"Data inválida: {value} (use AAAA-MM-DD)")
+    return timezone.make_aware(datetime.combine(parsed.date(), dt_time.min))
+
+
+class Command(BaseCommand):
+    help = "Concilia Payment/PaymentLink com as cobranças do Pagar.me"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", help="Início do período (AAAA-MM-DD)")
+        parser.add_argument("--until", help="Fim do período, inclusive (padrão: hoje)")
+        parser.add_argument(
+            "--stuck",
+            action="store_true",
+            help="Consulta só os links parados em pending/processing",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Só relata as divergências, sem corrigir",
+        )
+        parser.add_argument("--report", help="Arquivo do relatório JSONL (padrão: saída)")
+        parser.add_argument("--workers", type=int, default=None)
+        parser.add_argument("--page-size", type=int, default=None)
+
+    def handle(self, *args, **options):
+        if options["stuck"] == bool(options["since"]):
+            raise CommandError("Informe --since ou --stuck")
+
+        report = (
+            open(options["report"], "w", encoding="utf-8") if options["report"]
+            else self.stdout
+        )
+
+        started = time.perf_counter()
+        try:
+            if options["stuck"]:
+                summary = reconcile_stuck_links(
+                    apply=not options["dry_run"],
+                    report=report,
+                    chunk_size=options["page_size"],
+                    max_workers=options["workers"],
+                )
+            else:
+                since = _parse_date(options["since"])
+                until = (
+                    _parse_date(options["until"]) if options["until"]
+                    else timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+                ) + timedelta(days=1)
+                summary = reconcile_charges_range(
+                    since,
+                    until,
+                    apply=not options["dry_run"],
+                    report=report,
+                    page_size=options["page_size"],
+                    max_workers=options["workers"],
+                )
+        finally:
+            if options["report"]:
+                report.close()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write("")
+        self.stdout.write(
+            f"Cobranças: {summary['charges']}  Links consultados: {summary['checked_links']}"
+        )
+        self.stdout.write(
+            f"Sem pagamento: {summary['missing_payment']}  "
+            f"Status divergente: {summary['status_mismatch']}  "
+            f"Desconhecidas: {summary['unknown_charge']}  "
+            f"Erros: {summary['errors']}"
+        )
+        self.stdout.write(
+            f"Corrigidas: {summary['applied']}"
+            + (" (dry-run)" if options["dry_run"] else "")
+            + f" em {elapsed:.2f} s"
+        )
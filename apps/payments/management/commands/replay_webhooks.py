@@ -0,0 +1,171 @@
+"""
+Reproduz um arquivo JSONL de webhooks do Pagar.me e mede o throughput.
+
+Modos:
+- direct: chama process_payment_webhook evento a evento
+- batch:  chama process_payment_webhooks_batch em lotes (--batch-size)
+- http:   posta no WebhookAPIView via test client (latência de ACK);
+          com --drain, consome a caixa de entrada ao final
+
+Relatório: eventos/s, latência p50/p95/p99, consultas SQL por evento e
+tasks Celery publicadas por evento.
+
+Por padrão as tasks são publicadas num broker em memória (memory://),
+para medir só o caminho do webhook. Use --real-broker para publicar no
+CELERY_BROKER_URL configurado.
+
+Uso:
+    python manage.py replay_webhooks webhooks.jsonl --mode direct
+    python manage.py replay_webhooks webhooks.jsonl --mode http --drain
+"""
+import json
+import time
+
+from celery.signals import before_task_publish
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+from apps.payments.services.commands import (
+    drain_webhook_inbox,
+    process_payment_webhook,
+    process_payment_webhooks_batch,
+)
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    """Percentil por posição mais próxima (lista já ordenada)."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class Command(BaseCommand):
+    help = "Reproduz webhooks de um arquivo JSONL e mede o throughput"
+
+    def add_arguments(self, parser):
+        parser.add_argument("archive", help="Arquivo JSONL com um payload por linha")
+        parser.add_argument(
+            "--mode", choices=["direct", "batch", "http"], default="direct"
+        )
+        parser.add_argument("--limit", type=int, default=None)
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument(
+            "--drain",
+            action="store_true",
+            help="(http) consome a caixa de entrada depois do replay",
+        )
+        parser.add_argument(
+            "--real-broker",
+            action="store_true",
+            help="Publica tasks no broker configurado em vez de memory://",
+        )
+
+    def handle(self, *args, **options):
+        events = self._load(options["archive"], options["limit"])
+        if not events:
+            raise CommandError("Arquivo sem eventos")
+
+        if not options["real_broker"]:
+            from config.celery import app as celery_app
+            celery_app.conf.broker_url = "memory://"
+
+        counters = {"queries": 0, "publishes": 0, "errors": 0}
+
+        def count_queries(execute, sql, params, many, context):
+            counters["queries"] += 1
+            return execute(sql, params, many, context)
+
+        def count_publish(**kwargs):
+            counters["publishes"] += 1
+
+        before_task_publish.connect(count_publish, weak=False)
+        try:
+            with connection.execute_wrapper(count_queries):
+                started = time.perf_counter()
+                latencies, unit = self._replay(events, options, counters)
+                elapsed = time.perf_counter() - started
+
+                drain_elapsed = None
+                if options["mode"] == "http" and options["drain"]:
+                    drain_started = time.perf_counter()
+                    while drain_webhook_inbox(limit=options["batch_size"], grace_seconds=0):
+                        pass
+                    drain_elapsed = time.perf_counter() - drain_started
+        finally:
+            before_task_publish.disconnect(count_publish)
+
+        self._report(events, elapsed, drain_elapsed, latencies, unit, counters)
+
+    def _load(self, path: str, limit: int | None) -> list[dict]:
+        events = []
+        with open(path, encoding="utf-8") as archive:
+            for line in archive:
+                line = line.strip()
+                if not line:
+                    continue
+                events.append(json.loads(line))
+                if limit and len(events) >= limit:
+                    break
+        return events
+
+    def _replay(self, events, options, counters) -> tuple[list[float], str]:
+        latencies = []
+
+        if options["mode"] == "batch":
+            size = options["batch_size"]
+            for start in range(0, len(events), size):
+                t0 = time.perf_counter()
+                try:
+                    process_payment_webhooks_batch(events[start:start + size])
+                except Exception:
+                    counters["errors"] += 1
+                latencies.append(time.perf_counter() - t0)
+            return latencies, f"lote de {size}"
+
+        if options["mode"] == "http":
+            client = Client(HTTP_HOST="localhost")
+            url = reverse("payments_api_v1:webhook")
+            for event in events:
+                t0 = time.perf_counter()
+                response = client.post(
+                    url, data=json.dumps(event), content_type="application/json"
+                )
+                latencies.append(time.perf_counter() - t0)
+                if response.status_code >= 400:
+                    counters["errors"] += 1
+            return latencies, "evento"
+
+        for event in events:
+            t0 = time.perf_counter()
+            try:
+                process_payment_webhook(event)
+            except Exception:
+                counters["errors"] += 1
+            latencies.append(time.perf_counter() - t0)
+        return latencies, "evento"
+
+    def _report(self, events, elapsed, drain_elapsed, latencies, unit, counters):
+        total = len(events)
+        latencies = sorted(latencies)
+
+        self.stdout.write(f"Eventos:            {total}")
+        self.stdout.write(f"Tempo total:        {elapsed:.2f} s")
+        self.stdout.write(f"Throughput:         {total / elapsed:.1f} eventos/s")
+        self.stdout.write(
+            f"Latência ({unit}):  "
+            f"p50 {percentile(latencies, 0.50) * 1000:.2f} ms | "
+            f"p95 {percentile(latencies, 0.95) * 1000:.2f} ms | "
+            f"p99 {percentile(latencies, 0.99) * 1000:.2f} ms"
+        )
+        if drain_elapsed is not None:
+            self.stdout.write(
+                f"Dreno da caixa:     {drain_elapsed:.2f} s "
+                f"({total / drain_elapsed:.1f} eventos/s)"
+                if drain_elapsed else "Dreno da caixa:     0.00 s"
+            )
+        self.stdout.write(f"SQL por evento:     {counters['queries'] / total:.2f}")
+        self.stdout.write(f"Tasks por evento:   {counters['publishes'] / total:.3f}")
+        self.stdout.write(f"Erros:              {counters['errors']}")
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0006_webhookinbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webhookinbox',
+            name='event_id',
+            field=models.CharField(blank=True, max_length=255, null=True, unique=True, verbose_name='ID do evento'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0007_webhookinbox_event_id'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='paymentlink',
+            name='id_link',
+            field=models.CharField(max_length=255, unique=True, verbose_name='ID do link de pagamento'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0007_order_link_status'),
+        ('payments', '0008_paymentlink_id_link_unique'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='paymentlink',
+            index=models.Index(fields=['status', 'created_at'], name='payment_lin_status_691618_idx'),
+        ),
+    ]
@@ -27,6 +27,14 @@ PAYMENT_LINK_STATUS = (
 )
 
 
+WEBHOOK_INBOX_STATUS = (
+    ("pending", "Pendente"),
+    ("processing", "Processando"),
+    ("done", "Processado"),
+    ("failed", "Falhou"),
+)
+
+
 
 class PaymentLink(BaseModel):
     order = models.ForeignKey(
@@ -36,7 +44,12 @@ class PaymentLink(BaseModel):
         verbose_name="Pedido",
     )
     url_link = models.URLField(max_length=500, verbose_name="Link de pagamento")
-    id_link = models.CharField(max_length=255, verbose_name="ID do link de pagamento")
+    # Código da cobrança no Pagar.me (data.code nos webhooks)
+    id_link = models.CharField(
+        max_length=255,
+        unique=True,
+        verbose_name="ID do link de pagamento",
+    )
     amount = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Valor", null=True, blank=True)
     status = models.CharField(
         max_length=50,
@@ -53,6 +66,10 @@ class PaymentLink(BaseModel):
         verbose_name_plural = "Links de Pagamento"
         ordering = ["-created_at"]
         db_table = "payment_links"
+        indexes = [
+            # Varredura de expiração e consultas de links em aberto
+            models.Index(fields=["status", "created_at"]),
+        ]
 
 
 class Payment(BaseModel):
@@ -81,4 +98,45 @@ class Payment(BaseModel):
         verbose_name = "Pagamento"
         verbose_name_plural = "Pagamentos"
         ordering = ["-created_at"]
-        db_table = "payments"
\ No newline at end of file
+        db_table = "payments"
+
+
+class WebhookInbox(BaseModel):
+    """
+    Caixa de entrada durável dos webhooks do Pagar.me.
+
+    O endpoint apenas grava o payload bruto e responde; o processamento
+    acontece depois, no worker Celery.
+    """
+
+    # ID do evento no Pagar.me (hook_...): índice de eventos já recebidos
+    event_id = models.CharField(
+        max_length=255,
+        null=True,
+        blank=True,
+        unique=True,
+        verbose_name="ID do evento",
+    )
+    event_type = models.CharField(max_length=100, verbose_name="Tipo do evento")
+    payload = models.JSONField(verbose_name="Payload")
+    status = models.CharField(
+        max_length=20,
+        choices=WEBHOOK_INBOX_STATUS,
+        default="pending",
+        verbose_name="Status",
+    )
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Tentativas")
+    last_error = models.TextField(blank=True, default="", verbose_name="Último erro")
+    processed_at = models.DateTimeField(null=True, blank=True, verbose_name="Processado em")
+
+    def __str__(self):
+        return f"Webhook {self.id} — {self.event_type} — {self.status}"
+
+    class Meta:
+        verbose_name = "Webhook recebido"
+        verbose_name_plural = "Webhooks recebidos"
+        ordering = ["created_at"]
+        db_table = "webhook_inbox"
+        indexes = [
+            models.Index(fields=["status", "created_at"]),
+        ]
@@ -7,13 +7,25 @@ Exporta as funções de Commands (escrita) e Queries (leitura).
 # COMMANDS - Escrita
 from apps.payments.services.commands import (
     process_payment_link_for_order,
+    generate_payment_link_for_order,
+    mark_payment_link_failed,
+    requeue_failed_payment_links,
+    generate_payment_links_for_orders,
     process_payment_webhook,
+    process_payment_webhooks_batch,
+    receive_payment_webhook,
+    process_webhook_inbox,
+    drain_webhook_inbox,
+    purge_processed_webhooks,
     cancel_payment_link,
+    expire_overdue_payment_links,
 )
 
 # QUERIES - Leitura
 from apps.payments.services.queries import (
     get_payment_links_for_order,
+    get_payment_link_by_charge_code,
+    is_unknown_charge_code,
     list_active_payment_links,
     list_payments,
     list_payments_by_status,
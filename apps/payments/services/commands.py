@@ -19,21 +19,40 @@ Este arquivo NÃO:
 ✘ decide regras (isso é do rules)
 """
 
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 from decimal import Decimal
-from django.db import transaction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
 from django.utils import timezone
 
-from apps.payments.models import Payment, PaymentLink
-from apps.core.integrations.pagarme import PagarMePaymentLink
-from apps.notifications.services.payment_notifications import payment_status as ps
+from apps.orders.models import Order
+from apps.payments.models import Payment, PaymentLink, WebhookInbox
+from apps.payments.services.queries import (
+    charge_code_cache_key,
+    get_payment_link_by_charge_code,
+    is_unknown_charge_code,
+)
+from apps.core.integrations.pagarme import PAGARME_BULKHEAD, PagarMePaymentLink
+from apps.notifications.services.payment_notifications import (
+    payment_link_created,
+    payment_status as ps,
+    payment_statuses,
+)
 
 # REGRAS DE NEGÓCIO (DOMÍNIO)
 from apps.payments.domain.rules import (
+    is_payment_status_regression,
     is_valid_payment_status,
     resolve_payment_link_status,
     resolve_order_status_from_payment,
+    resolve_terminal_payment_status,
 )
 
+logger = logging.getLogger("payments")
+
 # ================================================================
 # CRIAÇÃO DE LINK DE PAGAMENTO
 # ================================================================
@@ -49,6 +68,118 @@ def process_payment_link_for_order(order) -> PaymentLink | None:
     return _create_payment_link_record(order, link_data)
 
 
+def generate_payment_link_for_order(order_id: int) -> PaymentLink | None:
+    """
+    Etapa assíncrona da criação do pedido (generate_payment_link_task).
+
+    Fluxo:
+    - Trava o pedido (SELECT ... FOR UPDATE) até o fim da geração
+    - Reaproveita o link ativo se já existir (retentativa da task)
+    - Gera o link no Pagar.me e persiste
+    - Marca o pedido como "ready"
+    - Enfileira o envio do link por WhatsApp (no commit)
+
+    A trava é o que impede dois links reais no Pagar.me para o mesmo
+    pedido: retentativa da task, recuperação periódica e novo disparo
+    manual esperam a geração em andamento e encontram o link criado. A
+    recuperação pula pedidos travados (skip_locked).
+
+    Retorna None se o Pagar.me falhar (a task decide se tenta de novo).
+    """
+    with transaction.atomic():
+        order = (
+            Order.objects
+            .select_for_update(of=("self",))
+            .select_related("seller")
+            .filter(pk=order_id)
+            .first()
+        )
+        if not order:
+            return None
+
+        payment_link = order.payment_links.filter(status="active").first()
+        if payment_link:
+            if order.link_status != "ready":
+                Order.objects.filter(pk=order.pk).update(link_status="ready")
+            return payment_link
+
+        link_data = _generate_payment_link(order)
+        if not link_data:
+            return None
+
+        payment_link = _create_payment_link_record(order, link_data)
+        if not payment_link:
+            return None
+
+        Order.objects.filter(pk=order.pk).update(
+            link_status="ready", updated_at=timezone.now()
+        )
+        payment_link_created(payment_link=payment_link)
+
+    return payment_link
+
+
+def mark_payment_link_failed(order_id: int) -> None:
+    """
+    Marca a geração do link como falha (retentativas esgotadas).
+    """
+    Order.objects.filter(pk=order_id, link_status="generating").update(
+        link_status="failed", updated_at=timezone.now()
+    )
+
+
+def requeue_failed_payment_links(
+    limit: int, max_age: timedelta, stale_after: timedelta | None = None
+) -> list[int]:
+    """
+    Devolve para "generating" pedidos cujo link falhou (ex.: Pagar.me fora).
+
+    Com stale_after, pega também pedidos parados em "generating" há mais
+    que isso: criados fora de create_order (admin, shell, outra rotina)
+    nunca tiveram a task disparada, ou a task se perdeu.
+
+    Só pedidos recentes (max_age). Os "failed" precisam estar sem link
+    ativo; um "generating" com link ativo só é marcado "ready" pela task.
+    Mesma trava da geração (SELECT ... FOR UPDATE, skip_locked): dois
+    dispatchers nunca pegam o mesmo pedido, e pedido em geração não é
+    reenfileirado.
+
+    Retorna os IDs dos pedidos que devem ter o link regenerado.
+    """
+    now = timezone.now()
+    # skip_locked: pedido com geração em andamento (travado em
+    # generate_payment_link_for_order) fica de fora
+    recent = (
+        Order.objects
+        .select_for_update(skip_locked=True, of=("self",))
+        .filter(created_at__gte=now - max_age)
+    )
+
+    with transaction.atomic():
+        candidates = list(
+            recent
+            .filter(link_status="failed")
+            .exclude(payment_links__status="active")
+            .order_by("created_at")
+            .values_list("pk", flat=True)[:limit]
+        )
+        if stale_after is not None:
+            candidates += (
+                recent
+                .filter(link_status="generating", updated_at__lt=now - stale_after)
+                .order_by("created_at")
+                .values_list("pk", flat=True)[:limit]
+            )
+
+        requeued = candidates[:limit]
+        # Linhas travadas nesta transação: nenhum outro dispatcher as pega
+        Order.objects.filter(pk__in=requeued).update(
+            link_status="generating", updated_at=timezone.now()
+        )
+
+    return requeued
+
+
 def _generate_payment_link(order) -> dict | None:
     """
     Integração com Pagar.me para gerar link de pagamento.
@@ -85,110 +216,748 @@ def _create_payment_link_record(order, link_data: dict) -> PaymentLink | None:
     Persiste o PaymentLink no banco.
     """
     try:
-        return PaymentLink.objects.create(
-            order=order,
-            id_link=link_data["id"],
-            url_link=link_data["url"],
-            amount=order.total,
-            status="active",
-            is_active=True,
-        )
+        # Savepoint: a falha não invalida a transação de quem chamou
+        with transaction.atomic():
+            payment_link = PaymentLink.objects.create(
+                order=order,
+                id_link=link_data["id"],
+                url_link=link_data["url"],
+                amount=order.total,
+                status="active",
+                is_active=True,
+            )
     except Exception:
         return None
 
+    # Substitui um eventual cache negativo do código recém-criado
+    cache.set(
+        charge_code_cache_key(payment_link.id_link),
+        payment_link.id,
+        getattr(settings, "PAYMENT_LINK_CACHE_TTL", 60 * 60),
+    )
+    return payment_link
+
+
+# ================================================================
+# CRIAÇÃO DE LINKS EM LOTE (IMPORTAÇÃO DE PEDIDOS)
+# ================================================================
+
+def generate_payment_links_for_orders(
+    order_ids: list[int],
+    max_workers: int | None = None,
+) -> dict[int, PaymentLink | None]:
+    """
+    Gera os links de vários pedidos com chamadas concorrentes ao Pagar.me.
+
+    Fluxo:
+    - Uma consulta para os pedidos (+ vendedor), travados até o fim do
+      lote, ignorando os que já têm link ativo ou estão travados por outra
+      geração
+    - Chamadas ao Pagar.me num pool de threads limitado (padrão: o tamanho
+      do bulkhead do Pagar.me); as threads não tocam no banco
+    - bulk_create dos PaymentLinks e UPDATE em massa do link_status
+    - Envio dos links por WhatsApp enfileirado no commit
+
+    Pedidos cujo link falhou ficam "failed" (retry_failed_payment_links_task
+    tenta de novo).
+
+    Retorna {id do pedido: PaymentLink ou None}.
+    """
+    if max_workers is None:
+        max_workers = PAGARME_BULKHEAD.max_concurrent
+
+    # Pedidos travados até o fim do lote (mesma trava de
+    # generate_payment_link_for_order); os já travados ficam de fora
+    with transaction.atomic():
+        orders = list(
+            Order.objects
+            .select_for_update(skip_locked=True, of=("self",))
+            .select_related("seller")
+            .filter(pk__in=order_ids)
+            .exclude(payment_links__status="active")
+        )
+        if not orders:
+            return {}
+
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+            link_data = dict(zip(
+                (order.pk for order in orders),
+                pool.map(_generate_payment_link, orders),
+            ))
+
+        new_links = [
+            PaymentLink(
+                order=order,
+                id_link=link_data[order.pk]["id"],
+                url_link=link_data[order.pk]["url"],
+                amount=order.total,
+                status="active",
+                is_active=True,
+            )
+            for order in orders
+            if link_data[order.pk]
+        ]
+        ready_ids = [link.order.pk for link in new_links]
+        failed_ids = [order.pk for order in orders if not link_data[order.pk]]
+        now = timezone.now()
+
+        PaymentLink.objects.bulk_create(new_links)
+        if ready_ids:
+            Order.objects.filter(pk__in=ready_ids).update(link_status="ready", updated_at=now)
+        if failed_ids:
+            Order.objects.filter(pk__in=failed_ids).update(link_status="failed", updated_at=now)
+
+        for payment_link in new_links:
+            payment_link_created(payment_link=payment_link)
+
+    cache.set_many(
+        {charge_code_cache_key(link.id_link): link.id for link in new_links if link.id},
+        getattr(settings, "PAYMENT_LINK_CACHE_TTL", 60 * 60),
+    )
+
+    results: dict[int, PaymentLink | None] = {}
+    for payment_link in new_links:
+        results[payment_link.order.pk] = payment_link
+    for order_id in failed_ids:
+        results[order_id] = None
+
+    return results
+
 
 # ================================================================
 # WEBHOOK – PROCESSAMENTO DE PAGAMENTO
 # ================================================================
 
+# Tradução status externo (Pagar.me) → interno
+PAGARME_PAYMENT_STATUS_MAP = {
+    "pending": "pending",
+    "processing": "processing",
+    "paid": "paid",
+    "failed": "failed",
+    "canceled": "canceled",
+    "refunded": "refunded",
+    "chargeback": "chargeback",
+    "overpaid": "overpaid",
+    "underpaid": "underpaid",
+}
+
+
+def _normalize_payment_status(pagarme_status: str | None) -> str | None:
+    """
+    Traduz o status do Pagar.me; None se não for reconhecido.
+    """
+    payment_status = PAGARME_PAYMENT_STATUS_MAP.get(pagarme_status)
+
+    if not payment_status or not is_valid_payment_status(payment_status):
+        return None
+
+    return payment_status
+
+
 def process_payment_webhook(webhook_data: dict) -> Payment | None:
     """
     Processa eventos recebidos via webhook do Pagar.me.
 
     Fluxo:
-    - Identifica PaymentLink
+    - Identifica PaymentLink (uma consulta: link + pedido + vendedor + pagamento)
     - Normaliza status
     - Aplica rules
-    - Persiste tudo de forma transacional
+    - Persiste de forma transacional, com UPDATE só do que mudou
+
+    Orçamento de consultas:
+    - evento repetido (nada muda): 1 SELECT ... FOR UPDATE
+    - primeiro evento: 2 SELECTs + 1 INSERT + até 2 UPDATEs
+    - notificação sem lazy load (vendedor já vem no SELECT)
+
+    Concorrência: o SELECT trava a linha do PaymentLink até o fim da
+    transação, então dois workers nunca aplicam eventos do mesmo link
+    ao mesmo tempo.
     """
 
     data = webhook_data.get("data", {})
     charge_id = data.get("code")
 
-    payment_link = (
-        PaymentLink.objects
-        .select_related("order")
-        .filter(id_link=charge_id)
-        .first()
-    )
-    
-    if not payment_link:
+    payment_status = _normalize_payment_status(data.get("status"))
+    if not payment_status or is_unknown_charge_code(charge_id):
         return None
 
-    pagarme_status = data.get("status")
-    print(pagarme_status)
-    
-
-    # Tradução status externo → interno
-    payment_status_map = {
-        "pending": "pending",
-        "processing": "processing",
-        "paid": "paid",
-        "failed": "failed",
-        "canceled": "canceled",
-        "refunded": "refunded",
-        "chargeback": "chargeback",
-        "overpaid": "overpaid",
-        "underpaid": "underpaid",
-    }
-
-    payment_status = payment_status_map.get(pagarme_status)
+    with transaction.atomic():
+        # Lock na linha do link: eventos da mesma cobrança são serializados,
+        # cobranças diferentes seguem em paralelo
+        payment_link = get_payment_link_by_charge_code(
+            charge_id,
+            queryset=(
+                PaymentLink.objects
+                .select_related("order__seller", "payment")
+                .select_for_update(of=("self",))
+            ),
+        )
 
-    if not payment_status or not is_valid_payment_status(payment_status):
-        return None
+        if not payment_link:
+            return None
 
-    amount = Decimal(str(data.get("paid_amount", 0))) / 100
-    paid_at = data.get("paid_at") or timezone.now()
+        payment = _get_locked_link_payment(payment_link)
 
-    with transaction.atomic():
+        order = payment_link.order
+        new_link_status = resolve_payment_link_status(payment_status)
+        new_order_status = resolve_order_status_from_payment(payment_status)
+
+        create_payment = payment is None
+        update_payment = not create_payment and payment.status != payment_status
+        update_link = bool(new_link_status) and payment_link.status != new_link_status
+        update_order = bool(new_order_status) and order.status != new_order_status
+
+        if not (create_payment or update_payment or update_link or update_order):
+            # Nada mudou (reenvio): nenhuma escrita, nenhuma notificação
+            return payment
+
+        now = timezone.now()
 
         # --------------------------------------------------
         # PAYMENT (financeiro)
         # --------------------------------------------------
-        payment, created = Payment.objects.get_or_create(
-            payment_link=payment_link,
-            defaults={
-                "status": payment_status,
-                "amount": amount,
-                "payment_date": paid_at,
-            }
-        )
-
-        if not created and payment.status != payment_status:
+        if create_payment:
+            payment = Payment.objects.create(
+                payment_link=payment_link,
+                status=payment_status,
+                amount=Decimal(str(data.get("paid_amount", 0))) / 100,
+                payment_date=data.get("paid_at") or now,
+            )
+        elif update_payment:
+            Payment.objects.filter(pk=payment.pk).update(
+                status=payment_status, updated_at=now
+            )
             payment.status = payment_status
-            payment.save(update_fields=["status"])
 
         # --------------------------------------------------
         # PAYMENT LINK (estado do link)
         # --------------------------------------------------
-        new_link_status = resolve_payment_link_status(payment_status)
-        if new_link_status:
+        if update_link:
+            PaymentLink.objects.filter(pk=payment_link.pk).update(
+                status=new_link_status, updated_at=now
+            )
             payment_link.status = new_link_status
-            payment_link.save(update_fields=["status"])
 
         # --------------------------------------------------
         # ORDER (estado comercial)
         # --------------------------------------------------
-        order = payment_link.order
-        new_order_status = resolve_order_status_from_payment(payment_status)
-        if new_order_status:
+        if update_order:
+            Order.objects.filter(pk=order.pk).update(
+                status=new_order_status, updated_at=now
+            )
             order.status = new_order_status
-            order.save(update_fields=["status"])
-    
-    ps(payment=payment)
+
+        if create_payment or update_payment:
+            # Publicada no commit: rollback não gera notificação
+            ps(payment=payment)
+
+    return payment
+
+
+def _get_locked_link_payment(payment_link: PaymentLink) -> Payment | None:
+    """
+    Retorna o Payment de um link já travado por select_for_update.
+
+    O pagamento vem no JOIN do SELECT, mas se outro worker o criou enquanto
+    esperávamos o lock, o JOIN ainda o enxerga como inexistente. Só nesse
+    caso (link sem pagamento) relemos a tabela de pagamentos.
+    """
+    try:
+        return payment_link.payment
+    except Payment.DoesNotExist:
+        pass
+
+    payment = Payment.objects.filter(payment_link=payment_link).first()
+    if payment:
+        payment.payment_link = payment_link
+    return payment
+
+
+# ================================================================
+# WEBHOOK – PROCESSAMENTO EM LOTE (COALESCÊNCIA)
+# ================================================================
+
+def process_payment_webhooks_batch(events: list[dict]) -> dict[str, Payment]:
+    """
+    Processa vários webhooks de uma vez, agrupando por cobrança.
+
+    Fluxo:
+    - Agrupa eventos pelo código da cobrança (data.code)
+    - Mantém só o status terminal de cada cobrança
+      (resolve_terminal_payment_status), e só o aplica se não for
+      anterior ao status já gravado (PAYMENT_STATUS_PRECEDENCE)
+    - Busca links, pedidos e pagamentos numa única consulta, travando
+      os links (select_for_update) em ordem de PK
+    - Grava Payment, PaymentLink e Order com bulk_create/bulk_update
+      numa única transação
+    - Notificações do lote saem numa única task, publicada no commit
+
+    Retorna {código da cobrança: Payment} das cobranças processadas.
+    Eventos de cobranças desconhecidas ou com status inválido ficam de fora.
+    """
+    grouped: dict[str, list[dict]] = {}
+    for webhook_data in events:
+        data = webhook_data.get("data") or {}
+        charge_code = data.get("code")
+        if charge_code and not is_unknown_charge_code(charge_code):
+            grouped.setdefault(charge_code, []).append(data)
+
+    # Evento que "vence" em cada cobrança
+    terminal_events: dict[str, tuple[str, dict]] = {}
+    for charge_code, charge_events in grouped.items():
+        statuses = [
+            PAGARME_PAYMENT_STATUS_MAP.get(data.get("status")) for data in charge_events
+        ]
+        terminal_status = resolve_terminal_payment_status(statuses)
+        if not terminal_status:
+            continue
+
+        # Último evento da cobrança com o status terminal
+        terminal_data = next(
+            data for data, status in zip(reversed(charge_events), reversed(statuses))
+            if status == terminal_status
+        )
+        terminal_events[charge_code] = (terminal_status, terminal_data)
+
+    if not terminal_events:
+        return {}
+
+    now = timezone.now()
+    processed: dict[str, Payment] = {}
+    changed: list[Payment] = []
+    new_payments, updated_payments, updated_links, updated_orders = [], [], [], []
+
+    with transaction.atomic():
+        # Lock em ordem de PK: lotes concorrentes não entram em deadlock
+        links = list(
+            PaymentLink.objects
+            .select_related("order__seller", "payment")
+            .select_for_update(of=("self",))
+            .filter(id_link__in=terminal_events.keys())
+            .order_by("pk")
+        )
+
+        # Pagamentos criados por outro worker enquanto esperávamos o lock
+        missing = [link for link in links if not hasattr(link, "payment")]
+        late_payments = {
+            payment.payment_link_id: payment
+            for payment in Payment.objects.filter(payment_link__in=missing)
+        } if missing else {}
+
+        for payment_link in links:
+            payment_status, data = terminal_events[payment_link.id_link]
+
+            # --------------------------------------------------
+            # PAYMENT (financeiro)
+            # --------------------------------------------------
+            try:
+                payment = payment_link.payment
+            except Payment.DoesNotExist:
+                payment = late_payments.get(payment_link.id)
+                if payment:
+                    payment.payment_link = payment_link
+
+            if payment is not None and is_payment_status_regression(payment.status, payment_status):
+                # Evento atrasado (ex.: "pending" depois de "paid"): não volta o status
+                processed[payment_link.id_link] = payment
+                continue
+
+            if payment is None:
+                payment = Payment(
+                    payment_link=payment_link,
+                    status=payment_status,
+                    amount=Decimal(str(data.get("paid_amount", 0))) / 100,
+                    payment_date=data.get("paid_at") or now,
+                )
+                new_payments.append(payment)
+                changed.append(payment)
+            elif payment.status != payment_status:
+                payment.status = payment_status
+                payment.updated_at = now
+                updated_payments.append(payment)
+                changed.append(payment)
+
+            # --------------------------------------------------
+            # PAYMENT LINK (estado do link)
+            # --------------------------------------------------
+            new_link_status = resolve_payment_link_status(payment_status)
+            if new_link_status and payment_link.status != new_link_status:
+                payment_link.status = new_link_status
+                payment_link.updated_at = now
+                updated_links.append(payment_link)
+
+            # --------------------------------------------------
+            # ORDER (estado comercial)
+            # --------------------------------------------------
+            order = payment_link.order
+            new_order_status = resolve_order_status_from_payment(payment_status)
+            if new_order_status and order.status != new_order_status:
+                order.status = new_order_status
+                order.updated_at = now
+                updated_orders.append(order)
+
+            processed[payment_link.id_link] = payment
+
+        if new_payments:
+            Payment.objects.bulk_create(new_payments)
+        if updated_payments:
+            Payment.objects.bulk_update(updated_payments, ["status", "updated_at"])
+        if updated_links:
+            PaymentLink.objects.bulk_update(updated_links, ["status", "updated_at"])
+        if updated_orders:
+            Order.objects.bulk_update(updated_orders, ["status", "updated_at"])
+
+        # Uma única publicação no commit para todo o lote
+        payment_statuses(payments=changed)
+
+    return processed
+
+
+# ================================================================
+# WEBHOOK INBOX – RECEBIMENTO E CONSUMO ASSÍNCRONO
+# ================================================================
+
+WEBHOOK_RECEIVED_RESPONSE = {"status": "recebido"}
+
+
+def _webhook_event_cache_key(event_id: str) -> str:
+    return f"payments:webhook:event:{event_id}"
+
+
+def receive_payment_webhook(payload: dict) -> dict:
+    """
+    Grava o payload bruto na caixa de entrada e agenda o processamento.
+
+    É o único trabalho feito durante a requisição do webhook: um INSERT.
+    Se o broker estiver fora, o registro fica "pending" e o dreno
+    periódico (drain_webhook_inbox) processa depois.
+
+    Idempotência (o Pagar.me reenvia o mesmo evento várias vezes):
+    - o ID do evento fica num cache quente com TTL → reenvio custa uma
+      consulta ao cache, sem ORM
+    - a constraint unique em WebhookInbox.event_id cobre o caso de cache
+      frio/expirado ou fora do ar (erro do cache conta como miss)
+
+    Cobrança desconhecida também é gravada: o link pode ter sido criado
+    por um caminho que não atualiza o cache (admin, shell) e o Pagar.me
+    não reenvia um evento respondido com 2xx.
+
+    Retorna a resposta a devolver ao Pagar.me (a mesma para reenvios).
+    """
+    event_id = payload.get("id") or None
+    charge_code = (payload.get("data") or {}).get("code")
+
+    if event_id:
+        cached = _cached_webhook_response(event_id)
+        if cached is not None:
+            return cached
+
+    try:
+        with transaction.atomic():
+            inbox = WebhookInbox.objects.create(
+                event_id=event_id,
+                event_type=payload.get("type") or "",
+                payload=payload,
+            )
+    except IntegrityError:
+        logger.info(f"Webhook duplicado ignorado: {event_id}")
+    else:
+        # Modo lote: sem task por evento, o dreno periódico consome em lotes
+        if not getattr(settings, "WEBHOOK_BATCH_MODE", False):
+            transaction.on_commit(
+                lambda: _dispatch_webhook_inbox(inbox.id, charge_code)
+            )
+
+    if event_id:
+        _remember_webhook_response(event_id)
+
+    return WEBHOOK_RECEIVED_RESPONSE
+
+
+def _cached_webhook_response(event_id: str) -> dict | None:
+    try:
+        return cache.get(_webhook_event_cache_key(event_id))
+    except Exception:
+        # Cache fora do ar não pode impedir a gravação: a constraint
+        # unique da caixa de entrada segura o reenvio
+        logger.warning("Cache indisponível na recepção do webhook")
+        return None
+
+
+def _remember_webhook_response(event_id: str) -> None:
+    try:
+        cache.set(
+            _webhook_event_cache_key(event_id),
+            WEBHOOK_RECEIVED_RESPONSE,
+            getattr(settings, "WEBHOOK_EVENT_CACHE_TTL", 60 * 60 * 24),
+        )
+    except Exception:
+        logger.warning("Cache indisponível na recepção do webhook")
+
+
+def _dispatch_webhook_inbox(inbox_id: int, charge_code: str | None = None) -> None:
+    """
+    Enfileira o processamento de um webhook no Celery.
+
+    A fila é escolhida pelo código da cobrança (webhook_queue_for_charge):
+    eventos da mesma cobrança sempre caem na mesma fila, em ordem.
+    """
+    from apps.payments.tasks import process_webhook_inbox_task, webhook_queue_for_charge
+
+    try:
+        process_webhook_inbox_task.apply_async(
+            args=[inbox_id],
+            queue=webhook_queue_for_charge(charge_code),
+        )
+    except Exception:
+        # O dreno periódico recupera o que não foi enfileirado
+        logger.warning(f"Falha ao enfileirar webhook {inbox_id}", exc_info=True)
+
+
+def _claim_webhook_inbox(inbox_id: int) -> bool:
+    """
+    Marca o webhook como "processing" se ainda estiver pendente.
+
+    O UPDATE condicional garante que dois workers não processem o
+    mesmo registro.
+    """
+    return bool(
+        WebhookInbox.objects
+        .filter(id=inbox_id, status="pending")
+        .update(status="processing", updated_at=timezone.now())
+    )
+
+
+def process_webhook_inbox(inbox_id: int) -> Payment | None:
+    """
+    Processa um webhook da caixa de entrada via process_payment_webhook.
+
+    Resultado:
+    - "done"    → pagamento processado
+    - "failed"  → evento rejeitado (link desconhecido, status inválido)
+                  ou tentativas esgotadas
+    - "pending" → erro inesperado, volta para a fila
+    """
+    if not _claim_webhook_inbox(inbox_id):
+        return None
+
+    inbox = WebhookInbox.objects.get(id=inbox_id)
+    max_attempts = getattr(settings, "WEBHOOK_INBOX_MAX_ATTEMPTS", 5)
+
+    try:
+        payment = process_payment_webhook(inbox.payload)
+    except Exception as e:
+        logger.exception(f"Erro ao processar webhook {inbox_id}")
+        attempts = inbox.attempts + 1
+        WebhookInbox.objects.filter(id=inbox_id).update(
+            status="failed" if attempts >= max_attempts else "pending",
+            attempts=attempts,
+            last_error=str(e),
+            updated_at=timezone.now(),
+        )
+        return None
+
+    WebhookInbox.objects.filter(id=inbox_id).update(
+        status="done" if payment else "failed",
+        attempts=inbox.attempts + 1,
+        last_error="" if payment else "Evento rejeitado",
+        processed_at=timezone.now(),
+        updated_at=timezone.now(),
+    )
     return payment
 
 
+def drain_webhook_inbox(limit: int | None = None, *, grace_seconds: int | None = None) -> int:
+    """
+    Consome webhooks pendentes da caixa de entrada (Celery beat).
+
+    - WEBHOOK_BATCH_MODE: processa em lote (process_payment_webhooks_batch);
+      eventos da mesma cobrança que se acumularam na fila são coalescidos
+      e só o status terminal é gravado
+    - sem modo lote: cada evento já tem sua task na fila da cobrança; o
+      dreno só recupera os que passaram de WEBHOOK_INBOX_DRAIN_GRACE_SECONDS
+      sem ser consumidos (broker fora, task perdida), um por vez e em
+      ordem, para não atropelar a ordem das filas por cobrança
+
+    Também devolve para a fila registros presos em "processing"
+    (worker morto no meio do processamento).
+
+    grace_seconds substitui a carência (0 = quem chama faz o papel do
+    worker, ex.: replay_webhooks --drain).
+
+    Retorna a quantidade de webhooks consumidos.
+    """
+    limit = limit or getattr(settings, "WEBHOOK_INBOX_BATCH_SIZE", 100)
+    stale_seconds = getattr(settings, "WEBHOOK_INBOX_STALE_SECONDS", 300)
+    max_attempts = getattr(settings, "WEBHOOK_INBOX_MAX_ATTEMPTS", 5)
+
+    WebhookInbox.objects.filter(
+        status="processing",
+        updated_at__lt=timezone.now() - timedelta(seconds=stale_seconds),
+    ).update(status="pending")
+
+    if not getattr(settings, "WEBHOOK_BATCH_MODE", False):
+        if grace_seconds is None:
+            grace_seconds = getattr(settings, "WEBHOOK_INBOX_DRAIN_GRACE_SECONDS", 120)
+        return _drain_overdue_webhooks(limit, grace_seconds)
+
+    # skip_locked: drenos concorrentes pegam lotes diferentes
+    with transaction.atomic():
+        batch = list(
+            WebhookInbox.objects
+            .select_for_update(skip_locked=True)
+            .filter(status="pending")
+            .order_by("created_at", "id")[:limit]
+        )
+        WebhookInbox.objects.filter(id__in=[inbox.id for inbox in batch]).update(
+            status="processing", updated_at=timezone.now()
+        )
+
+    if not batch:
+        return 0
+
+    try:
+        processed = process_payment_webhooks_batch([inbox.payload for inbox in batch])
+    except Exception as e:
+        logger.exception("Erro ao processar lote de webhooks")
+        for inbox in batch:
+            attempts = inbox.attempts + 1
+            inbox.status = "failed" if attempts >= max_attempts else "pending"
+            inbox.attempts = attempts
+            inbox.last_error = str(e)
+            inbox.updated_at = timezone.now()
+        WebhookInbox.objects.bulk_update(
+            batch, ["status", "attempts", "last_error", "updated_at"]
+        )
+        return 0
+
+    now = timezone.now()
+    for inbox in batch:
+        charge_code = (inbox.payload.get("data") or {}).get("code")
+        ok = charge_code in processed
+        inbox.status = "done" if ok else "failed"
+        inbox.attempts += 1
+        inbox.last_error = "" if ok else "Evento rejeitado"
+        inbox.processed_at = now
+        inbox.updated_at = now
+    WebhookInbox.objects.bulk_update(
+        batch, ["status", "attempts", "last_error", "processed_at", "updated_at"]
+    )
+
+    return len(batch)
+
+
+def _drain_overdue_webhooks(limit: int, grace_seconds: int) -> int:
+    """Processa um a um os pendentes mais velhos que a carência."""
+    overdue = list(
+        WebhookInbox.objects
+        .filter(status="pending", created_at__lte=timezone.now() - timedelta(seconds=grace_seconds))
+        .order_by("created_at", "id")
+        .values_list("id", flat=True)[:limit]
+    )
+    for inbox_id in overdue:
+        process_webhook_inbox(inbox_id)
+    return len(overdue)
+
+
+def purge_processed_webhooks(
+    *,
+    retention_days: int | None = None,
+    chunk_size: int = 1000,
+    max_chunks: int | None = None,
+) -> tuple[int, bool]:
+    """
+    Apaga da caixa de entrada os webhooks "done" mais velhos que a retenção.
+
+    Retenção: WEBHOOK_INBOX_RETENTION_DAYS (deve cobrir a janela de reenvio
+    do Pagar.me: enquanto o registro existe, a constraint de event_id barra
+    o reprocessamento). Registros "failed" ficam para investigação/replay.
+
+    Mesmo esquema da expiração de links: lotes de chunk_size pelo índice
+    (status, created_at), cada DELETE na sua transação.
+
+    Retorna (webhooks apagados, se ainda restam registros vencidos).
+    """
+    if retention_days is None:
+        retention_days = getattr(settings, "WEBHOOK_INBOX_RETENTION_DAYS", 7)
+    cutoff = timezone.now() - timedelta(days=retention_days)
+    expired = (
+        WebhookInbox.objects
+        .filter(status="done", created_at__lt=cutoff)
+        .order_by("created_at")
+    )
+
+    deleted = 0
+    chunks = 0
+    while max_chunks is None or chunks < max_chunks:
+        ids = list(expired.values_list("pk", flat=True)[:chunk_size])
+        if not ids:
+            return deleted, False
+
+        with transaction.atomic():
+            count, _ = WebhookInbox.objects.filter(pk__in=ids, status="done").delete()
+            deleted += count
+        chunks += 1
+
+        if len(ids) < chunk_size:
+            return deleted, False
+
+    return deleted, expired.exists()
+
+
+# ================================================================
+# EXPIRAÇÃO DE LINKS
+# ================================================================
+
+def expire_overdue_payment_links(
+    *,
+    chunk_size: int = 500,
+    max_chunks: int | None = None,
+) -> tuple[int, bool]:
+    """
+    Marca como "expired" os links ativos que passaram da validade.
+
+    Validade: PAYMENT_LINK_EXPIRES_MINUTES (o mesmo expires_in enviado ao
+    Pagar.me). Links com pagamento em "processing" ficam de fora: a
+    confirmação ainda pode chegar por webhook.
+
+    Processa em lotes de chunk_size (SELECT de PKs pelo índice
+    (status, created_at) + UPDATE), cada lote na sua transação, para não
+    segurar locks numa tabela grande. max_chunks limita a execução
+    (None = até acabar, modo catch-up).
+
+    Retorna (links expirados, se ainda restam links vencidos).
+    """
+    cutoff = timezone.now() - timedelta(
+        minutes=getattr(settings, "PAYMENT_LINK_EXPIRES_MINUTES", 1200)
+    )
+    overdue = (
+        PaymentLink.objects
+        .filter(status="active", created_at__lt=cutoff)
+        .exclude(payment__status="processing")
+        .order_by("created_at")
+    )
+
+    expired = 0
+    chunks = 0
+    while max_chunks is None or chunks < max_chunks:
+        ids = list(overdue.values_list("pk", flat=True)[:chunk_size])
+        if not ids:
+            return expired, False
+
+        with transaction.atomic():
+            # Condicional: webhook que chegou no meio do lote prevalece
+            expired += PaymentLink.objects.filter(pk__in=ids, status="active").update(
+                status="expired", updated_at=timezone.now()
+            )
+        chunks += 1
+
+        if len(ids) < chunk_size:
+            return expired, False
+
+    return expired, overdue.exists()
+
+
 # ================================================================
 # AÇÕES DIRETAS (COMMANDS SIMPLES)
 # ================================================================
@@ -14,6 +14,8 @@ Command = escrita
 
 from decimal import Decimal
 from typing import Iterable
+from django.conf import settings
+from django.core.cache import cache
 from django.db.models import Sum, Count, Q, QuerySet
 
 from apps.payments.models import PaymentLink, Payment
@@ -58,6 +60,77 @@ def list_active_payment_links() -> QuerySet[PaymentLink]:
     )
 
 
+def charge_code_cache_key(charge_code: str) -> str:
+    return f"payments:charge-code:{charge_code}"
+
+
+def is_unknown_charge_code(charge_code: str) -> bool:
+    """
+    Indica se o código já foi consultado recentemente e não existe.
+
+    Consulta APENAS o cache (cache negativo) — nunca o banco. Cache fora
+    do ar conta como miss (False).
+    """
+    return _cache_get(charge_code_cache_key(charge_code)) == 0
+
+
+def _cache_get(key: str):
+    try:
+        return cache.get(key)
+    except Exception:
+        # Cache fora do ar: segue pelo banco
+        return None
+
+
+def _cache_set(key: str, value, timeout: int) -> None:
+    try:
+        cache.set(key, value, timeout)
+    except Exception:
+        pass
+
+
+def get_payment_link_by_charge_code(
+    charge_code: str,
+    queryset: QuerySet[PaymentLink] | None = None,
+) -> PaymentLink | None:
+    """
+    Resolve o PaymentLink a partir do código da cobrança do Pagar.me.
+
+    Cache:
+    - positivo: código → ID do link (busca pela PK)
+    - negativo: código desconhecido fica marcado por um TTL curto,
+      e reenvios são rejeitados sem tocar no banco
+
+    Consultas ao banco: nenhuma no cache negativo, uma no caso comum e
+    duas quando o ID em cache ficou velho (link removido ou recriado; o
+    cache é corrigido na mesma chamada). Cache fora do ar: vai direto ao
+    banco.
+    """
+    if not charge_code:
+        return None
+
+    queryset = queryset if queryset is not None else PaymentLink.objects.all()
+    key = charge_code_cache_key(charge_code)
+    link_id = _cache_get(key)
+
+    if link_id == 0:
+        return None
+
+    if link_id:
+        link = queryset.filter(pk=link_id, id_link=charge_code).first()
+        if link:
+            return link
+
+    link = queryset.filter(id_link=charge_code).first()
+
+    if link:
+        _cache_set(key, link.id, getattr(settings, "PAYMENT_LINK_CACHE_TTL", 60 * 60))
+    else:
+        _cache_set(key, 0, getattr(settings, "PAYMENT_LINK_NEGATIVE_CACHE_TTL", 60))
+
+    return link
+
+
 # ================================================================
 # PAYMENTS (LEITURA)
 # ================================================================
@@ -0,0 +1,366 @@
+"""
+Conciliação com o Pagar.me: recupera webhooks perdidos.
+
+Dois modos:
+- Período (reconcile_charges_range): pagina as cobranças criadas num
+  intervalo, buscando algumas páginas em paralelo, e compara cada lote
+  com Payment / PaymentLink / Order
+- Direcionado (reconcile_stuck_links): consulta só os links parados
+  (pagamento pending/processing ou link ativo sem pagamento)
+
+Nada é carregado inteiro na memória: as cobranças chegam página a página
+e os links locais são percorridos por PK (keyset).
+
+Correções passam por process_payment_webhooks_batch, ou seja, pelas
+mesmas regras (domain/rules.py) e notificações dos webhooks.
+
+Cada divergência vira uma linha JSON no relatório:
+    {"charge_code", "kind", "remote_status", "payment_status",
+     "link_status", "order_status", "applied"}
+
+kind:
+- "missing_payment": cobrança sem Payment local
+- "status_mismatch": Payment, link ou pedido diferente do Pagar.me
+- "unknown_charge": cobrança sem link local (só relatada)
+- "error": falha ao consultar o Pagar.me
+"""
+import json
+import logging
+import math
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Iterator, TextIO
+
+import requests
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.core.integrations.pagarme import PagarMeCharges
+from apps.core.integrations.resilience import IntegrationUnavailable
+from apps.payments.domain.rules import (
+    resolve_order_status_from_payment,
+    resolve_payment_link_status,
+    resolve_terminal_payment_status,
+)
+from apps.payments.models import PaymentLink
+from apps.payments.services.commands import (
+    PAGARME_PAYMENT_STATUS_MAP,
+    process_payment_webhooks_batch,
+)
+
+logger = logging.getLogger("payments")
+
+STUCK_PAYMENT_STATUSES = ("pending", "processing")
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+# ================================================================
+# LEITURA DO PAGAR.ME
+# ================================================================
+
+def iter_charge_pages(
+    client: PagarMeCharges,
+    created_since: datetime,
+    created_until: datetime,
+    *,
+    page_size: int,
+    max_workers: int,
+) -> Iterator[list[dict]]:
+    """
+    Gera as páginas de cobranças do período, em ordem.
+
+    A primeira página informa o total; as demais são buscadas em janelas
+    de max_workers páginas simultâneas, então no máximo max_workers
+    páginas ficam em memória. Sem total na resposta, segue página a
+    página até uma página incompleta.
+    """
+    def fetch(page: int) -> list[dict]:
+        response = client.list_charges(
+            created_since=created_since,
+            created_until=created_until,
+            page=page,
+            size=page_size,
+        )
+        return response.get("data") or []
+
+    first = client.list_charges(
+        created_since=created_since, created_until=created_until, page=1, size=page_size
+    )
+    data = first.get("data") or []
+    yield data
+
+    total = (first.get("paging") or {}).get("total")
+    if total is None:
+        page = 1
+        while len(data) == page_size:
+            page += 1
+            data = fetch(page)
+            yield data
+        return
+
+    last_page = math.ceil(total / page_size)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for start in range(2, last_page + 1, max_workers):
+            pages = range(start, min(start + max_workers, last_page + 1))
+            yield from pool.map(fetch, pages)
+
+
+# ================================================================
+# COMPARAÇÃO E CORREÇÃO
+# ================================================================
+
+def _diff_kind(payment_link: PaymentLink, remote_status: str) -> str | None:
+    """Tipo da divergência entre o estado local e o status do Pagar.me."""
+    payment = getattr(payment_link, "payment", None)
+    if payment is None:
+        # Link aberto e cobrança ainda pendente: nada se perdeu
+        return "missing_payment" if remote_status != "pending" else None
+
+    new_link_status = resolve_payment_link_status(remote_status)
+    new_order_status = resolve_order_status_from_payment(remote_status)
+
+    if (
+        payment.status != remote_status
+        or (new_link_status and payment_link.status != new_link_status)
+        or (new_order_status and payment_link.order.status != new_order_status)
+    ):
+        return "status_mismatch"
+
+    return None
+
+
+def reconcile_charges(charges: list[dict], *, apply: bool = True) -> list[dict]:
+    """
+    Compara um lote de cobranças com o banco e corrige as divergências.
+
+    Uma consulta para os links do lote; correções num único
+    process_payment_webhooks_batch. Com apply=False só relata.
+
+    Returns:
+        Divergências encontradas (linhas do relatório)
+    """
+    by_code: dict[str, list[dict]] = {}
+    for charge in charges:
+        if charge.get("code"):
+            by_code.setdefault(charge["code"], []).append(charge)
+
+    if not by_code:
+        return []
+
+    links = {
+        link.id_link: link
+        for link in PaymentLink.objects
+        .select_related("order", "payment")
+        .filter(id_link__in=by_code.keys())
+    }
+
+    diffs = []
+    events = []
+    for code, code_charges in by_code.items():
+        statuses = [PAGARME_PAYMENT_STATUS_MAP.get(c.get("status")) for c in code_charges]
+        remote_status = resolve_terminal_payment_status(statuses)
+        if not remote_status:
+            continue
+
+        payment_link = links.get(code)
+        if payment_link is None:
+            diffs.append(_report_row(code, "unknown_charge", remote_status))
+            continue
+
+        kind = _diff_kind(payment_link, remote_status)
+        if not kind:
+            continue
+
+        diffs.append(_report_row(code, kind, remote_status, payment_link, applied=apply))
+        events.extend(
+            {"data": charge}
+            for charge, status in zip(code_charges, statuses)
+            if status == remote_status
+        )
+
+    if apply and events:
+        process_payment_webhooks_batch(events)
+
+    return diffs
+
+
+def _report_row(code, kind, remote_status, payment_link=None, applied=False, error=None):
+    payment = getattr(payment_link, "payment", None) if payment_link else None
+    row = {
+        "charge_code": code,
+        "kind": kind,
+        "remote_status": remote_status,
+        "payment_status": payment.status if payment else None,
+        "link_status": payment_link.status if payment_link else None,
+        "order_status": payment_link.order.status if payment_link else None,
+        "applied": applied,
+    }
+    if error:
+        row["error"] = error
+    return row
+
+
+def _write_report(report: TextIO | None, rows: list[dict]):
+    if report is None:
+        return
+    for row in rows:
+        report.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+
+def _new_summary() -> dict:
+    return {
+        "charges": 0,
+        "checked_links": 0,
+        "missing_payment": 0,
+        "status_mismatch": 0,
+        "unknown_charge": 0,
+        "applied": 0,
+        "errors": 0,
+    }
+
+
+def _count(summary: dict, rows: list[dict]):
+    for row in rows:
+        summary[row["kind"] if row["kind"] != "error" else "errors"] += 1
+        summary["applied"] += int(row["applied"])
+
+
+# ================================================================
+# MODO PERÍODO
+# ================================================================
+
+def reconcile_charges_range(
+    created_since: datetime,
+    created_until: datetime,
+    *,
+    apply: bool = True,
+    report: TextIO | None = None,
+    page_size: int | None = None,
+    max_workers: int | None = None,
+    client: PagarMeCharges | None = None,
+) -> dict:
+    """
+    Concilia todas as cobranças criadas no período, página a página.
+
+    Uma falha de consulta interrompe a varredura (as páginas já
+    processadas continuam corrigidas) e aparece no relatório como "error".
+
+    Returns:
+        Resumo: {"charges", "missing_payment", "status_mismatch",
+                 "unknown_charge", "applied", "errors", ...}
+    """
+    client = client or PagarMeCharges()
+    page_size = page_size or _setting("RECONCILIATION_PAGE_SIZE", 100)
+    max_workers = max_workers or _setting("RECONCILIATION_MAX_CONCURRENCY", 2)
+    summary = _new_summary()
+
+    pages = iter_charge_pages(
+        client, created_since, created_until,
+        page_size=page_size, max_workers=max_workers,
+    )
+    try:
+        for charges in pages:
+            summary["charges"] += len(charges)
+            rows = reconcile_charges(charges, apply=apply)
+            _count(summary, rows)
+            _write_report(report, rows)
+    except (requests.exceptions.RequestException, IntegrationUnavailable) as e:
+        logger.error(f"[Conciliação] Falha ao paginar cobranças: {e}")
+        rows = [_report_row(None, "error", None, error=str(e))]
+        _count(summary, rows)
+        _write_report(report, rows)
+
+    return summary
+
+
+# ================================================================
+# MODO DIRECIONADO (LINKS PARADOS)
+# ================================================================
+
+def stuck_payment_links(*, min_age: timedelta, max_age: timedelta):
+    """
+    Links que provavelmente perderam o webhook: pagamento pending/processing,
+    ou link ativo sem pagamento, criados entre max_age e min_age atrás.
+    """
+    now = timezone.now()
+    return (
+        PaymentLink.objects
+        .select_related("order", "payment")
+        .filter(created_at__lt=now - min_age, created_at__gte=now - max_age)
+        .filter(
+            Q(payment__status__in=STUCK_PAYMENT_STATUSES)
+            | Q(status="active", payment__isnull=True)
+        )
+        .order_by("pk")
+    )
+
+
+def reconcile_stuck_links(
+    *,
+    apply: bool = True,
+    report: TextIO | None = None,
+    min_age: timedelta | None = None,
+    max_age: timedelta | None = None,
+    chunk_size: int | None = None,
+    max_workers: int | None = None,
+    client: PagarMeCharges | None = None,
+) -> dict:
+    """
+    Consulta no Pagar.me só os links parados, em lotes de chunk_size
+    (keyset por PK), com até max_workers consultas simultâneas.
+
+    Falha ao consultar um link vai para o relatório e não interrompe os
+    demais; circuito aberto interrompe a varredura.
+    """
+    client = client or PagarMeCharges()
+    min_age = min_age or timedelta(minutes=_setting("RECONCILIATION_STUCK_MIN_AGE_MINUTES", 30))
+    max_age = max_age or timedelta(hours=_setting("RECONCILIATION_STUCK_MAX_AGE_HOURS", 72))
+    chunk_size = chunk_size or _setting("RECONCILIATION_PAGE_SIZE", 100)
+    max_workers = max_workers or _setting("RECONCILIATION_MAX_CONCURRENCY", 2)
+    summary = _new_summary()
+
+    def fetch(payment_link):
+        try:
+            return payment_link, client.list_charges_by_code(payment_link.id_link), None
+        except requests.exceptions.RequestException as e:
+            return payment_link, [], str(e)
+
+    queryset = stuck_payment_links(min_age=min_age, max_age=max_age)
+    last_pk = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while True:
+            links = list(queryset.filter(pk__gt=last_pk)[:chunk_size])
+            if not links:
+                break
+            last_pk = links[-1].pk
+            summary["checked_links"] += len(links)
+
+            charges = []
+            rows = []
+            try:
+                for payment_link, link_charges, error in pool.map(fetch, links):
+                    if error:
+                        rows.append(_report_row(
+                            payment_link.id_link, "error", None, payment_link, error=error
+                        ))
+                    charges.extend(link_charges)
+            except IntegrationUnavailable as e:
+                logger.warning(f"[Conciliação] Interrompida: {e}")
+                rows.append(_report_row(None, "error", None, error=str(e)))
+                _count(summary, rows)
+                _write_report(report, rows)
+                break
+
+            summary["charges"] += len(charges)
+            rows.extend(reconcile_charges(charges, apply=apply))
+            _count(summary, rows)
+            _write_report(report, rows)
+
+            if len(links) < chunk_size:
+                break
+
+    return summary
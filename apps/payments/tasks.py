@@ -0,0 +1,214 @@
+# apps/payments/tasks.py
+"""
+Tasks Celery do domínio de Pagamentos.
+
+- process_webhook_inbox_task: consome um webhook gravado na caixa de entrada
+- drain_webhook_inbox_task: dreno periódico (Celery beat) dos pendentes
+- purge_webhook_inbox_task: apaga webhooks processados além da retenção
+  (Celery beat)
+- generate_payment_link_task: gera o link de um pedido recém-criado
+- generate_payment_links_batch_task: links de pedidos importados em lote
+- retry_failed_payment_links_task: regenera links que falharam quando o
+  circuito do Pagar.me volta a aceitar chamadas e os pedidos parados em
+  "generating" (Celery beat)
+- expire_payment_links_task: expira links vencidos (Celery beat)
+- reconcile_stuck_payment_links_task: consulta no Pagar.me os links
+  parados em pending/processing (Celery beat)
+
+Roteamento: com WEBHOOK_QUEUE_COUNT > 0, cada webhook vai para a fila
+"webhooks.<n>", onde n = crc32(código da cobrança) % WEBHOOK_QUEUE_COUNT.
+Com um worker de concurrency=1 por fila, eventos da mesma cobrança são
+processados em ordem, e cobranças diferentes em paralelo:
+
+    celery -A config worker -Q webhooks.0 --concurrency=1 --prefetch-multiplier=1
+    celery -A config worker -Q webhooks.1 --concurrency=1 --prefetch-multiplier=1
+    ...
+
+No docker-compose.yml são os serviços celery_webhooks_<n> (duas filas).
+"""
+import logging
+import zlib
+from datetime import timedelta
+from celery import shared_task
+from django.conf import settings
+
+from apps.core.integrations.pagarme import PAGARME_BREAKER
+from apps.core.integrations.resilience import STATE_HALF_OPEN
+from apps.payments.services.commands import (
+    drain_webhook_inbox,
+    expire_overdue_payment_links,
+    generate_payment_link_for_order,
+    generate_payment_links_for_orders,
+    mark_payment_link_failed,
+    process_webhook_inbox,
+    purge_processed_webhooks,
+    requeue_failed_payment_links,
+)
+
+logger = logging.getLogger("payments")
+
+
+def webhook_queue_for_charge(charge_code: str | None) -> str | None:
+    """
+    Fila Celery de um webhook a partir do código da cobrança.
+
+    Retorna None (fila padrão) se o roteamento estiver desligado
+    (WEBHOOK_QUEUE_COUNT = 0) ou o evento não tiver código.
+    """
+    queue_count = getattr(settings, "WEBHOOK_QUEUE_COUNT", 0)
+
+    if not queue_count or not charge_code:
+        return None
+
+    shard = zlib.crc32(charge_code.encode("utf-8")) % queue_count
+    return f"webhooks.{shard}"
+
+
+@shared_task(ignore_result=True)
+def process_webhook_inbox_task(inbox_id: int):
+    """
+    Processa um webhook da caixa de entrada.
+
+    Falhas voltam para "pending" e são reprocessadas pelo dreno periódico.
+    """
+    logger.info(f"[Task] Processando webhook {inbox_id}")
+    process_webhook_inbox(inbox_id)
+
+
+@shared_task(ignore_result=True)
+def drain_webhook_inbox_task(limit: int = None):
+    """
+    Consome webhooks pendentes (broker fora no recebimento, falhas, etc.).
+    """
+    total = drain_webhook_inbox(limit=limit)
+    if total:
+        logger.info(f"[Task] {total} webhooks drenados da caixa de entrada")
+
+
+@shared_task(ignore_result=True)
+def purge_webhook_inbox_task():
+    """
+    Mantém a caixa de entrada pequena: apaga os "done" além da retenção.
+
+    Limitada a WEBHOOK_INBOX_PURGE_MAX_CHUNKS lotes por execução; o
+    restante fica para a próxima.
+    """
+    deleted, _ = purge_processed_webhooks(
+        chunk_size=getattr(settings, "WEBHOOK_INBOX_PURGE_CHUNK_SIZE", 1000),
+        max_chunks=getattr(settings, "WEBHOOK_INBOX_PURGE_MAX_CHUNKS", 20),
+    )
+    if deleted:
+        logger.info(f"[Task] {deleted} webhooks antigos apagados da caixa de entrada")
+
+
+@shared_task(bind=True, max_retries=3, ignore_result=True)
+def generate_payment_link_task(self, order_id: int):
+    """
+    Gera o link de pagamento do pedido e enfileira o envio por WhatsApp.
+
+    Disparada no commit da criação do pedido: a requisição não espera
+    o Pagar.me nem o WhatsApp. Falhas do Pagar.me são repetidas com
+    backoff (5s, 10s, 20s); esgotadas, o pedido fica "failed".
+
+    Com o circuito do Pagar.me aberto não adianta repetir: o pedido vai
+    direto para "failed" e retry_failed_payment_links_task o regenera
+    quando o circuito fechar.
+    """
+    logger.info(f"[Task] Gerando link de pagamento do pedido {order_id}")
+
+    if generate_payment_link_for_order(order_id):
+        return
+
+    if not PAGARME_BREAKER.allows_calls():
+        logger.warning(f"[Task] Pagar.me indisponível, link do pedido {order_id} adiado")
+        mark_payment_link_failed(order_id)
+        return
+
+    if self.request.retries < self.max_retries:
+        raise self.retry(countdown=5 * 2 ** self.request.retries)
+
+    logger.error(f"[Task] Falha ao gerar link do pedido {order_id}")
+    mark_payment_link_failed(order_id)
+
+
+@shared_task(ignore_result=True)
+def generate_payment_links_batch_task(order_ids: list[int]):
+    """
+    Gera os links de um lote de pedidos importados (chamadas concorrentes).
+
+    Falhas ficam "failed" e entram na recuperação periódica.
+    """
+    results = generate_payment_links_for_orders(order_ids)
+    created = sum(1 for link in results.values() if link)
+    logger.info(f"[Task] {created}/{len(results)} links gerados no lote")
+
+
+@shared_task(ignore_result=True)
+def retry_failed_payment_links_task():
+    """
+    Fila de recuperação dos links que falharam e dos pedidos parados em
+    "generating" (criados sem passar por create_order ou com a task perdida).
+
+    Não faz nada com o circuito aberto. Meio aberto, manda um único
+    pedido (a chamada de teste); fechado, um lote.
+    """
+    if not PAGARME_BREAKER.allows_calls():
+        return
+
+    limit = getattr(settings, "PAYMENT_LINK_RETRY_BATCH_SIZE", 20)
+    if PAGARME_BREAKER.state == STATE_HALF_OPEN:
+        limit = 1
+
+    order_ids = requeue_failed_payment_links(
+        limit=limit,
+        max_age=timedelta(
+            hours=getattr(settings, "PAYMENT_LINK_RETRY_MAX_AGE_HOURS", 24)
+        ),
+        stale_after=timedelta(
+            minutes=getattr(settings, "PAYMENT_LINK_GENERATING_STALE_MINUTES", 10)
+        ),
+    )
+
+    for order_id in order_ids:
+        generate_payment_link_task.delay(order_id)
+
+    if order_ids:
+        logger.info(f"[Task] {len(order_ids)} links de pagamento reenfileirados")
+
+
+@shared_task(ignore_result=True)
+def expire_payment_links_task(catch_up: bool = False):
+    """
+    Expira links vencidos em lotes, mantendo o conjunto "active" pequeno.
+
+    Execução normal: no máximo PAYMENT_LINK_EXPIRY_MAX_CHUNKS lotes.
+    Catch-up (acúmulo antigo): se ainda sobrar, a task se reenfileira
+    em vez de ocupar o worker até o fim.
+    """
+    expired, remaining = expire_overdue_payment_links(
+        chunk_size=getattr(settings, "PAYMENT_LINK_EXPIRY_CHUNK_SIZE", 500),
+        max_chunks=getattr(settings, "PAYMENT_LINK_EXPIRY_MAX_CHUNKS", 20),
+    )
+
+    if expired:
+        logger.info(f"[Task] {expired} links de pagamento expirados")
+
+    if remaining and catch_up:
+        expire_payment_links_task.apply_async(kwargs={"catch_up": True})
+
+
+@shared_task(ignore_result=True)
+def reconcile_stuck_payment_links_task():
+    """
+    Conciliação direcionada: recupera webhooks perdidos dos links parados.
+
+    Não roda com o circuito do Pagar.me aberto.
+    """
+    from apps.payments.services.reconciliation import reconcile_stuck_links
+
+    if not PAGARME_BREAKER.allows_calls():
+        return
+
+    summary = reconcile_stuck_links()
+    if summary["applied"] or summary["errors"]:
+        logger.info(f"[Task] Conciliação: {summary}")
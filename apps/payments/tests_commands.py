@@ -0,0 +1,75 @@
+"""
+Testes dos management commands de benchmark de webhooks.
+"""
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+
+from apps.payments.models import PaymentLink, Payment, WebhookInbox
+
+
+class WebhookBenchmarkCommandTests(TestCase):
+    """Testes do gerador e do replay de arquivos de webhooks."""
+
+    def setUp(self):
+        cache.clear()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.archive = os.path.join(self.tmpdir.name, 'webhooks.jsonl')
+        self.notification_patch = patch(
+            'apps.notifications.services.payment_notifications.send_payment_notification_task'
+        )
+        self.notification_patch.start()
+
+    def tearDown(self):
+        self.notification_patch.stop()
+        self.tmpdir.cleanup()
+
+    def _generate(self, events=50):
+        call_command(
+            'generate_webhook_archive', self.archive,
+            '--events', str(events), '--prefix', 'tst', '--create-links',
+            stdout=StringIO(),
+        )
+        with open(self.archive, encoding='utf-8') as archive:
+            return [json.loads(line) for line in archive]
+
+    def test_generate_archive_creates_events_and_links(self):
+        """Testa que o gerador escreve os eventos e cria os links."""
+        events = self._generate()
+
+        self.assertEqual(len(events), 50)
+        codes = {event['data']['code'] for event in events}
+        self.assertEqual(PaymentLink.objects.filter(id_link__in=codes).count(), len(codes))
+
+    def test_replay_direct_applies_events(self):
+        """Testa o replay direto e o relatório de throughput."""
+        events = self._generate()
+        out = StringIO()
+
+        call_command('replay_webhooks', self.archive, stdout=out)
+
+        output = out.getvalue()
+        self.assertIn('Throughput:', output)
+        self.assertIn('SQL por evento:', output)
+        self.assertIn('Erros:              0', output)
+        self.assertTrue(Payment.objects.exists())
+        self.assertLessEqual(
+            Payment.objects.count(), len({e['data']['code'] for e in events})
+        )
+
+    def test_replay_http_with_drain(self):
+        """Testa o replay pela view com dreno da caixa de entrada."""
+        self._generate(events=20)
+        out = StringIO()
+
+        with self.settings(WEBHOOK_BATCH_MODE=True):
+            call_command('replay_webhooks', self.archive, '--mode', 'http', '--drain', stdout=out)
+
+        self.assertIn('Dreno da caixa:', out.getvalue())
+        self.assertFalse(WebhookInbox.objects.filter(status='pending').exists())
@@ -0,0 +1,197 @@
+"""
+Testes de concorrência do processamento de webhooks.
+
+Dispara webhooks simultâneos (threads, uma conexão cada) para:
+- uma única cobrança → o lock no PaymentLink serializa os eventos
+- muitas cobranças → sem contenção, processamento em paralelo
+
+Reporta throughput (eventos/s) e o tempo total de espera por lock.
+Precisa de um banco com SELECT ... FOR UPDATE (PostgreSQL); no SQLite
+os testes de stress são pulados.
+"""
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from apps.sellers.models import Seller
+from apps.orders.models import Order
+from apps.payments.models import PaymentLink, Payment
+from apps.payments.services.commands import process_payment_webhook
+from apps.payments.tasks import webhook_queue_for_charge
+
+
+class WebhookQueueRoutingTests(TestCase):
+    """Testes do roteamento de webhooks por cobrança."""
+
+    @override_settings(WEBHOOK_QUEUE_COUNT=0)
+    def test_routing_disabled_uses_default_queue(self):
+        """Testa que sem filas configuradas vai para a fila padrão."""
+        self.assertIsNone(webhook_queue_for_charge('lnk_1'))
+
+    @override_settings(WEBHOOK_QUEUE_COUNT=4)
+    def test_same_charge_always_same_queue(self):
+        """Testa que a mesma cobrança cai sempre na mesma fila."""
+        queue = webhook_queue_for_charge('lnk_1')
+        self.assertEqual(webhook_queue_for_charge('lnk_1'), queue)
+        self.assertIn(queue, {f'webhooks.{n}' for n in range(4)})
+
+    @override_settings(WEBHOOK_QUEUE_COUNT=4)
+    def test_charges_spread_over_queues(self):
+        """Testa que cobranças diferentes se distribuem entre as filas."""
+        queues = {webhook_queue_for_charge(f'lnk_{i}') for i in range(100)}
+        self.assertEqual(len(queues), 4)
+
+    @override_settings(WEBHOOK_QUEUE_COUNT=4)
+    def test_event_without_code_uses_default_queue(self):
+        """Testa que evento sem código vai para a fila padrão."""
+        self.assertIsNone(webhook_queue_for_charge(None))
+
+
+@skipUnless(
+    connection.features.has_select_for_update,
+    "Banco sem SELECT ... FOR UPDATE (ex.: SQLite)",
+)
+class WebhookConcurrencyStressTests(TransactionTestCase):
+    """Stress de webhooks simultâneos com lock por PaymentLink."""
+
+    WORKERS = 8
+
+    def setUp(self):
+        cache.clear()
+        self.seller = Seller.objects.create(name="Seller Stress", phone="11999999999")
+        self.notification_patch = patch(
+            'apps.notifications.services.payment_notifications.send_payment_notification_task'
+        )
+        self.notification_patch.start()
+
+    def tearDown(self):
+        self.notification_patch.stop()
+
+    def _create_links(self, total):
+        links = []
+        for i in range(total):
+            order = Order.objects.create(
+                name=f"Pedido Stress {i}",
+                value=Decimal('10.00'),
+                value_freight=Decimal('0.00'),
+                total=Decimal('10.00'),
+                status='pending',
+                installments=1,
+                seller=self.seller,
+            )
+            links.append(PaymentLink.objects.create(
+                order=order,
+                url_link=f'https://pay.test/stress/{i}',
+                id_link=f'lnk_stress_{i}',
+                amount=order.total,
+                status='active',
+            ))
+        return links
+
+    def _fire(self, payloads):
+        """Processa os payloads em paralelo, conferindo vazão e espera por lock."""
+        lock_wait = []
+        lock_wait_guard = threading.Lock()
+
+        def timed_for_update(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                if "FOR UPDATE" in sql:
+                    with lock_wait_guard:
+                        lock_wait.append(time.perf_counter() - started)
+
+        def worker(payload):
+            try:
+                with connection.execute_wrapper(timed_for_update):
+                    return process_payment_webhook(payload)
+            finally:
+                connection.close()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.WORKERS) as pool:
+            results = list(pool.map(worker, payloads))
+        elapsed = time.perf_counter() - started
+
+        throughput = len(payloads) / elapsed if elapsed else float("inf")
+        # Todo evento passou pelo SELECT ... FOR UPDATE do link, e a espera
+        # pelo lock não pode somar mais que o tempo de parede × workers
+        self.assertGreaterEqual(len(lock_wait), len(payloads))
+        self.assertLessEqual(sum(lock_wait), elapsed * self.WORKERS)
+        self.assertGreater(throughput, 0)
+        return results
+
+    def test_simultaneous_events_single_charge(self):
+        """Eventos simultâneos na mesma cobrança geram um único Payment consistente."""
+        link = self._create_links(1)[0]
+        statuses = ['pending', 'processing', 'paid'] * 10
+        payloads = [
+            {'data': {'code': link.id_link, 'status': status, 'paid_amount': 1000}}
+            for status in statuses
+        ]
+
+        results = self._fire(payloads)
+
+        self.assertTrue(all(results))
+        self.assertEqual(Payment.objects.filter(payment_link=link).count(), 1)
+
+    def test_simultaneous_events_many_charges(self):
+        """Eventos simultâneos em cobranças diferentes são todos aplicados."""
+        links = self._create_links(40)
+        payloads = [
+            {'data': {'code': link.id_link, 'status': 'paid', 'paid_amount': 1000}}
+            for link in links
+        ]
+
+        results = self._fire(payloads)
+
+        self.assertTrue(all(results))
+        self.assertEqual(Payment.objects.filter(status='paid').count(), 40)
+        self.assertEqual(PaymentLink.objects.filter(status='used').count(), 40)
+        self.assertEqual(Order.objects.filter(status='paid').count(), 40)
+
+
+@skipUnless(
+    connection.features.has_select_for_update,
+    "Banco sem SELECT ... FOR UPDATE (ex.: SQLite)",
+)
+class PaymentLinkGenerationConcurrencyTests(TransactionTestCase):
+    """Disparos simultâneos da geração do link do mesmo pedido."""
+
+    def test_concurrent_generation_creates_single_link(self):
+        """Retentativa, recuperação e disparo manual juntos geram um único link no Pagar.me."""
+        from apps.payments.services.commands import generate_payment_link_for_order
+
+        order = Order.objects.create(
+            name="Pedido Link", value=Decimal('10.00'), value_freight=Decimal('0.00'),
+            total=Decimal('10.00'), status='pending', installments=1,
+            seller=Seller.objects.create(name="Seller Link", phone="11999999999"),
+        )
+        calls = []
+
+        def slow_pagarme(order):
+            calls.append(order.pk)
+            time.sleep(0.2)
+            return {'id': f'lnk_{len(calls)}', 'url': 'https://pay.test/link'}
+
+        def worker(_):
+            try:
+                return generate_payment_link_for_order(order.pk)
+            finally:
+                connection.close()
+
+        with patch('apps.payments.services.commands._generate_payment_link', side_effect=slow_pagarme), \
+                patch('apps.notifications.services.payment_notifications.send_payment_link_task'):
+            with ThreadPoolExecutor(max_workers=3) as pool:
+                links = list(pool.map(worker, range(3)))
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual({link.pk for link in links}, {PaymentLink.objects.get(order=order).pk})
@@ -0,0 +1,176 @@
+"""
+Testes da conciliação com o Pagar.me.
+"""
+import json
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+import requests
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.orders.models import Order
+from apps.payments.models import Payment, PaymentLink
+from apps.payments.services.reconciliation import (
+    reconcile_charges_range,
+    reconcile_stuck_links,
+)
+from apps.sellers.models import Seller
+
+
+class FakeCharges:
+    """Pagar.me falso: cobranças em memória, paginadas como na API."""
+
+    def __init__(self, charges, total=True, failing_codes=()):
+        self.charges = charges
+        self.total = total
+        self.failing_codes = set(failing_codes)
+        self.pages = []
+
+    def list_charges(self, *, created_since, created_until, page=1, size=100):
+        self.pages.append(page)
+        data = self.charges[(page - 1) * size:page * size]
+        paging = {"total": len(self.charges)} if self.total else {}
+        return {"data": data, "paging": paging}
+
+    def list_charges_by_code(self, code):
+        if code in self.failing_codes:
+            raise requests.exceptions.ReadTimeout("timeout")
+        return [charge for charge in self.charges if charge["code"] == code]
+
+
+def charge(code, status, paid_amount=1000):
+    return {"id": f"ch_{code}", "code": code, "status": status, "paid_amount": paid_amount}
+
+
+@patch("apps.notifications.services.payment_notifications.send_payment_notification_task")
+@patch("apps.notifications.services.payment_notifications.send_payment_notifications_batch_task")
+class ReconciliationTests(TestCase):
+    """Testes dos modos período e direcionado."""
+
+    def setUp(self):
+        cache.clear()
+        self.seller = Seller.objects.create(name="Seller Conciliação", phone="11999999999")
+        self.since = timezone.now() - timedelta(days=1)
+        self.until = timezone.now()
+
+    def _link(self, code, payment_status=None, minutes_ago=60):
+        order = Order.objects.create(
+            name=f"Pedido {code}",
+            value=Decimal("10.00"),
+            value_freight=Decimal("0.00"),
+            total=Decimal("10.00"),
+            status="pending",
+            installments=1,
+            seller=self.seller,
+        )
+        link = PaymentLink.objects.create(
+            order=order, url_link=f"https://pay.test/{code}", id_link=code,
+            amount=order.total, status="active",
+        )
+        PaymentLink.objects.filter(pk=link.pk).update(
+            created_at=timezone.now() - timedelta(minutes=minutes_ago)
+        )
+        if payment_status:
+            Payment.objects.create(
+                payment_link=link, amount=order.total, status=payment_status,
+                payment_date=timezone.now(),
+            )
+        return link
+
+    def test_range_applies_missing_payments_and_reports(self, *mocks):
+        """Testa que cobranças pagas sem webhook são corrigidas e relatadas."""
+        self._link("lnk_missed")
+        self._link("lnk_ok", payment_status="paid")
+        Order.objects.filter(payment_links__id_link="lnk_ok").update(status="paid")
+        PaymentLink.objects.filter(id_link="lnk_ok").update(status="used")
+        self._link("lnk_stale", payment_status="processing")
+        client = FakeCharges([
+            charge("lnk_missed", "paid"),
+            charge("lnk_ok", "paid"),
+            charge("lnk_stale", "failed"),
+            charge("lnk_other_store", "paid"),
+        ])
+        report = StringIO()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            summary = reconcile_charges_range(
+                self.since, self.until, report=report,
+                page_size=2, max_workers=2, client=client,
+            )
+
+        self.assertEqual(client.pages, [1, 2])
+        self.assertEqual(summary["charges"], 4)
+        self.assertEqual(summary["missing_payment"], 1)
+        self.assertEqual(summary["status_mismatch"], 1)
+        self.assertEqual(summary["unknown_charge"], 1)
+        self.assertEqual(summary["applied"], 2)
+
+        missed = PaymentLink.objects.select_related("order", "payment").get(id_link="lnk_missed")
+        self.assertEqual(
+            (missed.payment.status, missed.status, missed.order.status),
+            ("paid", "used", "paid"),
+        )
+        stale = PaymentLink.objects.select_related("order", "payment").get(id_link="lnk_stale")
+        self.assertEqual(
+            (stale.payment.status, stale.status, stale.order.status),
+            ("failed", "canceled", "canceled"),
+        )
+
+        rows = [json.loads(line) for line in report.getvalue().splitlines()]
+        self.assertEqual(
+            {row["charge_code"]: row["kind"] for row in rows},
+            {
+                "lnk_missed": "missing_payment",
+                "lnk_stale": "status_mismatch",
+                "lnk_other_store": "unknown_charge",
+            },
+        )
+
+    def test_dry_run_only_reports(self, *mocks):
+        """Testa que o dry-run não altera o banco."""
+        self._link("lnk_missed")
+        client = FakeCharges([charge("lnk_missed", "paid")], total=False)
+
+        summary = reconcile_charges_range(
+            self.since, self.until, apply=False, page_size=10, client=client,
+        )
+
+        self.assertEqual(summary["missing_payment"], 1)
+        self.assertEqual(summary["applied"], 0)
+        self.assertFalse(Payment.objects.exists())
+
+    def test_stuck_mode_polls_only_stuck_links(self, *mocks):
+        """Testa que o modo direcionado consulta só os links parados."""
+        self._link("lnk_processing", payment_status="processing")
+        self._link("lnk_open")
+        self._link("lnk_too_recent", minutes_ago=5)
+        self._link("lnk_paid", payment_status="paid")
+        self._link("lnk_broken", payment_status="pending")
+        client = FakeCharges(
+            [charge("lnk_processing", "paid"), charge("lnk_open", "pending")],
+            failing_codes={"lnk_broken"},
+        )
+
+        with patch.object(client, "list_charges_by_code", wraps=client.list_charges_by_code) as polled:
+            with self.captureOnCommitCallbacks(execute=True):
+                summary = reconcile_stuck_links(
+                    min_age=timedelta(minutes=30), max_age=timedelta(days=1),
+                    chunk_size=2, client=client,
+                )
+
+        self.assertEqual(
+            sorted(call.args[0] for call in polled.call_args_list),
+            ["lnk_broken", "lnk_open", "lnk_processing"],
+        )
+        self.assertEqual(summary["checked_links"], 3)
+        self.assertEqual(summary["status_mismatch"], 1)
+        self.assertEqual(summary["errors"], 1)
+        self.assertEqual(
+            Payment.objects.get(payment_link__id_link="lnk_processing").status, "paid"
+        )
+        # Cobrança ainda pendente num link sem pagamento não é divergência
+        self.assertFalse(Payment.objects.filter(payment_link__id_link="lnk_open").exists())
@@ -1,4 +1,12 @@
+from collections import Counter
+
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from unittest.mock import MagicMock, patch
+
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from datetime import timedelta
 from decimal import Decimal
 from apps.sellers.models import Seller
 from apps.orders.models import Order
@@ -7,10 +15,21 @@ from apps.payments import services
 from django.utils import timezone
 
 
+def statement_kinds(queries) -> Counter:
+    """Consultas capturadas por tipo (SELECT, INSERT, UPDATE, SAVEPOINT...)."""
+    return Counter(query["sql"].split(None, 1)[0].upper() for query in queries)
+
+
+# Transação do atomic() que segura o lock da linha do link: dentro do
+# TestCase ela aparece como SAVEPOINT/RELEASE (em produção, BEGIN/COMMIT)
+TRANSACTION = {"SAVEPOINT": 1, "RELEASE": 1}
+
+
 class PaymentsServicesTests(TestCase):
     """Testes dos serviços de pagamento."""
     
     def setUp(self):
+        cache.clear()
         self.seller = Seller.objects.create(name="Seller Pay", phone="999")
         self.order = Order.objects.create(
             name="Order Pay",
@@ -281,3 +300,603 @@ class PaymentsServicesTests(TestCase):
         
         order = payment.order
         self.assertEqual(order, self.order)
+
+
+class ChargeCodeLookupTests(TestCase):
+    """Testes da busca de PaymentLink pelo código da cobrança (com cache)."""
+
+    def setUp(self):
+        cache.clear()
+        self.seller = Seller.objects.create(name="Seller Lookup", phone="11999999999")
+        self.order = Order.objects.create(
+            name="Order Lookup",
+            value=Decimal('20.00'),
+            value_freight=Decimal('5.00'),
+            total=Decimal('25.00'),
+            status='pending',
+            installments=1,
+            seller=self.seller,
+        )
+        self.link = PaymentLink.objects.create(
+            order=self.order,
+            url_link='https://pay.test/lookup',
+            id_link='lnk_lookup',
+            amount=self.order.total,
+            status='active',
+        )
+
+    def test_id_link_is_unique(self):
+        """Testa que o código da cobrança é único."""
+        with self.assertRaises(IntegrityError):
+            PaymentLink.objects.create(
+                order=self.order,
+                url_link='https://pay.test/dup',
+                id_link='lnk_lookup',
+                amount=self.order.total,
+            )
+
+    def test_lookup_uses_single_query(self):
+        """Testa que a busca faz no máximo uma consulta (fria ou quente)."""
+        with self.assertNumQueries(1):
+            link = services.get_payment_link_by_charge_code('lnk_lookup')
+        self.assertEqual(link, self.link)
+
+        with self.assertNumQueries(1):
+            link = services.get_payment_link_by_charge_code('lnk_lookup')
+        self.assertEqual(link, self.link)
+
+    def test_unknown_code_is_negatively_cached(self):
+        """Testa que código desconhecido não volta ao banco no TTL."""
+        self.assertIsNone(services.get_payment_link_by_charge_code('lnk_nao_existe'))
+
+        with self.assertNumQueries(0):
+            self.assertIsNone(services.get_payment_link_by_charge_code('lnk_nao_existe'))
+            self.assertIsNone(services.process_payment_webhook(
+                {'data': {'code': 'lnk_nao_existe', 'status': 'paid'}}
+            ))
+
+        self.assertTrue(services.is_unknown_charge_code('lnk_nao_existe'))
+
+    def test_unknown_code_webhook_still_persisted(self):
+        """Testa que evento de cobrança no cache negativo é gravado na caixa de entrada."""
+        from apps.payments.models import WebhookInbox
+
+        services.get_payment_link_by_charge_code('lnk_nao_existe')
+
+        with patch('apps.payments.services.commands._dispatch_webhook_inbox'):
+            response = services.receive_payment_webhook(
+                {'id': 'evt_desconhecido', 'type': 'charge.paid', 'data': {'code': 'lnk_nao_existe'}}
+            )
+
+        self.assertEqual(response, {'status': 'recebido'})
+        self.assertTrue(WebhookInbox.objects.filter(event_id='evt_desconhecido').exists())
+
+    def test_intake_survives_cache_outage(self):
+        """Testa que com o cache fora do ar o webhook é gravado e o link resolvido pelo banco."""
+        from apps.payments.models import WebhookInbox
+
+        broken_cache = MagicMock()
+        broken_cache.get.side_effect = ConnectionError('redis')
+        broken_cache.set.side_effect = ConnectionError('redis')
+        payload = {'id': 'evt_sem_cache', 'type': 'charge.paid', 'data': {'code': 'lnk_lookup'}}
+
+        with patch('apps.payments.services.commands.cache', broken_cache), \
+                patch('apps.payments.services.queries.cache', broken_cache), \
+                patch('apps.payments.services.commands._dispatch_webhook_inbox'):
+            response = services.receive_payment_webhook(payload)
+            # Reenvio com o cache fora: a constraint unique segura
+            again = services.receive_payment_webhook(payload)
+
+            self.assertFalse(services.is_unknown_charge_code('lnk_lookup'))
+            self.assertEqual(services.get_payment_link_by_charge_code('lnk_lookup'), self.link)
+
+        self.assertEqual(response, {'status': 'recebido'})
+        self.assertEqual(again, response)
+        self.assertEqual(WebhookInbox.objects.filter(event_id='evt_sem_cache').count(), 1)
+
+    def test_created_link_replaces_negative_cache(self):
+        """Testa que criar o link limpa o cache negativo do código."""
+        from apps.payments.services.commands import _create_payment_link_record
+
+        services.get_payment_link_by_charge_code('lnk_novo')
+        self.assertTrue(services.is_unknown_charge_code('lnk_novo'))
+
+        link = _create_payment_link_record(
+            self.order, {'id': 'lnk_novo', 'url': 'https://pay.test/novo'}
+        )
+
+        self.assertFalse(services.is_unknown_charge_code('lnk_novo'))
+        self.assertEqual(services.get_payment_link_by_charge_code('lnk_novo'), link)
+
+    def test_stale_positive_cache_falls_back_to_code(self):
+        """Testa que cache positivo apontando para link removido é corrigido."""
+        services.get_payment_link_by_charge_code('lnk_lookup')
+        self.link.delete()
+        relinked = PaymentLink.objects.create(
+            order=self.order,
+            url_link='https://pay.test/lookup2',
+            id_link='lnk_lookup',
+            amount=self.order.total,
+        )
+
+        self.assertEqual(services.get_payment_link_by_charge_code('lnk_lookup'), relinked)
+
+
+class BatchWebhookProcessingTests(TestCase):
+    """Testes do processamento de webhooks em lote (coalescência)."""
+
+    def setUp(self):
+        cache.clear()
+        self.seller = Seller.objects.create(name="Seller Batch", phone="11999999999")
+        self.links = []
+        for i in range(3):
+            order = Order.objects.create(
+                name=f"Order Batch {i}",
+                value=Decimal('20.00'),
+                value_freight=Decimal('5.00'),
+                total=Decimal('25.00'),
+                status='pending',
+                installments=1,
+                seller=self.seller,
+            )
+            self.links.append(PaymentLink.objects.create(
+                order=order,
+                url_link=f'https://pay.test/batch/{i}',
+                id_link=f'lnk_batch_{i}',
+                amount=order.total,
+                status='active',
+            ))
+
+    def _event(self, link, status):
+        return {'data': {'code': link.id_link, 'status': status, 'paid_amount': 2500}}
+
+    def test_terminal_status_rule(self):
+        """Testa a escolha do status terminal entre vários eventos."""
+        from apps.payments.domain.rules import resolve_terminal_payment_status
+
+        self.assertEqual(
+            resolve_terminal_payment_status(['pending', 'processing', 'paid']), 'paid'
+        )
+        self.assertEqual(
+            resolve_terminal_payment_status(['paid', 'processing']), 'paid'
+        )
+        self.assertEqual(
+            resolve_terminal_payment_status(['paid', 'refunded']), 'refunded'
+        )
+        self.assertEqual(
+            resolve_terminal_payment_status(['failed', 'canceled']), 'canceled'
+        )
+        self.assertIsNone(resolve_terminal_payment_status(['invalido', None]))
+
+    def test_batch_keeps_terminal_status_per_link(self):
+        """Testa que o lote grava só o status terminal de cada cobrança."""
+        link_a, link_b, link_c = self.links
+        events = [
+            self._event(link_a, 'pending'),
+            self._event(link_b, 'processing'),
+            self._event(link_a, 'processing'),
+            self._event(link_b, 'failed'),
+            self._event(link_a, 'paid'),
+            self._event(link_c, 'pending'),
+        ]
+
+        with patch('apps.notifications.services.payment_notifications.send_payment_notification_task') as mock_task, \
+                patch('apps.notifications.services.payment_notifications.send_payment_notifications_batch_task') as mock_batch_task:
+            with self.captureOnCommitCallbacks(execute=True):
+                processed = services.process_payment_webhooks_batch(events)
+
+        self.assertEqual(set(processed), {link_a.id_link, link_b.id_link, link_c.id_link})
+        self.assertEqual(Payment.objects.get(payment_link=link_a).status, 'paid')
+        self.assertEqual(Payment.objects.get(payment_link=link_b).status, 'failed')
+        self.assertEqual(Payment.objects.get(payment_link=link_c).status, 'pending')
+
+        link_a.refresh_from_db()
+        link_b.refresh_from_db()
+        self.assertEqual(link_a.status, 'used')
+        self.assertEqual(link_a.order.status, 'paid')
+        self.assertEqual(link_b.status, 'canceled')
+
+        # Uma única task com as notificações do lote (paid e failed);
+        # pending não notifica
+        mock_task.delay.assert_not_called()
+        mock_batch_task.delay.assert_called_once()
+        notifications = mock_batch_task.delay.call_args.kwargs['notifications']
+        self.assertEqual(
+            sorted(n['status'] for n in notifications), ['failed', 'paid']
+        )
+
+    def test_batch_does_not_regress_stored_status(self):
+        """Testa que evento atrasado ("pending" depois de "paid") não volta o status."""
+        link = self.links[0]
+        with patch('apps.notifications.services.payment_notifications.send_payment_notification_task'), \
+                patch('apps.notifications.services.payment_notifications.send_payment_notifications_batch_task'):
+            services.process_payment_webhooks_batch([self._event(link, 'paid')])
+            processed = services.process_payment_webhooks_batch([self._event(link, 'pending')])
+
+        self.assertIn(link.id_link, processed)
+        self.assertEqual(Payment.objects.get(payment_link=link).status, 'paid')
+        link.refresh_from_db()
+        self.assertEqual(link.status, 'used')
+        self.assertEqual(link.order.status, 'paid')
+
+    def test_drain_without_batch_mode_waits_grace_period(self):
+        """Testa que, sem modo lote, o dreno só pega pendentes antigos, um a um."""
+        from datetime import timedelta
+        from django.utils import timezone
+        from apps.payments.models import WebhookInbox
+
+        fresh = WebhookInbox.objects.create(event_id='evt_novo', payload=self._event(self.links[0], 'paid'))
+        overdue = WebhookInbox.objects.create(event_id='evt_velho', payload=self._event(self.links[1], 'paid'))
+        WebhookInbox.objects.filter(pk=overdue.pk).update(
+            created_at=timezone.now() - timedelta(minutes=10)
+        )
+
+        with self.settings(WEBHOOK_BATCH_MODE=False, WEBHOOK_INBOX_DRAIN_GRACE_SECONDS=120), \
+                patch('apps.payments.services.commands.process_payment_webhooks_batch') as mock_batch, \
+                patch('apps.notifications.services.payment_notifications.send_payment_notification_task'):
+            self.assertEqual(services.drain_webhook_inbox(), 1)
+
+        mock_batch.assert_not_called()
+        fresh.refresh_from_db()
+        overdue.refresh_from_db()
+        self.assertEqual(fresh.status, 'pending')
+        self.assertEqual(overdue.status, 'done')
+
+    def test_batch_query_count_is_constant(self):
+        """Testa que o lote usa poucas consultas, independente do número de eventos."""
+        events = [
+            self._event(link, status)
+            for link in self.links
+            for status in ('pending', 'processing', 'paid')
+        ]
+
+        with patch('apps.notifications.services.payment_notifications.send_payment_notification_task'):
+            with CaptureQueriesContext(connection) as queries:
+                services.process_payment_webhooks_batch(events)
+
+        # SELECT joined (com lock) + INSERT payments + UPDATE links + UPDATE orders.
+        # O segundo SELECT relê pagamentos dos links que vieram sem pagamento:
+        # outro worker pode tê-los criado enquanto esperávamos o lock, e o
+        # JOIN não os enxerga. Só acontece quando há link sem pagamento.
+        self.assertEqual(
+            statement_kinds(queries),
+            Counter({"SELECT": 2, "INSERT": 1, "UPDATE": 2, **TRANSACTION}),
+        )
+
+        self.assertEqual(Payment.objects.filter(status='paid').count(), 3)
+
+    def test_batch_updates_existing_payment(self):
+        """Testa que pagamento existente é atualizado via bulk_update."""
+        link = self.links[0]
+        Payment.objects.create(
+            payment_link=link,
+            status='pending',
+            payment_date=timezone.now(),
+            amount=link.amount,
+        )
+
+        with patch('apps.notifications.services.payment_notifications.send_payment_notification_task'):
+            services.process_payment_webhooks_batch([self._event(link, 'paid')])
+
+        self.assertEqual(Payment.objects.get(payment_link=link).status, 'paid')
+        self.assertEqual(Payment.objects.count(), 1)
+
+    def test_batch_ignores_unknown_and_invalid_events(self):
+        """Testa que cobranças desconhecidas e status inválidos ficam de fora."""
+        events = [
+            {'data': {'code': 'lnk_nao_existe', 'status': 'paid'}},
+            self._event(self.links[0], 'status_invalido'),
+        ]
+
+        processed = services.process_payment_webhooks_batch(events)
+
+        self.assertEqual(processed, {})
+        self.assertFalse(Payment.objects.exists())
+
+
+class WebhookQueryBudgetTests(TestCase):
+    """Orçamento de consultas SQL do caminho de escrita do webhook."""
+
+    def setUp(self):
+        cache.clear()
+        self.seller = Seller.objects.create(name="Seller Budget", phone="11999999999")
+        self.order = Order.objects.create(
+            name="Order Budget",
+            value=Decimal('20.00'),
+            value_freight=Decimal('5.00'),
+            total=Decimal('25.00'),
+            status='pending',
+            installments=1,
+            seller=self.seller,
+        )
+        self.link = PaymentLink.objects.create(
+            order=self.order,
+            url_link='https://pay.test/budget',
+            id_link='lnk_budget',
+            amount=self.order.total,
+            status='active',
+        )
+
+    def _payload(self, status):
+        return {'data': {'code': self.link.id_link, 'status': status, 'paid_amount': 2500}}
+
+    def test_first_paid_event_budget(self):
+        """Primeiro evento pago: SELECT com lock + releitura + INSERT + 2 UPDATEs."""
+        with patch('apps.notifications.services.payment_notifications.send_payment_notification_task') as mock_task:
+            with self.captureOnCommitCallbacks(execute=True):
+                with CaptureQueriesContext(connection) as queries:
+                    payment = services.process_payment_webhook(self._payload('paid'))
+
+        # A releitura do pagamento (_get_locked_link_payment) só roda quando o
+        # link vem sem pagamento: cobre o pagamento criado por outro worker
+        # durante a espera pelo lock, que o JOIN não enxerga
+        self.assertEqual(
+            statement_kinds(queries),
+            Counter({"SELECT": 2, "INSERT": 1, "UPDATE": 2, **TRANSACTION}),
+        )
+
+        self.assertEqual(payment.status, 'paid')
+        mock_task.delay.assert_called_once()
+        self.link.refresh_from_db()
+        self.order.refresh_from_db()
+        self.assertEqual(self.link.status, 'used')
+        self.assertEqual(self.order.status, 'paid')
+
+    def test_status_change_budget(self):
+        """Mudança de status com pagamento existente: sem lazy load na notificação."""
+        with patch('apps.notifications.services.payment_notifications.send_payment_notification_task'):
+            services.process_payment_webhook(self._payload('processing'))
+
+        with patch('apps.notifications.services.payment_notifications.send_payment_notification_task') as mock_task:
+            # SELECT + UPDATE payment + UPDATE link + UPDATE order
+            with self.captureOnCommitCallbacks(execute=True):
+                with CaptureQueriesContext(connection) as queries:
+                    payment = services.process_payment_webhook(self._payload('paid'))
+
+        self.assertEqual(statement_kinds(queries), Counter({"SELECT": 1, "UPDATE": 3, **TRANSACTION}))
+
+        self.assertEqual(payment.status, 'paid')
+        mock_task.delay.assert_called_once()
+
+    def test_redelivery_budget(self):
+        """Reenvio sem mudança: uma consulta, nenhuma escrita e nenhuma notificação."""
+        with patch('apps.notifications.services.payment_notifications.send_payment_notification_task'):
+            services.process_payment_webhook(self._payload('paid'))
+
+        with patch('apps.notifications.services.payment_notifications.send_payment_notification_task') as mock_task:
+            with self.captureOnCommitCallbacks(execute=True):
+                with CaptureQueriesContext(connection) as queries:
+                    payment = services.process_payment_webhook(self._payload('paid'))
+
+        self.assertEqual(statement_kinds(queries), Counter({"SELECT": 1, **TRANSACTION}))
+
+        self.assertEqual(payment.status, 'paid')
+        mock_task.delay.assert_not_called()
+
+    def test_notification_published_only_on_commit(self):
+        """Testa que a notificação só vai para o broker no commit."""
+        with patch('apps.notifications.services.payment_notifications.send_payment_notification_task') as mock_task:
+            with self.captureOnCommitCallbacks() as callbacks:
+                services.process_payment_webhook(self._payload('paid'))
+                mock_task.delay.assert_not_called()
+
+            self.assertEqual(len(callbacks), 1)
+            callbacks[0]()
+            mock_task.delay.assert_called_once()
+
+    def test_rollback_discards_notification(self):
+        """Testa que rollback da transação não publica notificação."""
+        with patch('apps.notifications.services.payment_notifications.send_payment_notification_task') as mock_task:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                with self.assertRaises(IntegrityError):
+                    with transaction.atomic():
+                        services.process_payment_webhook(self._payload('paid'))
+                        raise IntegrityError("falha posterior na transação")
+
+        self.assertEqual(callbacks, [])
+        mock_task.delay.assert_not_called()
+
+
+class PaymentLinkGenerationTests(TestCase):
+    """Testes da geração assíncrona do link de pagamento."""
+
+    def setUp(self):
+        from apps.core.integrations.pagarme import PAGARME_BREAKER
+        cache.clear()
+        PAGARME_BREAKER.reset()
+        self.addCleanup(PAGARME_BREAKER.reset)
+        self.seller = Seller.objects.create(name="Seller Link", phone="11999999999")
+        self.order = Order.objects.create(
+            name="Order Link",
+            value=Decimal('30.00'),
+            value_freight=Decimal('0.00'),
+            total=Decimal('30.00'),
+            status='pending',
+            installments=1,
+            seller=self.seller,
+        )
+
+    def test_generate_link_marks_ready_and_sends_whatsapp(self):
+        """Testa que o link é gravado, o pedido fica pronto e o WhatsApp é enfileirado."""
+        link_data = {'id': 'lnk_async', 'url': 'https://pay.test/async'}
+
+        with patch('apps.payments.services.commands._generate_payment_link', return_value=link_data), \
+                patch('apps.notifications.services.payment_notifications.send_payment_link_task') as mock_task:
+            with self.captureOnCommitCallbacks(execute=True):
+                payment_link = services.generate_payment_link_for_order(self.order.pk)
+
+        self.assertEqual(payment_link.id_link, 'lnk_async')
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.link_status, 'ready')
+        mock_task.delay.assert_called_once_with(
+            phone='5511999999999', link='https://pay.test/async', value=30.0
+        )
+
+    def test_generate_link_reuses_active_link(self):
+        """Testa que a retentativa não cria um segundo link no Pagar.me."""
+        PaymentLink.objects.create(
+            order=self.order,
+            url_link='https://pay.test/existing',
+            id_link='lnk_existing',
+            amount=self.order.total,
+            status='active',
+        )
+
+        with patch('apps.payments.services.commands._generate_payment_link') as mock_generate:
+            payment_link = services.generate_payment_link_for_order(self.order.pk)
+
+        mock_generate.assert_not_called()
+        self.assertEqual(payment_link.id_link, 'lnk_existing')
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.link_status, 'ready')
+
+    def test_task_marks_failed_after_retries(self):
+        """Testa que, esgotadas as retentativas, o pedido fica com link 'failed'."""
+        from apps.payments.tasks import generate_payment_link_task
+
+        with patch('apps.payments.services.commands._generate_payment_link', return_value=None):
+            generate_payment_link_task.apply(args=[self.order.pk], retries=3)
+
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.link_status, 'failed')
+
+    def test_task_with_open_circuit_defers_to_recovery(self):
+        """Testa que com o circuito aberto a task não fica repetindo."""
+        from apps.core.integrations.pagarme import PAGARME_BREAKER
+        from apps.payments.tasks import generate_payment_link_task
+
+        PAGARME_BREAKER._open()
+
+        with patch('apps.payments.services.commands._generate_payment_link', return_value=None), \
+                patch.object(generate_payment_link_task, 'retry') as mock_retry:
+            generate_payment_link_task.apply(args=[self.order.pk])
+
+        mock_retry.assert_not_called()
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.link_status, 'failed')
+
+    def test_recovery_requeues_failed_links_when_circuit_closed(self):
+        """Testa que a recuperação reenfileira links que falharam."""
+        from apps.payments.tasks import retry_failed_payment_links_task
+
+        Order.objects.filter(pk=self.order.pk).update(link_status='failed')
+
+        with patch('apps.payments.tasks.generate_payment_link_task.delay') as mock_delay:
+            retry_failed_payment_links_task()
+
+        mock_delay.assert_called_once_with(self.order.pk)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.link_status, 'generating')
+
+    def test_recovery_picks_up_stale_generating_orders(self):
+        """Testa que pedido criado fora de create_order não fica parado em "generating"."""
+        from apps.payments.tasks import retry_failed_payment_links_task
+
+        recent = Order.objects.create(
+            name="Order Recente", value=Decimal('10.00'), value_freight=Decimal('0.00'),
+            total=Decimal('10.00'), status='pending', installments=1, seller=self.seller,
+        )
+        Order.objects.filter(pk=self.order.pk).update(
+            link_status='generating', updated_at=timezone.now() - timedelta(minutes=30)
+        )
+
+        with patch('apps.payments.tasks.generate_payment_link_task.delay') as mock_delay:
+            retry_failed_payment_links_task()
+
+        mock_delay.assert_called_once_with(self.order.pk)
+        recent.refresh_from_db()
+        self.assertEqual(recent.link_status, 'generating')
+
+        # Reenfileirado agora: a próxima execução não o pega de novo
+        with patch('apps.payments.tasks.generate_payment_link_task.delay') as mock_delay:
+            retry_failed_payment_links_task()
+        mock_delay.assert_not_called()
+
+    def test_recovery_waits_while_circuit_open(self):
+        """Testa que a recuperação não dispara nada com o circuito aberto."""
+        from apps.core.integrations.pagarme import PAGARME_BREAKER
+        from apps.payments.tasks import retry_failed_payment_links_task
+
+        PAGARME_BREAKER._open()
+        Order.objects.filter(pk=self.order.pk).update(link_status='failed')
+
+        with patch('apps.payments.tasks.generate_payment_link_task.delay') as mock_delay:
+            retry_failed_payment_links_task()
+
+        mock_delay.assert_not_called()
+
+
+class PaymentLinkExpiryTests(TestCase):
+    """Testes da expiração periódica de links vencidos."""
+
+    def setUp(self):
+        self.seller = Seller.objects.create(name="Seller Expiry", phone="11999999999")
+        self.order = Order.objects.create(
+            name="Order Expiry",
+            value=Decimal('10.00'),
+            value_freight=Decimal('0.00'),
+            total=Decimal('10.00'),
+            status='pending',
+            installments=1,
+            seller=self.seller,
+        )
+
+    def _link(self, code, minutes_ago):
+        link = PaymentLink.objects.create(
+            order=self.order, url_link=f'https://pay.test/{code}', id_link=code,
+            amount=self.order.total, status='active',
+        )
+        PaymentLink.objects.filter(pk=link.pk).update(
+            created_at=timezone.now() - timedelta(minutes=minutes_ago)
+        )
+        return link
+
+    def test_expires_only_overdue_links(self):
+        """Testa que só links vencidos e sem pagamento em andamento expiram."""
+        overdue = self._link('lnk_old', 90)
+        recent = self._link('lnk_new', 10)
+        processing = self._link('lnk_proc', 90)
+        Payment.objects.create(
+            payment_link=processing, amount=processing.amount, status='processing',
+            payment_date=timezone.now(),
+        )
+
+        with self.settings(PAYMENT_LINK_EXPIRES_MINUTES=60):
+            expired, remaining = services.expire_overdue_payment_links()
+
+        self.assertEqual((expired, remaining), (1, False))
+        for link in (overdue, recent, processing):
+            link.refresh_from_db()
+        self.assertEqual(overdue.status, 'expired')
+        self.assertEqual(recent.status, 'active')
+        self.assertEqual(processing.status, 'active')
+
+    def test_chunks_and_reports_remaining(self):
+        """Testa o limite de lotes e o retorno de pendências."""
+        for i in range(5):
+            self._link(f'lnk_{i}', 90)
+
+        with self.settings(PAYMENT_LINK_EXPIRES_MINUTES=60):
+            first = services.expire_overdue_payment_links(chunk_size=2, max_chunks=2)
+            second = services.expire_overdue_payment_links(chunk_size=2)
+
+        self.assertEqual(first, (4, True))
+        self.assertEqual(second, (1, False))
+        self.assertFalse(PaymentLink.objects.filter(status='active').exists())
+
+    def test_task_requeues_in_catch_up_mode(self):
+        """Testa que a task se reenfileira enquanto houver acúmulo."""
+        from apps.payments.tasks import expire_payment_links_task
+
+        for i in range(3):
+            self._link(f'lnk_{i}', 90)
+
+        with self.settings(
+            PAYMENT_LINK_EXPIRES_MINUTES=60,
+            PAYMENT_LINK_EXPIRY_CHUNK_SIZE=1,
+            PAYMENT_LINK_EXPIRY_MAX_CHUNKS=2,
+        ), patch('apps.payments.tasks.expire_payment_links_task.apply_async') as mock_async:
+            expire_payment_links_task(catch_up=True)
+
+        mock_async.assert_called_once_with(kwargs={'catch_up': True})
+        self.assertEqual(PaymentLink.objects.filter(status='active').count(), 1)
@@ -4,15 +4,24 @@ Testes HTTP do Webhook de Pagamentos.
 Testa o endpoint de webhook via chamadas HTTP simuladas.
 Com suporte para fila Celery (mock das tasks).
 """
+from datetime import timedelta
 from decimal import Decimal
 from unittest.mock import patch, MagicMock
 
+from django.core.cache import cache
 from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
 from rest_framework.test import APIClient
 
 from apps.sellers.models import Seller
 from apps.orders.models import Order
-from apps.payments.models import PaymentLink, Payment
+from apps.payments.models import PaymentLink, Payment, WebhookInbox
+from apps.payments.services.commands import (
+    drain_webhook_inbox,
+    purge_processed_webhooks,
+    receive_payment_webhook,
+)
 
 
 # Desabilitar Celery durante testes - executar sync
@@ -21,6 +30,7 @@ class WebhookAPITests(TestCase):
     """Testes do endpoint de webhook HTTP."""
     
     def setUp(self):
+        cache.clear()
         self.client = APIClient()
         self.seller = Seller.objects.create(
             name="Vendedor Teste",
@@ -42,8 +52,15 @@ class WebhookAPITests(TestCase):
             amount=self.order.total,
             status='active',
         )
-        # URL do webhook
         self.webhook_url = '/api/payments/v1/hook/'
+
+    def _post_and_drain(self, payload):
+        """Envia o webhook e consome a caixa de entrada (papel do worker)."""
+        response = self.client.post(self.webhook_url, data=payload, format='json')
+        # Notificações são publicadas no commit da transação
+        with self.captureOnCommitCallbacks(execute=True):
+            drain_webhook_inbox(grace_seconds=0)
+        return response
     
     def test_webhook_payment_paid_success(self):
         """Testa webhook de pagamento aprovado com sucesso."""
@@ -58,14 +75,10 @@ class WebhookAPITests(TestCase):
         }
         
         with patch('apps.notifications.tasks.send_payment_notification_task.delay') as mock_task:
-            response = self.client.post(
-                self.webhook_url,
-                data=payload,
-                format='json'
-            )
+            response = self._post_and_drain(payload)
         
-        self.assertEqual(response.status_code, 200)
-        self.assertEqual(response.json()['status'], 'ok')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['status'], 'recebido')
         
         # Verificar que o pagamento foi criado
         payment = Payment.objects.filter(payment_link=self.payment_link).first()
@@ -91,13 +104,9 @@ class WebhookAPITests(TestCase):
         }
         
         with patch('apps.notifications.tasks.send_payment_notification_task.delay') as mock_task:
-            response = self.client.post(
-                self.webhook_url,
-                data=payload,
-                format='json'
-            )
+            response = self._post_and_drain(payload)
         
-        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.status_code, 202)
         
         payment = Payment.objects.filter(payment_link=self.payment_link).first()
         self.assertIsNotNone(payment)
@@ -115,13 +124,9 @@ class WebhookAPITests(TestCase):
         }
         
         with patch('apps.notifications.tasks.send_payment_notification_task.delay') as mock_task:
-            response = self.client.post(
-                self.webhook_url,
-                data=payload,
-                format='json'
-            )
+            response = self._post_and_drain(payload)
         
-        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.status_code, 202)
         
         payment = Payment.objects.filter(payment_link=self.payment_link).first()
         self.assertEqual(payment.status, 'failed')
@@ -147,13 +152,9 @@ class WebhookAPITests(TestCase):
         }
         
         with patch('apps.notifications.tasks.send_payment_notification_task.delay') as mock_task:
-            response = self.client.post(
-                self.webhook_url,
-                data=payload,
-                format='json'
-            )
+            response = self._post_and_drain(payload)
         
-        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.status_code, 202)
         
         payment = Payment.objects.filter(payment_link=self.payment_link).first()
         self.assertEqual(payment.status, 'refunded')
@@ -176,8 +177,8 @@ class WebhookAPITests(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.json()['status'], 'ignorado')
     
-    def test_webhook_unknown_charge_returns_error(self):
-        """Testa webhook para charge desconhecido retorna erro."""
+    def test_webhook_unknown_charge_marked_failed(self):
+        """Testa webhook para charge desconhecido: aceito, mas marcado como falho."""
         payload = {
             'type': 'charge.paid',
             'data': {
@@ -187,14 +188,11 @@ class WebhookAPITests(TestCase):
             }
         }
         
-        response = self.client.post(
-            self.webhook_url,
-            data=payload,
-            format='json'
-        )
+        response = self._post_and_drain(payload)
         
-        self.assertEqual(response.status_code, 400)
-        self.assertIn('error', response.json())
+        self.assertEqual(response.status_code, 202)
+        inbox = WebhookInbox.objects.get()
+        self.assertEqual(inbox.status, 'failed')
     
     def test_webhook_invalid_status(self):
         """Testa webhook com status inválido."""
@@ -207,14 +205,12 @@ class WebhookAPITests(TestCase):
             }
         }
         
-        response = self.client.post(
-            self.webhook_url,
-            data=payload,
-            format='json'
-        )
+        response = self._post_and_drain(payload)
         
-        # Status inválido resulta em erro
-        self.assertEqual(response.status_code, 400)
+        # Status inválido: aceito no recebimento, rejeitado no processamento
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(WebhookInbox.objects.get().status, 'failed')
+        self.assertFalse(Payment.objects.filter(payment_link=self.payment_link).exists())
     
     def test_webhook_empty_payload(self):
         """Testa webhook com payload vazio."""
@@ -242,11 +238,7 @@ class WebhookAPITests(TestCase):
         with patch('apps.notifications.services.payment_notifications.send_payment_notification_task') as mock_task:
             mock_task.delay = MagicMock()
             
-            response = self.client.post(
-                self.webhook_url,
-                data=payload,
-                format='json'
-            )
+            response = self._post_and_drain(payload)
             
             # Verifica que a task foi enfileirada com .delay()
             mock_task.delay.assert_called_once_with(
@@ -269,25 +261,180 @@ class WebhookAPITests(TestCase):
         with patch('apps.notifications.services.payment_notifications.send_payment_notification_task') as mock_task:
             mock_task.delay = MagicMock()
             
-            response = self.client.post(
-                self.webhook_url,
-                data=payload,
-                format='json'
-            )
+            response = self._post_and_drain(payload)
         
         # Webhook retorna sucesso
-        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.status_code, 202)
         
         # Pagamento foi criado
         payment = Payment.objects.filter(payment_link=self.payment_link).first()
         self.assertIsNotNone(payment)
 
+    def test_webhook_only_persists_payload(self):
+        """Testa que o recebimento só grava na caixa de entrada (sem processar)."""
+        payload = {
+            'type': 'charge.paid',
+            'data': {
+                'code': self.payment_link.id_link,
+                'status': 'paid',
+                'paid_amount': int(self.payment_link.amount * 100),
+            }
+        }
+
+        response = self.client.post(self.webhook_url, data=payload, format='json')
+
+        self.assertEqual(response.status_code, 202)
+        inbox = WebhookInbox.objects.get()
+        self.assertEqual(inbox.status, 'pending')
+        self.assertEqual(inbox.event_type, 'charge.paid')
+        self.assertEqual(inbox.payload, payload)
+        self.assertFalse(Payment.objects.filter(payment_link=self.payment_link).exists())
+
+    def test_drain_marks_inbox_done(self):
+        """Testa que o dreno processa e marca o webhook como concluído."""
+        payload = {
+            'type': 'charge.paid',
+            'data': {
+                'code': self.payment_link.id_link,
+                'status': 'paid',
+                'paid_amount': int(self.payment_link.amount * 100),
+            }
+        }
+
+        with patch('apps.notifications.tasks.send_payment_notification_task.delay'):
+            self._post_and_drain(payload)
+
+        inbox = WebhookInbox.objects.get()
+        self.assertEqual(inbox.status, 'done')
+        self.assertEqual(inbox.attempts, 1)
+        self.assertIsNotNone(inbox.processed_at)
+
+    def test_processing_error_returns_to_queue(self):
+        """Testa que erro inesperado devolve o webhook para a fila."""
+        payload = {
+            'type': 'charge.paid',
+            'data': {
+                'code': self.payment_link.id_link,
+                'status': 'paid',
+                'paid_amount': int(self.payment_link.amount * 100),
+            }
+        }
+
+        with patch(
+            'apps.payments.services.commands.process_payment_webhook',
+            side_effect=RuntimeError('db fora'),
+        ):
+            self._post_and_drain(payload)
+
+        inbox = WebhookInbox.objects.get()
+        self.assertEqual(inbox.status, 'pending')
+        self.assertEqual(inbox.attempts, 1)
+        self.assertEqual(inbox.last_error, 'db fora')
+
+
+class WebhookIdempotencyTests(TestCase):
+    """Testes de idempotência por ID do evento do Pagar.me."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.webhook_url = '/api/payments/v1/hook/'
+        self.payload = {
+            'id': 'hook_idem_123',
+            'type': 'charge.paid',
+            'data': {
+                'code': 'lnk_idem',
+                'status': 'paid',
+                'paid_amount': 1000,
+            }
+        }
+
+    def test_redelivery_creates_single_inbox_row(self):
+        """Testa que reenvios do mesmo evento geram um único registro."""
+        first = self.client.post(self.webhook_url, data=self.payload, format='json')
+        second = self.client.post(self.webhook_url, data=self.payload, format='json')
+
+        self.assertEqual(first.status_code, 202)
+        self.assertEqual(second.status_code, 202)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(WebhookInbox.objects.filter(event_id='hook_idem_123').count(), 1)
+
+    def test_redelivery_skips_database(self):
+        """Testa que reenvio com cache quente não toca o banco."""
+        receive_payment_webhook(self.payload)
+
+        with self.assertNumQueries(0):
+            response = receive_payment_webhook(self.payload)
+
+        self.assertEqual(response, {'status': 'recebido'})
+
+    def test_redelivery_with_cold_cache_hits_unique_constraint(self):
+        """Testa que a constraint unique barra o duplicado quando o cache expirou."""
+        receive_payment_webhook(self.payload)
+        cache.clear()
+
+        response = receive_payment_webhook(self.payload)
+
+        self.assertEqual(response, {'status': 'recebido'})
+        self.assertEqual(WebhookInbox.objects.count(), 1)
+
+    def test_events_without_id_are_not_deduplicated(self):
+        """Testa que payloads sem ID continuam sendo aceitos."""
+        payload = dict(self.payload)
+        payload.pop('id')
+
+        receive_payment_webhook(payload)
+        receive_payment_webhook(payload)
+
+        self.assertEqual(WebhookInbox.objects.count(), 2)
+
 
 @override_settings(CELERY_TASK_ALWAYS_EAGER=True)
+class WebhookInboxRetentionTests(TestCase):
+    """Testes da limpeza de webhooks processados."""
+
+    def _inbox(self, event_id, status, days_old):
+        inbox = WebhookInbox.objects.create(event_id=event_id, payload={}, status=status)
+        WebhookInbox.objects.filter(pk=inbox.pk).update(
+            created_at=timezone.now() - timedelta(days=days_old)
+        )
+        return inbox
+
+    def test_purges_only_old_done_webhooks(self):
+        """Só "done" além da retenção sai; recentes, pendentes e falhas ficam."""
+        self._inbox('evt_velho', 'done', days_old=10)
+        recent = self._inbox('evt_recente', 'done', days_old=1)
+        pending = self._inbox('evt_pendente', 'pending', days_old=10)
+        failed = self._inbox('evt_falhou', 'failed', days_old=10)
+
+        deleted, remaining = purge_processed_webhooks(retention_days=7)
+
+        self.assertEqual(deleted, 1)
+        self.assertFalse(remaining)
+        self.assertEqual(
+            set(WebhookInbox.objects.values_list('pk', flat=True)),
+            {recent.pk, pending.pk, failed.pk},
+        )
+
+    def test_purge_respects_max_chunks(self):
+        """Com max_chunks, o que sobrar fica para a próxima execução."""
+        for i in range(3):
+            self._inbox(f'evt_{i}', 'done', days_old=10)
+
+        deleted, remaining = purge_processed_webhooks(
+            retention_days=7, chunk_size=2, max_chunks=1
+        )
+
+        self.assertEqual(deleted, 2)
+        self.assertTrue(remaining)
+        self.assertEqual(WebhookInbox.objects.count(), 1)
+
+
 class WebhookNotificationTests(TestCase):
     """Testes específicos de disparo de notificações via webhook."""
     
     def setUp(self):
+        cache.clear()
         self.client = APIClient()
         self.seller = Seller.objects.create(
             name="Vendedor Notif",
@@ -310,6 +457,14 @@ class WebhookNotificationTests(TestCase):
             status='active',
         )
         self.webhook_url = '/api/payments/v1/hook/'
+
+    def _post_and_drain(self, payload):
+        """Envia o webhook e consome a caixa de entrada (papel do worker)."""
+        response = self.client.post(self.webhook_url, data=payload, format='json')
+        # Notificações são publicadas no commit da transação
+        with self.captureOnCommitCallbacks(execute=True):
+            drain_webhook_inbox(grace_seconds=0)
+        return response
     
     def test_paid_status_enqueues_notification(self):
         """Testa que status paid enfileira notificação de sucesso."""
@@ -325,7 +480,7 @@ class WebhookNotificationTests(TestCase):
         with patch('apps.notifications.services.payment_notifications.send_payment_notification_task') as mock_task:
             mock_task.delay = MagicMock()
             
-            self.client.post(self.webhook_url, data=payload, format='json')
+            self._post_and_drain(payload)
             
             mock_task.delay.assert_called_once_with(
                 status='paid',
@@ -347,7 +502,7 @@ class WebhookNotificationTests(TestCase):
         with patch('apps.notifications.services.payment_notifications.send_payment_notification_task') as mock_task:
             mock_task.delay = MagicMock()
             
-            self.client.post(self.webhook_url, data=payload, format='json')
+            self._post_and_drain(payload)
             
             mock_task.delay.assert_called_once_with(
                 status='failed',
@@ -369,7 +524,7 @@ class WebhookNotificationTests(TestCase):
         with patch('apps.notifications.services.payment_notifications.send_payment_notification_task') as mock_task:
             mock_task.delay = MagicMock()
             
-            self.client.post(self.webhook_url, data=payload, format='json')
+            self._post_and_drain(payload)
             
             mock_task.delay.assert_called_once()
     
@@ -387,7 +542,7 @@ class WebhookNotificationTests(TestCase):
         with patch('apps.notifications.services.payment_notifications.send_payment_notification_task') as mock_task:
             mock_task.delay = MagicMock()
             
-            self.client.post(self.webhook_url, data=payload, format='json')
+            self._post_and_drain(payload)
             
             # Não deve chamar .delay() para status pending
             mock_task.delay.assert_not_called()
@@ -425,10 +580,10 @@ class WebhookNotificationTests(TestCase):
         with patch('apps.notifications.services.payment_notifications.send_payment_notification_task') as mock_task:
             mock_task.delay = MagicMock()
             
-            response = self.client.post(self.webhook_url, data=payload, format='json')
+            response = self._post_and_drain(payload)
             
             # Webhook ainda funciona
-            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.status_code, 202)
             
             # Mas não enfileira mensagem
             mock_task.delay.assert_not_called()
@@ -489,3 +644,42 @@ class CeleryTaskTests(TestCase):
                     phone='5511999999999',
                     amount=100.0
                 )
+
+    def test_batch_task_uses_single_service(self):
+        """Testa que a task de lote cria um único serviço para todas as mensagens."""
+        from apps.notifications.tasks import send_payment_notifications_batch_task
+
+        with patch('apps.notifications.tasks.get_whatsapp_service') as mock_factory:
+            mock_service = MagicMock()
+            mock_factory.return_value = mock_service
+
+            send_payment_notifications_batch_task(notifications=[
+                {'status': 'paid', 'phone': '5511999999999', 'amount': 10.0},
+                {'status': 'failed', 'phone': '5511888888888', 'amount': None},
+            ])
+
+        mock_factory.assert_called_once()
+        mock_service.send_payment_success_approved.assert_called_once_with(
+            phone='5511999999999', value=10.0
+        )
+        mock_service.send_payment_refused.assert_called_once_with(phone='5511888888888')
+
+    def test_batch_task_requeues_failed_message(self):
+        """Testa que falha de envio no lote vira task unitária (sem reenviar o resto)."""
+        from apps.notifications.tasks import send_payment_notifications_batch_task
+
+        failed = {'status': 'failed', 'phone': '5511888888888', 'amount': None}
+
+        with patch('apps.notifications.tasks.get_whatsapp_service') as mock_factory, \
+                patch('apps.notifications.tasks.send_payment_notification_task.delay') as mock_delay:
+            mock_service = MagicMock()
+            mock_service.send_payment_refused.side_effect = Exception("timeout")
+            mock_factory.return_value = mock_service
+
+            send_payment_notifications_batch_task(notifications=[
+                {'status': 'paid', 'phone': '5511999999999', 'amount': 10.0},
+                failed,
+            ])
+
+        mock_service.send_payment_success_approved.assert_called_once()
+        mock_delay.assert_called_once_with(**failed)
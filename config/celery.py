@@ -9,6 +9,7 @@ Otimizado para Oracle Free Tier (1GB RAM):
 """
 import os
 from celery import Celery
+from celery.signals import worker_process_init
 
 # Definir settings do Django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
@@ -22,6 +23,18 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 app.autodiscover_tasks()
 
 
+@worker_process_init.connect
+def reset_integration_clients(**kwargs):
+    """
+    Cada processo filho do worker começa sem clientes herdados do pai.
+
+    Nada conecta aqui: o cliente da Evolution API é criado no primeiro uso.
+    """
+    from apps.core.integrations.integration_whatsapp.whatsapp import reset_evolution_client
+
+    reset_evolution_client()
+
+
 @app.task(bind=True, ignore_result=True)
 def debug_task(self):
     print(f'Request: {self.request!r}')
@@ -1,6 +1,6 @@
 from pathlib import Path
 import os
-from decouple import config
+from decouple import Csv, config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -202,6 +202,27 @@ if not DEBUG:
     SECURE_HSTS_PRELOAD = True
 
 
+# ========================================
+# Cache
+# ========================================
+# Redis em produção (CACHE_URL=redis://redis:6379/1); memória local no dev/testes
+CACHE_URL = config('CACHE_URL', default='')
+
+if CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+
 # ========================================
 # Celery Configuration (Task Queue)
 # ========================================
@@ -226,6 +247,173 @@ CELERY_ENABLE_UTC = True
 CELERY_TASK_DEFAULT_RETRY_DELAY = 60  # 1 minuto
 CELERY_TASK_MAX_RETRIES = 3
 
+# Publicação: falha rápido quando o broker não responde (a task vai para o
+# spool local, ver apps/core/task_spool.py) em vez de travar a requisição
+TASK_PUBLISH_TIMEOUT = config('TASK_PUBLISH_TIMEOUT', default=2.0, cast=float)
+CELERY_BROKER_CONNECTION_TIMEOUT = TASK_PUBLISH_TIMEOUT
+CELERY_BROKER_TRANSPORT_OPTIONS = {'socket_connect_timeout': TASK_PUBLISH_TIMEOUT}
+CELERY_TASK_PUBLISH_RETRY_POLICY = {
+    'max_retries': 1,
+    'interval_start': 0,
+    'interval_step': 0.2,
+    'interval_max': 0.2,
+}
+# Spool: tasks republicadas por lote e lotes por execução do flusher
+TASK_SPOOL_BATCH_SIZE = config('TASK_SPOOL_BATCH_SIZE', default=100, cast=int)
+TASK_SPOOL_MAX_BATCHES = config('TASK_SPOOL_MAX_BATCHES', default=20, cast=int)
+
+# Tarefas periódicas (celery -A config beat)
+CELERY_BEAT_SCHEDULE = {
+    'flush-task-spool': {
+        'task': 'apps.core.tasks.flush_task_spool_task',
+        'schedule': 30.0,  # segundos
+    },
+    'drain-webhook-inbox': {
+        'task': 'apps.payments.tasks.drain_webhook_inbox_task',
+        'schedule': 30.0,  # segundos
+    },
+    'purge-webhook-inbox': {
+        'task': 'apps.payments.tasks.purge_webhook_inbox_task',
+        'schedule': 3600.0,  # segundos
+    },
+    'retry-failed-payment-links': {
+        'task': 'apps.payments.tasks.retry_failed_payment_links_task',
+        'schedule': 60.0,  # segundos
+    },
+    'expire-payment-links': {
+        'task': 'apps.payments.tasks.expire_payment_links_task',
+        'schedule': 300.0,  # segundos
+        'kwargs': {'catch_up': True},
+    },
+    'reconcile-stuck-payment-links': {
+        'task': 'apps.payments.tasks.reconcile_stuck_payment_links_task',
+        'schedule': 900.0,  # segundos
+    },
+    'rebuild-freight-table': {
+        'task': 'apps.orders.tasks.rebuild_freight_table_task',
+        'schedule': 24 * 60 * 60.0,  # segundos
+    },
+    'sample-freight-estimate-error': {
+        'task': 'apps.orders.tasks.sample_freight_estimate_error_task',
+        'schedule': 60 * 60.0,  # segundos
+    },
+    'dispatch-whatsapp-outbox': {
+        'task': 'apps.notifications.tasks.dispatch_whatsapp_outbox_task',
+        'schedule': 60.0,  # segundos
+    },
+    'check-evolution-instances': {
+        'task': 'apps.notifications.tasks.check_evolution_instances_task',
+        'schedule': 60.0,  # segundos
+    },
+}
+
+
+# ========================================
+# Webhooks (Pagar.me)
+# ========================================
+# Máximo de tentativas antes de marcar o webhook como "failed"
+WEBHOOK_INBOX_MAX_ATTEMPTS = config('WEBHOOK_INBOX_MAX_ATTEMPTS', default=5, cast=int)
+# Modo lote: não enfileira uma task por webhook; o dreno periódico processa
+# em lotes, coalescendo eventos da mesma cobrança (janelas de conciliação)
+WEBHOOK_BATCH_MODE = config('WEBHOOK_BATCH_MODE', default=False, cast=bool)
+# Filas "webhooks.<n>" por hash do código da cobrança (0 = fila padrão).
+# Ver apps/payments/tasks.py para subir um worker por fila.
+WEBHOOK_QUEUE_COUNT = config('WEBHOOK_QUEUE_COUNT', default=0, cast=int)
+# Quantidade de webhooks consumidos por execução do dreno
+WEBHOOK_INBOX_BATCH_SIZE = config('WEBHOOK_INBOX_BATCH_SIZE', default=100, cast=int)
+# Sem modo lote: idade (s) a partir da qual o dreno periódico processa um
+# webhook pendente cuja task não rodou (broker fora, task perdida)
+WEBHOOK_INBOX_DRAIN_GRACE_SECONDS = config('WEBHOOK_INBOX_DRAIN_GRACE_SECONDS', default=120, cast=int)
+# Tempo (s) até um webhook preso em "processing" voltar para a fila
+WEBHOOK_INBOX_STALE_SECONDS = config('WEBHOOK_INBOX_STALE_SECONDS', default=300, cast=int)
+# Tempo (s) que o ID de um evento já recebido fica no cache quente
+WEBHOOK_EVENT_CACHE_TTL = config('WEBHOOK_EVENT_CACHE_TTL', default=60 * 60 * 24, cast=int)
+# Retenção (dias) dos webhooks processados ("done"); deve cobrir a janela de
+# reenvio do Pagar.me. Limpeza: registros por DELETE e lotes por execução
+WEBHOOK_INBOX_RETENTION_DAYS = config('WEBHOOK_INBOX_RETENTION_DAYS', default=7, cast=int)
+WEBHOOK_INBOX_PURGE_CHUNK_SIZE = config('WEBHOOK_INBOX_PURGE_CHUNK_SIZE', default=1000, cast=int)
+WEBHOOK_INBOX_PURGE_MAX_CHUNKS = config('WEBHOOK_INBOX_PURGE_MAX_CHUNKS', default=20, cast=int)
+
+
+# ========================================
+# Links de pagamento (Pagar.me)
+# ========================================
+# Pedidos com link "failed" reenfileirados por execução da recuperação
+PAYMENT_LINK_RETRY_BATCH_SIZE = config('PAYMENT_LINK_RETRY_BATCH_SIZE', default=20, cast=int)
+# Idade máxima (h) de um pedido para ainda tentar gerar o link
+PAYMENT_LINK_RETRY_MAX_AGE_HOURS = config('PAYMENT_LINK_RETRY_MAX_AGE_HOURS', default=24, cast=int)
+# Pedido em "generating" há mais que isto (min) entra na recuperação: criado
+# fora de create_order (admin, shell) ou com a task perdida
+PAYMENT_LINK_GENERATING_STALE_MINUTES = config('PAYMENT_LINK_GENERATING_STALE_MINUTES', default=10, cast=int)
+# Validade (min) dos links: enviada ao Pagar.me (expires_in) e usada na expiração
+PAYMENT_LINK_EXPIRES_MINUTES = config('PAYMENT_LINK_EXPIRES_MINUTES', default=1200, cast=int)
+# Expiração: links por UPDATE e lotes por execução da task
+PAYMENT_LINK_EXPIRY_CHUNK_SIZE = config('PAYMENT_LINK_EXPIRY_CHUNK_SIZE', default=500, cast=int)
+PAYMENT_LINK_EXPIRY_MAX_CHUNKS = config('PAYMENT_LINK_EXPIRY_MAX_CHUNKS', default=20, cast=int)
+
+
+# ========================================
+# Frete (Correios)
+# ========================================
+# Cache de cotações: validade (s) e janela (s) em que o valor antigo ainda
+# é servido enquanto a cotação é atualizada em segundo plano
+FREIGHT_CACHE_TTL = config('FREIGHT_CACHE_TTL', default=6 * 60 * 60, cast=int)
+FREIGHT_CACHE_STALE_TTL = config('FREIGHT_CACHE_STALE_TTL', default=24 * 60 * 60, cast=int)
+# Chave: dígitos do CEP de destino. Faixas de peso (g) e dimensões (cm):
+# usadas só com FREIGHT_QUOTE_AT_BAND_LIMIT (senão a chave é o pacote exato)
+FREIGHT_CACHE_CEP_PREFIX = config('FREIGHT_CACHE_CEP_PREFIX', default=5, cast=int)
+FREIGHT_WEIGHT_BAND_GRAMS = config('FREIGHT_WEIGHT_BAND_GRAMS', default=500, cast=int)
+FREIGHT_DIMENSION_BAND_CM = config('FREIGHT_DIMENSION_BAND_CM', default=5, cast=int)
+# Cotar no limite superior da faixa e guardar por faixa (mais acertos no
+# cache, mas todo pacote paga pelo limite). Desligado: cota e guarda pelo
+# peso/dimensões reais
+FREIGHT_QUOTE_AT_BAND_LIMIT = config('FREIGHT_QUOTE_AT_BAND_LIMIT', default=False, cast=bool)
+# Tabela local de preços (estimativa): arquivo, faixas de peso (g) e se a
+# página de frete usa a estimativa. Desligada por padrão: a tabela tem uma
+# amostra (capital) por UF; ligue quando o erro medido por
+# sample_freight_estimate_error for aceitável
+FREIGHT_TABLE_PATH = config('FREIGHT_TABLE_PATH', default=str(BASE_DIR / 'data' / 'freight_table.bin'))
+FREIGHT_TABLE_WEIGHTS_GRAMS = config(
+    'FREIGHT_TABLE_WEIGHTS_GRAMS', default='300,500,1000,2000,3000,5000,10000,20000,30000', cast=Csv(int)
+)
+FREIGHT_ESTIMATE_ENABLED = config('FREIGHT_ESTIMATE_ENABLED', default=False, cast=bool)
+# Cotações reais por execução da amostragem do erro da estimativa
+FREIGHT_ESTIMATE_SAMPLES = config('FREIGHT_ESTIMATE_SAMPLES', default=20, cast=int)
+
+# ========================================
+# WhatsApp (Evolution API)
+# ========================================
+# Caixa de saída: mensagens gravadas na transação e enviadas por um
+# despachante no ritmo da instância (desligado = uma task por mensagem)
+WHATSAPP_OUTBOX_ENABLED = config('WHATSAPP_OUTBOX_ENABLED', default=False, cast=bool)
+# Vazão por instância (mensagens/s): inicial, mínima e máxima (adaptativa)
+WHATSAPP_RATE_PER_SECOND = config('WHATSAPP_RATE_PER_SECOND', default=1.0, cast=float)
+WHATSAPP_RATE_MIN = config('WHATSAPP_RATE_MIN', default=0.1, cast=float)
+WHATSAPP_RATE_MAX = config('WHATSAPP_RATE_MAX', default=3.0, cast=float)
+# Rajada máxima (tokens acumulados no balde)
+WHATSAPP_BURST = config('WHATSAPP_BURST', default=3, cast=int)
+# Mensagens por lote do despachante e tempo máximo (s) por execução
+WHATSAPP_OUTBOX_BATCH_SIZE = config('WHATSAPP_OUTBOX_BATCH_SIZE', default=10, cast=int)
+WHATSAPP_OUTBOX_MAX_SECONDS = config('WHATSAPP_OUTBOX_MAX_SECONDS', default=50, cast=int)
+WHATSAPP_OUTBOX_MAX_ATTEMPTS = config('WHATSAPP_OUTBOX_MAX_ATTEMPTS', default=5, cast=int)
+# "Digitando..." (ms) antes de cada mensagem da caixa de saída (0 = sem)
+WHATSAPP_MESSAGE_DELAY_MS = config('WHATSAPP_MESSAGE_DELAY_MS', default=0, cast=int)
+# Janela (s) em que transições do mesmo pagamento viram uma só mensagem
+# com o último status. Padrão 0: desligada, envia cada transição (ex.: 15
+# para segurar estorno/chargeback em sequência)
+PAYMENT_NOTIFICATION_COALESCE_SECONDS = config('PAYMENT_NOTIFICATION_COALESCE_SECONDS', default=0, cast=int)
+
+# ========================================
+# Conciliação (Pagar.me)
+# ========================================
+# Cobranças por página / links por lote
+RECONCILIATION_PAGE_SIZE = config('RECONCILIATION_PAGE_SIZE', default=100, cast=int)
+# Consultas simultâneas ao Pagar.me
+RECONCILIATION_MAX_CONCURRENCY = config('RECONCILIATION_MAX_CONCURRENCY', default=2, cast=int)
+# Modo direcionado: idade mínima (min) e máxima (h) de um link parado
+RECONCILIATION_STUCK_MIN_AGE_MINUTES = config('RECONCILIATION_STUCK_MIN_AGE_MINUTES', default=30, cast=int)
+RECONCILIATION_STUCK_MAX_AGE_HOURS = config('RECONCILIATION_STUCK_MAX_AGE_HOURS', default=72, cast=int)
+
 
 # ========================================
 # Logging Configuration
@@ -22,6 +22,8 @@ urlpatterns = [
     # API
     path("api/orders/", include("apps.orders.api.urls")),
     path("api/payments/", include("apps.payments.api.urls")),
+    path("api/notifications/", include("apps.notifications.api.urls")),
+    path("api/core/", include("apps.core.api.urls")),
     
     # API Documentation
     path("api/schema/", SpectacularAPIView.as_view(), name="schema"),